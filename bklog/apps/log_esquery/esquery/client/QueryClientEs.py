@@ -20,9 +20,11 @@ SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 We undertake not to change the open source license (MIT license) applicable to the current version of
 the project delivered to anyone in the future.
 """
+from contextlib import contextmanager
 from typing import Any, Dict
 
 from apps.api import TransferApi
+from apps.log_esquery import metrics
 from apps.log_esquery.constants import DEFAULT_SCHEMA
 from apps.log_esquery.esquery.client.QueryClientTemplate import QueryClientTemplate
 from apps.log_esquery.exceptions import (
@@ -35,7 +37,7 @@ from apps.log_esquery.exceptions import (
     EsException,
 )
 from apps.log_esquery.type_constants import type_mapping_dict
-from apps.log_esquery.utils.es_client import es_socket_ping, get_es_client
+from apps.log_esquery.utils.es_client import es_client_pool, is_connection_failure
 from apps.utils.cache import cache_five_minute
 from django.conf import settings
 from django.utils.translation import ugettext as _
@@ -59,7 +61,8 @@ class QueryClientEs(QueryClientTemplate):  # pylint: disable=invalid-name
 
         try:
             params = {"request_timeout": settings.ES_QUERY_TIMEOUT}
-            return self._client.search(index=index, body=body, scroll=scroll, params=params)
+            with self._request():
+                return self._client.search(index=index, body=body, scroll=scroll, params=params)
         except Exception as e:  # pylint: disable=broad-except
             self.catch_timeout_raise(e)
             raise EsClientSearchException(EsClientSearchException.MESSAGE.format(error=e))
@@ -67,7 +70,8 @@ class QueryClientEs(QueryClientTemplate):  # pylint: disable=invalid-name
     def mapping(self, index: str) -> Dict:
         self._build_connection(check_ping=False)
         try:
-            mapping_dict: type_mapping_dict = self._client.indices.get_mapping(index=index)
+            with self._request():
+                mapping_dict: type_mapping_dict = self._client.indices.get_mapping(index=index)
             return mapping_dict
         except Exception as e:  # pylint: disable=broad-except
             self.catch_timeout_raise(e)
@@ -76,7 +80,8 @@ class QueryClientEs(QueryClientTemplate):  # pylint: disable=invalid-name
     def scroll(self, index: str, scroll_id: str, scroll: str) -> Dict:
         self._build_connection(check_ping=False)
         try:
-            return self._client.scroll(scroll_id=scroll_id, scroll=scroll)
+            with self._request():
+                return self._client.scroll(scroll_id=scroll_id, scroll=scroll)
         except Exception as e:  # pylint: disable=broad-except
             self.catch_timeout_raise(e)
             raise EsClientScrollException(EsClientScrollException.MESSAGE.format(error=e))
@@ -84,7 +89,8 @@ class QueryClientEs(QueryClientTemplate):  # pylint: disable=invalid-name
     def cluster_stats(self, index=None):
         self._build_connection()
         try:
-            return self._client.cluster.stats()
+            with self._request():
+                return self._client.cluster.stats()
         except Exception as e:  # pylint: disable=broad-except
             self.catch_timeout_raise(e)
             raise EsException
@@ -94,21 +100,24 @@ class QueryClientEs(QueryClientTemplate):  # pylint: disable=invalid-name
             params = {"request_timeout": 10}
         self._build_connection()
         try:
-            return self._client.cat.indices(index=index, bytes=bytes, format=format, params=params)
+            with self._request():
+                return self._client.cat.indices(index=index, bytes=bytes, format=format, params=params)
         except Exception as e:  # pylint: disable=broad-except
             self.catch_timeout_raise(e)
             raise EsClientCatIndicesException(EsClientCatIndicesException.MESSAGE.format(error=e))
 
     def cluster_nodes_stats(self, index=None):
         self._build_connection()
-        return self._client.nodes.stats()
+        with self._request():
+            return self._client.nodes.stats()
 
     def es_route(self, url: str, index=None):
         self._build_connection()
         if not url.startswith("/"):
             url = "/" + url
         try:
-            return self._client.transport.perform_request("GET", url)
+            with self._request():
+                return self._client.transport.perform_request("GET", url)
         except Exception as e:  # pylint: disable=broad-except
             self.catch_timeout_raise(e)
             raise
@@ -129,21 +138,26 @@ class QueryClientEs(QueryClientTemplate):  # pylint: disable=invalid-name
         )
         self._active: bool = False
 
-        # es socket ping
-        es_socket_ping(host=self.host, port=self.port)
-
-        self._client: Elasticsearch = get_es_client(
-            version=self.version,
-            hosts=[self.host],
-            username=self.username,
-            password=self.password,
-            scheme=self.schema,
-            port=self.port,
-            sniffer_timeout=600,
-            verify_certs=False,
+        # 从进程内连接池获取客户端，复用已建立的连接
+        self._client, self._active = es_client_pool.get_client(
+            storage_cluster_id=self.storage_cluster_id,
+            connect_info=(self.host, self.port, self.username, self.password, self.version, self.schema),
+            check_ping=check_ping,
         )
-        if not check_ping or self._client.ping():
-            self._active = True
+
+    @contextmanager
+    def _request(self):
+        """
+        统计进行中的请求数，连接异常时从连接池中剔除客户端，请求超时不剔除
+        """
+        with metrics.ESQUERY_INFLIGHT_REQUESTS.labels(storage_cluster_id=self.storage_cluster_id).track_inprogress():
+            try:
+                yield
+            except Exception as e:  # pylint: disable=broad-except
+                if is_connection_failure(e):
+                    es_client_pool.evict(self.storage_cluster_id, client=self._client)
+                    self._active = False
+                raise
 
     @staticmethod
     @cache_five_minute("_connect_info_{storage_cluster_id}", need_md5=True)
@@ -183,7 +197,8 @@ class QueryClientEs(QueryClientTemplate):  # pylint: disable=invalid-name
         """
         self._build_connection()
         try:
-            index_results = self._client.indices.get_alias(result_table_id if result_table_id else "*")
+            with self._request():
+                index_results = self._client.indices.get_alias(result_table_id if result_table_id else "*")
         except Exception as e:  # pylint: disable=broad-except
             self.catch_timeout_raise(e)
             raise EsClientAliasException(EsClientAliasException.MESSAGE.format(error=e))
@@ -43,6 +43,7 @@ class DslBuilder(object):
         highlight: dict = {},
         collapse={},
         search_after=[],
+        scroll_slice={},
         use_time_range=True,
         mappings: list = [],
     ):  # pylint: disable=dangerous-default-value
@@ -105,6 +106,8 @@ class DslBuilder(object):
         self._query_body.update({"query": query_bool_obj.get("query")})
         if collapse:
             self._query_body.update({"collapse": collapse})
+        if scroll_slice:
+            self._query_body.update({"slice": scroll_slice})
 
         # 透传聚合
         self._agg_body = aggs
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 from apps.utils.prometheus import register_metric
-from prometheus_client import Counter, Histogram
+from prometheus_client import Counter, Gauge, Histogram
 from prometheus_client.utils import INF
 
 ESQUERY_SEARCH_LATENCY = register_metric(
@@ -18,3 +18,28 @@ ESQUERY_SEARCH_COUNT = register_metric(
     documentation="search count of esquery search API",
     labelnames=("index_set_id", "indices", "scenario_id", "storage_cluster_id", "status"),
 )
+
+
+ESQUERY_CLIENT_POOL_COUNT = register_metric(
+    Counter,
+    name="esquery_client_pool_count",
+    documentation="es client pool access count",
+    labelnames=("storage_cluster_id", "status"),
+)
+
+
+ESQUERY_CLIENT_CONNECT_LATENCY = register_metric(
+    Histogram,
+    name="esquery_client_connect_latency",
+    documentation="es client connection setup latency",
+    labelnames=("storage_cluster_id",),
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, INF),
+)
+
+
+ESQUERY_INFLIGHT_REQUESTS = register_metric(
+    Gauge,
+    name="esquery_inflight_requests",
+    documentation="in-flight requests of es client",
+    labelnames=("storage_cluster_id",),
+)
@@ -82,6 +82,8 @@ class EsQuerySearchAttrSerializer(serializers.Serializer):
     highlight = serializers.DictField(required=False, default={})
     # 折叠查询
     collapse = serializers.DictField(required=False, default={}, allow_null=True)
+    # 分片scroll查询 {"id": 0, "max": 4}
+    slice = serializers.DictField(required=False, default={}, allow_null=True)
 
     bkdata_authentication_method = serializers.CharField(required=False)
     bkdata_data_token = serializers.CharField(required=False)
@@ -20,12 +20,16 @@ We undertake not to change the open source license (MIT license) applicable to t
 the project delivered to anyone in the future.
 """
 import socket
+import threading
+import time
 
+from apps.log_esquery import metrics
 from apps.log_esquery.exceptions import (
     EsClientAuthenticatorException,
     EsClientHostPortException,
     EsClientSocketException,
 )
+from django.conf import settings
 from django.utils.translation import ugettext_lazy as _
 from elasticsearch import Elasticsearch as Elasticsearch
 from elasticsearch import exceptions as ElasticsearchExceptions
@@ -113,3 +117,140 @@ def es_client_ping(es_client):
         raise EsClientSocketException(EsClientSocketException.MESSAGE.format(error=_("ES is not alive")))
 
     return result
+
+
+# 连接异常，出现时需要从连接池中剔除客户端
+ES_CONNECTION_ERRORS = (
+    ElasticsearchExceptions.ConnectionError,
+    Elasticsearch5Exceptions.ConnectionError,
+    Elasticsearch6Exceptions.ConnectionError,
+)
+
+# 请求超时(ConnectionError的子类)，仅说明单次查询较慢，连接本身仍可用
+ES_CONNECTION_TIMEOUTS = (
+    ElasticsearchExceptions.ConnectionTimeout,
+    Elasticsearch5Exceptions.ConnectionTimeout,
+    Elasticsearch6Exceptions.ConnectionTimeout,
+)
+
+
+def is_connection_failure(error: Exception) -> bool:
+    """
+    是否为需要剔除客户端的连接异常
+    """
+    return isinstance(error, ES_CONNECTION_ERRORS) and not isinstance(error, ES_CONNECTION_TIMEOUTS)
+
+
+class EsClientPool(object):
+    """
+    进程内共享的ES客户端池
+    1. 按 storage_cluster_id 复用客户端及其持久连接，避免每次查询重新建立连接和ping
+    2. 集群连接信息(地址、账号、版本等)变更或连接异常时剔除客户端
+    3. 已缓存的客户端按间隔做健康检查
+    4. 剔除的客户端可能仍有其他线程在使用，不主动关闭连接，由客户端回收时释放
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}
+
+    @staticmethod
+    def get_pool_maxsize(storage_cluster_id: int) -> int:
+        """
+        单个集群的连接池大小，可按集群单独配置
+        """
+        cluster_maxsize = getattr(settings, "ES_CLIENT_POOL_MAXSIZE_CLUSTERS", {})
+        return int(
+            cluster_maxsize.get(str(storage_cluster_id))
+            or cluster_maxsize.get(storage_cluster_id)
+            or getattr(settings, "ES_CLIENT_POOL_MAXSIZE", 10)
+        )
+
+    def get_client(self, storage_cluster_id: int, connect_info: tuple, check_ping: bool = True):
+        """
+        获取集群客户端
+        :param storage_cluster_id: 集群ID
+        :param connect_info: (host, port, username, password, version, schema)
+        :param check_ping: 是否需要检查集群可用
+        :return: (client, is_active)
+        """
+        now = time.time()
+        with self._lock:
+            cached = self._clients.get(storage_cluster_id)
+
+        if cached and cached["connect_info"] == connect_info:
+            if not check_ping or now - cached["checked_at"] < getattr(settings, "ES_CLIENT_HEALTH_CHECK_INTERVAL", 60):
+                metrics.ESQUERY_CLIENT_POOL_COUNT.labels(storage_cluster_id=storage_cluster_id, status="hit").inc()
+                return cached["client"], True
+
+            if self._ping(cached["client"]):
+                cached["checked_at"] = now
+                metrics.ESQUERY_CLIENT_POOL_COUNT.labels(storage_cluster_id=storage_cluster_id, status="hit").inc()
+                return cached["client"], True
+
+            # 健康检查失败，重新建立连接
+            self.evict(storage_cluster_id, client=cached["client"])
+        elif cached:
+            # 集群连接信息已变更
+            self.evict(storage_cluster_id, client=cached["client"])
+
+        metrics.ESQUERY_CLIENT_POOL_COUNT.labels(storage_cluster_id=storage_cluster_id, status="miss").inc()
+        client, is_active = self._create_client(storage_cluster_id, connect_info, check_ping)
+        if is_active:
+            with self._lock:
+                self._clients[storage_cluster_id] = {
+                    "connect_info": connect_info,
+                    "client": client,
+                    "checked_at": time.time() if check_ping else now,
+                }
+        return client, is_active
+
+    def evict(self, storage_cluster_id: int, client=None):
+        """
+        剔除集群客户端，指定 client 时仅当缓存的是该客户端时剔除
+        """
+        with self._lock:
+            cached = self._clients.get(storage_cluster_id)
+            if not cached or (client is not None and cached["client"] is not client):
+                return
+            self._clients.pop(storage_cluster_id, None)
+
+        metrics.ESQUERY_CLIENT_POOL_COUNT.labels(storage_cluster_id=storage_cluster_id, status="evict").inc()
+
+    def clear(self):
+        for storage_cluster_id in list(self._clients.keys()):
+            self.evict(storage_cluster_id)
+
+    def _create_client(self, storage_cluster_id: int, connect_info: tuple, check_ping: bool):
+        host, port, username, password, version, schema = connect_info
+        start_time = time.time()
+
+        # es socket ping
+        es_socket_ping(host=host, port=port)
+
+        client = get_es_client(
+            version=version,
+            hosts=[host],
+            username=username,
+            password=password,
+            scheme=schema,
+            port=port,
+            sniffer_timeout=600,
+            verify_certs=False,
+            maxsize=self.get_pool_maxsize(storage_cluster_id),
+        )
+        is_active = not check_ping or self._ping(client)
+        metrics.ESQUERY_CLIENT_CONNECT_LATENCY.labels(storage_cluster_id=storage_cluster_id).observe(
+            time.time() - start_time
+        )
+        return client, is_active
+
+    @staticmethod
+    def _ping(client) -> bool:
+        try:
+            return bool(client.ping())
+        except Exception:  # pylint: disable=broad-except
+            return False
+
+
+es_client_pool = EsClientPool()
@@ -173,6 +173,7 @@ class AsyncExportHandlers(object):
             "download_url": export_task_history["download_url"],
             "export_pkg_name": export_task_history["file_name"],
             "export_pkg_size": export_task_history["file_size"],
+            "export_count": export_task_history["export_count"],
             "export_created_at": export_task_history["created_at"],
             "export_created_by": export_task_history["created_by"],
             "export_completed_at": export_task_history["completed_at"],
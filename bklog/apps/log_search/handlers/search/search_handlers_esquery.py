@@ -616,11 +616,12 @@ class SearchHandler(object):
 
         return search_result
 
-    def pre_get_result(self, sorted_fields: list, size: int):
+    def pre_get_result(self, sorted_fields: list, size: int, scroll_slice: dict = None):
         """
         pre_get_result
         @param sorted_fields:
         @param size:
+        @param scroll_slice: 分片scroll查询参数, 仅ES场景支持 {"id": 0, "max": 4}
         @return:
         """
         if self.scenario_id == Scenario.ES:
@@ -646,6 +647,7 @@ class SearchHandler(object):
                     "time_field_unit": self.time_field_unit,
                     "scroll": SCROLL,
                     "collapse": self.collapse,
+                    "slice": scroll_slice or {},
                 },
                 data_api_retry_cls=DataApiRetryClass.create_retry_obj(
                     exceptions=[BaseException],
@@ -692,6 +694,16 @@ class SearchHandler(object):
         @param sorted_fields:
         @return:
         """
+        for result in self.search_after_pages(search_result, sorted_fields):
+            yield self._deal_query_result(result)
+
+    def search_after_pages(self, search_result, sorted_fields):
+        """
+        search_after 翻页, 返回每页的原始查询结果
+        @param search_result:
+        @param sorted_fields:
+        @return:
+        """
         search_after_size = len(search_result["hits"]["hits"])
         result_size = search_after_size
         sorted_list = self._get_user_sorted_list(sorted_fields)
@@ -730,7 +742,7 @@ class SearchHandler(object):
 
             search_after_size = len(search_result["hits"]["hits"])
             result_size += search_after_size
-            yield self._deal_query_result(search_result)
+            yield search_result
 
     def scroll_result(self, scroll_result):
         """
@@ -738,6 +750,15 @@ class SearchHandler(object):
         @param scroll_result:
         @return:
         """
+        for result in self.scroll_pages(scroll_result):
+            yield self._deal_query_result(result)
+
+    def scroll_pages(self, scroll_result):
+        """
+        scroll 翻页, 返回每页的原始查询结果
+        @param scroll_result:
+        @return:
+        """
         scroll_size = len(scroll_result["hits"]["hits"])
         result_size = scroll_size
         while scroll_size == MAX_RESULT_WINDOW and result_size < self.size:
@@ -756,7 +777,7 @@ class SearchHandler(object):
             )
             scroll_size = len(scroll_result["hits"]["hits"])
             result_size += scroll_size
-            yield self._deal_query_result(scroll_result)
+            yield scroll_result
 
     @staticmethod
     def get_bcs_manage_url(cluster_id, container_id):
@@ -1282,23 +1303,47 @@ class SearchHandler(object):
 
         return highlight
 
-    def _add_cmdb_fields(self, log):
+    @staticmethod
+    def _get_cmdb_host_key(log):
+        """
+        获取日志对应的cmdb主机缓存key: bk_host_id 或 ip, 无法关联主机时返回None
+        """
+        bk_host_id = log.get("bk_host_id")
+        if bk_host_id:
+            return bk_host_id
+        return log.get("serverIp", log.get("ip")) or None
+
+    def _prefetch_cmdb_hosts(self, logs):
+        """
+        预先批量获取一页日志关联的主机信息, 避免逐条查询缓存
+        """
+        bk_biz_id = self.search_dict.get("bk_biz_id")
+        if not bk_biz_id:
+            return {}
+        host_keys = [host_key for host_key in map(self._get_cmdb_host_key, logs) if host_key]
+        if not host_keys:
+            return {}
+        return CmdbHostCache.batch_get(bk_biz_id, host_keys)
+
+    def _add_cmdb_fields(self, log, host_info_map=None):
         if not self.search_dict.get("bk_biz_id"):
             return log
 
         bk_biz_id = self.search_dict.get("bk_biz_id")
         bk_host_id = log.get("bk_host_id")
-        server_ip = log.get("serverIp", log.get("ip"))
         bk_cloud_id = log.get("cloudId", log.get("cloudid"))
-        if not bk_host_id and not server_ip:
+        host_key = self._get_cmdb_host_key(log)
+        if not host_key:
             return log
         # 以上情况说明请求不包含能去cmdb查询主机信息的字段，直接返回
         log["__module__"] = ""
         log["__set__"] = ""
         log["__ipv6__"] = ""
 
-        host_key = bk_host_id if bk_host_id else server_ip
-        host_info = CmdbHostCache.get(bk_biz_id, host_key)
+        if host_info_map is not None and host_key in host_info_map:
+            host_info = host_info_map[host_key]
+        else:
+            host_info = CmdbHostCache.get(bk_biz_id, host_key)
         # 当主机被迁移业务或者删除的时候, 会导致缓存中没有该主机信息, 放空处理
         if not host_info:
             return log
@@ -1349,12 +1394,11 @@ class SearchHandler(object):
             )
             return result
         # hit data
-        for hit in result_dict["hits"]["hits"]:
-            log = hit["_source"]
-            # 脱敏处理
-            if self.desensitize_config_list:
-                log = self._log_desensitize(log)
-            log = self._add_cmdb_fields(log)
+        hits = result_dict["hits"]["hits"]
+        logs = self._prepare_hit_logs(hits)
+        host_info_map = self._prefetch_cmdb_hosts(logs)
+        for hit, log in zip(hits, logs):
+            log = self._add_cmdb_fields(log, host_info_map)
             if self.export_fields:
                 new_origin_log = {}
                 for _export_field in self.export_fields:
@@ -1370,7 +1414,7 @@ class SearchHandler(object):
             log.update({"index": _index})
             if self.search_dict.get("is_return_doc_id"):
                 log.update({"__id__": hit["_id"]})
-            origin_log_list.append(copy.deepcopy(origin_log))
+            origin_log_list.append(origin_log if self.export_fields else self._copy_origin_log(origin_log))
             if "highlight" not in hit:
                 log_list.append(log)
                 continue
@@ -1391,6 +1435,70 @@ class SearchHandler(object):
         result.update({"aggs": agg_dict})
         return result
 
+    def prepare_export_fields(self):
+        """
+        将导出字段和检索日志有的字段取交集, 需要在拉取导出数据前调用一次
+        """
+        if self.export_fields:
+            support_fields_list = [i["field_name"] for i in self.fields()["fields"]]
+            self.export_fields = list(set(self.export_fields).intersection(set(support_fields_list)))
+
+    def iter_export_logs(self, result_dict: dict):
+        """
+        逐条返回导出日志, 内容与 _deal_query_result 中的 origin_log_list 一致
+        导出的日志写出后即不再使用, 因此不做深拷贝
+        导出字段由 prepare_export_fields 预先计算, 这里只读, 可在多个拉取线程中并发调用
+        """
+        if not result_dict.get("hits", {}).get("total"):
+            return
+
+        hits = result_dict["hits"]["hits"]
+        logs = self._prepare_hit_logs(hits)
+        host_info_map = self._prefetch_cmdb_hosts(logs)
+        for hit, log in zip(hits, logs):
+            log = self._add_cmdb_fields(log, host_info_map)
+            if self.export_fields:
+                # 此处是为了虚拟字段[__set__, __module__, ipv6]可以导出
+                yield {_export_field: log.get(_export_field, "") for _export_field in self.export_fields}
+                continue
+            log.update({"index": hit["_index"]})
+            if self.search_dict.get("is_return_doc_id"):
+                log.update({"__id__": hit["_id"]})
+            yield log
+
+    @staticmethod
+    def _copy_origin_log(log: dict) -> dict:
+        """
+        复制原始日志, 嵌套的字典和列表需要深拷贝, 避免与展示用的日志共享后被一同修改
+        标量字段不可变, 直接复用
+        """
+        return {
+            key: copy.deepcopy(value) if isinstance(value, (dict, list)) else value for key, value in log.items()
+        }
+
+    def _prepare_hit_logs(self, hits):
+        """
+        获取命中日志内容并做脱敏处理
+        """
+        logs = [hit["_source"] for hit in hits]
+        if self.desensitize_config_list:
+            logs = [self._log_desensitize(log) for log in logs]
+        return logs
+
+    @classmethod
+    def merge_nested_dict(cls, base_dict: Dict[str, Any], update_dict: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        合并嵌套字典, 返回新的字典, 只复制更新路径上的字典, 不修改 base_dict
+        """
+        merged = dict(base_dict)
+        for key, value in update_dict.items():
+            base_value = base_dict.get(key)
+            if isinstance(value, dict):
+                merged[key] = cls.merge_nested_dict(base_value if isinstance(base_value, dict) else {}, value)
+            else:
+                merged[key] = value
+        return merged
+
     @classmethod
     def update_nested_dict(cls, base_dict: Dict[str, Any], update_dict: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -1407,7 +1515,7 @@ class SearchHandler(object):
     def nested_dict_from_dotted_key(dotted_dict: Dict[str, Any]) -> Dict[str, Any]:
         result = {}
         for key, value in dotted_dict.items():
-            parts = key.split('.')
+            parts = key.split(".")
             current_level = result
             for part in parts[:-1]:
                 if part not in current_level:
@@ -1422,7 +1530,7 @@ class SearchHandler(object):
         ES层会返回打平后的高亮字段, 该函数将其高亮的字段更新至对应Object字段
         """
         nested_dict = self.nested_dict_from_dotted_key(dotted_dict=highlight)
-        return self.update_nested_dict(log, nested_dict)
+        return self.merge_nested_dict(log, nested_dict)
 
     def _log_desensitize(self, log: dict = None):
         """
@@ -1431,8 +1539,13 @@ class SearchHandler(object):
         if not log:
             return log
 
-        # 保存一份未处理之前的log字段 用于脱敏之后的日志原文处理
-        log_content_tmp = copy.deepcopy(log)
+        # 处理原文字段需要脱敏前的字段值, 这里只保存脱敏字段的原始内容
+        origin_values = {}
+        if self.text_fields:
+            for _config in self.desensitize_config_list:
+                field_name = _config["field_name"]
+                if field_name in log:
+                    origin_values[field_name] = str(log[field_name])
 
         # 字段脱敏处理
         log = self.desensitize_handler.transform_dict(log)
@@ -1448,9 +1561,10 @@ class SearchHandler(object):
 
             for _config in self.desensitize_config_list:
                 field_name = _config["field_name"]
-                if field_name not in log.keys():
+                origin_value = origin_values.get(field_name)
+                if origin_value is None or field_name not in log:
                     continue
-                log[text_field] = log[text_field].replace(str(log_content_tmp[field_name]), str(log[field_name]))
+                log[text_field] = log[text_field].replace(origin_value, str(log[field_name]))
 
         return log
 
@@ -980,6 +980,7 @@ class AsyncTask(OperateRecordModel):
     export_type = models.CharField(_("导出类型"), max_length=64, null=True, blank=True)
     bk_biz_id = models.IntegerField(_("业务ID"), null=True, default=None)
     completed_at = models.DateTimeField(_("任务完成时间"), null=True, blank=True)
+    export_count = models.IntegerField(_("已导出条数"), null=True, blank=True, default=0)
 
     class Meta:
         db_table = "export_task"
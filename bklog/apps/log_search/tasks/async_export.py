@@ -20,9 +20,17 @@ We undertake not to change the open source license (MIT license) applicable to t
 the project delivered to anyone in the future.
 """
 import os
+import queue
 import tarfile
+import tempfile
 import json
 import datetime
+import functools
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import pytz
 import arrow
 
@@ -56,6 +64,7 @@ from apps.feature_toggle.handlers.toggle import FeatureToggleObject
 from apps.utils.log import logger
 from apps.utils.notify import NotifyType
 from apps.utils.remote_storage import StorageType
+from apps.utils.thread import FuncThread
 
 
 @task(ignore_result=True, queue="async_export")
@@ -94,7 +103,7 @@ def async_export(
 
         async_task.export_status = ExportStatus.DOWNLOAD_LOG
         try:
-            async_export_util.export_package()
+            async_export_util.export_package(async_task=async_task)
         except Exception as e:  # pylint: disable=broad-except
             async_task = set_failed_status(async_task=async_task, reason=f"export package error: {e}")
             raise
@@ -222,30 +231,103 @@ class AsyncExportUtils(object):
         self.storage = self.init_remote_storage()
         self.notify = self.init_notify_type()
 
-    def export_package(self):
+    def export_package(self, async_task: AsyncTask = None):
         """
-        检索结果文件打包
+        检索结果流式写入压缩包
+        ES场景默认按scroll顺序拉取, 配置 ASYNC_EXPORT_SLICE_COUNT 大于1时按分片scroll并发拉取(结果不保证有序),
+        其余场景按search_after顺序拉取
         """
         if not (os.path.exists(ASYNC_DIR) and os.path.isdir(ASYNC_DIR)):
             os.makedirs(ASYNC_DIR)
 
-        result = self.search_handler.pre_get_result(sorted_fields=self.sorted_fields, size=MAX_RESULT_WINDOW)
+        # 导出字段在拉取前计算一次, 拉取线程中只读
+        self.search_handler.prepare_export_fields()
+
+        writer = ExportPackageWriter(
+            tar_file_path=self.tar_file_path,
+            file_name=self.file_name,
+            limit=self.search_handler.size,
+            async_task=async_task,
+        )
+        try:
+            slice_max = settings.ASYNC_EXPORT_SLICE_COUNT
+            if self.search_handler.scenario_id == Scenario.ES and slice_max > 1:
+                self._export_by_slices(writer, slice_max)
+            else:
+                result = self.pre_get_result()
+                if self.search_handler.scenario_id == Scenario.ES:
+                    generate_result = self.search_handler.scroll_pages(result)
+                else:
+                    generate_result = self.search_handler.search_after_pages(result, self.sorted_fields)
+                for page in itertools.chain([result], generate_result):
+                    writer.write(*self.dump_logs(page))
+                    if writer.is_full:
+                        break
+        finally:
+            writer.close()
+
+    def pre_get_result(self, scroll_slice: dict = None):
+        result = self.search_handler.pre_get_result(
+            sorted_fields=self.sorted_fields, size=MAX_RESULT_WINDOW, scroll_slice=scroll_slice
+        )
         # 判断是否成功
         if result["_shards"]["total"] != result["_shards"]["successful"]:
             logger.error("can not create async_export task, reason: {}".format(result["_shards"]["failures"]))
             raise PreCheckAsyncExportException()
-        with open(self.file_path, "a+", encoding="utf-8") as f:
-            result_list = self.search_handler._deal_query_result(result_dict=result).get("origin_log_list")
-            for item in result_list:
-                f.write("%s\n" % json.dumps(item, ensure_ascii=False))
-            if self.search_handler.scenario_id == Scenario.ES:
-                generate_result = self.search_handler.scroll_result(result)
-            else:
-                generate_result = self.search_handler.search_after_result(result, self.sorted_fields)
-            self.write_file(f, generate_result)
+        return result
+
+    def dump_logs(self, result: dict):
+        """
+        将单页检索结果序列化为日志行
+        @return: (日志条数, 日志内容)
+        """
+        lines = ["%s\n" % json.dumps(log, ensure_ascii=False) for log in self.search_handler.iter_export_logs(result)]
+        return len(lines), "".join(lines).encode("utf-8")
 
-        with tarfile.open(self.tar_file_path, "w:gz") as tar:
-            tar.add(self.file_path, arcname=self.file_name)
+    def _export_by_slices(self, writer, slice_max: int):
+        """
+        分片scroll并发拉取, 拉取线程通过有界队列将数据交给写入方, 队列满时拉取线程阻塞等待
+        """
+        page_queue = queue.Queue(maxsize=slice_max * 2)
+        stop_event = threading.Event()
+
+        def put(item):
+            while not stop_event.is_set():
+                try:
+                    page_queue.put(item, timeout=1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def export_slice(slice_id):
+            result = self.pre_get_result(scroll_slice={"id": slice_id, "max": slice_max})
+            for page in itertools.chain([result], self.search_handler.scroll_pages(result)):
+                if not put(self.dump_logs(page)):
+                    break
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=slice_max) as executor:
+            futures = [
+                executor.submit(FuncThread(functools.partial(export_slice, slice_id), None, slice_id, results).run)
+                for slice_id in range(slice_max)
+            ]
+            try:
+                while not writer.is_full:
+                    try:
+                        writer.write(*page_queue.get(timeout=1))
+                    except queue.Empty:
+                        if all(future.done() for future in futures):
+                            break
+                if not writer.is_full:
+                    # 拉取线程全部结束后, 写入队列中剩余的数据
+                    while not page_queue.empty():
+                        writer.write(*page_queue.get_nowait())
+            finally:
+                stop_event.set()
+
+        for future in futures:
+            future.result()
 
     def export_upload(self):
         """
@@ -310,8 +392,8 @@ class AsyncExportUtils(object):
         """
         清空产生的临时文件
         """
-        os.remove(self.file_path)
-        os.remove(self.tar_file_path)
+        if os.path.exists(self.tar_file_path):
+            os.remove(self.tar_file_path)
 
     @classmethod
     def init_remote_storage(cls):
@@ -344,12 +426,55 @@ class AsyncExportUtils(object):
 
         return NotifyType.get_instance(notify_type=notify_type)()
 
-    @classmethod
-    def write_file(cls, f, result):
-        """
-        将对应数据写到文件中
-        """
-        for res in result:
-            origin_result_list = res.get("origin_log_list")
-            for item in origin_result_list:
-                f.write("%s\n" % json.dumps(item))
+
+class ExportPackageWriter(object):
+    """
+    将导出日志写入 tar.gz 包, 包内只有一个与原文件名相同的文件
+    tar 成员需要预先确定大小, 日志先写入缓冲区(超过 ASYNC_EXPORT_BUFFER_SIZE 后转存到临时文件), 关闭时一次性写入压缩包
+    """
+
+    # 导出进度更新间隔(秒)
+    PROGRESS_INTERVAL = 10
+
+    def __init__(self, tar_file_path: str, file_name: str, limit: int, async_task: AsyncTask = None):
+        self.tar_file_path = tar_file_path
+        self.file_name = file_name
+        self.limit = limit
+        self.async_task = async_task
+        self.buffer = tempfile.SpooledTemporaryFile(
+            max_size=settings.ASYNC_EXPORT_BUFFER_SIZE, dir=os.path.dirname(tar_file_path) or None
+        )
+        self.count = 0
+        self.last_progress_time = time.time()
+
+    @property
+    def is_full(self):
+        return self.count >= self.limit
+
+    def write(self, count: int, content: bytes):
+        if self.is_full:
+            return
+        self.buffer.write(content)
+        self.count += count
+        self.report_progress()
+
+    def report_progress(self, force=False):
+        if not self.async_task:
+            return
+        if not force and time.time() - self.last_progress_time < self.PROGRESS_INTERVAL:
+            return
+        self.last_progress_time = time.time()
+        self.async_task.export_count = self.count
+        self.async_task.save(update_fields=["export_count"])
+
+    def close(self):
+        try:
+            tar_info = tarfile.TarInfo(name=self.file_name)
+            tar_info.size = self.buffer.tell()
+            tar_info.mtime = int(time.time())
+            self.buffer.seek(0)
+            with tarfile.open(self.tar_file_path, "w:gz") as tar:
+                tar.addfile(tar_info, self.buffer)
+        finally:
+            self.buffer.close()
+        self.report_progress(force=True)
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making BK-LOG 蓝鲸日志平台 available.
+Copyright (C) 2021 THL A29 Limited, a Tencent company.  All rights reserved.
+BK-LOG 蓝鲸日志平台 is licensed under the MIT License.
+License for BK-LOG 蓝鲸日志平台:
+--------------------------------------------------------------------
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or substantial
+portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT
+LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+We undertake not to change the open source license (MIT license) applicable to the current version of
+the project delivered to anyone in the future.
+"""
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from apps.log_esquery.utils.es_client import EsClientPool, is_connection_failure
+from elasticsearch import exceptions as ElasticsearchExceptions
+
+CONNECT_INFO = ("127.0.0.1", 9200, "admin", "password", "7.10.1", "http")
+
+
+def make_client(*args, **kwargs):
+    client = MagicMock()
+    client.ping.return_value = True
+    return client
+
+
+@patch("apps.log_esquery.utils.es_client.es_socket_ping", return_value=None)
+@patch("apps.log_esquery.utils.es_client.get_es_client", side_effect=make_client)
+class TestEsClientPool(TestCase):
+    def test_reuse_client(self, get_es_client, es_socket_ping):
+        pool = EsClientPool()
+        client, is_active = pool.get_client(1, CONNECT_INFO)
+        self.assertTrue(is_active)
+        self.assertEqual(pool.get_client(1, CONNECT_INFO, check_ping=False), (client, True))
+        self.assertEqual(pool.get_client(1, CONNECT_INFO), (client, True))
+        self.assertEqual(get_es_client.call_count, 1)
+        self.assertEqual(es_socket_ping.call_count, 1)
+        self.assertEqual(client.ping.call_count, 1)
+
+    def test_connect_info_changed(self, get_es_client, es_socket_ping):
+        pool = EsClientPool()
+        client, _ = pool.get_client(1, CONNECT_INFO)
+        new_client, _ = pool.get_client(1, CONNECT_INFO[:3] + ("new_password",) + CONNECT_INFO[4:])
+        self.assertIsNot(client, new_client)
+        # 剔除的客户端可能仍在被其他线程使用，不主动关闭
+        client.transport.close.assert_not_called()
+
+    def test_evict(self, get_es_client, es_socket_ping):
+        pool = EsClientPool()
+        client, _ = pool.get_client(1, CONNECT_INFO)
+        # 非当前缓存的客户端不会被剔除
+        pool.evict(1, client=MagicMock())
+        self.assertIs(pool.get_client(1, CONNECT_INFO)[0], client)
+
+        pool.evict(1, client=client)
+        self.assertIsNot(pool.get_client(1, CONNECT_INFO)[0], client)
+
+    def test_ping_failed(self, get_es_client, es_socket_ping):
+        get_es_client.side_effect = None
+        get_es_client.return_value = MagicMock(**{"ping.return_value": False})
+        pool = EsClientPool()
+        _, is_active = pool.get_client(1, CONNECT_INFO)
+        self.assertFalse(is_active)
+        pool.get_client(1, CONNECT_INFO)
+        self.assertEqual(get_es_client.call_count, 2)
+
+
+class TestConnectionFailure(TestCase):
+    def test_is_connection_failure(self):
+        self.assertTrue(is_connection_failure(ElasticsearchExceptions.ConnectionError("N/A", "refused", None)))
+        # 慢查询超时不剔除客户端
+        self.assertFalse(is_connection_failure(ElasticsearchExceptions.ConnectionTimeout("TIMEOUT", "timeout", None)))
+        self.assertFalse(is_connection_failure(ElasticsearchExceptions.NotFoundError(404, "not found", {})))
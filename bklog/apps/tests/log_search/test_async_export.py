@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making BK-LOG 蓝鲸日志平台 available.
+Copyright (C) 2021 THL A29 Limited, a Tencent company.  All rights reserved.
+BK-LOG 蓝鲸日志平台 is licensed under the MIT License.
+License for BK-LOG 蓝鲸日志平台:
+--------------------------------------------------------------------
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or substantial
+portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT
+LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+We undertake not to change the open source license (MIT license) applicable to the current version of
+the project delivered to anyone in the future.
+"""
+import os
+import tarfile
+import tempfile
+
+from django.test import TestCase, override_settings
+
+from apps.log_search.tasks.async_export import ExportPackageWriter
+
+FILE_NAME = "bk_log_search_1_20230101000000_test"
+
+
+@override_settings(ASYNC_EXPORT_BUFFER_SIZE=10)
+class TestExportPackageWriter(TestCase):
+    def setUp(self) -> None:
+        self.tar_file_path = os.path.join(tempfile.mkdtemp(), f"{FILE_NAME}.tar.gz")
+
+    def tearDown(self) -> None:
+        os.remove(self.tar_file_path)
+
+    def read_package(self):
+        with tarfile.open(self.tar_file_path, "r:gz") as tar:
+            return {member.name: tar.extractfile(member).read() for member in tar.getmembers()}
+
+    def test_write_single_member(self):
+        writer = ExportPackageWriter(tar_file_path=self.tar_file_path, file_name=FILE_NAME, limit=100)
+        writer.write(2, b'{"a": 1}\n{"a": 2}\n')
+        writer.write(1, b'{"a": 3}\n')
+        self.assertFalse(writer.is_full)
+        writer.close()
+
+        # 超过缓冲大小时仍只有一个文件
+        self.assertEqual(self.read_package(), {FILE_NAME: b'{"a": 1}\n{"a": 2}\n{"a": 3}\n'})
+
+    def test_write_limit(self):
+        writer = ExportPackageWriter(tar_file_path=self.tar_file_path, file_name=FILE_NAME, limit=1)
+        writer.write(1, b"1\n")
+        self.assertTrue(writer.is_full)
+        writer.write(1, b"2\n")
+        writer.close()
+        self.assertEqual(self.read_package(), {FILE_NAME: b"1\n"})
+
+    def test_write_empty(self):
+        writer = ExportPackageWriter(tar_file_path=self.tar_file_path, file_name=FILE_NAME, limit=1)
+        writer.close()
+        self.assertEqual(self.read_package(), {FILE_NAME: b""})
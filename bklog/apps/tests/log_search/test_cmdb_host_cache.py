@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making BK-LOG 蓝鲸日志平台 available.
+Copyright (C) 2021 THL A29 Limited, a Tencent company.  All rights reserved.
+BK-LOG 蓝鲸日志平台 is licensed under the MIT License.
+License for BK-LOG 蓝鲸日志平台:
+--------------------------------------------------------------------
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or substantial
+portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT
+LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+We undertake not to change the open source license (MIT license) applicable to the current version of
+the project delivered to anyone in the future.
+"""
+import json
+from unittest.mock import MagicMock, patch
+
+from django.test import TestCase
+
+from apps.utils.core.cache.cmdb_host import CmdbHostCache
+
+BK_BIZ_ID = 2
+HOST = {"bk_host_id": 1, "bk_host_innerip": "127.0.0.1", "topo": []}
+
+
+class TestCmdbHostCache(TestCase):
+    def setUp(self):
+        CmdbHostCache.clear_local_cache()
+        self.redis = MagicMock()
+        self.redis.hmget.side_effect = lambda key, host_ids: [
+            json.dumps(HOST) if host_id == f"{BK_BIZ_ID}:1" else None for host_id in host_ids
+        ]
+        self.patcher = patch.object(CmdbHostCache, "cache", self.redis)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        CmdbHostCache.clear_local_cache()
+
+    def test_batch_get(self):
+        result = CmdbHostCache.batch_get(BK_BIZ_ID, [1, 2, 1])
+
+        self.assertEqual(result, {1: HOST, 2: {}})
+        self.redis.hmget.assert_called_once_with(CmdbHostCache.CACHE_KEY, [f"{BK_BIZ_ID}:1", f"{BK_BIZ_ID}:2"])
+
+        # 第二次获取全部命中本地缓存
+        self.assertEqual(CmdbHostCache.batch_get(BK_BIZ_ID, [1, 2]), {1: HOST, 2: {}})
+        self.assertEqual(CmdbHostCache.get(BK_BIZ_ID, 1), HOST)
+        self.assertEqual(self.redis.hmget.call_count, 1)
@@ -66,6 +66,7 @@ SEARCH_RESULT = {
     lambda _, __: False,
 )
 @patch("apps.utils.core.cache.cmdb_host.CmdbHostCache.get", lambda _, __: {})
+@patch("apps.utils.core.cache.cmdb_host.CmdbHostCache.batch_get", lambda _, __: {})
 class TestSearchHandler(TestCase):
     @patch(
         "apps.log_search.handlers.search.mapping_handlers.MappingHandlers.is_nested_field",
@@ -117,3 +118,35 @@ class TestSearchHandler(TestCase):
             logs_result.extend(result["list"])
 
         self.assertEqual(len(logs_result), 90000)
+
+    def test_deal_object_highlight(self):
+        log = {"log": "hello", "obj": {"a": "x", "b": {"c": "y"}}, "other": {"d": 1}}
+        result = self.search_handler._deal_object_highlight(
+            log=log, highlight={"obj.b.c": ["<mark>y</mark>"], "log": ["<mark>hello</mark>"]}
+        )
+
+        self.assertEqual(result["log"], "<mark>hello</mark>")
+        self.assertEqual(result["obj"], {"a": "x", "b": {"c": "<mark>y</mark>"}})
+        # 原日志及未高亮的字段不会被修改或复制
+        self.assertEqual(log, {"log": "hello", "obj": {"a": "x", "b": {"c": "y"}}, "other": {"d": 1}})
+        self.assertIs(result["other"], log["other"])
+
+    def test_log_desensitize_missing_field(self):
+        def transform_dict(log):
+            # 模拟脱敏后新增的字段, 脱敏前的日志中没有该字段
+            log.update({"phone": "***", "user": "***"})
+            return log
+
+        self.search_handler.text_fields = ["log"]
+        self.search_handler.desensitize_config_list = [{"field_name": "phone"}, {"field_name": "user"}]
+        with patch.object(self.search_handler.desensitize_handler, "transform_dict", transform_dict):
+            log = self.search_handler._log_desensitize({"log": "user admin login", "user": "admin"})
+
+        self.assertEqual(log["log"], "user *** login")
+
+    def test_copy_origin_log(self):
+        log = {"log": "hello", "obj": {"a": {"b": 1}}, "tags": ["x"]}
+        origin_log = self.search_handler._copy_origin_log(log)
+        log["obj"]["a"]["b"] = 2
+        log["tags"].append("y")
+        self.assertEqual(origin_log, {"log": "hello", "obj": {"a": {"b": 1}}, "tags": ["x"]})
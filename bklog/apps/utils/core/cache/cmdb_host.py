@@ -1,33 +1,67 @@
+import threading
 from collections import defaultdict
 
+from cachetools import TTLCache
+
 from apps.api import CCApi
 from apps.log_search.constants import TimeEnum
-from apps.utils import local
 from apps.utils.core.cache.cache_base import CacheBase
 from apps.utils.log import logger
 from bkm_ipchooser.constants import CommonEnum
 
-setattr(local, "host_info_cache", {})
-
 
 class CmdbHostCache(CacheBase):
     CACHE_KEY = f"{CacheBase.CACHE_KEY_PREFIX}.cmdb.host_info"
     CACHE_TIMEOUT = TimeEnum.ONE_DAY_SECOND.value
 
+    # 进程级主机信息缓存, 限制容量并定期过期, 避免常驻进程无限增长或长期使用旧的拓扑数据
+    LOCAL_CACHE_MAXSIZE = 20000
+    LOCAL_CACHE_TTL = TimeEnum.FIVE_MINUTE_SECOND.value
+    local_cache = TTLCache(maxsize=LOCAL_CACHE_MAXSIZE, ttl=LOCAL_CACHE_TTL)
+    local_cache_lock = threading.Lock()
+
     @classmethod
     def get(cls, bk_biz_id, host_key):
         # host_key: bk_host_id or bk_cloud_id:bk_host_innerip
-        host_id = f"{bk_biz_id}:{host_key}"
-        host = local.host_info_cache.get(host_id, None)
-        if host is None:
-            result = cls.cache.hget(cls.CACHE_KEY, host_id)
-            if result:
-                result = cls.deserialize(result)
-                local.host_info_cache[host_id] = result
-                return result
-            local.host_info_cache[host_id] = {}
-            host = {}
-        return host
+        return cls.batch_get(bk_biz_id, [host_key]).get(host_key, {})
+
+    @classmethod
+    def batch_get(cls, bk_biz_id, host_keys):
+        """
+        批量获取主机信息, 本地缓存未命中的部分通过一次 HMGET 从 redis 获取
+        :return: {host_key: host_info}, 不存在的主机对应 {}
+        """
+        result = {}
+        missing = {}
+        with cls.local_cache_lock:
+            for host_key in host_keys:
+                if host_key in result or host_key in missing:
+                    continue
+                host_id = f"{bk_biz_id}:{host_key}"
+                host = cls.local_cache.get(host_id)
+                if host is None:
+                    missing[host_key] = host_id
+                else:
+                    result[host_key] = host
+
+        if not missing:
+            return result
+
+        values = cls.cache.hmget(cls.CACHE_KEY, list(missing.values()))
+        fetched = {}
+        for (host_key, host_id), value in zip(missing.items(), values):
+            host = cls.deserialize(value) if value else {}
+            result[host_key] = host
+            fetched[host_id] = host
+
+        with cls.local_cache_lock:
+            cls.local_cache.update(fetched)
+        return result
+
+    @classmethod
+    def clear_local_cache(cls):
+        with cls.local_cache_lock:
+            cls.local_cache.clear()
 
     @classmethod
     def get_biz_cache_key(cls):
@@ -819,12 +819,22 @@ ES_PUBLIC_STORAGE_DURATION = int(os.environ.get("BKAPP_ES_PUBLIC_STORAGE_DURATIO
 # 公共集群存储容量限制
 ES_STORAGE_CAPACITY = os.environ.get("BKAPP_ES_STORAGE_CAPACITY", 0)
 
+# ES客户端连接池：单集群连接数，可按集群ID单独配置，健康检查间隔(秒)
+ES_CLIENT_POOL_MAXSIZE = int(os.environ.get("BKAPP_ES_CLIENT_POOL_MAXSIZE", 10))
+ES_CLIENT_POOL_MAXSIZE_CLUSTERS = {}
+ES_CLIENT_HEALTH_CHECK_INTERVAL = int(os.environ.get("BKAPP_ES_CLIENT_HEALTH_CHECK_INTERVAL", 60))
+
 # ES兼容：默认关闭，可以通过环境变量调整
 ES_COMPATIBILITY = int(os.environ.get("BKAPP_ES_COMPATIBILITY", 0))
 
 # scroll滚动查询：默认关闭，通过环境变量控制
 FEATURE_EXPORT_SCROLL = os.environ.get("BKAPP_FEATURE_EXPORT_SCROLL", False)
 
+# 异步导出：ES场景分片scroll并发数，默认为1即按排序顺序拉取，大于1时并发拉取但导出结果不再有序
+ASYNC_EXPORT_SLICE_COUNT = int(os.environ.get("BKAPP_ASYNC_EXPORT_SLICE_COUNT", 1))
+# 异步导出：写入压缩包前的内存缓冲大小(字节)，超过后转存到临时文件
+ASYNC_EXPORT_BUFFER_SIZE = int(os.environ.get("BKAPP_ASYNC_EXPORT_BUFFER_SIZE", 64 * 1024 * 1024))
+
 # BCS
 BCS_API_GATEWAY_TOKEN = os.getenv("BKAPP_BCS_API_GATEWAY_TOKEN", "")
 BCS_CC_SSM_SWITCH = os.getenv("BKAPP_BCS_CC_SSM_SWITCH", "on")
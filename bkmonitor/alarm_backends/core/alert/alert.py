@@ -27,6 +27,7 @@ from alarm_backends.core.cache.key import (
     COMPOSITE_QOS_COUNTER,
 )
 from alarm_backends.core.cluster import get_cluster
+from alarm_backends.core.storage.counter import CounterRequest, WindowCounter
 from bkmonitor.documents import ActionInstanceDocument, AlertDocument, AlertLog
 from bkmonitor.models import ActionInstance
 from bkmonitor.strategy.expression import AlertExpressionValue
@@ -845,13 +846,9 @@ class Alert:
             )
         return {"is_blocked": is_blocked, "message": message}
 
-    def qos_calc(self, signal, qos_counter=COMPOSITE_QOS_COUNTER, threshold=None, need_incr=True):
+    def get_qos_counter_key(self, signal, qos_counter=COMPOSITE_QOS_COUNTER):
         """
-        :param signal: 信号
-        :param qos_counter: qos计数器
-        :param threshold: QOS规则
-        :param need_incr: 是否需要计数
-        :return:
+        获取qos计数器的key
         """
         # 限流计数器，监控的告警以策略ID，信号，告警级别作为维度
         qos_dimension = dict(strategy_id=self.strategy_id or 0, signal=signal, severity=self.severity)
@@ -867,27 +864,43 @@ class Alert:
                 )
             )
         qos_dimension.update({"alert_md5": alert_md5})
-        qos_counter_key = qos_counter.get_key(**qos_dimension)
-        client = qos_counter.client
+        return qos_counter.get_key(**qos_dimension)
+
+    def qos_calc(self, signal, qos_counter=COMPOSITE_QOS_COUNTER, threshold=None, need_incr=True):
+        """
+        :param signal: 信号
+        :param qos_counter: qos计数器
+        :param threshold: QOS规则
+        :param need_incr: 是否需要计数
+        :return:
+        """
+        return self.batch_qos_calc([(self, signal)], qos_counter, threshold, need_incr)[0]
+
+    @staticmethod
+    def batch_qos_calc(alert_signals, qos_counter=COMPOSITE_QOS_COUNTER, threshold=None, need_incr=True):
+        """
+        批量计算告警QOS，所有计数通过一次批量请求完成
+        :param alert_signals: [(alert, signal), ...]
+        :return: [(是否被流控, 当前计数), ...]，与 alert_signals 顺序一致
+        """
         if threshold is None:
             threshold = {"threshold": settings.QOS_DROP_ACTION_THRESHOLD, "window": settings.QOS_DROP_ACTION_WINDOW}
 
         if threshold["threshold"] == 0:
             # 如果阈值为0 ，默认不做QOS处理，直接返回
-            return False, 0
-        qos_window = threshold["window"]
-        current_count = 1
-        if need_incr:
-            result = client.set(qos_counter_key, current_count, nx=True, ex=qos_window)
-            if not result:
-                current_count = client.incr(qos_counter_key)
-                # 这里client对应的是redis-py的Redis对象，对ttl返回值错了一层处理，小于0的统一设置为None
-                ttl = client.ttl(qos_counter_key)
-                if ttl is None or ttl < 0:
-                    client.expire(qos_counter_key, qos_window)
-        else:
-            current_count = int(client.get(qos_counter_key) or 0)
-        return current_count > threshold["threshold"], current_count
+            return [(False, 0) for _ in alert_signals]
+
+        requests = [
+            CounterRequest(
+                alert.get_qos_counter_key(signal, qos_counter),
+                window=threshold["window"],
+                amount=1 if need_incr else 0,
+                limit=threshold["threshold"],
+            )
+            for alert, signal in alert_signals
+        ]
+        results = WindowCounter(qos_counter).evaluate(requests)
+        return [(not result.allowed, result.count) for result in results]
 
     @staticmethod
     def create_qos_log(alerts: List[str], total_count, qos_actions):
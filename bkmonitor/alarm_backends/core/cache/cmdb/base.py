@@ -11,16 +11,25 @@ specific language governing permissions and limitations under the License.
 
 
 import abc
+import hashlib
 import json
+import threading
 import time
 
 import six.moves.cPickle as pickle
+from django.conf import settings
 
 from alarm_backends.constants import CONST_ONE_DAY
 from alarm_backends.core.cache.base import CacheManager
+from bkmonitor.utils.thread_backend import ThreadPool
 from core.drf_resource import api
 from core.prometheus import metrics
 
+# 紧凑序列化格式前缀，pickle序列化后的数据不会以该前缀开头
+COMPACT_SERIALIZE_PREFIX = "\x00c"
+
+_i18n_lock = threading.Lock()
+
 
 class CMDBCacheManager(CacheManager):
     """
@@ -147,6 +156,49 @@ class CMDBCacheManager(CacheManager):
         cls.cache.delete(cls.CACHE_KEY)
 
 
+class CompactSerializerMixin(object):
+    """
+    紧凑序列化，将对象转换为普通字典后使用json编码，解码时不依赖pickle重建对象
+    存储格式: {COMPACT_SERIALIZE_PREFIX}{version}:{json}，版本号变化时旧数据视为不存在，并在下次刷新时被重写
+    """
+
+    SERIALIZE_VERSION = 1
+
+    @classmethod
+    def to_plain(cls, obj):
+        """
+        对象转换为可json序列化的字典，由子类实现
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def from_plain(cls, data):
+        """
+        由字典还原对象，由子类实现
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def serialize(cls, obj):
+        try:
+            data = json.dumps(cls.to_plain(obj), separators=(",", ":"), sort_keys=True)
+        except (TypeError, ValueError):
+            # 存在无法json序列化的字段时，回退到pickle
+            return super(CompactSerializerMixin, cls).serialize(obj)
+        return "{}{}:{}".format(COMPACT_SERIALIZE_PREFIX, cls.SERIALIZE_VERSION, data)
+
+    @classmethod
+    def deserialize(cls, string):
+        if not string.startswith(COMPACT_SERIALIZE_PREFIX):
+            # 兼容pickle格式的数据
+            return super(CompactSerializerMixin, cls).deserialize(string)
+
+        version, _, data = string[len(COMPACT_SERIALIZE_PREFIX) :].partition(":")
+        if version != str(cls.SERIALIZE_VERSION):
+            return None
+        return cls.from_plain(json.loads(data))
+
+
 class RefreshByBizMixin(object):
     @classmethod
     def get_biz_cache_key(cls):
@@ -162,13 +214,99 @@ class RefreshByBizMixin(object):
         """
         raise NotImplementedError
 
+    @staticmethod
+    def get_content_digest(value):
+        """
+        计算序列化内容的摘要，用于判断对象是否发生变化
+        """
+        return hashlib.md5(str(value).encode("utf-8")).hexdigest()[:16]
+
     @classmethod
-    def refresh(cls):
+    def load_biz_manifests(cls):
         """
-        刷新缓存
+        获取按业务存储的对象清单
+        :return: {"2": {"cache_key": "digest"}}
+        """
+        manifests = {}
+        for bk_biz_id, value in (cls.cache.hgetall(cls.get_biz_cache_key()) or {}).items():
+            try:
+                manifest = json.loads(value)
+            except (TypeError, ValueError):
+                continue
+            # 兼容旧格式，旧格式只记录了key列表，没有内容摘要
+            if isinstance(manifest, list):
+                manifest = dict.fromkeys(manifest)
+            manifests[str(bk_biz_id)] = manifest
+        return manifests
+
+    @classmethod
+    def get_manifest_keys(cls):
+        """
+        从业务清单中获取全部对象key，避免对大hash执行HKEYS
+        """
+        keys = set()
+        for manifest in cls.load_biz_manifests().values():
+            keys.update(manifest)
+        return keys
+
+    @classmethod
+    def fetch_biz_objects(cls, bk_biz_id):
+        """
+        拉取业务下的对象并序列化
+        :return: {"cache_key": (serialized_value, digest)}
         """
         from alarm_backends.core.i18n import i18n
 
+        # i18n 为全局单例，切换业务时需要加锁，语言及时区的激活是线程内生效的
+        with _i18n_lock:
+            i18n.set_biz(bk_biz_id)
+
+        result = {}
+        for key, obj in list(cls.refresh_by_biz(bk_biz_id).items()):
+            value = cls.serialize(obj)
+            result[key] = (value, cls.get_content_digest(value))
+        return result
+
+    @classmethod
+    def _fetch_biz_objects(cls, bk_biz_id):
+        start_time = time.time()
+        try:
+            objs = cls.fetch_biz_objects(bk_biz_id)
+        except Exception as e:
+            # 如果接口调用异常，则不更新
+            cls.logger.exception("get data by biz fail, bk_biz_id: {}, {}".format(bk_biz_id, e))
+            return None, e, time.time() - start_time
+        return objs, None, time.time() - start_time
+
+    @classmethod
+    def update_biz_objects(cls, bk_biz_id, objs, old_manifest, full_update=False):
+        """
+        只写入内容摘要发生变化的对象，并更新业务的对象清单
+        :return: 新的对象清单, 写入的对象数量
+        """
+        manifest = {}
+        pipeline = cls.cache.pipeline()
+        updated_count = 0
+        for key, (value, digest) in list(objs.items()):
+            manifest[key] = digest
+            if full_update or old_manifest.get(key) != digest:
+                pipeline.hset(cls.CACHE_KEY, key, value)
+                updated_count += 1
+
+        # 按业务设置key及内容摘要，用于差量更新
+        pipeline.hset(cls.get_biz_cache_key(), str(bk_biz_id), json.dumps(manifest))
+        pipeline.expire(cls.CACHE_KEY, cls.CACHE_TIMEOUT)
+        pipeline.execute()
+        return manifest, updated_count
+
+    @classmethod
+    def refresh(cls):
+        """
+        刷新缓存
+        1. 多线程并发拉取各业务数据，序列化后计算内容摘要
+        2. 与业务清单中的摘要比对，只写入发生变化的对象
+        3. 根据新旧清单计算已删除的对象，避免对大hash执行HKEYS
+        """
         cls.logger.info("refresh CMDB data started.")
 
         start_time = time.time()
@@ -178,69 +316,80 @@ class RefreshByBizMixin(object):
             return
 
         biz_ids = [business.bk_biz_id for business in business_list]
-
-        new_keys = []
-
         biz_cache_key = cls.get_biz_cache_key()
 
-        for bk_biz_id in biz_ids:
-            biz_start_time = time.time()
-            exc = None
-            try:
-                i18n.set_biz(bk_biz_id)
-                objs = cls.refresh_by_biz(bk_biz_id)
-            except Exception as e:
-                # 如果接口调用异常，则不更新
-                cls.logger.exception("get data by biz fail, bk_biz_id: {}, {}".format(bk_biz_id, e))
-                exc = e
-            else:
-                # 更新对象缓存
-                pipeline = cls.cache.pipeline()
-                for key, obj in list(objs.items()):
-                    pipeline.hset(cls.CACHE_KEY, key, cls.serialize(obj))
-                    new_keys.append(key)
-
-                # 按业务设置key列表，用于差量更新
-                pipeline.hset(biz_cache_key, str(bk_biz_id), json.dumps(list(objs.keys())))
-
-                pipeline.expire(cls.CACHE_KEY, cls.CACHE_TIMEOUT)
-                pipeline.execute()
-            metrics.ALARM_CACHE_TASK_TIME.labels(str(bk_biz_id), cls.type, str(exc)).observe(
-                time.time() - biz_start_time
-            )
+        # 业务清单存储结构
+        # {
+        #   '2': {'10.0.0.1|0': 'digest', '10.0.0.2|0': 'digest'},
+        #   '3': {'10.0.0.3|0': 'digest'},
+        # }
+        old_manifests = cls.load_biz_manifests()
+        old_keys = set()
+        for manifest in old_manifests.values():
+            old_keys.update(manifest)
+
+        # 缓存被清理或字段数少于清单记录时，说明缓存数据不完整，需要全量写入
+        full_update = not old_manifests or cls.cache.hlen(cls.CACHE_KEY) < len(old_keys)
+
+        new_manifests = {}
+        updated_count = 0
+        pool = ThreadPool(processes=getattr(settings, "CMDB_CACHE_REFRESH_WORKERS", 4))
+        try:
+            futures = [
+                (bk_biz_id, pool.apply_async(cls._fetch_biz_objects, args=(bk_biz_id,))) for bk_biz_id in biz_ids
+            ]
+            # 按业务顺序写入，写入当前业务时其他业务的数据仍在并发拉取
+            for bk_biz_id, future in futures:
+                objs, exc, cost = future.get()
+                write_start_time = time.time()
+                if exc is None:
+                    manifest, count = cls.update_biz_objects(
+                        bk_biz_id, objs, old_manifests.get(str(bk_biz_id), {}), full_update
+                    )
+                    new_manifests[str(bk_biz_id)] = manifest
+                    updated_count += count
+                metrics.ALARM_CACHE_TASK_TIME.labels(str(bk_biz_id), cls.type, str(exc)).observe(
+                    cost + time.time() - write_start_time
+                )
+        finally:
+            pool.close()
+            pool.join()
 
         # 清理已被删除的业务数据
-        old_biz_ids = set(cls.cache.hkeys(biz_cache_key))
         new_biz_ids = {str(biz_id) for biz_id in biz_ids}
-        deleted_biz_ids = old_biz_ids - new_biz_ids
+        deleted_biz_ids = set(old_manifests) - new_biz_ids
         if deleted_biz_ids:
             cls.cache.hdel(biz_cache_key, *deleted_biz_ids)
         cls.cache.expire(biz_cache_key, cls.CACHE_TIMEOUT)
 
-        biz_cache_keys = cls.cache.hgetall(biz_cache_key) or {}
-
-        # biz_cache_key 存储的就是最新的Keys列表，在后面与old keys做差量比对
-        # 存储结构
-        # {
-        #   '2': ['10.0.0.1|0', '10.0.0.2|0'],
-        #   '3': ['10.0.0.3|0'],
-        # }
-        new_keys = []
-        for keys in list(biz_cache_keys.values()):
-            new_keys.extend(json.loads(keys))
+        # 拉取失败的业务保留原有数据
+        new_keys = set()
+        for bk_biz_id, manifest in old_manifests.items():
+            if bk_biz_id in new_biz_ids and bk_biz_id not in new_manifests:
+                new_keys.update(manifest)
+        for manifest in new_manifests.values():
+            new_keys.update(manifest)
 
         # 清理业务下已被删除的对象数据
-        old_keys = cls.cache.hkeys(cls.CACHE_KEY)
-        deleted_keys = set(old_keys) - set(new_keys)
+        deleted_keys = old_keys - new_keys
         if deleted_keys:
             cls.cache.hdel(cls.CACHE_KEY, *deleted_keys)
+
+        # 首次刷新或存在清单外的对象时，使用全量key比对清理
+        if cls.cache.hlen(cls.CACHE_KEY) > len(new_keys):
+            untracked_keys = set(cls.cache.hkeys(cls.CACHE_KEY)) - new_keys
+            if untracked_keys:
+                cls.cache.hdel(cls.CACHE_KEY, *untracked_keys)
+            deleted_keys |= untracked_keys
         cls.cache.expire(cls.CACHE_KEY, cls.CACHE_TIMEOUT)
 
         metrics.ALARM_CACHE_TASK_TIME.labels("0", cls.type, "None").observe(time.time() - start_time)
 
         cls.logger.info(
-            "cache_key({}) refresh CMDB data finished, amount: updated: {}, removed: {}, "
-            "removed_biz: {}".format(cls.CACHE_KEY, len(new_keys), len(deleted_keys), len(deleted_biz_ids))
+            "cache_key({}) refresh CMDB data finished, amount: total: {}, updated: {}, removed: {}, "
+            "removed_biz: {}".format(
+                cls.CACHE_KEY, len(new_keys), updated_count, len(deleted_keys), len(deleted_biz_ids)
+            )
         )
 
     @classmethod
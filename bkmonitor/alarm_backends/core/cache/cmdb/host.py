@@ -12,8 +12,12 @@ specific language governing permissions and limitations under the License.
 import json
 from typing import List
 
-from alarm_backends.core.cache.cmdb.base import CMDBCacheManager, RefreshByBizMixin
-from api.cmdb.define import Host, TopoTree
+from alarm_backends.core.cache.cmdb.base import (
+    CMDBCacheManager,
+    CompactSerializerMixin,
+    RefreshByBizMixin,
+)
+from api.cmdb.define import Host, TopoNode, TopoTree
 from bkmonitor.utils.local import local
 from core.drf_resource import api
 
@@ -131,7 +135,7 @@ class HostIPManager(CMDBCacheManager):
         ip_mapping = {}
 
         if host_keys is None:
-            host_keys = HostManager.keys()
+            host_keys = HostManager.get_manifest_keys() or HostManager.keys()
 
         for host in host_keys:
             if not host:
@@ -143,32 +147,37 @@ class HostIPManager(CMDBCacheManager):
 
             ip_mapping.setdefault(ip, set()).add(host)
 
-        old_keys = cls.cache.hkeys(cls.CACHE_KEY)
-        deleted_keys = set(old_keys) - set(ip_mapping.keys())
+        # 只写入发生变化的IP
+        old_values = cls.cache.hgetall(cls.CACHE_KEY) or {}
+        deleted_keys = set(old_values) - set(ip_mapping.keys())
         if deleted_keys:
             cls.cache.hdel(cls.CACHE_KEY, *deleted_keys)
 
-        if ip_mapping:
-            ip_result = {}
-            for index, ip in enumerate(ip_mapping):
-                ip_result[ip] = json.dumps(list(ip_mapping[ip]))
-                if index % 1000 == 0:
-                    cls.cache.hmset(cls.CACHE_KEY, ip_result)
-                    ip_result = {}
-
-            if ip_result:
+        updated_count = 0
+        ip_result = {}
+        for ip, hosts in ip_mapping.items():
+            value = json.dumps(sorted(hosts))
+            if old_values.get(ip) == value:
+                continue
+            ip_result[ip] = value
+            updated_count += 1
+            if len(ip_result) >= 1000:
                 cls.cache.hmset(cls.CACHE_KEY, ip_result)
+                ip_result = {}
+
+        if ip_result:
+            cls.cache.hmset(cls.CACHE_KEY, ip_result)
 
         cls.cache.expire(cls.CACHE_KEY, cls.CACHE_TIMEOUT)
 
         cls.logger.info(
-            "cache_key({}) refresh CMDB data finished, amount: updated: {}, removed: {}".format(
-                cls.CACHE_KEY, len(ip_mapping), len(deleted_keys)
+            "cache_key({}) refresh CMDB data finished, amount: total: {}, updated: {}, removed: {}".format(
+                cls.CACHE_KEY, len(ip_mapping), updated_count, len(deleted_keys)
             )
         )
 
 
-class HostManager(RefreshByBizMixin, CMDBCacheManager):
+class HostManager(RefreshByBizMixin, CompactSerializerMixin, CMDBCacheManager):
     """
     CMDB 主机缓存
     """
@@ -176,6 +185,27 @@ class HostManager(RefreshByBizMixin, CMDBCacheManager):
     type = "host"
     CACHE_KEY = "{prefix}.cmdb.host".format(prefix=CMDBCacheManager.CACHE_KEY_PREFIX)
 
+    @classmethod
+    def to_plain(cls, host):
+        return {
+            "attrs": host.get_attrs(),
+            "topo_link": {
+                key: [node.__dict__ for node in nodes] for key, nodes in getattr(host, "topo_link", {}).items()
+            },
+            "bk_world_ids": getattr(host, "bk_world_ids", []),
+            "bk_world_id": getattr(host, "bk_world_id", ""),
+        }
+
+    @classmethod
+    def from_plain(cls, data):
+        # 缓存中的字段已经过Host初始化处理，直接还原，不再重复执行初始化逻辑
+        host = Host.__new__(Host)
+        super(Host, host).__init__(data["attrs"])
+        host.topo_link = {key: [TopoNode(**node) for node in nodes] for key, nodes in data["topo_link"].items()}
+        host.bk_world_ids = data["bk_world_ids"]
+        host.bk_world_id = data["bk_world_id"]
+        return host
+
     @classmethod
     def key_to_internal_value(cls, ip, bk_cloud_id=0):
         return "{}|{}".format(ip, bk_cloud_id)
@@ -196,13 +196,13 @@ DATA_SIGNAL_KEY = register_key_with_config(
     }
 )
 
-NO_DATA_LIST_KEY = register_key_with_config(
+NO_DATA_LAST_SEEN_KEY = register_key_with_config(
     {
-        "label": "[access]无数据告警待检测队列",
-        "key_type": "list",
-        "key_tpl": "access.nodata.{strategy_id}.{item_id}",
-        "ttl": 10 * CONST_MINUTES,
-        "backend": "queue",
+        "label": "[access]无数据检测维度最后上报时间(type:Hash)(field: 无数据维度md5, value: 上报时间|维度字典json)",
+        "key_type": "hash",
+        "key_tpl": "access.nodata.last_seen.{strategy_id}.{item_id}",
+        "ttl": CONST_ONE_DAY,
+        "backend": "service",
     }
 )
 
@@ -634,6 +634,40 @@ SYNC_ACTION_LOCK_KEY = register_key_with_config(
     }
 )
 
+ACTION_SYNC_CHANGES_KEY = register_key_with_config(
+    {
+        "label": "[fta_action]待同步的处理记录变更",
+        "key_type": "set",
+        "key_tpl": "fta_action.sync_action.changes",
+        "ttl": CONST_ONE_DAY,
+        "backend": "service",
+        "is_global": True,
+    }
+)
+
+ACTION_SYNC_PROCESSING_KEY = register_key_with_config(
+    {
+        "label": "[fta_action]同步中的处理记录变更",
+        "key_type": "set",
+        "key_tpl": "fta_action.sync_action.processing",
+        "ttl": CONST_ONE_DAY,
+        "backend": "service",
+        "is_global": True,
+    }
+)
+
+ACTION_SYNCED_VERSION_KEY = register_key_with_config(
+    {
+        "label": "[fta_action]已同步的处理记录版本",
+        "key_type": "hash",
+        "key_tpl": "fta_action.sync_action.synced.{bucket}",
+        "ttl": CONST_MINUTES * 30,
+        "backend": "service",
+        "field_tpl": "{action_id}",
+        "is_global": True,
+    }
+)
+
 LATEST_TIME_UPDATE_P_ACTION_KEY = register_key_with_config(
     {
         "label": "[fta_action]定期更新主任务状态",
@@ -677,6 +711,16 @@ COMPOSITE_CHECK_RESULT = register_key_with_config(
     }
 )
 
+COMPOSITE_CHECK_RESULT_REGISTRY = register_key_with_config(
+    {
+        "label": "[composite]关联策略检测结果缓存索引: 同一策略维度下已写入的检测结果缓存key",
+        "key_type": "set",
+        "key_tpl": "composite.check_result_registry.{strategy_id}.{dimension_hash}",
+        "ttl": CONST_ONE_HOUR * 2,
+        "backend": "service",
+    }
+)
+
 ALERT_BUILD_QOS_COUNTER = register_key_with_config(
     {
         "label": "[alert builder]流控计数器",
@@ -13,6 +13,7 @@ specific language governing permissions and limitations under the License.
 """
 
 
+import hashlib
 from collections import defaultdict
 from datetime import timedelta
 
@@ -31,6 +32,15 @@ class ShieldCacheManager(CacheManager):
 
     # 策略详情的缓存key
     CACHE_KEY_TEMPLATE = CacheManager.CACHE_KEY_PREFIX + ".shield.biz_{}"
+    # 屏蔽配置版本，按业务记录缓存内容的摘要，进程内的屏蔽索引据此判断是否需要重建
+    VERSION_CACHE_KEY = CacheManager.CACHE_KEY_PREFIX + ".shield.version"
+
+    @classmethod
+    def get_version(cls, bk_biz_id):
+        """
+        获取业务屏蔽配置的版本，无屏蔽配置时返回 None
+        """
+        return cls.cache.hget(cls.VERSION_CACHE_KEY, bk_biz_id)
 
     @classmethod
     def get_shields_by_biz_id(cls, bk_biz_id):
@@ -108,13 +118,13 @@ class ShieldCacheManager(CacheManager):
         for biz in biz_list:
             bk_biz_id = biz.bk_biz_id
             if bk_biz_id in shield_configs:
-                pipeline.set(
-                    cls.CACHE_KEY_TEMPLATE.format(bk_biz_id),
-                    extended_json.dumps(shield_configs[bk_biz_id]),
-                    cls.CACHE_TIMEOUT,
-                )
+                data = extended_json.dumps(shield_configs[bk_biz_id])
+                pipeline.set(cls.CACHE_KEY_TEMPLATE.format(bk_biz_id), data, cls.CACHE_TIMEOUT)
+                pipeline.hset(cls.VERSION_CACHE_KEY, bk_biz_id, hashlib.md5(data.encode("utf-8")).hexdigest())
             else:
                 pipeline.delete(cls.CACHE_KEY_TEMPLATE.format(bk_biz_id))
+                pipeline.hdel(cls.VERSION_CACHE_KEY, bk_biz_id)
+        pipeline.expire(cls.VERSION_CACHE_KEY, cls.CACHE_TIMEOUT)
         pipeline.execute()
 
 
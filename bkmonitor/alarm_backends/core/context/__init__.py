@@ -28,6 +28,7 @@ from bkmonitor.models import (
     GlobalConfig,
 )
 from bkmonitor.utils.common_utils import count_md5
+from bkmonitor.utils.template import Jinja2Renderer
 from constants.action import (
     ActionSignal,
     ActionStatus,
@@ -537,6 +538,12 @@ class ActionContext(object):
         return infos
 
 
+# 预编译内置的通知模板
+Jinja2Renderer.precompile(
+    [ActionContext.DEFAULT_TITLE_TEMPLATE, ActionContext.DEFAULT_TEMPLATE, ActionContext.DEFAULT_ACTION_TEMPLATE]
+)
+
+
 class BaseContextObject(object):
     def __init__(self, parent):
         self.parent = parent
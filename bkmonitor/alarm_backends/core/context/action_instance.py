@@ -207,21 +207,24 @@ class ActionInstanceContext(BaseContextObject):
             template_detail = {}
         return json.dumps(template_detail)
 
-    def jinja_render(self, template_value):
+    def jinja_render(self, template_value, context=None):
         """
         做jinja渲染
         :param template_value:
+        :param context: 渲染上下文，递归渲染时复用
         :return:
         """
+        if context is None:
+            context = self.parent.get_dictionary()
         if isinstance(template_value, str):
-            return Jinja2Renderer.render(template_value, self.parent.get_dictionary())
+            return Jinja2Renderer.render(template_value, context)
         if isinstance(template_value, dict):
             render_value = {}
             for key, value in template_value.items():
-                render_value[key] = self.jinja_render(value)
+                render_value[key] = self.jinja_render(value, context)
             return render_value
         if isinstance(template_value, list):
-            return [self.jinja_render(value) for value in template_value]
+            return [self.jinja_render(value, context) for value in template_value]
         return template_value
 
     @cached_property
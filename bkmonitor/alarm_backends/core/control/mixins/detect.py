@@ -16,9 +16,7 @@ from django.utils.module_loading import import_string
 from django.utils.translation import ugettext as _
 
 from alarm_backends.constants import LATEST_POINT_WITH_ALL_KEY
-from alarm_backends.core.cache.key import LAST_CHECKPOINTS_CACHE_KEY
 from alarm_backends.core.detect_result import ANOMALY_LABEL, CheckResult
-from bkmonitor.utils.common_utils import chunks
 from bkmonitor.utils.text import camel_to_underscore
 
 logger = logging.getLogger("core.control")
@@ -73,13 +71,22 @@ class DetectMixin(object):
                 anomaly_records = detector_list[0].detect_records(data_points, level)
             else:
                 # 组合策略
+                # 批量预筛选，未入选的数据点在该算法下必然不是异常点，无需逐点检测
+                candidate_ids_list = []
+                for d in detector_list:
+                    candidates = d.batch_prefilter(data_points)
+                    candidate_ids_list.append(None if candidates is None else {id(c) for c in candidates})
+
                 anomaly_records = []
                 for data_point in data_points:
                     ap = None
                     prefix = suffix = ""
-                    for d in detector_list:
+                    for d, candidate_ids in zip(detector_list, candidate_ids_list):
                         try:
-                            single_ret = d.detect(data_point)
+                            if candidate_ids is not None and id(data_point) not in candidate_ids:
+                                single_ret = []
+                            else:
+                                single_ret = d.detect(data_point)
 
                             # != "or" 兼容connector未配置或配错的情况，默认都使用and
                             if not single_ret:
@@ -142,56 +149,40 @@ class DetectMixin(object):
         return info_collection
 
     def _update_monitor_d_checkpoint(self, records, anomaly_records, level):
-        redis_pipeline = None
+        from alarm_backends.core.detect_result.clean import detect_result_point_required
+
         last_checkpoints = {}
+        check_points = []
         anomaly_record_ids = {i.data_point.record_id for i in anomaly_records}
         latest_point_with_all = 0
         for d in records:
-            # data_record 的record_id规则： {dimensions_md5}.{timestamp}
-            dimensions_md5, timestamp = d.record_id.split(".")
-            timestamp = int(timestamp)
-            latest_point_with_all = max([latest_point_with_all, d.timestamp])
-
-            check_result = CheckResult(self.strategy.id, self.id, dimensions_md5, level)
-            if redis_pipeline is None:
-                redis_pipeline = check_result.CHECK_RESULT
-
-            if d.record_id in anomaly_record_ids:
-                name = "{}|{}".format(timestamp, ANOMALY_LABEL)
-            else:
-                name = "{}|{}".format(timestamp, str(d.value))
-
             try:
-                # 1. 缓存数据(检测结果缓存) type:SortedSet
-                kwargs = {name: timestamp}
-                check_result.add_check_result_cache(**kwargs)
+                # data_record 的record_id规则： {dimensions_md5}.{timestamp}
+                dimensions_md5, timestamp = d.record_id.split(".")
+                timestamp = int(timestamp)
+                latest_point_with_all = max([latest_point_with_all, d.timestamp])
+
+                # 1. 检测结果缓存 type:SortedSet
+                value = ANOMALY_LABEL if d.record_id in anomaly_record_ids else d.value
+                check_points.append((dimensions_md5, timestamp, value))
 
-                # 2. 缓存最后checkpoint type:Hash，先放到内存里，最后再一次性写入redis
+                # 2. 最后checkpoint type:Hash，先放到内存里，最后再一次性写入redis
                 last_point = last_checkpoints.setdefault(dimensions_md5, 0)
                 if last_point < timestamp:
                     last_checkpoints[dimensions_md5] = timestamp
-
             except Exception as e:
                 msg = "set check result cache error:%s" % e
                 logger.exception(msg)
 
-        if redis_pipeline:
-            check_result.expire_key_to_dimension()
-            redis_pipeline.execute()
-
         if latest_point_with_all:
             last_checkpoints[LATEST_POINT_WITH_ALL_KEY] = latest_point_with_all
 
-        # 更新last_checkpoint
-        last_checkpoint_cache_key = LAST_CHECKPOINTS_CACHE_KEY.get_key(strategy_id=self.strategy.id, item_id=self.id)
-
-        for chunked_points in chunks(list(last_checkpoints.items()), 5000):
-            set_mapping = {}
-            for _dimensions_md5, point_timestamp in chunked_points:
-                last_checkpoint_cache_field = LAST_CHECKPOINTS_CACHE_KEY.get_field(
-                    dimensions_md5=_dimensions_md5,
-                    level=level,
-                )
-                set_mapping[last_checkpoint_cache_field] = point_timestamp
-            LAST_CHECKPOINTS_CACHE_KEY.client.hmset(last_checkpoint_cache_key, set_mapping)
-        CheckResult.expire_last_checkpoint_cache(strategy_id=self.strategy.id, item_id=self.id)
+        # 同一监控项同一级别的检测结果及last_checkpoint一次性写入
+        CheckResult.record_check_results(
+            strategy_id=self.strategy.id,
+            item_id=self.id,
+            level=level,
+            points=check_points,
+            last_checkpoints=last_checkpoints,
+            max_len=detect_result_point_required(self.strategy.config),
+        )
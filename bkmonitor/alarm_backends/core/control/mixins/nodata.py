@@ -10,10 +10,12 @@ specific language governing permissions and limitations under the License.
 """
 
 
+import json
 import logging
 from itertools import chain
 
 import arrow
+from django.conf import settings
 from django.utils.module_loading import import_string
 from django.utils.translation import ugettext_lazy as _
 
@@ -25,10 +27,31 @@ from alarm_backends.constants import (
 )
 from alarm_backends.core.cache import key
 from alarm_backends.core.detect_result import ANOMALY_LABEL, CheckResult
-from bkmonitor.utils.common_utils import count_md5
+from alarm_backends.core.storage.redis_cluster import RedisScript
+from bkmonitor.utils.common_utils import chunks, count_dimension_md5, count_md5
 
 logger = logging.getLogger("core.control")
 
+# 更新无数据维度最后上报时间，仅当上报时间比已记录的更新时才覆盖
+# payload:
+#   entries: [[dimensions_md5, timestamp, value], ...]
+#   ttl: 索引过期时间
+UPDATE_NO_DATA_LAST_SEEN_SCRIPT = RedisScript(
+    """
+local payload = cjson.decode(ARGV[1])
+local updated = 0
+for _, entry in ipairs(payload["entries"]) do
+    local current = redis.call("HGET", KEYS[1], entry[1])
+    if (not current) or tonumber(string.match(current, "^[^|]+")) < tonumber(entry[2]) then
+        redis.call("HSET", KEYS[1], entry[1], entry[3])
+        updated = updated + 1
+    end
+end
+redis.call("EXPIRE", KEYS[1], payload["ttl"])
+return updated
+"""
+)
+
 
 class CheckMixin(object):
     @property
@@ -36,6 +59,120 @@ class CheckMixin(object):
         no_data_config = getattr(self, "no_data_config", {})
         return int(no_data_config.get("level", NO_DATA_LEVEL))
 
+    @property
+    def no_data_dimensions(self):
+        no_data_config = getattr(self, "no_data_config", {}) or {}
+        return no_data_config.get("agg_dimension", [])
+
+    def update_no_data_last_seen(self, records):
+        """
+        :summary: 将上报数据按无数据维度降维，记录各维度的最后上报时间，无数据检测时直接与目标维度对比，无需回放原始数据
+        :param records: 上报数据 [{"dimensions": {...}, "time": 1569246480, ...}]
+        :return: 记录的维度数量
+        """
+        no_data_dimensions = self.no_data_dimensions
+        # 相同维度值只计算一次 md5
+        md5_cache = {}
+        last_seen = {}
+        for record in records:
+            dimensions = record["dimensions"]
+            try:
+                dimension_values = tuple(dimensions[dimension] for dimension in no_data_dimensions)
+            except KeyError:
+                # 目标维度比数据中的维度范围大，说明数据无效
+                continue
+
+            try:
+                dimensions_md5, reduced_dimensions = md5_cache[dimension_values]
+            except (KeyError, TypeError):
+                reduced_dimensions = dict(zip(no_data_dimensions, dimension_values))
+                reduced_dimensions[NO_DATA_TAG_DIMENSION] = True
+                dimensions_md5 = count_dimension_md5(reduced_dimensions)
+                try:
+                    md5_cache[dimension_values] = (dimensions_md5, reduced_dimensions)
+                except TypeError:
+                    pass
+
+            timestamp = int(record["time"])
+            if dimensions_md5 not in last_seen or last_seen[dimensions_md5][0] < timestamp:
+                last_seen[dimensions_md5] = (timestamp, reduced_dimensions)
+
+        if not last_seen:
+            return 0
+
+        last_seen_key = key.NO_DATA_LAST_SEEN_KEY.get_key(strategy_id=self.strategy.id, item_id=self.id)
+        entries = [
+            [dimensions_md5, timestamp, "{}|{}".format(timestamp, json.dumps(dimensions))]
+            for dimensions_md5, (timestamp, dimensions) in last_seen.items()
+        ]
+        client = key.NO_DATA_LAST_SEEN_KEY.client
+        if getattr(settings, "ENABLE_REDIS_LUA_SCRIPT", False):
+            for chunked_entries in chunks(entries, 5000):
+                client.run_script(
+                    UPDATE_NO_DATA_LAST_SEEN_SCRIPT,
+                    keys=[last_seen_key],
+                    args=[json.dumps({"entries": chunked_entries, "ttl": key.NO_DATA_LAST_SEEN_KEY.ttl})],
+                )
+        else:
+            # 未启用lua脚本时，先批量读取已记录的上报时间，再写入更新的部分
+            for chunked_entries in chunks(entries, 5000):
+                current_values = client.hmget(last_seen_key, [entry[0] for entry in chunked_entries])
+                mapping = {
+                    entry[0]: entry[2]
+                    for entry, current in zip(chunked_entries, current_values)
+                    if not current or int(current.split("|", 1)[0]) < entry[1]
+                }
+                if mapping:
+                    client.hmset(last_seen_key, mapping)
+            client.expire(last_seen_key, key.NO_DATA_LAST_SEEN_KEY.ttl)
+        return len(entries)
+
+    def get_no_data_last_seen(self, check_timestamp):
+        """
+        :summary: 获取无数据维度最后上报时间索引，并清理与当前无数据维度配置不一致或已过期的维度
+        :param check_timestamp: 检测时刻
+        :return: {dimensions_md5: (timestamp, dimensions)}
+        """
+        last_seen_key = key.NO_DATA_LAST_SEEN_KEY.get_key(strategy_id=self.strategy.id, item_id=self.id)
+        client = key.NO_DATA_LAST_SEEN_KEY.client
+        expected_keys = set(self.no_data_dimensions)
+        expected_keys.add(NO_DATA_TAG_DIMENSION)
+        expire_timestamp = check_timestamp - key.NO_DATA_LAST_SEEN_KEY.ttl
+
+        last_seen = {}
+        invalid_fields = []
+        for field, value in client.hgetall(last_seen_key).items():
+            try:
+                timestamp, dimensions = value.split("|", 1)
+                timestamp = int(timestamp)
+                dimensions = json.loads(dimensions)
+            except ValueError:
+                invalid_fields.append(field)
+                continue
+            if timestamp < expire_timestamp or set(dimensions.keys()) != expected_keys:
+                invalid_fields.append(field)
+                continue
+            last_seen[field] = (timestamp, dimensions)
+
+        if invalid_fields:
+            client.hdel(last_seen_key, *invalid_fields)
+        return last_seen
+
+    def get_no_data_last_checkpoints(self, dimensions_md5_list):
+        """
+        :summary: 批量获取维度上一次无数据检测记录的上报时刻
+        :return: {dimensions_md5: last_point}
+        """
+        if not dimensions_md5_list:
+            return {}
+        last_check_cache_key = key.LAST_CHECKPOINTS_CACHE_KEY.get_key(strategy_id=self.strategy.id, item_id=self.id)
+        fields = [
+            key.LAST_CHECKPOINTS_CACHE_KEY.get_field(dimensions_md5=dimensions_md5, level=self.no_data_level)
+            for dimensions_md5 in dimensions_md5_list
+        ]
+        last_points = key.LAST_CHECKPOINTS_CACHE_KEY.client.hmget(last_check_cache_key, fields)
+        return dict(zip(dimensions_md5_list, last_points))
+
     def check(self, data_points, check_timestamp):
         scenario_cls = import_string("alarm_backends.service.nodata.scenarios.base.SCENARIO_CLS")
         scenario = self.strategy.scenario
@@ -87,19 +224,11 @@ class CheckMixin(object):
 
             # 5. 生成异常记录，生成规则：1）当前监测点无数据 or 2）当前监测点有数据，但是数据上报时间晚于 last_check_point
             anomaly_data = []
-            target_dimensions_md5 = []
-            last_check_cache_key = key.LAST_CHECKPOINTS_CACHE_KEY.get_key(strategy_id=self.strategy.id, item_id=self.id)
-            for target_inst_dms in target_instance_dimensions:
-                target_dms_md5 = count_md5(target_inst_dms)
-                target_dimensions_md5.append(target_dms_md5)
-                # 之前检测的数据最后上报点
-                last_checkpoint_cache_field = key.LAST_CHECKPOINTS_CACHE_KEY.get_field(
-                    dimensions_md5=target_dms_md5,
-                    level=self.no_data_level,
-                )
-                last_point = key.LAST_CHECKPOINTS_CACHE_KEY.client.hget(
-                    last_check_cache_key, last_checkpoint_cache_field
-                )
+            target_dimensions_md5 = [count_md5(target_inst_dms) for target_inst_dms in target_instance_dimensions]
+            # 之前检测的数据最后上报点
+            last_points = self.get_no_data_last_checkpoints(target_dimensions_md5)
+            for target_inst_dms, target_dms_md5 in zip(target_instance_dimensions, target_dimensions_md5):
+                last_point = last_points.get(target_dms_md5)
                 if target_dms_md5 not in dimensions_md5_timestamp or (
                     last_point and dimensions_md5_timestamp[target_dms_md5] < int(last_point)
                 ):
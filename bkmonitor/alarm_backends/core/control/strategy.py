@@ -25,10 +25,17 @@ from alarm_backends.core.cache.strategy import StrategyCacheManager
 from alarm_backends.core.control.item import Item
 from alarm_backends.core.i18n import i18n
 from bkmonitor.utils import time_tools
+from bkmonitor.utils.cache import LRUCache
 from core.errors.alarm_backends import StrategyItemNotFound
+from core.prometheus import metrics
 
 logger = logging.getLogger("core.control")
 
+# 策略快照的内容由 (strategy_id, update_time) 唯一确定，进程内缓存已转换为v2格式的快照
+STRATEGY_SNAPSHOT_CACHE = LRUCache(maxsize=5000)
+# 进程内记录已写入的快照，超过半个过期时间后才需要再次确认快照是否存在
+STRATEGY_SNAPSHOT_WRITTEN = LRUCache(maxsize=20000, ttl=key.STRATEGY_SNAPSHOT_KEY.ttl // 2)
+
 
 class Strategy(object):
     def __init__(self, strategy_id, default_config=None):
@@ -202,14 +209,32 @@ class Strategy(object):
         client = key.STRATEGY_SNAPSHOT_KEY.client
         update_time = self.config.get("update_time")
         snapshot_key = key.STRATEGY_SNAPSHOT_KEY.get_key(strategy_id=self.id, update_time=update_time)
-        client.set(snapshot_key, json.dumps(self.config), ex=CONST_ONE_HOUR)
+        if STRATEGY_SNAPSHOT_WRITTEN.get(snapshot_key) is None:
+            # 快照不存在时才写入，已存在则只延长过期时间
+            if client.set(snapshot_key, json.dumps(self.config), ex=CONST_ONE_HOUR, nx=True):
+                status = "created"
+            else:
+                client.expire(snapshot_key, CONST_ONE_HOUR)
+                status = "existed"
+            STRATEGY_SNAPSHOT_WRITTEN.set(snapshot_key, True)
+            metrics.STRATEGY_SNAPSHOT_WRITE_COUNT.labels(status=status).inc()
         setattr(self, "snapshot_key", snapshot_key)
         return snapshot_key
 
     @classmethod
     def get_strategy_snapshot_by_key(cls, snapshot_key, strategy_id=None):
+        """
+        获取策略快照，优先从进程内缓存获取
+        调用方会修改快照(如写入告警的extra_info)，因此缓存转换后的json，每次命中时反序列化出新的对象
+        """
         from bkmonitor.strategy.new_strategy import Strategy as StrategyClass
 
+        cached_snapshot = STRATEGY_SNAPSHOT_CACHE.get(snapshot_key)
+        if cached_snapshot is not None:
+            metrics.STRATEGY_SNAPSHOT_CACHE_COUNT.labels(status="hit").inc()
+            return json.loads(cached_snapshot)
+        metrics.STRATEGY_SNAPSHOT_CACHE_COUNT.labels(status="miss").inc()
+
         client = key.STRATEGY_SNAPSHOT_KEY.client
         if strategy_id:
             snapshot_key = key.SimilarStr(snapshot_key)
@@ -218,8 +243,9 @@ class Strategy(object):
         if not snapshot:
             return None
 
-        snapshot_strategy = json.loads(snapshot)
-        return StrategyClass.convert_v1_to_v2(snapshot_strategy)
+        snapshot_strategy = StrategyClass.convert_v1_to_v2(json.loads(snapshot))
+        STRATEGY_SNAPSHOT_CACHE.set(str(snapshot_key), json.dumps(snapshot_strategy))
+        return snapshot_strategy
 
     @classmethod
     def get_item_in_strategy(cls, strategy, item_id):
@@ -12,16 +12,53 @@ specific language governing permissions and limitations under the License.
 
 import json
 
+from django.conf import settings
+
 from alarm_backends.constants import (
     LATEST_NO_DATA_CHECK_POINT,
     LATEST_POINT_WITH_ALL_KEY,
 )
 from alarm_backends.core.cache import key
+from alarm_backends.core.storage.redis_cluster import RedisScript
+from bkmonitor.utils.common_utils import chunks
 
 CONST_MAX_LEN_CHECK_RESULT = 60  # 检测结果缓存，默认只保留60条数据
 
 ANOMALY_LABEL = "ANOMALY"  # 异常标识
 
+# 批量记录检测结果，脚本涉及的key全部通过KEYS传入(同一策略的key位于同一节点)
+# KEYS[1]: last checkpoint 缓存key, KEYS[2]: 维度缓存key, KEYS[3...]: 检测结果缓存key
+# ARGV[1]: json 打包的检测结果
+#   points: [[检测结果缓存key在KEYS中的下标, timestamp, value], ...]
+#   checkpoints: [[field, timestamp], ...]
+#   trim_end: 按保留点数裁剪时 ZREMRANGEBYRANK 的结束位置，见 check_result_trim_end
+RECORD_CHECK_RESULT_SCRIPT = RedisScript(
+    """
+local payload = cjson.decode(ARGV[1])
+for _, point in ipairs(payload["points"]) do
+    redis.call("ZADD", KEYS[point[1]], point[2], point[2] .. "|" .. point[3])
+end
+for index = 3, #KEYS do
+    redis.call("ZREMRANGEBYRANK", KEYS[index], 0, payload["trim_end"])
+    redis.call("EXPIRE", KEYS[index], payload["ttl"])
+end
+for _, checkpoint in ipairs(payload["checkpoints"]) do
+    redis.call("HSET", KEYS[1], checkpoint[1], checkpoint[2])
+end
+redis.call("EXPIRE", KEYS[1], payload["checkpoint_ttl"])
+redis.call("EXPIRE", KEYS[2], payload["dimension_ttl"])
+return #KEYS - 2
+"""
+)
+
+
+def check_result_trim_end(point_remain):
+    """
+    检测结果缓存按保留点数裁剪时，ZREMRANGEBYRANK 的结束位置
+    写入与定时清理使用同一规则
+    """
+    return -(point_remain or CONST_MAX_LEN_CHECK_RESULT)
+
 
 class Result(object):
     _pipeline = None
@@ -109,14 +146,72 @@ class CheckResult(Result):
         return ret
 
     def remove_old_check_result_cache(self, point_remains=0):
-        point_remains = point_remains or 0
-        return self.CHECK_RESULT.zremrangebyrank(
-            self.check_result_cache_key, 0, -point_remains or -CONST_MAX_LEN_CHECK_RESULT
-        )
+        return self.CHECK_RESULT.zremrangebyrank(self.check_result_cache_key, 0, check_result_trim_end(point_remains))
 
     def remove_expired_check_result_cache(self, expired_timestamp):
         return self.CHECK_RESULT.zremrangebyscore(self.check_result_cache_key, 0, expired_timestamp)
 
+    @classmethod
+    def record_check_results(cls, strategy_id, item_id, level, points, last_checkpoints, max_len=None):
+        """
+        记录同一监控项同一级别的全部检测结果，并更新最后检测点
+        启用lua脚本时，单次调用完成 ZADD、裁剪、过期时间设置及 last checkpoint 更新
+        :param points: [(dimensions_md5, timestamp, value)]，异常点的value为ANOMALY_LABEL
+        :param last_checkpoints: {dimensions_md5: timestamp}
+        :param max_len: 每个维度保留的检测结果数量，裁剪规则与定时清理一致
+        """
+        trim_end = check_result_trim_end(max_len)
+        last_checkpoint_cache_key = key.LAST_CHECKPOINTS_CACHE_KEY.get_key(strategy_id=strategy_id, item_id=item_id)
+        md5_to_dimension_key = cls.get_md5_to_dimension_key("detect", strategy_id, item_id)
+        checkpoints = [
+            [key.LAST_CHECKPOINTS_CACHE_KEY.get_field(dimensions_md5=dimensions_md5, level=level), str(timestamp)]
+            for dimensions_md5, timestamp in last_checkpoints.items()
+        ]
+
+        # 按维度计算检测结果缓存key，保持首次出现的顺序
+        check_result_keys = {}
+        for dimensions_md5, _, _ in points:
+            if dimensions_md5 not in check_result_keys:
+                check_result_keys[dimensions_md5] = key.CHECK_RESULT_CACHE_KEY.get_key(
+                    strategy_id=strategy_id, item_id=item_id, dimensions_md5=dimensions_md5, level=level
+                )
+
+        if getattr(settings, "ENABLE_REDIS_LUA_SCRIPT", False):
+            # lua 中的下标从1开始，前两个key为 last checkpoint 及维度缓存key
+            key_indexes = {dimensions_md5: index + 3 for index, dimensions_md5 in enumerate(check_result_keys)}
+            payload = {
+                "points": [
+                    [key_indexes[dimensions_md5], str(timestamp), str(value)]
+                    for dimensions_md5, timestamp, value in points
+                ],
+                "checkpoints": checkpoints,
+                "trim_end": trim_end,
+                "ttl": key.CHECK_RESULT_CACHE_KEY.ttl,
+                "checkpoint_ttl": key.LAST_CHECKPOINTS_CACHE_KEY.ttl,
+                "dimension_ttl": key.MD5_TO_DIMENSION_CACHE_KEY.ttl,
+            }
+            return key.CHECK_RESULT_CACHE_KEY.client.run_script(
+                RECORD_CHECK_RESULT_SCRIPT,
+                keys=[last_checkpoint_cache_key, md5_to_dimension_key] + list(check_result_keys.values()),
+                args=[json.dumps(payload)],
+            )
+
+        # 未启用lua脚本时，通过pipeline批量写入
+        pipeline = cls.pipeline()
+        for dimensions_md5, timestamp, value in points:
+            pipeline.zadd(check_result_keys[dimensions_md5], {"{}|{}".format(timestamp, value): timestamp})
+
+        for check_result_cache_key in check_result_keys.values():
+            pipeline.zremrangebyrank(check_result_cache_key, 0, trim_end)
+            pipeline.expire(check_result_cache_key, key.CHECK_RESULT_CACHE_KEY.ttl)
+        pipeline.expire(md5_to_dimension_key, key.MD5_TO_DIMENSION_CACHE_KEY.ttl)
+        pipeline.execute()
+
+        for chunked_checkpoints in chunks(checkpoints, 5000):
+            key.LAST_CHECKPOINTS_CACHE_KEY.client.hmset(last_checkpoint_cache_key, dict(chunked_checkpoints))
+        cls.expire_last_checkpoint_cache(strategy_id=strategy_id, item_id=item_id)
+        return len(check_result_keys)
+
     # ----- Func of last_check_point   ----- #
     @staticmethod
     def update_last_checkpoint_by_d_md5(strategy_id, item_id, dimensions_md5, check_point, level):
@@ -18,7 +18,10 @@ from alarm_backends.core.cache.key import (
     OLD_MD5_TO_DIMENSION_CACHE_KEY,
 )
 from alarm_backends.core.control.strategy import Strategy, StrategyCacheManager
-from alarm_backends.core.detect_result import CONST_MAX_LEN_CHECK_RESULT
+from alarm_backends.core.detect_result import (
+    CONST_MAX_LEN_CHECK_RESULT,
+    check_result_trim_end,
+)
 
 DUMMY_DIMENSIONS_MD5 = "dummy_dimensions_md5"
 CLEAN_EXPIRED_ARROW_REPLACE_TIME = {"hours": -5}
@@ -62,7 +65,7 @@ class CleanResult(object):
 
                 # 按保留点数清理检测结果缓存
                 for index, check_result_cache_key in enumerate(check_result_cache_keys):
-                    pipeline.zremrangebyrank(check_result_cache_key, 0, -point_remain)
+                    pipeline.zremrangebyrank(check_result_cache_key, 0, check_result_trim_end(point_remain))
                     # 一次最多清理5000个维度的检测结果
                     if index % 5000 == 4999:
                         pipeline.execute()
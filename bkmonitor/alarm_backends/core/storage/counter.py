@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import functools
+import json
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+from django.conf import settings
+
+from alarm_backends.core.storage.redis_cluster import RedisScript, execute_by_node
+
+FIXED_WINDOW = "fixed"
+SLIDING_WINDOW = "sliding"
+
+CounterResult = namedtuple("CounterResult", ["count", "allowed"])
+
+
+class CounterRequest(object):
+    """
+    单个key的计数请求
+    :param key: 计数key
+    :param window: 窗口长度(s)，固定窗口为key的过期时间，滑动窗口为统计的时间范围
+    :param amount: 计数增量，为0时只读取当前计数，小于0时释放计数(计数不会小于0)
+    :param limit: 阈值，计数超过阈值时 allowed 为 False，为0时不限制
+    :param rollback: 超过阈值时是否回退本次计数，用于并发控制
+    :param refresh_ttl: 未超过阈值时是否刷新过期时间，默认只在key没有过期时间时设置
+    """
+
+    __slots__ = ("key", "window", "amount", "limit", "rollback", "refresh_ttl")
+
+    def __init__(self, key, window, amount=1, limit=0, rollback=False, refresh_ttl=False):
+        self.key = key
+        self.window = int(window)
+        self.amount = int(amount)
+        self.limit = int(limit or 0)
+        self.rollback = rollback
+        self.refresh_ttl = refresh_ttl
+
+    def to_payload(self):
+        return [self.window, self.amount, self.limit, int(self.rollback), int(self.refresh_ttl)]
+
+
+# 窗口计数，一次交互内完成计数、阈值判断及过期时间设置
+# KEYS: 计数key列表，与 payload["items"] 一一对应，需要位于同一节点
+# payload:
+#   items: [[window, amount, limit, rollback, refresh_ttl], ...]
+#   sliding: 是否为滑动窗口
+#   now: 当前时间戳(滑动窗口)
+#   member: 本次请求的唯一标识(滑动窗口)
+# return: [count, allowed, count, allowed, ...]
+COUNTER_SCRIPT = RedisScript(
+    """
+local payload = cjson.decode(ARGV[1])
+local sliding = payload["sliding"]
+local now = tonumber(payload["now"])
+local result = {}
+for i, item in ipairs(payload["items"]) do
+    local counter_key = KEYS[i]
+    local window, amount, limit, rollback, refresh_ttl = item[1], item[2], item[3], item[4], item[5]
+    local count
+    local members = {}
+    if sliding then
+        redis.call("ZREMRANGEBYSCORE", counter_key, "-inf", now - window)
+        if amount < 0 then
+            redis.call("ZREMRANGEBYRANK", counter_key, 0, -amount - 1)
+        end
+        for j = 1, amount do
+            local member = payload["member"] .. ":" .. i .. ":" .. j
+            redis.call("ZADD", counter_key, now, member)
+            table.insert(members, member)
+        end
+        count = redis.call("ZCARD", counter_key)
+    elseif amount > 0 then
+        count = redis.call("INCRBY", counter_key, amount)
+    else
+        count = tonumber(redis.call("GET", counter_key)) or 0
+        if amount < 0 and count > 0 then
+            count = redis.call("DECRBY", counter_key, math.min(count, -amount))
+        end
+    end
+
+    local allowed = 1
+    if limit > 0 and count > limit then
+        allowed = 0
+        if rollback == 1 and amount > 0 then
+            if sliding then
+                redis.call("ZREM", counter_key, unpack(members))
+            else
+                redis.call("DECRBY", counter_key, amount)
+            end
+        end
+    end
+
+    if amount > 0 then
+        if sliding or (allowed == 1 and refresh_ttl == 1) or redis.call("TTL", counter_key) < 0 then
+            redis.call("EXPIRE", counter_key, window)
+        end
+    end
+    table.insert(result, count)
+    table.insert(result, allowed)
+end
+return result
+"""
+)
+
+
+class MemoryCounterClient(object):
+    """
+    进程内计数存储，实现计数器用到的redis命令，用于单元测试及性能测试
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.RLock()
+
+    def _check_expire(self, key):
+        expire_time = self._expires.get(key)
+        if expire_time is not None and expire_time <= time.time():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+
+    def get(self, key):
+        with self._lock:
+            self._check_expire(key)
+            value = self._data.get(key)
+            return None if value is None else str(value)
+
+    def incrby(self, key, amount=1):
+        with self._lock:
+            self._check_expire(key)
+            self._data[key] = int(self._data.get(key, 0)) + amount
+            return self._data[key]
+
+    def decrby(self, key, amount=1):
+        return self.incrby(key, -amount)
+
+    def ttl(self, key):
+        with self._lock:
+            self._check_expire(key)
+            if key not in self._data:
+                return -2
+            expire_time = self._expires.get(key)
+            return -1 if expire_time is None else int(expire_time - time.time())
+
+    def expire(self, key, seconds):
+        with self._lock:
+            if key in self._data:
+                self._expires[key] = time.time() + seconds
+
+    def zremrangebyscore(self, key, min_score, max_score):
+        with self._lock:
+            self._check_expire(key)
+            members = self._data.get(key, {})
+            for member, score in list(members.items()):
+                if score <= max_score:
+                    members.pop(member)
+
+    def zremrangebyrank(self, key, start, end):
+        with self._lock:
+            members = self._data.get(key, {})
+            for member, _ in sorted(members.items(), key=lambda x: x[1])[start : end + 1]:
+                members.pop(member)
+
+    def zadd(self, key, mapping):
+        with self._lock:
+            self._check_expire(key)
+            self._data.setdefault(key, {}).update(mapping)
+
+    def zrem(self, key, *members):
+        with self._lock:
+            for member in members:
+                self._data.get(key, {}).pop(member, None)
+
+    def zcard(self, key):
+        with self._lock:
+            self._check_expire(key)
+            return len(self._data.get(key, {}))
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+                self._expires.pop(key, None)
+
+
+class WindowCounter(object):
+    """
+    窗口计数器，支持固定窗口及滑动窗口，用于告警QOS、收敛并发控制等场景
+
+    - 启用lua脚本时，多个key按节点分组，每个节点一次脚本调用完成所有计数
+    - 未启用lua脚本时，逐个key执行redis命令
+    - 指定 MemoryCounterClient 时使用进程内存储，用于单元测试
+    """
+
+    def __init__(self, key_config=None, window_type=FIXED_WINDOW, client=None):
+        """
+        :param key_config: register_key_with_config 注册的key配置，使用其redis客户端
+        :param window_type: 窗口类型 fixed/sliding
+        :param client: 自定义客户端，如 MemoryCounterClient
+        """
+        self.window_type = window_type
+        self.client = client if client is not None else key_config.client
+
+    @property
+    def sliding(self):
+        return self.window_type == SLIDING_WINDOW
+
+    @property
+    def use_script(self):
+        return not isinstance(self.client, MemoryCounterClient) and getattr(settings, "ENABLE_REDIS_LUA_SCRIPT", False)
+
+    def incr(self, key, window, amount=1, limit=0, rollback=False, refresh_ttl=False):
+        """
+        计数并判断是否超过阈值
+        :return: CounterResult(count, allowed)
+        """
+        return self.evaluate([CounterRequest(key, window, amount, limit, rollback, refresh_ttl)])[0]
+
+    def get(self, key, window):
+        """
+        获取当前计数
+        """
+        return self.evaluate([CounterRequest(key, window, amount=0)])[0].count
+
+    def release(self, key, window, amount=1):
+        """
+        释放计数，用于并发控制场景的解锁
+        """
+        return self.evaluate([CounterRequest(key, window, amount=-amount)])[0].count
+
+    def evaluate(self, requests):
+        """
+        批量计数，同一个key的多个请求按顺序生效
+        :param requests: [CounterRequest]
+        :return: [CounterResult]，与 requests 顺序一致
+        """
+        requests = list(requests)
+        if not requests:
+            return []
+        if self.use_script:
+            return self._evaluate_by_script(requests)
+        return [self._evaluate_by_command(request) for request in requests]
+
+    def _script_payload(self, requests):
+        return json.dumps(
+            {
+                "items": [request.to_payload() for request in requests],
+                "sliding": self.sliding,
+                "now": time.time(),
+                "member": uuid.uuid4().hex,
+            }
+        )
+
+    def _evaluate_by_script(self, requests):
+        def run(client, items):
+            node_requests = [request for _, request in items]
+            return COUNTER_SCRIPT(
+                client, [request.key for request in node_requests], [self._script_payload(node_requests)]
+            )
+
+        if not hasattr(self.client, "group_keys_by_node"):
+            return self._parse_script_result(run(self.client, list(enumerate(requests))))
+
+        node_requests = {}
+        for node_id, (node, items) in self.client.group_keys_by_node([request.key for request in requests]).items():
+            node_requests[node_id] = (node, [(index, requests[index]) for index, _ in items])
+
+        tasks = {
+            node_id: functools.partial(run, self.client.get_client(node), items)
+            for node_id, (node, items) in node_requests.items()
+        }
+        results = [None] * len(requests)
+        for node_id, node_result in execute_by_node(tasks).items():
+            for (index, _), result in zip(node_requests[node_id][1], self._parse_script_result(node_result)):
+                results[index] = result
+        return results
+
+    @staticmethod
+    def _parse_script_result(result):
+        return [CounterResult(int(result[i]), bool(result[i + 1])) for i in range(0, len(result), 2)]
+
+    def _evaluate_by_command(self, request):
+        client = self.client
+        counter_key = request.key
+        amount = request.amount
+        members = []
+        if self.sliding:
+            now = time.time()
+            client.zremrangebyscore(counter_key, "-inf", now - request.window)
+            if amount < 0:
+                client.zremrangebyrank(counter_key, 0, -amount - 1)
+            members = ["{}:{}".format(uuid.uuid4().hex, index) for index in range(max(amount, 0))]
+            if members:
+                client.zadd(counter_key, {member: now for member in members})
+            count = client.zcard(counter_key)
+        elif amount > 0:
+            count = client.incrby(counter_key, amount)
+        else:
+            count = int(client.get(counter_key) or 0)
+            if amount < 0 and count > 0:
+                count = client.decrby(counter_key, min(count, -amount))
+
+        allowed = True
+        if request.limit > 0 and count > request.limit:
+            allowed = False
+            if request.rollback and amount > 0:
+                if self.sliding:
+                    client.zrem(counter_key, *members)
+                else:
+                    client.decrby(counter_key, amount)
+
+        if amount > 0:
+            if self.sliding or (allowed and request.refresh_ttl):
+                client.expire(counter_key, request.window)
+            else:
+                # 这里client对应的是redis-py的Redis对象，对ttl返回值错了一层处理，小于0的统一设置为None
+                ttl = client.ttl(counter_key)
+                if ttl is None or ttl < 0:
+                    client.expire(counter_key, request.window)
+        return CounterResult(count, allowed)
@@ -9,8 +9,18 @@ an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express o
 specific language governing permissions and limitations under the License.
 """
 
+import functools
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from redis.exceptions import NoScriptError
+
 from alarm_backends.core.storage.redis import CACHE_BACKEND_CONF_MAP, Cache
 from bkmonitor.models import CacheRouter
+from core.prometheus import metrics
 
 __doc__ = """
 
@@ -96,6 +106,45 @@ def setup_sentinel_client(node, backend):
     return sentinel_node.instance(backend)
 
 
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_node_executor():
+    """
+    多节点并发执行命令的线程池，进程内共享
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                max_workers = getattr(settings, "REDIS_NODE_EXECUTE_WORKERS", 8)
+                _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="redis-node")
+    return _executor
+
+
+def execute_by_node(tasks):
+    """
+    按节点执行任务，多个节点时并发执行，全部完成后返回结果
+    :param tasks: {node_id: callable}
+    :return: {node_id: result}
+    """
+    if len(tasks) <= 1:
+        return {node_id: task() for node_id, task in tasks.items()}
+
+    futures = {node_id: get_node_executor().submit(task) for node_id, task in tasks.items()}
+    results = {}
+    exception = None
+    for node_id, future in futures.items():
+        try:
+            results[node_id] = future.result()
+        except Exception as err:
+            exception = exception or err
+    if exception:
+        raise exception
+    return results
+
+
 class KeyRouterMixin(object):
     def strategy_id_from_command(self, *args, **kwargs):
         key = self.key_from_command(*args, **kwargs)
@@ -128,6 +177,47 @@ class RedisProxy(KeyRouterMixin):
 
         return self._client_pool[node.id]
 
+    def group_keys_by_node(self, keys):
+        """
+        按节点对key进行分组
+        :return: {node_id: (node, [(index, key), ...])}
+        """
+        node_keys = {}
+        for index, key in enumerate(keys):
+            node = get_node_by_strategy_id(self.strategy_id_from_key(key))
+            node_keys.setdefault(node.id, (node, []))[1].append((index, key))
+        return node_keys
+
+    def mget(self, keys, *args):
+        """
+        跨节点批量获取，按节点拆分key并发执行，结果按key的顺序返回
+        """
+        # 与 redis-py 一致，支持传入单个 key
+        if isinstance(keys, (str, bytes)):
+            keys = [keys]
+        keys = list(keys) + list(args)
+        if not keys:
+            return []
+
+        node_keys = self.group_keys_by_node(keys)
+        tasks = {
+            node_id: functools.partial(self.get_client(node).mget, [key for _, key in items])
+            for node_id, (node, items) in node_keys.items()
+        }
+        results = [None] * len(keys)
+        for node_id, values in execute_by_node(tasks).items():
+            for (index, _), value in zip(node_keys[node_id][1], values):
+                results[index] = value
+        return results
+
+    def run_script(self, script, keys, args=None):
+        """
+        执行lua脚本，按 keys[0] 路由到对应节点，脚本涉及的key需要位于同一节点
+        """
+        strategy_id = self.strategy_id_from_key(keys[0]) if keys else 0
+        client = self.get_client(get_node_by_strategy_id(strategy_id))
+        return script(client, keys, args)
+
     def __getattr__(self, name):
         def handle(*args, **kwargs):
             exception = None
@@ -167,14 +257,26 @@ class PipelineProxy(KeyRouterMixin):
         return self._pipeline_pool[node.id]
 
     def execute(self):
-        p_result = {}
-        result = []
+        start = time.time()
+        tasks = {}
         for node_id, pipeline_instance in self._pipeline_pool.items():
-            p_result[node_id] = list(reversed(getattr(pipeline_instance, "execute")()))
-        for cmd in self.command_stack:
-            resp = p_result[cmd].pop() if p_result[cmd] else None
+            command_count = len(pipeline_instance)
+            if not command_count:
+                continue
+            metrics.REDIS_PIPELINE_COMMAND_COUNT.labels(node_id=node_id).observe(command_count)
+            tasks[node_id] = getattr(pipeline_instance, "execute")
+
+        try:
+            # 多个节点的pipeline并发执行，耗时取决于最慢的节点
+            p_result = {node_id: list(reversed(resp)) for node_id, resp in execute_by_node(tasks).items()}
+        finally:
+            command_stack, self.command_stack = self.command_stack, []
+        metrics.REDIS_PIPELINE_EXECUTE_TIME.labels(node_count=len(tasks)).observe(time.time() - start)
+
+        result = []
+        for cmd in command_stack:
+            resp = p_result[cmd].pop() if p_result.get(cmd) else None
             result.append(resp)
-        self.command_stack = []
         return result
 
     def __getattr__(self, name):
@@ -194,6 +296,24 @@ class PipelineProxy(KeyRouterMixin):
         return handle
 
 
+class RedisScript(object):
+    """
+    lua 脚本，优先通过 evalsha 执行，节点上未加载脚本时回退到 eval(同时完成加载)
+    """
+
+    def __init__(self, script):
+        self.script = script
+        self.sha = hashlib.sha1(script.encode("utf-8")).hexdigest()
+
+    def __call__(self, client, keys, args=None):
+        keys = list(keys)
+        args = list(args or [])
+        try:
+            return client.evalsha(self.sha, len(keys), *(keys + args))
+        except NoScriptError:
+            return client.eval(self.script, len(keys), *(keys + args))
+
+
 STRATEGY_ROUTER_CACHE = {}
 
 
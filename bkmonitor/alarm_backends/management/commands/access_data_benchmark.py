@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2022 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+
+import json
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from alarm_backends.service.access.data.records import (
+    dump_records_data,
+    load_records_data,
+)
+from alarm_backends.service.detect import DataPoint
+from bkmonitor.utils.common_utils import count_md5
+
+"""
+# 用法:
+对比 access 推送待检测数据的逐条编码与批量编码，以及 detect 解析数据点的耗时及内存，仅用于本地评估，不依赖redis及数据库
+
+./bin/manage.sh access_data_benchmark --points=100000 --batch-size=500
+"""
+
+
+class LegacyDataPoint(object):
+    """
+    批量编码之前的 DataPoint: 将数据中的每个字段复制为实例属性
+    """
+
+    def __init__(self, accessed_data, item):
+        for key, value in accessed_data.items():
+            setattr(self, key, value)
+        self.item = item
+
+
+def gen_records_data(count):
+    records_data = []
+    for i in range(count):
+        dimensions = {"bk_target_ip": f"127.0.{i // 256 % 256}.{i % 256}", "bk_target_cloud_id": "0"}
+        records_data.append(
+            {
+                "record_id": f"{count_md5(dimensions)}.1569246480",
+                "value": i % 100,
+                "values": {"time": 1569246480, "load5": i % 100},
+                "dimensions": dimensions,
+                "time": 1569246480,
+                "access_time": 1569246490.0,
+            }
+        )
+    return records_data
+
+
+class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument("--points", type=int, default=100000, help="数据点数量")
+        parser.add_argument("--batch-size", type=int, default=500, help="单个队列元素合并的数据条数")
+
+    def measure(self, func):
+        """
+        返回耗时及内存峰值，内存单独执行一次统计，避免 tracemalloc 影响耗时
+        """
+        start = time.perf_counter()
+        result = func()
+        cost = time.perf_counter() - start
+
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return cost, peak, result
+
+    def report(self, name, old, new):
+        (old_cost, old_peak, _), (new_cost, new_peak, _) = old, new
+        self.stdout.write(
+            f"[{name}] per point: {old_cost:.3f}s {old_peak / 1024 / 1024:.1f}MB, "
+            f"batch: {new_cost:.3f}s {new_peak / 1024 / 1024:.1f}MB"
+        )
+
+    def handle(self, *args, **options):
+        records_data = gen_records_data(options["points"])
+        batch_size = options["batch_size"]
+
+        old_encoded = self.measure(lambda: dump_records_data(records_data, 1))
+        new_encoded = self.measure(lambda: dump_records_data(records_data, batch_size))
+        self.report("encode", old_encoded, new_encoded)
+        self.stdout.write(f"[encode] queue elements: {len(old_encoded[2])} -> {len(new_encoded[2])}")
+
+        old_payloads, new_payloads = old_encoded[2], new_encoded[2]
+        self.report(
+            "decode",
+            self.measure(lambda: [LegacyDataPoint(json.loads(payload), None) for payload in old_payloads]),
+            self.measure(
+                lambda: [
+                    DataPoint(record_data, None)
+                    for payload in new_payloads
+                    for record_data in load_records_data(payload)
+                ]
+            ),
+        )
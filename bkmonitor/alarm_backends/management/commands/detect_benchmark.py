@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2022 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from alarm_backends.service.detect import DataPoint
+from alarm_backends.service.detect.strategy.simple_ring_ratio import SimpleRingRatio
+from alarm_backends.service.detect.strategy.threshold import Threshold
+
+"""
+# 用法:
+对比逐点检测与批量预筛选检测的耗时，仅用于本地评估，不依赖redis及数据库
+
+./bin/manage.sh detect_benchmark --points=100000 --repeat=3 --anomaly-ratio=0.01
+"""
+
+
+class BenchmarkStrategy(object):
+    def __init__(self):
+        self.id = 1
+        self.scenario = "os"
+
+
+class BenchmarkItem(object):
+    def __init__(self, unit):
+        self.id = 1
+        self.strategy = BenchmarkStrategy()
+        self.unit = unit
+        self.data_sources = [None]
+        self.name = "avg(测试指标)"
+
+
+class BenchmarkRingRatio(SimpleRingRatio):
+    """
+    使用固定历史数据点的环比算法，不依赖历史数据缓存
+    """
+
+    def __init__(self, history_point, *args, **kwargs):
+        super(BenchmarkRingRatio, self).__init__(*args, **kwargs)
+        self.history_point = history_point
+
+    def history_point_fetcher(self, data_point, **kwargs):
+        return self.history_point
+
+
+def gen_data_points(count, anomaly_ratio, unit="%"):
+    item = BenchmarkItem(unit)
+    data_points = []
+    for i in range(count):
+        value = random.uniform(90, 100) if random.random() < anomaly_ratio else random.uniform(0, 80)
+        data_points.append(
+            DataPoint(
+                {
+                    "record_id": f"{i}.1569246480",
+                    "value": value,
+                    "values": {"timestamp": 1569246480, "metric": value},
+                    "dimensions": {"bk_target_ip": str(i)},
+                    "time": 1569246480,
+                },
+                item,
+            )
+        )
+    return data_points
+
+
+def detect_one_by_one(detector, data_points, level):
+    """
+    批量预筛选之前的检测方式: 逐点检测并生成异常点
+    """
+    anomaly_points = []
+    for data_point in data_points:
+        try:
+            check_result = detector.detect(data_point)
+        except Exception:
+            continue
+        if check_result:
+            anomaly_points.append(detector.gen_anomaly_point(data_point, check_result, level))
+    return anomaly_points
+
+
+class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument("--points", type=int, default=100000, help="数据点数量")
+        parser.add_argument("--repeat", type=int, default=3, help="重复次数，取最小耗时")
+        parser.add_argument("--anomaly-ratio", type=float, default=0.01, help="异常点占比")
+
+    def timeit(self, func, repeat):
+        cost = None
+        result = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            current = time.perf_counter() - start
+            cost = current if cost is None else min(cost, current)
+        return cost, result
+
+    def report(self, name, detector, data_points, repeat):
+        old_cost, old_result = self.timeit(lambda: detect_one_by_one(detector, data_points, 1), repeat)
+        new_cost, new_result = self.timeit(lambda: detector.detect_records(data_points, 1), repeat)
+        if [ap.data_point.record_id for ap in old_result] != [ap.data_point.record_id for ap in new_result]:
+            self.stderr.write(f"[{name}] anomaly points mismatch: {len(old_result)} != {len(new_result)}")
+        self.stdout.write(
+            f"[{name}] points: {len(data_points)}, anomalies: {len(new_result)}, "
+            f"one by one: {old_cost:.3f}s, batch: {new_cost:.3f}s, speedup: {old_cost / new_cost:.1f}x"
+        )
+
+    def handle(self, *args, **options):
+        data_points = gen_data_points(options["points"], options["anomaly_ratio"])
+        repeat = max(options["repeat"], 1)
+
+        threshold = Threshold(config=[[{"threshold": 90, "method": "gte"}, {"threshold": 100, "method": "lte"}]])
+        self.report("Threshold", threshold, data_points, repeat)
+
+        history_point = DataPoint({"value": 40, "time": 1569246420}, data_points[0].item)
+        ring_ratio = BenchmarkRingRatio(history_point, config={"floor": 0, "ceil": 100})
+        self.report("SimpleRingRatio", ring_ratio, data_points, repeat)
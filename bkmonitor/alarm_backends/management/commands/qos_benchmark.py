@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2022 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from alarm_backends.core.cache.key import COMPOSITE_QOS_COUNTER
+from alarm_backends.core.storage.counter import CounterRequest, WindowCounter
+
+"""
+# 用法:
+模拟告警风暴，对比逐条告警计数与 WindowCounter 批量计数的耗时
+使用 service 缓存的 redis，计数 key 的信号维度为 benchmark，执行结束后删除
+
+./bin/manage.sh qos_benchmark --alerts=10000 --strategies=20 --threshold=200
+"""
+
+BENCHMARK_SIGNAL = "benchmark"
+
+
+def incr_one_by_one(client, keys, window, threshold):
+    """
+    批量计数之前的流控方式: 每个告警依次执行 set/incr/ttl/expire
+    """
+    results = []
+    for qos_key in keys:
+        current_count = 1
+        if not client.set(qos_key, current_count, nx=True, ex=window):
+            current_count = client.incr(qos_key)
+            ttl = client.ttl(qos_key)
+            if ttl is None or ttl < 0:
+                client.expire(qos_key, window)
+        results.append(current_count > threshold)
+    return results
+
+
+class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument("--alerts", type=int, default=10000, help="告警数量")
+        parser.add_argument("--strategies", type=int, default=20, help="告警所属策略数量")
+        parser.add_argument("--threshold", type=int, default=200, help="流控阈值")
+        parser.add_argument("--window", type=int, default=60, help="流控窗口(s)")
+
+    def clear(self, keys):
+        for qos_key in set(keys):
+            COMPOSITE_QOS_COUNTER.client.delete(qos_key)
+
+    def handle(self, *args, **options):
+        window, threshold = options["window"], options["threshold"]
+        keys = [
+            COMPOSITE_QOS_COUNTER.get_key(
+                strategy_id=index % options["strategies"] + 1, signal=BENCHMARK_SIGNAL, severity=1, alert_md5=""
+            )
+            for index in range(options["alerts"])
+        ]
+
+        self.clear(keys)
+        try:
+            start = time.perf_counter()
+            old_results = incr_one_by_one(COMPOSITE_QOS_COUNTER.client, keys, window, threshold)
+            old_cost = time.perf_counter() - start
+            self.clear(keys)
+
+            requests = [CounterRequest(qos_key, window=window, limit=threshold) for qos_key in keys]
+            start = time.perf_counter()
+            new_results = [not result.allowed for result in WindowCounter(COMPOSITE_QOS_COUNTER).evaluate(requests)]
+            new_cost = time.perf_counter() - start
+        finally:
+            self.clear(keys)
+
+        # 逐条计数超过阈值后不回退，被流控的告警数量一致
+        if sum(old_results) != sum(new_results):
+            self.stderr.write(f"qos results mismatch: {sum(old_results)} != {sum(new_results)}")
+        self.stdout.write(
+            f"alerts: {len(keys)}, dropped: {sum(new_results)}, one by one: {old_cost:.3f}s, "
+            f"window counter: {new_cost:.3f}s, speedup: {old_cost / new_cost:.1f}x"
+        )
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2022 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+
+import re
+import time
+
+import arrow
+from django.core.management.base import BaseCommand
+
+from bkmonitor.data_source.unify_query.query import UnifyQuery
+
+"""
+# 用法:
+对比统一查询返回值逐点解析与按列解析的耗时，仅用于本地评估，不依赖查询模块
+
+./bin/manage.sh unify_query_benchmark --series=2000 --points=60 --repeat=3
+"""
+
+
+def process_unify_query_data_by_row(params, data, end_time=None):
+    """
+    按列解析之前的实现: 逐点解析时间及维度字段
+    """
+    re_dimension = re.compile(r"_table\d+$")
+    records = []
+    for row in data["series"] or []:
+        dimensions = {}
+        for index, group_key in enumerate(row["group_keys"] or []):
+            end_string = re_dimension.findall(group_key)
+            if end_string:
+                group_key = group_key[: -len(end_string[0])]
+            dimensions[group_key] = row["group_values"][index]
+
+        for value in row["values"]:
+            record = {**dimensions}
+            for column, column_type, v in zip(row["columns"], row["types"], value):
+                if column_type == "time":
+                    v = arrow.get(v).timestamp * 1000
+                if column == "_time":
+                    column = "_time_"
+                elif column in ["_result", "_value"]:
+                    column = "_result_"
+                record[column] = v
+            if "_result_" not in record:
+                record["_result_"] = record[params["query_list"][0]["reference_name"]]
+            if end_time and record.get("_time_") == end_time:
+                continue
+            records.append(record)
+    return records
+
+
+def gen_unify_query_data(series_count, point_count):
+    series = []
+    for series_index in range(series_count):
+        series.append(
+            {
+                "name": f"_result{series_index}",
+                "columns": ["_time", "_value"],
+                "types": ["time", "float"],
+                "group_keys": ["bk_target_ip_table1", "bk_target_cloud_id"],
+                "group_values": [f"127.0.{series_index // 256}.{series_index % 256}", "0"],
+                "values": [
+                    [f"2022-01-01T{point_index // 60:02d}:{point_index % 60:02d}:00Z", series_index + point_index]
+                    for point_index in range(point_count)
+                ],
+            }
+        )
+    return {"series": series}
+
+
+class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument("--series", type=int, default=2000, help="序列数量")
+        parser.add_argument("--points", type=int, default=60, help="每个序列的数据点数量")
+        parser.add_argument("--repeat", type=int, default=3, help="重复次数，取最小耗时")
+
+    def timeit(self, func, repeat):
+        cost = None
+        result = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            current = time.perf_counter() - start
+            cost = current if cost is None else min(cost, current)
+        return cost, result
+
+    def handle(self, *args, **options):
+        data = gen_unify_query_data(options["series"], options["points"])
+        repeat = max(options["repeat"], 1)
+
+        old_cost, old_records = self.timeit(lambda: process_unify_query_data_by_row({}, data), repeat)
+        new_cost, new_records = self.timeit(lambda: UnifyQuery.process_unify_query_data({}, data), repeat)
+        if old_records != new_records:
+            self.stderr.write("records mismatch")
+        self.stdout.write(
+            f"points: {len(new_records)}, by row: {old_cost:.3f}s, by column: {new_cost:.3f}s, "
+            f"speedup: {old_cost / new_cost:.1f}x"
+        )
@@ -46,7 +46,11 @@ from alarm_backends.service.access.data.filters import (
     RangeFilter,
 )
 from alarm_backends.service.access.data.fullers import TopoNodeFuller
-from alarm_backends.service.access.data.records import DataRecord
+from alarm_backends.service.access.data.records import (
+    DataRecord,
+    dump_records_data,
+    get_data_list_max_length,
+)
 from alarm_backends.service.access.priority import PriorityChecker
 from bkmonitor.utils.common_utils import count_md5, get_local_ip
 from bkmonitor.utils.consul import BKConsul
@@ -126,11 +130,12 @@ class BaseAccessDataProcess(base.BaseAccessProcess):
         output_key = data_list_key.get_key(strategy_id=item.strategy.strategy_id, item_id=item.id)
         queue_length = client.llen(output_key)
         # 超过最大检测长度10倍(50w)说明detect模块处理能力不足,数据将被丢弃。
-        if queue_length > settings.SQL_MAX_LIMIT * 10:
+        max_queue_length = get_data_list_max_length(settings.SQL_MAX_LIMIT * 10)
+        if queue_length > max_queue_length:
             msg = (
                 f"Critical: strategy({item.strategy.strategy_id}), item({item.id})"
                 f"The number of ({output_key}) records to be detected has "
-                f"exceeded {queue_length}/{settings.SQL_MAX_LIMIT * 10}. "
+                f"exceeded {queue_length}/{max_queue_length}. "
                 f"Please check if the detect process is running normally."
             )
             raise Exception(msg)
@@ -139,7 +144,7 @@ class BaseAccessDataProcess(base.BaseAccessProcess):
         _offset = 0
         while _offset < len(record_list):
             chunk_records = record_list[_offset : _offset + 10000]
-            pipeline.lpush(output_key, *[json.dumps(record.data) for record in chunk_records])
+            pipeline.lpush(output_key, *dump_records_data([record.data for record in chunk_records]))
             _offset += 10000
         # 避免监控周期大于默认key过期时间，引起数据丢失
         agg_interval = min(query_config["agg_interval"] for query_config in item.query_configs)
@@ -198,9 +203,9 @@ class BaseAccessDataProcess(base.BaseAccessProcess):
                 except BaseException as e:
                     logger.exception("push noise data of strategy(%s) error, %s", item.strategy.strategy_id, str(e))
 
-            # 推送无数据处理
+            # 更新无数据检测维度的最后上报时间
             if item.no_data_config["is_enabled"]:
-                self._push(item, records, output_client, key.NO_DATA_LIST_KEY)
+                item.update_no_data_last_seen([record.data for record in records])
 
         # 推送数据处理信号
         if records:
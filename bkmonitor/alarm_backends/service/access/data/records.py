@@ -8,10 +8,11 @@ Unless required by applicable law or agreed to in writing, software distributed
 an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
 specific language governing permissions and limitations under the License.
 """
+import json
 import logging
 import time
 from collections import defaultdict
-from typing import TYPE_CHECKING, List
+from typing import TYPE_CHECKING, Dict, List
 
 import six
 from django.conf import settings
@@ -19,7 +20,7 @@ from django.utils.functional import cached_property
 
 from alarm_backends import constants
 from alarm_backends.service.access import base
-from bkmonitor.utils.common_utils import count_md5, number_format
+from bkmonitor.utils.common_utils import count_dimension_md5, number_format
 from constants.strategy import (
     SYSTEM_PROC_PORT_DYNAMIC_DIMENSIONS,
     SYSTEM_PROC_PORT_METRIC_ID,
@@ -31,6 +32,50 @@ if TYPE_CHECKING:
 logger = logging.getLogger("access.data")
 
 
+def get_data_batch_size() -> int:
+    """
+    待检测队列中单个元素合并的数据条数，小于等于1时逐条写入
+    """
+    return getattr(settings, "ACCESS_DATA_BATCH_PUSH_SIZE", 0) or 1
+
+
+def get_data_list_max_length(point_limit: int) -> int:
+    """
+    根据数据条数上限，计算待检测队列的元素个数上限
+    """
+    return max(point_limit // get_data_batch_size(), 1)
+
+
+def dump_records_data(records_data: List[Dict], batch_size: int = None) -> List[str]:
+    """
+    将待检测数据编码为队列元素，每 batch_size 条数据编码为一个json数组
+    单条数据仍编码为json对象，与逐条写入的格式保持一致
+    """
+    if batch_size is None:
+        batch_size = get_data_batch_size()
+
+    if batch_size <= 1:
+        return [json.dumps(record_data) for record_data in records_data]
+
+    payloads = []
+    for offset in range(0, len(records_data), batch_size):
+        chunk = records_data[offset : offset + batch_size]
+        payloads.append(json.dumps(chunk[0] if len(chunk) == 1 else chunk))
+    return payloads
+
+
+def load_records_data(payload: str) -> List[Dict]:
+    """
+    解析待检测队列元素，兼容逐条写入及批量写入的格式
+    """
+    records_data = json.loads(payload)
+    if isinstance(records_data, dict):
+        return [records_data]
+    if isinstance(records_data, list) and all(isinstance(record_data, dict) for record_data in records_data):
+        return records_data
+    raise ValueError("unexpected data record payload")
+
+
 class DataRecord(base.BaseRecord):
     """
     raw_data:
@@ -142,7 +187,7 @@ class DataRecord(base.BaseRecord):
                 if field not in SYSTEM_PROC_PORT_DYNAMIC_DIMENSIONS
             }
 
-        md5_dimension = count_md5(origin_dimensions)
+        md5_dimension = count_dimension_md5(origin_dimensions)
         return "{md5_dimension}.{timestamp}".format(md5_dimension=md5_dimension, timestamp=self.time)
 
     def clean(self):
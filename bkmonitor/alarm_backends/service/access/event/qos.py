@@ -21,6 +21,9 @@ logger = logging.getLogger("access.qos")
 
 
 class QoSMixin(object):
+    # 每次批量提交的计数字段数量
+    QOS_BATCH_SIZE = 1000
+
     @classmethod
     def hash_alarm_by_match_info(cls, event_record, strategy_id, item_id):
         return count_md5(
@@ -34,36 +37,88 @@ class QoSMixin(object):
         )
 
     def check_qos(self, check_client=None):
+        """
+        告警风暴时按 (业务, 策略, 监控项, 目标IP, 级别) 计数，超过阈值的事件被丢弃
+        计数先在本地按维度聚合，再批量提交，根据提交后的计数还原每个事件在原有逐条计数下的计数值
+        """
         client = check_client or key.QOS_CONTROL_KEY.client
-        if not client.exists(key.QOS_CONTROL_KEY.get_key()):
+        qos_key = key.QOS_CONTROL_KEY.get_key()
+        if not client.exists(qos_key):
             return False
 
-        new_record_list = []
+        # 按原有顺序记录每个待计数的事件及其在本批次中对应维度的序号
+        pending = []
+        increments = {}
+        fields = {}
         for event_record in self.record_list:
             for item in event_record.items:
                 strategy_id = item.strategy.id
                 item_id = item.id
                 if not event_record.is_retains[item_id] or event_record.inhibitions[item_id]:
                     continue
-                dimensions_md5 = self.hash_alarm_by_match_info(event_record, strategy_id, item_id)
-                try:
-                    count_of_alarm = client.hincrby(
-                        key.QOS_CONTROL_KEY.get_key(), key.QOS_CONTROL_KEY.get_field(dimensions_md5=dimensions_md5), 1
-                    )
-                    if count_of_alarm > settings.QOS_DROP_ALARM_THREADHOLD:
-                        logger.warning(
-                            "qos drop alarm: cc_biz_id(%s), host(%s), " "strategy_id(%s), item_id(%s), level(%s)",
-                            event_record.bk_biz_id,
-                            event_record.data["data"]["dimensions"]["bk_target_ip"],
-                            strategy_id,
-                            item_id,
-                            event_record.level,
-                        )
-                    else:
-                        new_record_list.append(event_record)
-                except Exception as err:
-                    new_record_list.append(event_record)
-                    logger.exception(err)
+                match_info = (
+                    event_record.bk_biz_id,
+                    strategy_id,
+                    item_id,
+                    event_record.data["data"]["dimensions"]["bk_target_ip"],
+                    event_record.level,
+                )
+                field = fields.get(match_info)
+                if field is None:
+                    dimensions_md5 = self.hash_alarm_by_match_info(event_record, strategy_id, item_id)
+                    field = fields[match_info] = key.QOS_CONTROL_KEY.get_field(dimensions_md5=dimensions_md5)
+                increments[field] = increments.get(field, 0) + 1
+                pending.append((event_record, field, increments[field]))
+
+        base_counts = self.incr_qos_counts(client, qos_key, increments)
+
+        new_record_list = []
+        dropped = {}
+        for event_record, field, sequence in pending:
+            base_count = base_counts.get(field)
+            # 计数失败时不丢弃
+            if base_count is None or base_count + sequence <= settings.QOS_DROP_ALARM_THREADHOLD:
+                new_record_list.append(event_record)
+            else:
+                dropped[field] = dropped.get(field, 0) + 1
+
+        for match_info, field in fields.items():
+            if field not in dropped:
+                continue
+            bk_biz_id, strategy_id, item_id, bk_target_ip, level = match_info
+            logger.warning(
+                "qos drop alarm: cc_biz_id(%s), host(%s), strategy_id(%s), item_id(%s), level(%s), count(%s)",
+                bk_biz_id,
+                bk_target_ip,
+                strategy_id,
+                item_id,
+                level,
+                dropped[field],
+            )
 
         self.record_list = new_record_list
         return True
+
+    @classmethod
+    def incr_qos_counts(cls, client, qos_key, increments):
+        """
+        批量累加QoS计数
+        :param increments: {计数字段: 增量}
+        :return: {计数字段: 本次累加前的计数}，累加失败的字段不返回
+        """
+        base_counts = {}
+        fields = list(increments)
+        for start in range(0, len(fields), cls.QOS_BATCH_SIZE):
+            batch_fields = fields[start : start + cls.QOS_BATCH_SIZE]
+            try:
+                pipeline = client.pipeline(transaction=False)
+                for field in batch_fields:
+                    pipeline.hincrby(qos_key, field, increments[field])
+                results = pipeline.execute()
+            except Exception as err:
+                logger.exception(err)
+                continue
+
+            for field, result in zip(batch_fields, results):
+                base_counts[field] = int(result) - increments[field]
+        return base_counts
@@ -154,38 +154,53 @@ class ShieldStatusChecker(BaseChecker):
         current_count = 0
 
         # step 1 确定有哪些需要发送的事件
+        pending_actions = []
         for action in self.unshielded_actions:
             alert_id = action["alert_ids"][0]
             if alert_id in noticed_alerts:
                 # 如果当前告警ID存在发送过通知的有效周期任务，直接返回
                 continue
 
-            try:
-                # 限流计数器，监控的告警以策略ID，信号，告警级别作为维度
-                alert = self.alerts_dict.get(alert_id)
-                is_qos, current_count = alert.qos_calc(action["signal"])
-                if not is_qos:
-                    # 没有过通知处理的，需要QOS限流
-                    new_actions.append(action)
-                    need_notify_alerts.append(alert_id)
-                else:
-                    # 达到阈值之后，触发流控
-                    qos_actions += 1
-                    qos_alerts.append(alert_id)
-                    logger.info(
-                        "unshielded alert(%s) qos triggered->alert_name(%s)->strategy(%s)-signal(%s)"
-                        "-severity(%s)-relation_id(%s),"
-                        " current_count->(%s)",
-                        alert_id,
-                        alert.alert_name,
-                        action["strategy_id"],
-                        action["signal"],
-                        action["severity"],
-                        action["relation_id"],
-                        current_count,
-                    )
-            except BaseException as error:
-                logger.exception("alert(%s) detect finished, but push actions failed, reason: %s", alert_id, error)
+            alert = self.alerts_dict.get(alert_id)
+            if alert is None:
+                logger.error("alert(%s) detect finished, but push actions failed, reason: alert not found", alert_id)
+                continue
+            pending_actions.append((action, alert))
+
+        try:
+            # 限流计数器，监控的告警以策略ID，信号，告警级别作为维度，所有告警一次批量计数
+            qos_results = Alert.batch_qos_calc([(alert, action["signal"]) for action, alert in pending_actions])
+        except BaseException as error:
+            # 计数失败时不做流控，避免整批告警的通知被丢弃
+            logger.exception(
+                "alerts(%s) qos calc failed, push actions without qos, reason: %s",
+                ",".join(str(alert.id) for _, alert in pending_actions),
+                error,
+            )
+            qos_results = [(False, 0)] * len(pending_actions)
+
+        for (action, alert), (is_qos, current_count) in zip(pending_actions, qos_results):
+            alert_id = alert.id
+            if not is_qos:
+                # 没有过通知处理的，需要QOS限流
+                new_actions.append(action)
+                need_notify_alerts.append(alert_id)
+            else:
+                # 达到阈值之后，触发流控
+                qos_actions += 1
+                qos_alerts.append(alert_id)
+                logger.info(
+                    "unshielded alert(%s) qos triggered->alert_name(%s)->strategy(%s)-signal(%s)"
+                    "-severity(%s)-relation_id(%s),"
+                    " current_count->(%s)",
+                    alert_id,
+                    alert.alert_name,
+                    action["strategy_id"],
+                    action["signal"],
+                    action["severity"],
+                    action["relation_id"],
+                    current_count,
+                )
 
         if qos_alerts:
             # 如果有被qos的事件， 进行日志记录
@@ -23,6 +23,7 @@ from alarm_backends.core.cache.key import (
     ALERT_DETECT_RESULT,
     ALERT_FIRST_HANDLE_RECORD,
     COMPOSITE_CHECK_RESULT,
+    COMPOSITE_CHECK_RESULT_REGISTRY,
     COMPOSITE_DETECT_RESULT,
     COMPOSITE_DIMENSION_KEY_LOCK,
 )
@@ -30,6 +31,7 @@ from alarm_backends.core.cache.strategy import StrategyCacheManager
 from alarm_backends.core.control.item import gen_condition_matcher
 from alarm_backends.core.control.strategy import Strategy
 from alarm_backends.core.lock.service_lock import service_lock
+from alarm_backends.core.storage.redis_cluster import RedisScript
 from alarm_backends.service.fta_action.tasks import create_actions
 from bkmonitor.documents import AlertLog
 from bkmonitor.strategy.expression import AlertExpressionValue, parse_expression
@@ -42,6 +44,40 @@ from core.prometheus import metrics
 
 logger = logging.getLogger("composite")
 
+# 更新关联策略检测结果缓存，并统计各查询配置在检测窗口内的异常告警数量
+# KEYS[1]: 检测结果缓存索引, KEYS[2...]: 各查询配置的检测结果缓存，前 matched 个为当前告警匹配的查询配置
+# ARGV[1]: json 打包的参数
+#   alert_id/update_time/is_abnormal: 当前告警
+#   expire_before: 早于该时间的检测结果会被清理
+#   check_start_time: 检测窗口起始时间
+#   ttl/registry_ttl: 检测结果缓存及索引的过期时间
+UPDATE_COMPOSITE_CHECK_RESULT_SCRIPT = RedisScript(
+    """
+local payload = cjson.decode(ARGV[1])
+local counts = {}
+for index = 2, #KEYS do
+    local result_key = KEYS[index]
+    local is_matched = index - 1 <= payload["matched"]
+    if is_matched then
+        redis.call("ZREMRANGEBYSCORE", result_key, 0, payload["expire_before"])
+        if payload["is_abnormal"] then
+            redis.call("ZADD", result_key, payload["update_time"], payload["alert_id"])
+            redis.call("SADD", KEYS[1], result_key)
+        else
+            redis.call("ZREM", result_key, payload["alert_id"])
+        end
+        redis.call("EXPIRE", result_key, payload["ttl"])
+    end
+    if is_matched and payload["is_abnormal"] then
+        counts[index - 1] = 1
+    else
+        counts[index - 1] = redis.call("ZCOUNT", result_key, payload["check_start_time"], "+inf")
+    end
+end
+redis.call("EXPIRE", KEYS[1], payload["registry_ttl"])
+return counts
+"""
+)
 
 class CompositeProcessor:
     # 关联告警检测窗口大小（单位 s）
@@ -331,54 +367,87 @@ class CompositeProcessor:
         """
         check_start_time = int(time.time()) - self.COMPOSITE_CHECK_WINDOW_SIZE
 
-        # 每个别名所关联的告警对象
-        alert_by_alias = {}
-
         # 1. 对于匹配的item，直接注入到表达式上下文
-        for query_config_id, config in matched_configs.items():
-            cache_key = COMPOSITE_CHECK_RESULT.get_key(
-                strategy_id=strategy["id"], dimension_hash=dimension_hash, query_config_id=query_config_id
-            )
-            # 清理过期的 item
-            COMPOSITE_CHECK_RESULT.client.zremrangebyscore(cache_key, 0, check_start_time - COMPOSITE_CHECK_RESULT.ttl)
-            if self.alert_status == EventStatus.ABNORMAL:
-                # 如果是异常告警，则一定是触发的
-                COMPOSITE_CHECK_RESULT.client.zadd(cache_key, {self.alert.id: self.alert.update_time})
-                check_result = AlertExpressionValue.ABNORMAL
-            else:
-                # 如果不是异常告警，则还要看检测结果缓存中是否还有其他异常告警
-                # 当没有其他告警时，当前配置才会被认为是不满足，否则就仍为异常
-                COMPOSITE_CHECK_RESULT.client.zrem(cache_key, self.alert.id)
-                abnormal_count = COMPOSITE_CHECK_RESULT.client.zcount(cache_key, check_start_time, "+inf")
-                if abnormal_count:
-                    check_result = AlertExpressionValue.ABNORMAL
-                else:
-                    check_result = AlertExpressionValue.NORMAL
-
-            alert_by_alias[config["alias"]] = check_result
-
-            # 更新过期时间
-            COMPOSITE_CHECK_RESULT.expire(
-                strategy_id=strategy["id"], dimension_hash=dimension_hash, query_config_id=query_config_id
-            )
-
         # 2. 没匹配到的item，需要到缓存中查询，获取计算结果后再注入到表达式上下文
-        query_config_id_list = []
-        for query_config_id, config in unmatched_configs.items():
-            cache_key = COMPOSITE_CHECK_RESULT.get_key(
+        configs = list(matched_configs.items()) + list(unmatched_configs.items())
+        check_result_keys = [
+            COMPOSITE_CHECK_RESULT.get_key(
                 strategy_id=strategy["id"], dimension_hash=dimension_hash, query_config_id=query_config_id
             )
-            abnormal_count = COMPOSITE_CHECK_RESULT.client.zcount(cache_key, check_start_time, "+inf")
+            for query_config_id, _ in configs
+        ]
+        registry_key = COMPOSITE_CHECK_RESULT_REGISTRY.get_key(
+            strategy_id=strategy["id"], dimension_hash=dimension_hash
+        )
+        abnormal_counts = self.update_check_results(
+            registry_key, check_result_keys, len(matched_configs), check_start_time
+        )
+
+        # 每个别名所关联的告警对象
+        alert_by_alias = {}
+        for (_, config), abnormal_count in zip(configs, abnormal_counts):
             if abnormal_count:
-                check_result = AlertExpressionValue.ABNORMAL
+                alert_by_alias[config["alias"]] = AlertExpressionValue.ABNORMAL
             else:
-                check_result = AlertExpressionValue.NORMAL
+                alert_by_alias[config["alias"]] = AlertExpressionValue.NORMAL
 
-            alert_by_alias[config["alias"]] = check_result
+        return alert_by_alias
 
-            query_config_id_list.append(query_config_id)
+    def update_check_results(self, registry_key, check_result_keys, matched_count, check_start_time):
+        """
+        更新匹配的查询配置的检测结果缓存，并返回各查询配置在检测窗口内的异常告警数量
+        如果是异常告警，则一定是触发的；
+        如果不是异常告警，则还要看检测结果缓存中是否还有其他异常告警，当没有其他告警时，当前配置才会被认为是不满足，否则就仍为异常
+        写入的检测结果缓存key记录在索引中，清理时无需扫描key
+        :param registry_key: 检测结果缓存索引
+        :param check_result_keys: 检测结果缓存，前 matched_count 个为当前告警匹配的查询配置
+        """
+        if not check_result_keys:
+            return []
+
+        is_abnormal = self.alert_status == EventStatus.ABNORMAL
+        # 清理过期的 item
+        expire_before = check_start_time - COMPOSITE_CHECK_RESULT.ttl
+        client = COMPOSITE_CHECK_RESULT.client
+        if getattr(settings, "ENABLE_REDIS_LUA_SCRIPT", False):
+            payload = {
+                "matched": matched_count,
+                "alert_id": self.alert.id,
+                "update_time": self.alert.update_time,
+                "is_abnormal": is_abnormal,
+                "expire_before": expire_before,
+                "check_start_time": check_start_time,
+                "ttl": COMPOSITE_CHECK_RESULT.ttl,
+                "registry_ttl": COMPOSITE_CHECK_RESULT_REGISTRY.ttl,
+            }
+            return client.run_script(
+                UPDATE_COMPOSITE_CHECK_RESULT_SCRIPT,
+                keys=[registry_key] + check_result_keys,
+                args=[json.dumps(payload)],
+            )
 
-        return alert_by_alias
+        # 未启用lua脚本时，通过pipeline批量执行
+        pipeline = client.pipeline(transaction=False)
+        count_keys = []
+        for index, check_result_key in enumerate(check_result_keys):
+            is_matched = index < matched_count
+            if is_matched:
+                pipeline.zremrangebyscore(check_result_key, 0, expire_before)
+                if is_abnormal:
+                    pipeline.zadd(check_result_key, {self.alert.id: self.alert.update_time})
+                    pipeline.sadd(registry_key, check_result_key)
+                else:
+                    pipeline.zrem(check_result_key, self.alert.id)
+                pipeline.expire(check_result_key, COMPOSITE_CHECK_RESULT.ttl)
+            if not (is_matched and is_abnormal):
+                count_keys.append(check_result_key)
+        pipeline.expire(registry_key, COMPOSITE_CHECK_RESULT_REGISTRY.ttl)
+        for check_result_key in count_keys:
+            pipeline.zcount(check_result_key, check_start_time, "+inf")
+        results = pipeline.execute()
+
+        counts = dict(zip(count_keys, results[len(results) - len(count_keys) :]))
+        return [counts.get(check_result_key, 1) for check_result_key in check_result_keys]
 
     def do_detect(self, strategy, dimension_hash, alert_by_alias):
         """
@@ -577,19 +646,18 @@ class CompositeProcessor:
         if not composite_dimension_hash:
             return
 
-        COMPOSITE_DETECT_RESULT.client.delete(
-            COMPOSITE_DETECT_RESULT.get_key(
-                strategy_id=self.alert.strategy_id,
-                dimension_hash=composite_dimension_hash,
-            )
+        detect_result_key = COMPOSITE_DETECT_RESULT.get_key(
+            strategy_id=self.alert.strategy_id,
+            dimension_hash=composite_dimension_hash,
         )
-
-        key_pattern = COMPOSITE_CHECK_RESULT.get_key(
-            strategy_id=self.alert.strategy_id, dimension_hash=composite_dimension_hash, query_config_id="*"
+        # 检测结果缓存从索引中获取，避免扫描key
+        registry_key = COMPOSITE_CHECK_RESULT_REGISTRY.get_key(
+            strategy_id=self.alert.strategy_id, dimension_hash=composite_dimension_hash
         )
-        keys = COMPOSITE_CHECK_RESULT.client.keys(key_pattern)
-        if keys:
-            COMPOSITE_CHECK_RESULT.client.delete(*keys)
+        client = COMPOSITE_CHECK_RESULT_REGISTRY.client
+        # 同一策略的key位于同一节点
+        check_result_keys = client.smembers(registry_key)
+        client.delete(detect_result_key, registry_key, *check_result_keys)
 
     def process_single_strategy(self):
         """
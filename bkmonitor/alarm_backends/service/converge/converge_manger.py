@@ -17,6 +17,7 @@ from datetime import datetime, timezone
 from django.utils.translation import ugettext as _
 
 from alarm_backends.core.cache.key import FTA_SUB_CONVERGE_DIMENSION_LOCK_KEY
+from alarm_backends.core.storage.counter import WindowCounter
 from alarm_backends.service.converge.dimension import (
     DimensionCalculator,
     DimensionHandler,
@@ -151,11 +152,16 @@ class ConvergeManager(object):
         logger.info("push converge(%s) to converge queue, task id %s", self.converge_instance.id, task_id)
 
     def is_biz_converge_existed(self, matched_count):
-        client = FTA_SUB_CONVERGE_DIMENSION_LOCK_KEY.client
         biz_converge_lock_key = FTA_SUB_CONVERGE_DIMENSION_LOCK_KEY.get_key(
             **self.dimension_handler.get_sub_converge_label_info()
         )
-        if client.incr(biz_converge_lock_key) > matched_count:
+        result = WindowCounter(FTA_SUB_CONVERGE_DIMENSION_LOCK_KEY).incr(
+            biz_converge_lock_key,
+            window=FTA_SUB_CONVERGE_DIMENSION_LOCK_KEY.ttl,
+            limit=matched_count,
+            refresh_ttl=True,
+        )
+        if not result.allowed:
             # 如果当前的计数器大于并发数，直接返回异常
             logger.info(
                 "action(%s|%s) will be skipped because count of biz_converge_lock_key(%s) is bigger than %s, ",
@@ -165,7 +171,6 @@ class ConvergeManager(object):
                 matched_count,
             )
             return True
-        client.expire(biz_converge_lock_key, FTA_SUB_CONVERGE_DIMENSION_LOCK_KEY.ttl)
         return False
 
     def get_related_ids(self):
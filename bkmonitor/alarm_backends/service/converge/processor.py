@@ -26,6 +26,7 @@ from alarm_backends.core.cache.key import (
     FTA_NOTICE_COLLECT_KEY,
 )
 from alarm_backends.core.context import ActionContext
+from alarm_backends.core.storage.counter import WindowCounter
 from alarm_backends.service.converge.converge_func import ConvergeFunc
 from alarm_backends.service.converge.converge_manger import ConvergeManager
 from alarm_backends.service.converge.shield import ShieldManager
@@ -213,32 +214,33 @@ class ConvergeProcessor(object):
             self.unlock()
 
     def lock(self):
-        client = ACTION_CONVERGE_KEY_PROCESS_LOCK.client
         parallel_converge_count = max(int(self.converge_count) // 2, 1)
         self.lock_key = ACTION_CONVERGE_KEY_PROCESS_LOCK.get_key(dimension=self.dimension)
-        if client.incr(self.lock_key) > parallel_converge_count:
+        # 超过并发数时回退计数，并确保key有过期时间（很有可能是并发抢占），避免长期占用
+        result = WindowCounter(ACTION_CONVERGE_KEY_PROCESS_LOCK).incr(
+            self.lock_key,
+            window=ACTION_CONVERGE_KEY_PROCESS_LOCK.ttl,
+            limit=parallel_converge_count,
+            rollback=True,
+            refresh_ttl=True,
+        )
+        if not result.allowed:
             # 如果当前的计数器大于并发数，直接返回异常
-            client.decr(self.lock_key)
-            ttl = client.ttl(self.lock_key)
-            if ttl is None or ttl < 0:
-                # 如果没有ttl的情况，很有可能是并发抢占，需要设置一下ttl, 避免长期占用
-                client.expire(self.lock_key, ACTION_CONVERGE_KEY_PROCESS_LOCK.ttl)
             raise ConvergeLockError(
                 "get parallel converge failed, current_parallel_converge_count is {}, converge condition is {}".format(
                     parallel_converge_count, self.dimension
                 )
             )
-        client.expire(self.lock_key, ACTION_CONVERGE_KEY_PROCESS_LOCK.ttl)
         # 当获取到锁的情况下才需要去解锁
         self.need_unlock = True
 
     def unlock(self):
         if self.need_unlock is False:
             return
-        client = ACTION_CONVERGE_KEY_PROCESS_LOCK.client
-        if int(client.get(self.lock_key) or 0) > 0:
-            # 当前key没有过期的时候，需要进行递减
-            client.decr(self.lock_key)
+        # 当前key没有过期的时候，需要进行递减
+        WindowCounter(ACTION_CONVERGE_KEY_PROCESS_LOCK).release(
+            self.lock_key, window=ACTION_CONVERGE_KEY_PROCESS_LOCK.ttl
+        )
 
     def run_converge(self):
 
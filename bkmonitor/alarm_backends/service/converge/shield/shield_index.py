@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from alarm_backends.core.cache.shield import ShieldCacheManager
+from alarm_backends.service.converge.shield.shield_obj import AlertShieldObj
+from bkmonitor.documents.alert import AlertDocument
+from bkmonitor.utils.cache import LRUCache
+from bkmonitor.utils.range.conditions import EqualCondition
+
+logger = logging.getLogger("fta_action.shield")
+
+
+class ShieldIndex:
+    """
+    单个业务的屏蔽配置索引(进程内)
+
+    屏蔽配置在构建时解析为 AlertShieldObj，取维度条件中一个顶层的等值条件作为索引，
+    按 (字段类型, 字段名, 取值格式) 分组，组内按字段值建立倒排表。
+    等值条件要求告警维度与配置值有交集，因此告警只需按各组的字段取值查找候选配置，
+    再对候选配置做完整匹配；没有顶层等值条件的配置(如按维度条件屏蔽)每次都参与匹配。
+    """
+
+    # 优先作为索引的维度字段
+    INDEX_FIELDS = (
+        "strategy_id",
+        "bk_target_ip",
+        "ip",
+        "bk_target_service_instance_id",
+        "service_instance_id",
+        "bk_topo_node",
+    )
+
+    def __init__(self, bk_biz_id: int, configs: List[Dict], version: Optional[str] = None):
+        self.bk_biz_id = bk_biz_id
+        self.configs = configs
+        self.version = version
+        self.checked_at = time.time()
+
+        self.shield_objs: List[AlertShieldObj] = []
+        # 需要逐个匹配的配置
+        self.scan_positions: List[int] = []
+        # 分组签名 -> (该组的代表条件, {字段值: [配置位置]})
+        self.groups: Dict[tuple, tuple] = {}
+
+        for config in configs:
+            try:
+                shield_obj = AlertShieldObj(config)
+            except Exception as e:  # noqa
+                logger.exception(
+                    "[ShieldIndex] parse shield config(%s) of biz(%s) error: %s", config.get("id"), bk_biz_id, e
+                )
+                continue
+            self.add(shield_obj)
+
+    def __len__(self):
+        return len(self.shield_objs)
+
+    @classmethod
+    def get_index_condition(cls, shield_obj: AlertShieldObj) -> Optional[EqualCondition]:
+        """
+        选择作为索引的条件，只有顶层的等值条件才能保证不匹配的配置一定不在候选集中
+        """
+        conditions = [
+            condition for condition in shield_obj.dimension_check.conditions if type(condition) is EqualCondition
+        ]
+        if not conditions:
+            return None
+        priorities = {field: index for index, field in enumerate(cls.INDEX_FIELDS)}
+        return min(conditions, key=lambda c: priorities.get(c.cond_field.name, len(priorities)))
+
+    @staticmethod
+    def get_signature(condition: EqualCondition) -> tuple:
+        """
+        字段从告警维度中取值的方式由字段类型、字段名及配置值的格式决定，签名相同的条件取到的告警值相同
+        """
+        field = condition.cond_field
+        first_value = field.value
+        if field.value and isinstance(field.value, (list, tuple)):
+            first_value = field.value[0]
+        value_format = tuple(sorted(first_value)) if isinstance(first_value, dict) else None
+        return type(field), field.name, value_format
+
+    def add(self, shield_obj: AlertShieldObj):
+        position = len(self.shield_objs)
+        self.shield_objs.append(shield_obj)
+
+        condition = self.get_index_condition(shield_obj)
+        if condition is None:
+            self.scan_positions.append(position)
+            return
+
+        signature = self.get_signature(condition)
+        if signature not in self.groups:
+            self.groups[signature] = (condition, defaultdict(list))
+        postings = self.groups[signature][1]
+        for value in set(condition.cond_field.to_str_list()):
+            postings[value].append(position)
+
+    def get_candidates(self, dimension: Dict) -> List[int]:
+        """
+        获取可能匹配的屏蔽配置位置，按配置顺序返回
+        """
+        candidates = set(self.scan_positions)
+        for condition, postings in self.groups.values():
+            try:
+                is_exists, data_field = condition.get_field(dimension)
+                if not is_exists:
+                    continue
+                values = data_field.to_str_list()
+            except Exception:  # noqa
+                # 取值异常时交由完整匹配处理
+                for positions in postings.values():
+                    candidates.update(positions)
+                continue
+
+            for value in values:
+                candidates.update(postings.get(value, ()))
+        return sorted(candidates)
+
+    def match(self, alert: AlertDocument) -> List[AlertShieldObj]:
+        """
+        获取告警匹配的屏蔽配置
+        """
+        if not self.shield_objs:
+            return []
+
+        dimension = AlertShieldObj.get_dimension(alert)
+        shield_objs = []
+        for position in self.get_candidates(dimension):
+            shield_obj = self.shield_objs[position]
+            if shield_obj.is_match(alert, dimension=dimension):
+                shield_objs.append(shield_obj)
+        return shield_objs
+
+
+class ShieldIndexManager:
+    """
+    进程内按业务缓存屏蔽配置索引
+    ShieldCacheManager 刷新缓存时按业务写入版本，索引每隔 VERSION_CHECK_INTERVAL 秒检查一次版本，变化时重建
+    """
+
+    VERSION_CHECK_INTERVAL = 5
+
+    _indexes = LRUCache(maxsize=1000)
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_index(cls, bk_biz_id: int) -> ShieldIndex:
+        index = cls._indexes.get(bk_biz_id)
+        now = time.time()
+        if index is not None and now - index.checked_at < cls.VERSION_CHECK_INTERVAL:
+            return index
+
+        version = ShieldCacheManager.get_version(bk_biz_id)
+        if index is not None and index.version == version:
+            index.checked_at = now
+            return index
+
+        with cls._lock:
+            index = cls._indexes.get(bk_biz_id)
+            if index is not None and index.version == version:
+                index.checked_at = now
+                return index
+
+            start_time = time.time()
+            index = ShieldIndex(bk_biz_id, ShieldCacheManager.get_shields_by_biz_id(bk_biz_id), version)
+            cls._indexes.set(bk_biz_id, index)
+            logger.info(
+                "[ShieldIndex] build index of biz(%s), version: %s, shields: %s, indexed groups: %s, cost: %.3fs",
+                bk_biz_id,
+                version,
+                len(index),
+                len(index.groups),
+                time.time() - start_time,
+            )
+        return index
+
+    @classmethod
+    def clear(cls):
+        cls._indexes.clear()
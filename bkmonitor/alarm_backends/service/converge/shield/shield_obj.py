@@ -368,7 +368,8 @@ class ShieldObj(object):
 
 
 class AlertShieldObj(ShieldObj):
-    def get_dimension(self, alert: AlertDocument):
+    @staticmethod
+    def get_dimension(alert: AlertDocument):
         try:
             dimension = copy.deepcopy(alert.origin_alarm["data"]["dimensions"])
         except BaseException as error:
@@ -425,6 +426,14 @@ class AlertShieldObj(ShieldObj):
                 new_dimensions[key[len(tag_prefix) :]] = value
         return new_dimensions
 
-    def is_match(self, alert: AlertDocument):
+    def is_match(self, alert: AlertDocument, dimension=None):
+        """
+        :param alert: 告警
+        :param dimension: 预先通过 get_dimension 获取的告警维度，匹配多个屏蔽配置时避免重复获取
+        """
         source_time = arrow.now()
-        return self.time_check.is_match(source_time) and self.dimension_check.is_match(self.get_dimension(alert))
+        if not self.time_check.is_match(source_time):
+            return False
+        if dimension is None:
+            dimension = self.get_dimension(alert)
+        return self.dimension_check.is_match(dimension)
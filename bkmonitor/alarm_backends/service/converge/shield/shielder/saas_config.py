@@ -16,10 +16,9 @@ from django.conf import settings
 from django.utils.translation import ugettext as _
 
 from alarm_backends.core.cache.cmdb import HostManager
-from alarm_backends.core.cache.shield import ShieldCacheManager
 from alarm_backends.core.control.strategy import Strategy
 from alarm_backends.core.i18n import i18n
-from alarm_backends.service.converge.shield.shield_obj import AlertShieldObj
+from alarm_backends.service.converge.shield.shield_index import ShieldIndexManager
 from bkmonitor.documents.alert import AlertDocument
 from bkmonitor.models import ActionInstance, time_tools
 from bkmonitor.utils import extended_json
@@ -40,23 +39,22 @@ class AlertShieldConfigShielder(BaseShielder):
     def __init__(self, alert: AlertDocument):
         self.alert = alert
         try:
-            self.configs = ShieldCacheManager.get_shields_by_biz_id(self.alert.event.bk_biz_id)
-            config_ids = ",".join([str(config["id"]) for config in self.configs])
+            # 使用进程内预编译的屏蔽配置索引，只对候选配置进行匹配
+            index = ShieldIndexManager.get_index(self.alert.event.bk_biz_id)
+            self.configs = index.configs
             logger.info(
-                "Get biz(%s) shield configs(%s) of alert(%s), ",
+                "Get biz(%s) shield configs(count: %s, version: %s) of alert(%s), ",
                 self.alert.event.bk_biz_id,
-                config_ids,
+                len(self.configs),
+                index.version,
                 self.alert.id,
             )
         except BaseException as error:
+            index = None
             self.configs = []
             logger.exception("failed to get shield configs: %s", str(error))
 
-        self.shield_objs = []
-        for config in self.configs:
-            shield_obj = AlertShieldObj(config)
-            if shield_obj.is_match(alert):
-                self.shield_objs.append(shield_obj)
+        self.shield_objs = index.match(alert) if index else []
         shield_config_ids = ",".join([str(shield_obj.id) for shield_obj in self.shield_objs])
         self.is_global_shielder = None
         self.is_host_shielder = None
@@ -11,22 +11,45 @@ specific language governing permissions and limitations under the License.
 
 
 import arrow
-import six
 
 
 class DataPoint(object):
     """
     access 拉取的数据，在detect模块的一层封装
+    数据字段直接从原始数据中读取，不再逐个复制为实例属性
     """
 
+    __slots__ = ("item", "_raw_input", "_extra")
+
     # 定义DataPoint必须拥有的属性
     context_field = ["value", "timestamp", "unit", "item"]
 
     def __init__(self, accessed_data, item):
         self.item = item
         self._raw_input = accessed_data
-        for k, v in six.iteritems(accessed_data):
-            setattr(self, k, v)
+        self._extra = None
+
+    def __getattr__(self, name):
+        # 仅在常规属性查找失败时调用
+        # 双下划线属性同样从数据中查找，如 strategy_check 通过数据中的 __debug__ 开启调试
+        if name in DataPoint.__slots__:
+            raise AttributeError(name)
+        extra = self._extra
+        if extra and name in extra:
+            return extra[name]
+        try:
+            return self._raw_input[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        if name in DataPoint.__slots__:
+            object.__setattr__(self, name, value)
+            return
+        # 与原先逐个设置实例属性的行为一致，不修改原始数据
+        if self._extra is None:
+            self._extra = {}
+        self._extra[name] = value
 
     def as_dict(self):
         return self._raw_input
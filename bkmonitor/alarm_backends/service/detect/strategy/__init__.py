@@ -14,6 +14,7 @@ import functools
 import inspect
 import json
 import logging
+import operator
 
 from django.conf import settings
 from django.template import Context, Template
@@ -24,6 +25,7 @@ from alarm_backends.core.cache import key
 from alarm_backends.service.access.data.records import DataRecord
 from alarm_backends.service.detect import AnomalyDataPoint, DataPoint
 from alarm_backends.templatetags.unit import unit_auto_convert, unit_convert_min
+from bkmonitor.utils.cache import LRUCache
 from core.errors.alarm_backends.detect import (
     HistoryDataNotExists,
     InvalidAlgorithmsConfig,
@@ -33,6 +35,45 @@ from core.unit import load_unit
 
 logger = logging.getLogger("detect")
 
+# 进程内历史数据缓存，相邻检测周期需要的历史时刻大量重叠，避免重复从数据源拉取
+# 仅缓存本进程从数据源完整拉取的数据；redis中的数据可能被其他进程持续追加维度，每次都需要重新读取
+# key: HISTORY_DATA_KEY, value: {dimensions_md5: 数据点json}
+HISTORY_POINT_CACHE = LRUCache(
+    maxsize=getattr(settings, "DETECT_HISTORY_CACHE_MAXSIZE", 500),
+    ttl=getattr(settings, "DETECT_HISTORY_CACHE_TTL", 5 * 60),
+)
+
+# 批量预筛选使用的比较运算，与 allowed_threshold_method 对应
+COMPARE_OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
+@functools.lru_cache(maxsize=512)
+def compile_template(template_string):
+    """
+    编译异常描述模板，相同模板只编译一次
+    """
+    return Template(template_string)
+
+
+class UnitConverter(object):
+    """
+    批量检测时复用的单位转换器，与 unit_convert_min 的计算结果保持一致
+    """
+
+    def __init__(self, unit):
+        self.unit = unit
+        self._unit = load_unit(unit)
+
+    def convert_min(self, value):
+        return self._unit.convert_to_max(value, decimal=settings.POINT_PRECISION)[0]
+
 
 class DetectContext(dict):
     def __getattr__(self, item):
@@ -122,28 +163,50 @@ class Algorithms(object):
         if not self.desc_tpl:
             return ""
         context = Context(self.get_context(data_point))
-        return Template(self.desc_tpl).render(context)
+        return compile_template(str(self.desc_tpl)).render(context)
 
-    def detect_records(self, data_points, level):
+    def batch_prefilter(self, data_points):
         """
-        detect service entry
+        批量预筛选可能异常的数据点
+        返回None表示算法不支持批量预筛选；否则返回的数据点集合必须包含逐点检测的全部异常点，
+        无法确定结果的数据点(如计算报错)也需要保留，最终结果仍由 detect 逐点确认。
         """
-        if isinstance(data_points, DataPoint):
-            data_points = [data_points]
-        anomaly_points = []
-        for data_point in data_points:
+        return None
+
+    def detect_batch(self, data_points):
+        """
+        批量检测，先经过批量预筛选，仅对候选数据点执行逐点检测及异常描述渲染
+        :return: [(data_point, check_result)]
+        """
+        candidates = self.batch_prefilter(data_points)
+        if candidates is None:
+            candidates = data_points
+
+        results = []
+        for data_point in candidates:
             try:
                 check_result = self.detect(data_point)
             except Exception:
                 continue
             if check_result:
-                ap = self.gen_anomaly_point(data_point, check_result, level)
-                logger.info(
-                    "[detect] strategy({}) item({}) level[{}] 发现异常点: {}".format(
-                        ap.data_point.item.strategy.id, ap.data_point.item.id, level, ap.__dict__
-                    )
+                results.append((data_point, check_result))
+        return results
+
+    def detect_records(self, data_points, level):
+        """
+        detect service entry
+        """
+        if isinstance(data_points, DataPoint):
+            data_points = [data_points]
+        anomaly_points = []
+        for data_point, check_result in self.detect_batch(data_points):
+            ap = self.gen_anomaly_point(data_point, check_result, level)
+            logger.info(
+                "[detect] strategy({}) item({}) level[{}] 发现异常点: {}".format(
+                    ap.data_point.item.strategy.id, ap.data_point.item.id, level, ap.__dict__
                 )
-                anomaly_points.append(ap)
+            )
+            anomaly_points.append(ap)
 
         return anomaly_points
 
@@ -293,9 +356,11 @@ class BasicAlgorithmsCollection(Algorithms):
 class HistoryPointFetcher(object):
     def query_history_points(self, data_points):
         item = data_points[0].item
+        agg_interval = item.query_configs[0]["agg_interval"]
         # 按时间从小到大排序
         sorted_data_points = sorted(data_points, key=lambda x: x.timestamp)
         offsets = self.get_history_offsets(item)
+        history_timestamps = set()
         for offset in offsets:
             # offsets 支持区间（相邻offset之间差值等于interval的整数倍）批量查询
             if isinstance(offset, tuple):
@@ -307,44 +372,86 @@ class HistoryPointFetcher(object):
                 self._publish_history_points(item, data_points)
                 continue
 
-            records = []
             from_timestamp, until_timestamp = (
                 sorted_data_points[0].timestamp - end,
-                sorted_data_points[-1].timestamp - start + item.query_configs[0]["agg_interval"],
+                sorted_data_points[-1].timestamp - start + agg_interval,
             )
+            history_timestamps.update(range(from_timestamp, until_timestamp, agg_interval))
 
-            accessed = None
-            for history_timestamp in range(from_timestamp, until_timestamp, item.query_configs[0]["agg_interval"]):
-                if accessed is None:
-                    accessed = True
-                accessed = accessed and self._check_history_points(item, history_timestamp)
+        if not history_timestamps:
+            return
 
-            if accessed:
-                # 历史时刻的数据都已经查过
-                continue
+        # 所有偏移量需要的历史时刻统一加载，本地缓存和redis中都不存在的时刻再从数据源查询
+        missing_timestamps = self._load_history_frames(item, history_timestamps)
+        if not missing_timestamps:
+            return
 
+        records = []
+        for from_timestamp, until_timestamp in self._merge_history_timestamps(missing_timestamps, agg_interval):
             item_records = item.query_record(from_timestamp, until_timestamp)
             for record in item_records:
                 point = DataRecord(item, record)
                 if point.value:
                     records.append(adapter_data_access_2_detect(point, item))
 
+        self._publish_history_points(item, records, cache_frames=True)
+
+    @staticmethod
+    def _merge_history_timestamps(timestamps, interval):
+        """
+        将历史时刻合并为连续的查询区间 [(from_timestamp, until_timestamp), ...]
+        """
+        ranges = []
+        for timestamp in sorted(timestamps):
+            if ranges and ranges[-1][1] == timestamp:
+                ranges[-1][1] = timestamp + interval
+            else:
+                ranges.append([timestamp, timestamp + interval])
+        return [tuple(r) for r in ranges]
+
+    @property
+    def local_history_storage(self):
+        if not getattr(self, "_local_history_storage", None):
             self._local_history_storage = {}
-            self._publish_history_points(item, records)
+        return self._local_history_storage
 
-    def _check_history_points(self, item, history_timestamp):
+    def _load_history_frames(self, item, history_timestamps):
         """
-        检查历史时刻的数据是否已经拉取过，如果存在，则更新过期时间。
+        加载历史时刻的数据，优先使用进程内缓存，其余时刻通过pipeline批量获取
+        redis中读取的数据可能只包含部分维度，不写入进程内缓存
+        :return: 尚未拉取过数据的历史时刻
         """
-        client = key.HISTORY_DATA_KEY.client
-        history_key = key.HISTORY_DATA_KEY.get_key(
-            strategy_id=item.strategy.id, item_id=item.id, timestamp=history_timestamp
+        history_key_maker = functools.partial(
+            key.HISTORY_DATA_KEY.get_key, strategy_id=item.strategy.id, item_id=item.id
         )
-        return client.exists(history_key)
+        uncached = []
+        for history_timestamp in sorted(history_timestamps):
+            history_key = history_key_maker(timestamp=history_timestamp)
+            frame = HISTORY_POINT_CACHE.get(history_key)
+            if frame is None:
+                uncached.append((history_timestamp, history_key))
+            else:
+                self.local_history_storage[history_key] = frame
+
+        if not uncached:
+            return []
 
-    def _publish_history_points(self, item, history_points):
+        pipeline = key.HISTORY_DATA_KEY.client.pipeline(transaction=False)
+        for _, history_key in uncached:
+            pipeline.hgetall(history_key)
+
+        missing_timestamps = []
+        for (history_timestamp, history_key), frame in zip(uncached, pipeline.execute()):
+            if frame:
+                self.local_history_storage[history_key] = frame
+            else:
+                missing_timestamps.append(history_timestamp)
+        return missing_timestamps
+
+    def _publish_history_points(self, item, history_points, cache_frames=False):
         """
         发布历史时刻的数据
+        :param cache_frames: 数据是否为对应时刻的完整数据，是则同时写入进程内缓存
         """
         if not history_points:
             return
@@ -362,23 +469,34 @@ class HistoryPointFetcher(object):
             history_key = history_key_maker(timestamp=timestamp)
             pipeline.hmset(history_key, _points_with_timestamp_map)
             pipeline.expire(history_key, key.HISTORY_DATA_KEY.ttl)
+
+            # 同步更新本地数据，当前周期的数据可能只是部分维度，仅合并到已加载的数据中
+            frame = self.local_history_storage.get(history_key)
+            if frame is None:
+                frame = HISTORY_POINT_CACHE.get(history_key)
+            if frame is not None:
+                frame.update(_points_with_timestamp_map)
+            if cache_frames:
+                frame = _points_with_timestamp_map if frame is None else frame
+                HISTORY_POINT_CACHE.set(history_key, frame)
+                self.local_history_storage[history_key] = frame
         pipeline.execute()
 
     def fetch_history_point(self, item, point, history_timestamp):
         """
         获取当前数据点对应的历史数据点
         """
-        client = key.HISTORY_DATA_KEY.client
         history_key = key.HISTORY_DATA_KEY.get_key(
             strategy_id=item.strategy.id, item_id=item.id, timestamp=history_timestamp
         )
-        if not getattr(self, "_local_history_storage", None):
-            self._local_history_storage = {}
-
-        if history_key not in self._local_history_storage:
-            self._local_history_storage[history_key] = client.hgetall(history_key)
-
-        raw_data = self._local_history_storage[history_key].get(point.record_id.split(".")[0])
+        storage = self.local_history_storage
+        if history_key not in storage:
+            frame = HISTORY_POINT_CACHE.get(history_key)
+            if frame is None:
+                frame = key.HISTORY_DATA_KEY.client.hgetall(history_key)
+            storage[history_key] = frame
+
+        raw_data = storage[history_key].get(point.record_id.split(".")[0])
         if not raw_data:
             return
 
@@ -410,6 +528,9 @@ class RangeRatioAlgorithmsCollection(BasicAlgorithmsCollection, HistoryPointFetc
     floor_desc_tpl = ""
     ceil_desc_tpl = ""
 
+    # 是否支持批量预筛选，仅适用于未改写表达式及上下文的简易同环比算法
+    batch_prefilter_enabled = False
+
     def gen_expr(self):
         if self.validated_config["floor"]:
             yield ExprDetectAlgorithms(
@@ -441,6 +562,46 @@ class RangeRatioAlgorithmsCollection(BasicAlgorithmsCollection, HistoryPointFetc
         env.update(self.validated_config)
         return env
 
+    def batch_prefilter(self, data_points):
+        if not self.batch_prefilter_enabled:
+            return None
+
+        try:
+            floor = self.validated_config["floor"]
+            ceil = self.validated_config["ceil"]
+        except (KeyError, TypeError):
+            # 配置中没有上下限时无法预筛选，交由逐点检测处理
+            return None
+        converters = {}
+        candidates = []
+        for data_point in data_points:
+            try:
+                history_data_point = self.history_point_fetcher(data_point)
+                if history_data_point is None:
+                    # 逐点检测会抛出 HistoryDataNotExists，不可能产生异常点
+                    continue
+
+                unit = data_point.unit
+                converter = converters.get(unit)
+                if converter is None:
+                    converter = converters[unit] = UnitConverter(unit)
+
+                value = converter.convert_min(data_point.value)
+                history_value = converter.convert_min(history_data_point.value)
+                if floor:
+                    floor_value = history_value * (100 - floor) * 0.01
+                    if (value or floor_value) and value <= floor_value:
+                        candidates.append(data_point)
+                        continue
+                if ceil:
+                    ceil_value = history_value * (100 + ceil) * 0.01
+                    if (value or ceil_value) and value >= ceil_value:
+                        candidates.append(data_point)
+            except Exception:
+                # 无法确定检测结果的数据点交由逐点检测处理
+                candidates.append(data_point)
+        return candidates
+
     def history_point_fetcher(self, data_point, **kwargs):
         """
         同比环比类算法特有方法，获取历史数据。
@@ -27,6 +27,8 @@ class OsRestart(SimpleRingRatio):
     expr_op = "and"
     desc_tpl = _("当前服务器在{{data_point.value}}秒前发生系统重启事件")
     config_serializer = None
+    # 检测条件与环比上下限无关，不使用父类的批量预筛选
+    batch_prefilter_enabled = False
 
     def gen_expr(self):
         # 主机运行时长在0到600秒之间
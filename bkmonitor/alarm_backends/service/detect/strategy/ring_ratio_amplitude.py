@@ -23,6 +23,8 @@ from bkmonitor.strategy.serializers import RingRatioAmplitudeSerializer
 
 class RingRatioAmplitude(SimpleRingRatio):
     config_serializer = RingRatioAmplitudeSerializer
+    # 检测条件与环比上下限无关，不使用父类的批量预筛选
+    batch_prefilter_enabled = False
     expr_op = "and"
     desc_tpl = _(
         "{% load unit %} - 前一时刻值{{history_data_point.value|auto_unit:unit}}的绝对值 >= "
@@ -19,7 +19,13 @@ import logging
 from django.utils.safestring import mark_safe
 from six.moves import zip
 
-from alarm_backends.service.detect.strategy import BasicAlgorithmsCollection, ExprDetectAlgorithms
+from alarm_backends.service.detect.strategy import (
+    COMPARE_OPERATORS,
+    BasicAlgorithmsCollection,
+    ExprDetectAlgorithms,
+    UnitConverter,
+)
+from alarm_backends.templatetags.unit import unit_convert_min
 from bkmonitor.strategy.serializers import ThresholdSerializer, allowed_threshold_method
 from core.errors.alarm_backends.detect import InvalidThresholdConfig
 
@@ -61,6 +67,45 @@ class AndThreshold(BasicAlgorithmsCollection):
         for args in zip(expr_list, tpl_list):
             yield ExprDetectAlgorithms(*args)
 
+    def gen_value_matcher(self, unit):
+        """
+        生成单值匹配函数，阈值在生成时完成单位转换，输入为已转换为最小单位的值
+        """
+        conditions = [
+            (
+                COMPARE_OPERATORS[allowed_threshold_method[t_config["method"]]],
+                unit_convert_min(t_config["threshold"], unit, self.unit),
+            )
+            for t_config in self.validated_config
+        ]
+
+        def matcher(value):
+            for op, threshold in conditions:
+                if not op(value, threshold):
+                    return False
+            return True
+
+        return matcher
+
+    def batch_prefilter(self, data_points):
+        """
+        批量阈值预筛选: 每种单位只转换一次阈值，数据点仅做一次单位转换后直接比较
+        """
+        matchers = {}
+        candidates = []
+        for data_point in data_points:
+            try:
+                unit = data_point.unit
+                if unit not in matchers:
+                    matchers[unit] = (UnitConverter(unit), self.gen_value_matcher(unit))
+                converter, matcher = matchers[unit]
+                if matcher(converter.convert_min(data_point.value)):
+                    candidates.append(data_point)
+            except Exception:
+                # 无法确定检测结果的数据点交由逐点检测处理
+                candidates.append(data_point)
+        return candidates
+
 
 class Threshold(AndThreshold):
     config_serializer = ThresholdSerializer
@@ -69,3 +114,11 @@ class Threshold(AndThreshold):
     def gen_expr(self):
         for t_config in self.validated_config:
             yield AndThreshold(t_config, self.unit)
+
+    def gen_value_matcher(self, unit):
+        matchers = [detector.gen_value_matcher(unit) for detector in self.detectors]
+
+        def matcher(value):
+            return any(m(value) for m in matchers)
+
+        return matcher
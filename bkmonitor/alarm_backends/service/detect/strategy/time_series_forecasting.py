@@ -14,13 +14,13 @@ TimeSeriesForecasting：时序预测算法，基于计算平台的预测结果
 import json
 import logging
 import operator
-from typing import List, Tuple, Union
+from typing import Callable, List, Tuple, Union
 
 from django.conf import settings
 from django.utils.translation import ugettext as _
 
 from alarm_backends.service.detect import AnomalyDataPoint, DataPoint
-from alarm_backends.service.detect.strategy import BasicAlgorithmsCollection
+from alarm_backends.service.detect.strategy import BasicAlgorithmsCollection, UnitConverter
 from alarm_backends.templatetags.unit import unit_convert_min, unit_suffix
 from bkmonitor.strategy.serializers import TimeSeriesForecastingSerializer
 from bkmonitor.utils.time_tools import hms_string
@@ -92,18 +92,38 @@ class TimeSeriesForecasting(BasicAlgorithmsCollection):
 
         return []
 
+    def _get_threshold_conditions(self, unit: str) -> Tuple[UnitConverter, List[List[Tuple[Callable, float]]]]:
+        """
+        获取已完成单位转换的阈值条件，同一单位只转换一次
+        """
+        if not hasattr(self, "_threshold_conditions"):
+            self._threshold_conditions = {}
+
+        if unit not in self._threshold_conditions:
+            self._threshold_conditions[unit] = (
+                UnitConverter(unit),
+                [
+                    [
+                        (
+                            self.OPERATOR_MAPPINGS[and_config["method"]],
+                            unit_convert_min(and_config["threshold"], unit, self.unit),
+                        )
+                        for and_config in and_configs
+                    ]
+                    for and_configs in self.validated_config["thresholds"]
+                ],
+            )
+        return self._threshold_conditions[unit]
+
     def _threshold_detect(self, value: float, data_point) -> Union[AnomalyDataPoint, None]:
         """
         静态阈值检测
         """
         threshold_config = self.validated_config["thresholds"]
-        for and_configs in threshold_config:
-            for and_config in and_configs:
-                method = and_config["method"]
-                threshold = and_config["threshold"]
-                op = self.OPERATOR_MAPPINGS[method]
-                actual_value = unit_convert_min(value, data_point.unit)
-                excepted_value = unit_convert_min(threshold, data_point.unit, self.unit)
+        converter, conditions = self._get_threshold_conditions(data_point.unit)
+        actual_value = converter.convert_min(value)
+        for and_configs, and_conditions in zip(threshold_config, conditions):
+            for op, excepted_value in and_conditions:
                 if not op(actual_value, excepted_value):
                     break
             else:
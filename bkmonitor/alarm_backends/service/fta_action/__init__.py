@@ -52,6 +52,7 @@ from constants.action import (
     NotifyStep,
 )
 
+from . import action_sync  # noqa 注册处理记录变更信号
 from .utils import (
     AlertAssignee,
     PushActionProcessor,
@@ -468,7 +469,7 @@ class BaseActionProcessor(object):
             # 如果是自愈系统异常并且当前说节点执行次数少于3次，继续重试
             self.is_finished = False
             self.wait_callback(retry_func, delta_seconds=5, kwargs=kwargs)
-            self.action.save(update_fields=["outputs"])
+            self.action.save(update_fields=["outputs", "update_time"])
             return
 
         self.is_finished = True
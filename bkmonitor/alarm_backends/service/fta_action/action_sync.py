@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+"""
+处理记录同步至ES的变更记录
+
+处理记录变更时将 id 写入变更表(redis set，同一处理记录只保留一条)，
+同步任务每次整体取出变更表并分片同步，同时按版本记录已同步的处理记录，重复的同步请求会被跳过。
+"""
+import logging
+from typing import Iterable, List, Set
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_save
+
+from alarm_backends.core.cache.key import (
+    ACTION_SYNC_CHANGES_KEY,
+    ACTION_SYNC_PROCESSING_KEY,
+    ACTION_SYNCED_VERSION_KEY,
+)
+from bkmonitor.models import ActionInstance
+from bkmonitor.utils.common_utils import count_md5
+from constants.action import ActionSignal, ActionStatus
+
+logger = logging.getLogger("fta_action.sync")
+
+# 需要同步至ES的处理记录：汇总并且处于休眠期的、刚接收到的以及demo任务不做同步
+SYNC_ACTION_QUERY = Q(signal__in=ActionSignal.NORMAL_SIGNAL, status__in=ActionStatus.CAN_SYNC_STATUS) | Q(
+    signal=ActionSignal.COLLECT, status__in=ActionStatus.COLLECT_SYNC_STATUS
+)
+
+# 已同步版本按更新时间分桶存储的时间间隔(s)
+SYNCED_VERSION_BUCKET_SIZE = 600
+
+
+def get_update_version(update_time) -> int:
+    """
+    处理记录的更新版本(毫秒时间戳)
+    """
+    return int(update_time.timestamp() * 1000) if update_time else 0
+
+
+class ActionChangeLog:
+    """
+    处理记录变更表
+    """
+
+    @classmethod
+    def record(cls, action_ids: Iterable[int]):
+        """
+        记录处理记录变更，包括通过 QuerySet.update 批量更新的处理记录
+        :param action_ids: 处理记录ID列表
+        """
+        action_ids = list(action_ids)
+        if not action_ids:
+            return
+        client = ACTION_SYNC_CHANGES_KEY.client
+        changes_key = ACTION_SYNC_CHANGES_KEY.get_key()
+        pipeline = client.pipeline(transaction=False)
+        pipeline.sadd(changes_key, *action_ids)
+        pipeline.expire(changes_key, ACTION_SYNC_CHANGES_KEY.ttl)
+        pipeline.execute()
+
+    @classmethod
+    def fetch(cls) -> Set[int]:
+        """
+        取出待同步的变更，上一次取出但未确认的变更会被优先返回
+        变更表整体重命名为处理中的表，保证每条变更只会被取出一次，确认后才删除
+        """
+        client = ACTION_SYNC_CHANGES_KEY.client
+        processing_key = ACTION_SYNC_PROCESSING_KEY.get_key()
+        if not client.exists(processing_key):
+            changes_key = ACTION_SYNC_CHANGES_KEY.get_key()
+            if not client.exists(changes_key):
+                return set()
+            client.rename(changes_key, processing_key)
+            client.expire(processing_key, ACTION_SYNC_PROCESSING_KEY.ttl)
+
+        return {int(action_id) for action_id in client.smembers(processing_key)}
+
+    @classmethod
+    def ack(cls):
+        """
+        确认取出的变更已处理
+        """
+        ACTION_SYNC_PROCESSING_KEY.client.delete(ACTION_SYNC_PROCESSING_KEY.get_key())
+
+
+class ActionSyncedVersion:
+    """
+    已同步至ES的处理记录版本
+    ES文档内容由处理记录及其收敛关系决定，两者都未变化时无需重复同步
+    部分写入通过 update_fields 保存时不会更新 update_time，因此版本同时包含会变化的文档字段
+    已同步版本按处理记录的更新时间分桶记录，过期时间覆盖周期对账同步的回溯时间即可
+    """
+
+    @staticmethod
+    def get_version(instance: ActionInstance) -> str:
+        converge_info = getattr(instance, "converge_info", None) or {}
+        content_md5 = count_md5(
+            [
+                instance.status,
+                instance.real_status,
+                instance.failure_type,
+                instance.end_time,
+                instance.alerts,
+                instance.assignee,
+                instance.outputs,
+                instance.ex_data,
+            ],
+            list_sort=False,
+        )
+        return "{}|{}|{}|{}|{}".format(
+            get_update_version(instance.update_time),
+            content_md5,
+            converge_info.get("converge_id", ""),
+            converge_info.get("converge_status", ""),
+            converge_info.get("is_primary", ""),
+        )
+
+    @staticmethod
+    def get_key(instance: ActionInstance):
+        bucket = get_update_version(instance.update_time) // 1000 // SYNCED_VERSION_BUCKET_SIZE
+        return ACTION_SYNCED_VERSION_KEY.get_key(bucket=bucket)
+
+    @classmethod
+    def filter_changed(cls, instances: List[ActionInstance]) -> List[ActionInstance]:
+        """
+        过滤出版本与已同步版本不一致的处理记录
+        """
+        if not instances:
+            return []
+        pipeline = ACTION_SYNCED_VERSION_KEY.client.pipeline(transaction=False)
+        for instance in instances:
+            pipeline.hget(cls.get_key(instance), ACTION_SYNCED_VERSION_KEY.get_field(action_id=instance.id))
+        try:
+            synced_versions = pipeline.execute()
+        except Exception as error:  # noqa
+            logger.exception("get synced versions of actions error: %s", error)
+            return instances
+        return [
+            instance
+            for instance, synced_version in zip(instances, synced_versions)
+            if synced_version != cls.get_version(instance)
+        ]
+
+    @classmethod
+    def mark_synced(cls, instances: List[ActionInstance]):
+        if not instances:
+            return
+        pipeline = ACTION_SYNCED_VERSION_KEY.client.pipeline(transaction=False)
+        keys = set()
+        for instance in instances:
+            synced_key = cls.get_key(instance)
+            keys.add(synced_key)
+            pipeline.hset(
+                synced_key, ACTION_SYNCED_VERSION_KEY.get_field(action_id=instance.id), cls.get_version(instance)
+            )
+        for synced_key in keys:
+            pipeline.expire(synced_key, ACTION_SYNCED_VERSION_KEY.ttl)
+        pipeline.execute()
+
+
+def record_action_change(sender, instance, using=None, **kwargs):
+    """
+    处理记录保存后记录变更，事务提交后才写入，避免同步到未提交的数据
+    """
+
+    def record():
+        try:
+            ActionChangeLog.record([instance.id])
+        except Exception as error:  # noqa
+            # 变更记录失败时由周期对账同步兜底
+            logger.warning("record change of action(%s) error: %s", instance.id, error)
+
+    transaction.on_commit(record, using=using)
+
+
+post_save.connect(record_action_change, sender=ActionInstance, dispatch_uid="fta_action_sync_record_change")
@@ -211,7 +211,9 @@ class ActionProcessor(BaseActionProcessor):
         # 更新结束时间
         self.action.end_time = datetime.now(tz=timezone.utc)
         # 保存指定的字段
-        self.action.save(update_fields=["alerts", "assignee", "ex_data", "end_time", "status", "outputs"])
+        self.action.save(
+            update_fields=["alerts", "assignee", "ex_data", "end_time", "status", "outputs", "update_time"]
+        )
 
         # 更新当前执行任务的内容
         self.related_actions.update(real_status=self.action.status)
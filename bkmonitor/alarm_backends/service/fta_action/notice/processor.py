@@ -25,6 +25,7 @@ from alarm_backends.core.cache.key import (
 )
 from alarm_backends.core.lock.service_lock import service_lock
 from alarm_backends.service.fta_action import ActionAlreadyFinishedError
+from alarm_backends.service.fta_action.action_sync import ActionChangeLog
 from alarm_backends.service.fta_action.common import BaseActionProcessor
 from bkmonitor.models import ActionInstance
 from bkmonitor.utils.send import Sender
@@ -269,15 +270,18 @@ class ActionProcessor(BaseActionProcessor):
             if not notice_result["result"] and self.receiver_action_mapping.get(receiver)
         ]
 
+        now = datetime.now(tz=timezone.utc)
         if succeed_actions:
             ActionInstance.objects.filter(id__in=succeed_actions).update(
                 **{
                     "status": ActionStatus.SUCCESS,
-                    "end_time": datetime.now(tz=timezone.utc),
+                    "end_time": now,
+                    "update_time": now,
                     "ex_data": {"message": _("发送通知成功")},
                     "outputs": notify_content_outputs,
                 }
             )
+            ActionChangeLog.record(succeed_actions)
 
         if failed_actions:
             failed_message = _("发送失败")
@@ -293,11 +297,13 @@ class ActionProcessor(BaseActionProcessor):
                 **{
                     "status": ActionStatus.FAILURE,
                     "failure_type": failure_type,
-                    "end_time": datetime.now(tz=timezone.utc),
+                    "end_time": now,
+                    "update_time": now,
                     "ex_data": {"message": failed_message},
                     "outputs": notify_content_outputs,
                 }
             )
+            ActionChangeLog.record(failed_actions)
             # 更新失败任务的主任务状态
             ActionInstance.update_parent_action_status(sub_actions=failed_actions)
 
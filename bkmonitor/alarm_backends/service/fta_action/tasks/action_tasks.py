@@ -31,6 +31,11 @@ from alarm_backends.service.fta_action import (
     ActionAlreadyFinishedError,
     BaseActionProcessor,
 )
+from alarm_backends.service.fta_action.action_sync import (
+    SYNC_ACTION_QUERY,
+    ActionChangeLog,
+    ActionSyncedVersion,
+)
 from alarm_backends.service.fta_action.utils import (
     DutyCalendar,
     PushActionProcessor,
@@ -69,9 +74,11 @@ def run_action(action_type, action_info):
         module = importlib.import_module(module_name)
     except ImportError as error:
         logger.error("import module %s error %s", module_name, error)
+        now = datetime.now(timezone.utc)
         ActionInstance.objects.filter(id=action_info["id"]).update(
-            status=ActionStatus.FAILURE, failure_type=FailureType.FRAMEWORK_CODE, end_time=datetime.now(timezone.utc)
+            status=ActionStatus.FAILURE, failure_type=FailureType.FRAMEWORK_CODE, end_time=now, update_time=now
         )
+        ActionChangeLog.record([action_info["id"]])
         return
 
     exc = None
@@ -95,12 +102,15 @@ def run_action(action_type, action_info):
         logger.info("action(%s) get execute lock error: %s", action_info["id"], str(error))
     except BaseException as error:  # NOCC:broad-except(设计如此:)
         logger.exception("execute action(%s) error, %s", action_info["id"], str(error))
+        now = datetime.now(timezone.utc)
         ActionInstance.objects.filter(id=action_info["id"]).update(
             status=ActionStatus.FAILURE,
             failure_type=FailureType.FRAMEWORK_CODE,
-            end_time=datetime.now(timezone.utc),
+            end_time=now,
+            update_time=now,
             ex_data={"message": str(error)},
         )
+        ActionChangeLog.record([action_info["id"]])
         is_finished = True
         exc = error
 
@@ -169,55 +179,34 @@ def run_webhook_action(action_type, action_info):
 def sync_action_instances():
     """
     同步处理记录至ES
+    每10秒同步一次变更表中的处理记录，每分钟的第一次同步额外按更新时间对账，兜底未记录变更的批量写入
     :return:
     """
     for interval in range(0, 6):
-        sync_action_instances_every_10_secs.apply_async(countdown=interval * 10, expires=120)
+        sync_action_instances_every_10_secs.apply_async(
+            kwargs={"reconcile": interval == 0}, countdown=interval * 10, expires=120
+        )
 
 
 @task(ignore_result=True, queue="celery_action_cron")
-def sync_action_instances_every_10_secs(last_sync_time=None):
+def sync_action_instances_every_10_secs(last_sync_time=None, reconcile=True):
     """
     每隔十秒同步任务
     :param last_sync_time:
+    :param reconcile: 是否按更新时间对账
     :return:
     """
     try:
         with service_lock(SYNC_ACTION_LOCK_KEY):
-            current_sync_time = datetime.now(timezone.utc)
-            redis_client = LATEST_TIME_OF_SYNC_ACTION_KEY.client
-            cache_key = LATEST_TIME_OF_SYNC_ACTION_KEY.get_key()
-            try:
-                last_sync_time = int(redis_client.get(cache_key))
-            except (ValueError, TypeError):
-                # 如果获取缓存记录异常，表示要全库更新或者指定变量，这种可能性很小，但是无法保证redis一直正常运行
-                three_days_ago = current_sync_time - timedelta(days=3)
-                last_sync_time = last_sync_time or int(three_days_ago.timestamp())
-
-            # 同步逻辑： 如果不存在最近更新时间的缓存key， 直接更新全表， 如果有，则更新对应时间范围内的数据即可
-            # 汇总并且处于休眠期的内容不做同步
-            # 刚接收到的处理记录也不做同步
-            # demo任务也不同步到ES库
-            updated_action_instances = ActionInstance.objects.filter(update_time__lte=current_sync_time)
-
-            if last_sync_time:
-                # 同步的时候，默认用5分钟之前的数据
-                last_sync_time -= 5 * CONST_MINUTES
-                updated_action_instances = updated_action_instances.filter(
-                    update_time__gte=datetime.fromtimestamp(last_sync_time)
-                )
-
-            updated_action_instances = updated_action_instances.filter(
-                Q(signal__in=ActionSignal.NORMAL_SIGNAL, status__in=ActionStatus.CAN_SYNC_STATUS)
-                | Q(signal=ActionSignal.COLLECT, status__in=ActionStatus.COLLECT_SYNC_STATUS)
-            ).order_by("update_time")
-
-            logger.info("start sync_action_instances from time %s", last_sync_time)
-
-            perform_sharding_task(
-                updated_action_instances.values_list("id", flat=True), sync_actions_sharding_task, num_per_task=100
-            )
-            redis_client.set(cache_key, int(current_sync_time.timestamp()))
+            # 变更表中的处理记录只会被取出一次，分发完成后确认
+            changes = ActionChangeLog.fetch()
+            if changes:
+                logger.info("start sync_action_instances from change log, count %s", len(changes))
+                perform_sharding_task(sorted(changes), sync_actions_sharding_task, num_per_task=100)
+                ActionChangeLog.ack()
+
+            if reconcile:
+                reconcile_action_instances(last_sync_time)
     except LockError:
         # 加锁失败
         logger.info("[get service lock fail] sync_action_instances_every_10_secs. will process later")
@@ -227,13 +216,51 @@ def sync_action_instances_every_10_secs(last_sync_time=None):
         return
 
 
+def reconcile_action_instances(last_sync_time=None):
+    """
+    按更新时间对账同步，已同步的版本会在分片任务中跳过
+    """
+    current_sync_time = datetime.now(timezone.utc)
+    redis_client = LATEST_TIME_OF_SYNC_ACTION_KEY.client
+    cache_key = LATEST_TIME_OF_SYNC_ACTION_KEY.get_key()
+    try:
+        last_sync_time = int(redis_client.get(cache_key))
+    except (ValueError, TypeError):
+        # 如果获取缓存记录异常，表示要全库更新或者指定变量，这种可能性很小，但是无法保证redis一直正常运行
+        three_days_ago = current_sync_time - timedelta(days=3)
+        last_sync_time = last_sync_time or int(three_days_ago.timestamp())
+
+    # 同步逻辑： 如果不存在最近更新时间的缓存key， 直接更新全表， 如果有，则更新对应时间范围内的数据即可
+    updated_action_instances = ActionInstance.objects.filter(update_time__lte=current_sync_time)
+
+    if last_sync_time:
+        # 同步的时候，默认用5分钟之前的数据
+        last_sync_time -= 5 * CONST_MINUTES
+        updated_action_instances = updated_action_instances.filter(
+            update_time__gte=datetime.fromtimestamp(last_sync_time)
+        )
+
+    updated_action_instances = updated_action_instances.filter(SYNC_ACTION_QUERY).order_by("update_time")
+
+    logger.info("start sync_action_instances from time %s", last_sync_time)
+
+    perform_sharding_task(
+        updated_action_instances.values_list("id", flat=True), sync_actions_sharding_task, num_per_task=100
+    )
+    redis_client.set(cache_key, int(current_sync_time.timestamp()))
+
+
 @task(ignore_result=True, queue="celery_action_cron")
 def sync_actions_sharding_task(action_ids):
     """
     分片任务同步信息，避免一次任务量太大
+    只同步需要同步的状态且版本发生变化的处理记录
     :param action_ids:
     :return:
     """
+    if not action_ids:
+        return
+
     action_documents = []
     current_sync_time = datetime.now(timezone.utc)
     converge_relations = {
@@ -243,18 +270,25 @@ def sync_actions_sharding_task(action_ids):
         )
     }
     all_actions = []
-    all_alerts = []
-    for instance in ActionInstance.objects.filter(id__in=action_ids):
-        all_alerts.extend(instance.alerts)
-        all_actions.append(instance)
-    all_alert_docs = {alert.id: alert for alert in AlertDocument.mget(ids=all_alerts)}
-    for instance in all_actions:
+    for instance in ActionInstance.objects.filter(SYNC_ACTION_QUERY, id__in=action_ids):
         instance.converge_info = converge_relations.get(instance.id, {})
         if not instance.action_config:
             continue
+        all_actions.append(instance)
+
+    all_actions = ActionSyncedVersion.filter_changed(all_actions)
+    if not all_actions:
+        return
+
+    # 文档只使用第一个告警的信息
+    alert_ids = {instance.alerts[0] for instance in all_actions if instance.alerts}
+    all_alert_docs = {alert.id: alert for alert in AlertDocument.mget(ids=list(alert_ids))} if alert_ids else {}
+    synced_actions = []
+    for instance in all_actions:
         try:
             alert_doc = all_alert_docs.get(instance.alerts[0]) if instance.alerts else None
             action_documents.append(to_document(instance, current_sync_time, alerts=[alert_doc] if alert_doc else None))
+            synced_actions.append(instance)
         except BaseException as error:  # NOCC:broad-except(设计如此:)
             logger.exception(
                 "sync action error: %s , action_info %s",
@@ -262,6 +296,7 @@ def sync_actions_sharding_task(action_ids):
                 "{}{}".format(instance.id, instance.action_config.get("name", "")),
             )
     ActionInstanceDocument.bulk_create(action_documents, action=BulkActionType.INDEX)
+    ActionSyncedVersion.mark_synced(synced_actions)
 
 
 def check_timeout_actions():
@@ -291,13 +326,15 @@ def check_timeout_actions():
                 if int(timeout_timestamp) >= int(running_action.create_time.timestamp()):
                     timeout_actions.append(running_action.id)
             if timeout_actions:
+                now = datetime.now(tz=timezone.utc)
                 ActionInstance.objects.filter(id__in=timeout_actions).update(
-                    end_time=datetime.now(tz=timezone.utc),
-                    update_time=datetime.now(tz=timezone.utc),
+                    end_time=now,
+                    update_time=now,
                     status=ActionStatus.FAILURE,
                     failure_type=FailureType.TIMEOUT,
                     ex_data=dict(message=_("处理执行时间超过套餐配置的最大时长{}分钟, 按失败处理").format(timeout_setting // 60 or 10)),
                 )
+                ActionChangeLog.record(timeout_actions)
                 logger.info("setting actions(%s) to failure because of timeout", len(timeout_actions))
     except LockError:
         # 加锁失败
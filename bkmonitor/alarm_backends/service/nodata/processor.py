@@ -10,7 +10,6 @@ specific language governing permissions and limitations under the License.
 """
 
 
-import json
 import logging
 
 import arrow
@@ -38,17 +37,15 @@ class CheckProcessor(BaseAbnormalPushProcessor):
 
     def pull_data(self, item, check_timestamp, inputs=None):
         """
-        :
+        根据 access 维护的无数据维度最后上报时间索引，生成检测时刻有新数据上报的维度数据点
         :return: [datapoint, …]
         {
-            "record_id":"f7659f5811a0e187c71d119c7d625f23",
-            "value":1.38,
-            "values":{
-                "timestamp":1569246480,
-                "load5":1.38
-            },
+            "record_id":"f7659f5811a0e187c71d119c7d625f23.1569246480",
+            "value":None,
+            "values":{},
             "dimensions":{
-                "ip":"127.0.0.1"
+                "ip":"127.0.0.1",
+                "__NO_DATA_DIMENSION__": True
             },
             "time":1569246480
         }
@@ -58,94 +55,39 @@ class CheckProcessor(BaseAbnormalPushProcessor):
             # for debug
             self.inputs[item.id].extend(inputs)
             return
-        # pull data
-        data_channel = key.NO_DATA_LIST_KEY.get_key(strategy_id=self.strategy_id, item_id=item.id)
-        client = key.NO_DATA_LIST_KEY.client
 
-        total_points = client.llen(data_channel)
-        if total_points == 0:
+        last_seen = item.get_no_data_last_seen(check_timestamp)
+        if not last_seen:
             logger.info(
                 "[nodata] strategy({}) item({}) check_timestamp({}) 无待检测数据，可能触发无数据告警".format(
                     self.strategy_id, item.id, check_timestamp
                 )
             )
             return
-
-        records = client.lrange(data_channel, -total_points, -1)
-        metrics.NODATA_PROCESS_PULL_DATA_COUNT.labels(strategy_id=metrics.TOTAL_TAG).inc(len(records))
-
-        unexpected_record_count = 0
-        last_unexpected_record = None
-        if records:
-            client.ltrim(data_channel, 0, -total_points - 1)
-            logger.info(
-                "[nodata] strategy({}) item({}) check_timestamp({}) pull records({})".format(
-                    self.strategy_id, item.id, check_timestamp, total_points
-                )
-            )
-            future_records = []
-            for record in records:
-                try:
-                    data_point = DataPoint(json.loads(record), item)
-                    if data_point.timestamp <= check_timestamp:
-                        self.inputs[item.id].append(data_point)
-                    else:
-                        future_records.append(record)
-                except ValueError:
-                    unexpected_record_count += 1
-                    last_unexpected_record = record
-
-            # 如果当前监测点之前无数据，但是未来有数据，那么取未来一个周期的数据
-            if not self.inputs[item.id] and future_records:
-                record = future_records[0]
-                data_point = DataPoint(json.loads(record), item)
-                earliest_future_timestamp = data_point.timestamp
-                earliest_future_points = [data_point]
-                earliest_future_records_idx = [0]
-                for index, record in enumerate(future_records[1:]):
-                    data_point = DataPoint(json.loads(record), item)
-                    # 遇到更早时间数据，重置 earliest_future_points 和 earliest_future_records_idx
-                    if data_point.timestamp < earliest_future_timestamp:
-                        earliest_future_timestamp = data_point.timestamp
-                        earliest_future_points = [data_point]
-                        earliest_future_records_idx = [index + 1]
-                    # 遇到和当前最早时间一致的数据，加入 earliest_future_points 和 earliest_future_records_idx
-                    elif data_point.timestamp == earliest_future_timestamp:
-                        earliest_future_points.append(data_point)
-                        earliest_future_records_idx.append(index + 1)
-
-                self.inputs[item.id] = earliest_future_points
-                future_records = [
-                    record for index, record in enumerate(future_records) if index not in earliest_future_records_idx
-                ]
-                logger.info(
-                    "[nodata] strategy({}) item({}) check_timestamp({}) get future_timestamp({}) {} records,"
-                    "其中之一: {}".format(
-                        self.strategy_id,
-                        item.id,
-                        check_timestamp,
-                        earliest_future_timestamp,
-                        len(earliest_future_records_idx),
-                        data_point._raw_input,
-                    )
-                )
-
-            # 当前检测周期之后的数据或者未来周期非最早时间的数据，重新放入队列等待后续检测
-            if future_records:
-                client.rpush(data_channel, *future_records)
-            if unexpected_record_count > 0:
-                logger.error(
-                    "[nodata] strategy({}) item({}) check_timestamp({}) 发现非期望格式的待检测数据{}条,"
-                    "其中之一: {}".format(
-                        self.strategy_id, item.id, check_timestamp, unexpected_record_count, last_unexpected_record
-                    )
-                )
-
-            logger.info(
-                "[nodata] strategy({}) item({}) check_timestamp({}) 拉取数据({})条".format(
-                    self.strategy_id, item.id, check_timestamp, len(self.inputs[item.id])
-                )
+        metrics.NODATA_PROCESS_PULL_DATA_COUNT.labels(strategy_id=metrics.TOTAL_TAG).inc(len(last_seen))
+
+        last_points = item.get_no_data_last_checkpoints(list(last_seen.keys()))
+        for dimensions_md5, (timestamp, dimensions) in last_seen.items():
+            # 检测时刻之后的上报说明该维度在检测时刻仍有数据，按检测时刻记录，避免下个周期被误判为无新数据
+            point_timestamp = min(timestamp, check_timestamp)
+            last_point = last_points.get(dimensions_md5)
+            # 上一次检测后没有新的上报数据
+            if last_point and point_timestamp <= int(last_point):
+                continue
+            record = {
+                "record_id": "{}.{}".format(dimensions_md5, point_timestamp),
+                "value": None,
+                "values": {},
+                "dimensions": dimensions,
+                "time": point_timestamp,
+            }
+            self.inputs[item.id].append(DataPoint(record, item))
+
+        logger.info(
+            "[nodata] strategy({}) item({}) check_timestamp({}) 维度总数({}), 有新上报数据的维度({})".format(
+                self.strategy_id, item.id, check_timestamp, len(last_seen), len(self.inputs[item.id])
             )
+        )
 
     def handle_data(self, item, check_timestamp):
         # check no data
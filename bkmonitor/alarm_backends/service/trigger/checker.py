@@ -20,6 +20,7 @@ from alarm_backends.core.control.record_parser import RecordParser
 from alarm_backends.core.control.strategy import Strategy
 from alarm_backends.core.detect_result import ANOMALY_LABEL
 from bkmonitor.models import AnomalyRecord
+from bkmonitor.utils.common_utils import chunks
 
 logger = logging.getLogger("trigger")
 
@@ -32,7 +33,7 @@ class AnomalyChecker(object):
     # 检测窗口单位(默认1min)
     DEFAULT_CHECK_WINDOW_UNIT = 60
 
-    def __init__(self, point, strategy, item_id):
+    def __init__(self, point, strategy, item_id, check_results=None):
         self.item = Strategy.get_item_in_strategy(strategy, item_id)
         self.strategy = strategy
         self.strategy_id = strategy["id"]
@@ -54,6 +55,8 @@ class AnomalyChecker(object):
         # shortcut
         self.dimensions_md5 = self.record_parser.dimensions_md5
         self.source_time = self.record_parser.source_time
+        # 批量预取的检测结果缓存 {check_cache_key: [(label, score)]}，未预取的key直接查询redis
+        self.check_results = check_results
 
     @staticmethod
     def is_no_data_point(point):
@@ -163,14 +166,12 @@ class AnomalyChecker(object):
                 anomaly_level = level
         return anomaly_level, anomaly_timestamps
 
-    def _check_anomaly_by_level(self, level):
+    def _get_trigger_config(self, level):
         """
-        检测某个级别的异常点是否满足触发条件
-        :param str level: 告警级别
-        :return: 二元组：是否被触发，异常次数
+        获取某个级别的触发配置，不存在则返回None
         """
         try:
-            trigger_config = self.trigger_configs[level]
+            return self.trigger_configs[level]
         except KeyError:
             trigger_configs = self.trigger_configs.values()
             if not trigger_configs:
@@ -180,11 +181,16 @@ class AnomalyChecker(object):
                         self.strategy_id, self.item_id, level
                     )
                 )
-                return False, []
+                return None
 
             # 默认兜底，trigger 配置当前所有告警级别默认一致
-            trigger_config = list(trigger_configs)[0]
+            return list(trigger_configs)[0]
 
+    def _get_check_window(self, level, trigger_config):
+        """
+        获取某个级别需要读取的检测结果缓存及时间范围
+        :return: (check_cache_key, min_score, max_score)
+        """
         check_cache_key = CHECK_RESULT_CACHE_KEY.get_key(
             strategy_id=self.strategy_id,
             item_id=self.item_id,
@@ -193,9 +199,42 @@ class AnomalyChecker(object):
         )
         # 在对应的打点队列中取出打点信息。时间范围为source_time前后的一个窗口偏移量
         check_window_offset = trigger_config["check_window_size"] * self.check_window_unit - 1
-        check_results = CHECK_RESULT_CACHE_KEY.client.zrangebyscore(
-            name=check_cache_key, min=self.source_time - check_window_offset, max=self.source_time, withscores=True
+        return check_cache_key, self.source_time - check_window_offset, self.source_time
+
+    def get_check_windows(self):
+        """
+        获取所有异常级别需要读取的检测结果窗口，用于批量预取
+        :return: [(check_cache_key, min_score, max_score)]
+        """
+        windows = []
+        for level in self.point["anomaly"]:
+            trigger_config = self._get_trigger_config(str(level))
+            if trigger_config:
+                windows.append(self._get_check_window(str(level), trigger_config))
+        return windows
+
+    def _fetch_check_results(self, check_cache_key, min_score, max_score):
+        if self.check_results is not None and check_cache_key in self.check_results:
+            return [
+                (label, score)
+                for label, score in self.check_results[check_cache_key]
+                if min_score <= score <= max_score
+            ]
+        return CHECK_RESULT_CACHE_KEY.client.zrangebyscore(
+            name=check_cache_key, min=min_score, max=max_score, withscores=True
         )
+
+    def _check_anomaly_by_level(self, level):
+        """
+        检测某个级别的异常点是否满足触发条件
+        :param str level: 告警级别
+        :return: 二元组：是否被触发，异常次数
+        """
+        trigger_config = self._get_trigger_config(level)
+        if not trigger_config:
+            return False, []
+
+        check_results = self._fetch_check_results(*self._get_check_window(level, trigger_config))
         # 统计包含异常标记的key的数量，并与trigger_count进行比较
         anomaly_timestamps = []
         for label, score in check_results:
@@ -215,3 +254,30 @@ class AnomalyChecker(object):
             )
 
         return is_triggered, anomaly_timestamps
+
+
+def prefetch_check_results(checkers, chunk_size=5000):
+    """
+    批量预取检测结果缓存
+    同一个检测结果key只读取一次覆盖所有窗口的时间范围，按节点合并为pipeline，检测时在内存中按窗口过滤
+    """
+    score_ranges = {}
+    for checker in checkers:
+        for check_cache_key, min_score, max_score in checker.get_check_windows():
+            if check_cache_key in score_ranges:
+                current_min, current_max = score_ranges[check_cache_key]
+                score_ranges[check_cache_key] = (min(current_min, min_score), max(current_max, max_score))
+            else:
+                score_ranges[check_cache_key] = (min_score, max_score)
+
+    check_results = {}
+    pipeline = CHECK_RESULT_CACHE_KEY.client.pipeline(transaction=False)
+    for chunk_keys in chunks(list(score_ranges), chunk_size):
+        for check_cache_key in chunk_keys:
+            min_score, max_score = score_ranges[check_cache_key]
+            pipeline.zrangebyscore(check_cache_key, min_score, max_score, withscores=True)
+        check_results.update(zip(chunk_keys, pipeline.execute()))
+
+    for checker in checkers:
+        checker.check_results = check_results
+    return check_results
@@ -11,6 +11,7 @@ specific language governing permissions and limitations under the License.
 
 
 import logging
+from contextlib import ExitStack
 
 from alarm_backends.core.cache.key import ANOMALY_SIGNAL_KEY, SERVICE_LOCK_TRIGGER
 from alarm_backends.core.handlers import base
@@ -25,48 +26,113 @@ logger = logging.getLogger("trigger")
 class TriggerHandler(base.BaseHandler):
 
     DATA_FETCH_TIMEOUT = 5
+    # 单次最多处理的信号数量，多个监控项合并处理以减少redis及kafka的交互次数
+    MAX_SIGNAL_COUNT = 50
 
-    def handle(self):
+    def fetch_signals(self):
         if self.DATA_FETCH_TIMEOUT:
             anomaly_key = ANOMALY_SIGNAL_KEY.client.brpop(ANOMALY_SIGNAL_KEY.get_key(), self.DATA_FETCH_TIMEOUT)
+            if anomaly_key:
+                anomaly_key = anomaly_key[1]
         else:
             anomaly_key = ANOMALY_SIGNAL_KEY.client.rpop(ANOMALY_SIGNAL_KEY.get_key())
 
         if not anomaly_key:
+            return []
+
+        anomaly_keys = [anomaly_key]
+        # 仅在队列中还有信号时才批量取出，避免每轮都发送空的RPOP
+        queued_count = ANOMALY_SIGNAL_KEY.client.llen(ANOMALY_SIGNAL_KEY.get_key()) if self.MAX_SIGNAL_COUNT > 1 else 0
+        if queued_count:
+            pipeline = ANOMALY_SIGNAL_KEY.client.pipeline(transaction=False)
+            for _ in range(min(queued_count, self.MAX_SIGNAL_COUNT - 1)):
+                pipeline.rpop(ANOMALY_SIGNAL_KEY.get_key())
+            anomaly_keys.extend(key for key in pipeline.execute() if key)
+
+        # 去重并保持顺序
+        return list(dict.fromkeys(anomaly_keys))
+
+    def handle(self):
+        targets = []
+        for anomaly_key in self.fetch_signals():
+            try:
+                strategy_id, item_id = anomaly_key.split(".")
+            except Exception as e:
+                logger.error("ANOMALY_SIGNAL_KEY({}) parse error：{}".format(anomaly_key, e))
+                continue
+            targets.append((strategy_id, item_id, anomaly_key))
+
+        if not targets:
             return
-        if self.DATA_FETCH_TIMEOUT:
-            anomaly_key = anomaly_key[1]
 
-        try:
-            strategy_id, item_id = anomaly_key.split(".")
-        except Exception as e:
-            logger.error("ANOMALY_SIGNAL_KEY({}) parse error：{}".format(anomaly_key, e))
+        # 每个监控项单独持有锁，处理结束后立即释放
+        locks = {}
+        for strategy_id, item_id, anomaly_key in targets:
+            lock = ExitStack()
+            try:
+                lock.enter_context(service_lock(SERVICE_LOCK_TRIGGER, strategy_id=strategy_id, item_id=item_id))
+            except LockError:
+                logger.info(
+                    "[get service lock fail] strategy({}), item({}). will process later".format(strategy_id, item_id)
+                )
+                ANOMALY_SIGNAL_KEY.client.delay("rpush", ANOMALY_SIGNAL_KEY.get_key(), anomaly_key, delay=1)
+                continue
+            logger.info("[start] strategy({}), item({})".format(strategy_id, item_id))
+            locks[(strategy_id, item_id)] = lock
+
+        if not locks:
             return
 
-        logger.info("[start] strategy({}), item({})".format(strategy_id, item_id))
+        def finish(target, exc=None):
+            """
+            监控项处理结束：释放锁并按监控项记录处理结果
+            """
+            lock = locks.pop(target, None)
+            if lock is None:
+                return
+            lock.close()
+            logger.info("[end] strategy({}), item({})".format(*target))
+            metrics.TRIGGER_PROCESS_COUNT.labels(
+                strategy_id=metrics.TOTAL_TAG, status=metrics.StatusEnum.from_exc(exc), exception=exc
+            ).inc()
 
         exc = None
         try:
-            with service_lock(SERVICE_LOCK_TRIGGER, strategy_id=strategy_id, item_id=item_id):
-                with metrics.TRIGGER_PROCESS_TIME.labels(strategy_id=metrics.TOTAL_TAG).time():
-                    processor = TriggerProcessor(strategy_id, item_id)
-                    processor.process()
-        except LockError:
-            logger.info(
-                "[get service lock fail] strategy({}), item({}). will process later".format(strategy_id, item_id)
-            )
-            ANOMALY_SIGNAL_KEY.client.delay("rpush", ANOMALY_SIGNAL_KEY.get_key(), anomaly_key, delay=1)
+            with metrics.TRIGGER_PROCESS_TIME.labels(strategy_id=metrics.TOTAL_TAG).time():
+                processors = {}
+                for target in list(locks):
+                    try:
+                        processors[TriggerProcessor(*target)] = target
+                    except Exception as e:
+                        logger.exception(
+                            "[process error] strategy({}), item({}) reason：{}".format(target[0], target[1], e)
+                        )
+                        finish(target, e)
+
+                if len(processors) == 1:
+                    processor, target = next(iter(processors.items()))
+                    try:
+                        processor.process()
+                    except Exception as e:
+                        logger.exception(
+                            "[process error] strategy({}), item({}) reason：{}".format(target[0], target[1], e)
+                        )
+                        finish(target, e)
+                elif processors:
+                    TriggerProcessor.process_batch(
+                        list(processors),
+                        finish_callback=lambda processor, error: finish(processors[processor], error),
+                    )
         except Exception as e:
             exc = e
             logger.exception(
-                "[process error] strategy({strategy_id}), item({item_id}) reason：{msg}".format(
-                    strategy_id=strategy_id, item_id=item_id, msg=e
+                "[process error] strategy-items({targets}) reason：{msg}".format(
+                    targets=", ".join("{}.{}".format(*target) for target in locks), msg=e
                 )
             )
+        finally:
+            # 未单独结束的监控项(正常处理完成或批量处理中途异常)在此统一结束
+            for target in list(locks):
+                finish(target, exc)
 
-        logger.info("[end] strategy({}), item({})".format(strategy_id, item_id))
-
-        metrics.TRIGGER_PROCESS_COUNT.labels(
-            strategy_id=metrics.TOTAL_TAG, status=metrics.StatusEnum.from_exc(exc), exception=exc
-        ).inc()
         metrics.report_all()
@@ -22,7 +22,7 @@ from alarm_backends.core.cache.key import (
     TRIGGER_EVENT_LIST_KEY,
 )
 from alarm_backends.core.control.strategy import Strategy
-from alarm_backends.service.trigger.checker import AnomalyChecker
+from alarm_backends.service.trigger.checker import AnomalyChecker, prefetch_check_results
 from core.errors.alarm_backends import StrategyNotFound
 from core.prometheus import metrics
 
@@ -90,6 +90,9 @@ class TriggerProcessor(object):
         pipeline.execute()
 
     def push_event_to_kafka(self, event_records):
+        MonitorEventAdapter.push_to_kafka(events=self.adapt_events(event_records))
+
+    def adapt_events(self, event_records):
         events = []
         current_time = int(time.time())
         for record in event_records:
@@ -103,12 +106,18 @@ class TriggerProcessor(object):
                 strategy=self.get_strategy_snapshot(record["event_record"]["strategy_snapshot_key"]),
             )
             events.append(adapter.adapt())
-        MonitorEventAdapter.push_to_kafka(events=events)
+        return events
 
-    def push(self):
-        # 推送事件记录到输出队列
+    def push(self, events=None):
+        """
+        推送事件记录到输出队列
+        :param events: 批量处理时传入的事件收集列表，传入时只做事件转换，由调用方统一推送
+        """
         if self.event_records:
-            self.push_event_to_kafka(self.event_records)
+            if events is None:
+                self.push_event_to_kafka(self.event_records)
+            else:
+                events.extend(self.adapt_events(self.event_records))
             logger.info(
                 "[process result collect] strategy({}), item({}) finish."
                 "push {} AnomalyRecord, {} Event".format(
@@ -123,26 +132,114 @@ class TriggerProcessor(object):
 
     def process(self):
         self.pull()
+        checkers = self.gen_checkers()
+        prefetch_check_results([checker for checker, _ in checkers])
+        self.check(checkers)
+        self.push()
 
+    @classmethod
+    def process_batch(cls, processors, finish_callback=None):
+        """
+        批量处理多个监控项：检测结果窗口一次性预取，事件统一推送
+        :param finish_callback: 单个监控项处理结束时的回调 finish_callback(processor, exc)，
+            处理失败或没有事件的监控项在检测后即结束，有事件的监控项在事件推送后结束
+        """
+
+        def finish(processor, exc=None):
+            if finish_callback:
+                finish_callback(processor, exc)
+
+        pending = []
+        for processor in processors:
+            try:
+                processor.pull()
+                pending.append((processor, processor.gen_checkers()))
+            except Exception as e:
+                logger.exception(
+                    "[process error] strategy({}), item({}) reason: {}".format(
+                        processor.strategy_id, processor.item_id, e
+                    )
+                )
+                finish(processor, e)
+
+        prefetch_check_results([checker for _, checkers in pending for checker, _ in checkers])
+
+        events = []
+        event_processors = []
+        for processor, checkers in pending:
+            event_count = len(events)
+            try:
+                processor.check(checkers)
+                processor.push(events)
+            except Exception as e:
+                logger.exception(
+                    "[process error] strategy({}), item({}) reason: {}".format(
+                        processor.strategy_id, processor.item_id, e
+                    )
+                )
+                finish(processor, e)
+                continue
+
+            if len(events) > event_count:
+                event_processors.append(processor)
+            else:
+                finish(processor)
+
+        try:
+            MonitorEventAdapter.push_to_kafka(events=events)
+        except Exception as e:
+            logger.exception(
+                "[process error] strategy-items({}) push events reason: {}".format(
+                    ", ".join("{}.{}".format(p.strategy_id, p.item_id) for p in event_processors), e
+                )
+            )
+            for processor in event_processors:
+                finish(processor, e)
+            return
+
+        for processor in event_processors:
+            finish(processor)
+
+    def gen_checkers(self):
+        """
+        解析异常点并生成检测器
+        :return: [(checker, origin_point)]
+        """
+        checkers = []
         in_alarm_time, message = self.strategy.in_alarm_time()
         if not in_alarm_time:
             logger.info("[trigger] strategy(%s) not in alarm time: %s, skipped", self.strategy_id, message)
-        else:
-            for point in self.anomaly_points:
-                try:
-                    self.process_point(point)
-                except Exception as e:
-                    error_message = "[process error] strategy({}), item({}) reason: {} \norigin data: {}".format(
-                        self.strategy_id, self.item_id, e, point
-                    )
-                    logger.exception(error_message)
-
-        self.push()
+            return checkers
+
+        for point in self.anomaly_points:
+            try:
+                checkers.append((self.gen_checker(point), point))
+            except Exception as e:
+                error_message = "[process error] strategy({}), item({}) reason: {} \norigin data: {}".format(
+                    self.strategy_id, self.item_id, e, point
+                )
+                logger.exception(error_message)
+        return checkers
 
-    def process_point(self, point):
+    def gen_checker(self, point):
         point = json.loads(point)
         strategy = self.get_strategy_snapshot(point["strategy_snapshot_key"])
-        checker = AnomalyChecker(point, strategy, self.item_id)
+        return AnomalyChecker(point, strategy, self.item_id)
+
+    def check(self, checkers):
+        for checker, point in checkers:
+            try:
+                self.check_point(checker)
+            except Exception as e:
+                error_message = "[process error] strategy({}), item({}) reason: {} \norigin data: {}".format(
+                    self.strategy_id, self.item_id, e, point
+                )
+                logger.exception(error_message)
+
+    def process_point(self, point):
+        self.check_point(self.gen_checker(point))
+
+    def check_point(self, checker):
         anomaly_records, event_record = checker.check()
 
         # 暂存结果，最后批量保存
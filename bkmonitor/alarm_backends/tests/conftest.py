@@ -29,6 +29,8 @@ def pytest_configure():
         "elasticsearch_dsl.connections.Connections.create_connection", return_value=FakeElasticsearchBucket()
     ).start()
     settings.PUSH_MONITOR_EVENT_TO_FTA = False
+    # fakeredis 默认不支持lua脚本，使用pipeline实现
+    settings.ENABLE_REDIS_LUA_SCRIPT = False
     TestCase.databases = {"default", "monitor_api"}
 
 
@@ -46,6 +48,53 @@ MOCK_BCS_CLUSTER_MANAGER_FETCH_CLUSTERS = [
 ]
 
 
+@pytest.fixture(autouse=True)
+def clear_strategy_snapshot_cache():
+    """用例之间会清理redis，进程内的策略快照缓存也需要同步清理 ."""
+    from alarm_backends.core.control.strategy import (
+        STRATEGY_SNAPSHOT_CACHE,
+        STRATEGY_SNAPSHOT_WRITTEN,
+    )
+
+    STRATEGY_SNAPSHOT_CACHE.clear()
+    STRATEGY_SNAPSHOT_WRITTEN.clear()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def clear_history_point_cache():
+    """用例之间会清理redis，进程内的历史数据缓存也需要同步清理 ."""
+    from alarm_backends.service.detect.strategy import HISTORY_POINT_CACHE
+
+    HISTORY_POINT_CACHE.clear()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def clear_shield_index():
+    """用例之间会清理redis，进程内的屏蔽配置索引也需要同步清理 ."""
+    from alarm_backends.service.converge.shield.shield_index import ShieldIndexManager
+
+    ShieldIndexManager.clear()
+    yield
+
+
+@pytest.fixture
+def proxy():
+    """按策略ID路由到两个 fakeredis 节点的 RedisProxy，返回 (proxy, {node_id: client}) ."""
+    from alarm_backends.core.storage.redis_cluster import RedisProxy
+    from alarm_backends.tests.core.storage import NODES
+
+    clients = {
+        node.id: fakeredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True) for node in NODES.values()
+    }
+    with mock.patch(
+        "alarm_backends.core.storage.redis_cluster.get_node_by_strategy_id",
+        side_effect=lambda strategy_id: NODES[strategy_id % 2],
+    ), mock.patch.object(RedisProxy, "get_client", side_effect=lambda node: clients[node.id], autospec=False):
+        yield RedisProxy("service"), clients
+
+
 @pytest.fixture
 def monkeypatch_cluster_management_fetch_clusters(monkeypatch):
     """返回集群列表 ."""
@@ -23,6 +23,10 @@ from alarm_backends.core.cache.cmdb import (
     ServiceInstanceManager,
     TopoManager,
 )
+from alarm_backends.core.cache.cmdb.base import (
+    COMPACT_SERIALIZE_PREFIX,
+    CMDBCacheManager,
+)
 from api.cmdb.define import Business, Host, Module, ServiceInstance, TopoNode, TopoTree
 
 BIZ_IDS = [2, 3, 4, 5, 6, 10, 20, 21]
@@ -181,6 +185,21 @@ class TestHostManager(TestCase):
         new_host_obj = HostManager.deserialize(obj_bin)
         self.assertEqual(host_obj, new_host_obj)
 
+    def test_compact_serialize(self):
+        host_obj = Host(bk_host_innerip="10.0.0.1", bk_cloud_id=0, bk_host_id=1, bk_biz_id=2, bk_module_ids=[5])
+        host_obj.topo_link = {"module|5": [TopoNode("module", 5), TopoNode("set", 3), TopoNode("biz", 2)]}
+        obj_str = HostManager.serialize(host_obj)
+        self.assertTrue(obj_str.startswith(COMPACT_SERIALIZE_PREFIX))
+
+        new_host_obj = HostManager.deserialize(obj_str)
+        self.assertEqual(host_obj, new_host_obj)
+        self.assertEqual(new_host_obj.ip, "10.0.0.1")
+        self.assertEqual(new_host_obj.bk_module_ids, [5])
+        self.assertEqual(new_host_obj.topo_link, host_obj.topo_link)
+
+        # 兼容pickle格式的旧数据
+        self.assertEqual(host_obj, HostManager.deserialize(CMDBCacheManager.serialize(host_obj)))
+
     def test_key_convert(self):
         self.assertEqual("10.0.0.1|0", HostManager.key_to_internal_value(ip="10.0.0.1", bk_cloud_id=0))
         self.assertEqual("10.0.0.1|0", HostManager.key_to_representation("10.0.0.1|0"))
@@ -301,6 +320,43 @@ class TestHostManager(TestCase):
         # 业务拉取异常
         self.assertEqual(4, HostManager.get(ip="10.0.0.5", bk_cloud_id=5).bk_biz_id)
 
+    @mock.patch("alarm_backends.core.cache.cmdb.host.api.cmdb.get_host_by_topo_node")
+    def test_refresh_delta(self, get_host_by_topo_node):
+        host_names = {}
+
+        def mocked_get_host_by_topo_node(bk_biz_id, **kwargs):
+            return [
+                Host(
+                    bk_host_innerip=host.ip,
+                    bk_cloud_id=host.bk_cloud_id,
+                    bk_host_id=host.bk_host_id,
+                    bk_biz_id=bk_biz_id,
+                    bk_host_name=host_names.get(host.bk_host_id, ""),
+                )
+                for host in ALL_HOSTS
+                if host.bk_biz_id == bk_biz_id
+            ]
+
+        get_host_by_topo_node.side_effect = mocked_get_host_by_topo_node
+        HostManager.refresh()
+
+        # 内容未变化的对象不会被重写
+        HostManager.cache.hset(HostManager.CACHE_KEY, "3", "unchanged")
+        HostManager.refresh()
+        self.assertEqual("unchanged", HostManager.cache.hget(HostManager.CACHE_KEY, "3"))
+
+        # 内容变化的对象会被更新
+        host_names[1] = "new"
+        HostManager.refresh()
+        self.assertEqual("new", HostManager.get_by_id(1).bk_host_name)
+        self.assertEqual("unchanged", HostManager.cache.hget(HostManager.CACHE_KEY, "3"))
+
+        # 缓存字段丢失时全量写入
+        HostManager.cache.hdel(HostManager.CACHE_KEY, "4")
+        HostManager.refresh()
+        self.assertEqual(4, HostManager.get_by_id(4).bk_host_id)
+        self.assertEqual(3, HostManager.get_by_id(3).bk_host_id)
+
     @mock.patch("alarm_backends.core.cache.cmdb.business.api.cmdb.get_business")
     def test_remove_biz(self, get_business):
         get_business.return_value = ALL_BUSINESS
@@ -348,3 +348,34 @@ class TestChecker(TestCase):
         mock_last_check_key(self, 9940)
         data_points = [DataPoint(record, self.item) for record in RECORDS]
         self.assertEqual(self.item.check(data_points, check_timestamp), ANOMALY_INFO[:2])
+
+    def test_no_data_last_seen(self):
+        records = [
+            {"dimensions": {"bk_target_cloud_id": "0", "bk_target_ip": "127.0.0.1", "device": "a"}, "time": 9940},
+            {"dimensions": {"bk_target_cloud_id": "0", "bk_target_ip": "127.0.0.1", "device": "b"}, "time": 10000},
+            {"dimensions": {"bk_target_cloud_id": "0", "bk_target_ip": "127.0.0.2"}, "time": 9880},
+            {"dimensions": {"bk_target_ip": "127.0.0.3"}, "time": 10000},
+        ]
+        self.assertEqual(self.item.update_no_data_last_seen(records), 2)
+        # 较早的上报不会覆盖已记录的最后上报时间
+        self.item.update_no_data_last_seen(records[:1])
+
+        dimensions1 = {"bk_target_cloud_id": "0", "bk_target_ip": "127.0.0.1", NO_DATA_TAG_DIMENSION: True}
+        dimensions2 = {"bk_target_cloud_id": "0", "bk_target_ip": "127.0.0.2", NO_DATA_TAG_DIMENSION: True}
+        last_seen = self.item.get_no_data_last_seen(check_timestamp=10000)
+        self.assertEqual(set(last_seen), {count_md5(dimensions1), count_md5(dimensions2)})
+        self.assertEqual(last_seen[count_md5(dimensions1)], (10000, dimensions1))
+        self.assertEqual(last_seen[count_md5(dimensions2)], (9880, dimensions2))
+
+        # 无数据维度配置变更后，旧维度被清理
+        self.item.no_data_config = dict(self.item.no_data_config, agg_dimension=["bk_target_ip"])
+        self.assertEqual(self.item.get_no_data_last_seen(check_timestamp=10000), {})
+        last_seen_key = key.NO_DATA_LAST_SEEN_KEY.get_key(strategy_id=self.item.strategy.id, item_id=self.item.id)
+        self.assertFalse(key.NO_DATA_LAST_SEEN_KEY.client.hgetall(last_seen_key))
+
+    def test_get_no_data_last_checkpoints(self):
+        dms_md5_list = ["e5a9d7c74835f2637cff046a47737f81", "4b2af89bdb5f9c09e55743b07c306a77"]
+        mock_last_check_key(self, 9940, dms_md5_list[:1])
+        self.assertEqual(
+            self.item.get_no_data_last_checkpoints(dms_md5_list), {dms_md5_list[0]: "9940", dms_md5_list[1]: None}
+        )
@@ -99,3 +99,32 @@ class TestStrategy(TestCase):
             [],
         ]
         self.assertFalse(strategy.in_alarm_time(datetime.strptime("2022-01-01 01:00:00", "%Y-%m-%d %H:%M:%S"))[0])
+
+    def test_strategy_snapshot(self):
+        from alarm_backends.core.cache import key
+
+        config = copy.deepcopy(STRATEGY)
+        config["update_time"] = 1600000000
+        strategy = Strategy(1, config)
+        snapshot_key = strategy.gen_strategy_snapshot()
+        client = key.STRATEGY_SNAPSHOT_KEY.client
+        self.assertTrue(client.exists(snapshot_key))
+
+        # 快照已写入时不会覆盖
+        with mock.patch.object(client, "set") as mock_set:
+            self.assertEqual(Strategy(1, config).gen_strategy_snapshot(), snapshot_key)
+            mock_set.assert_not_called()
+
+        snapshot = Strategy.get_strategy_snapshot_by_key(snapshot_key, 1)
+        self.assertEqual(snapshot["id"], 1)
+
+        # 第二次读取命中进程内缓存
+        with mock.patch.object(client, "get") as mock_get:
+            cached_snapshot = Strategy.get_strategy_snapshot_by_key(snapshot_key, 1)
+            mock_get.assert_not_called()
+        self.assertEqual(cached_snapshot, snapshot)
+
+        # 调用方修改返回的快照不影响缓存
+        cached_snapshot["items"].append({"id": 2})
+        cached_snapshot["extra"] = {"changed": True}
+        self.assertEqual(Strategy.get_strategy_snapshot_by_key(snapshot_key, 1), snapshot)
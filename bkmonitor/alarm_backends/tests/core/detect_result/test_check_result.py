@@ -10,9 +10,18 @@ specific language governing permissions and limitations under the License.
 """
 
 
+import json
+import unittest
+
 from django.test import TestCase
 
-from alarm_backends.core.detect_result import CheckResult
+from alarm_backends.core.cache import key
+from alarm_backends.core.detect_result import (
+    ANOMALY_LABEL,
+    RECORD_CHECK_RESULT_SCRIPT,
+    CheckResult,
+    check_result_trim_end,
+)
 from alarm_backends.tests.core.detect_result.mock import fakeredis, patch
 from alarm_backends.tests.core.detect_result.mock_settings import ALARM_BACKENDS_REDIS
 from bkmonitor.models import CacheNode
@@ -20,6 +29,11 @@ from bkmonitor.utils.common_utils import count_md5
 
 DIMENSION = {"bk_target_ip": "127.0.0.1", "bk_target_cloud_id": 0}
 
+try:
+    import lupa  # noqa
+except ImportError:
+    lupa = None
+
 
 class TestDetectResult(TestCase):
     def setUp(self):
@@ -109,3 +123,70 @@ class TestDetectResult(TestCase):
             CheckResult.get_dimensions_keys(service_type="detect", strategy_id=1, item_id=1),
             [check_result1.dimensions_md5],
         )
+
+    def assert_check_results_recorded(self):
+        md5_1, md5_2 = count_md5(DIMENSION), count_md5({"bk_target_ip": "127.0.0.2"})
+        points = [(md5_1, 1000 + i * 60, i) for i in range(5)] + [(md5_2, 1000, ANOMALY_LABEL)]
+        CheckResult.record_check_results(
+            strategy_id=1,
+            item_id=1,
+            level=2,
+            points=points,
+            last_checkpoints={md5_1: 1240, md5_2: 1000},
+            max_len=4,
+        )
+
+        client = key.CHECK_RESULT_CACHE_KEY.client
+        check_result_key = key.CHECK_RESULT_CACHE_KEY.get_key(strategy_id=1, item_id=1, dimensions_md5=md5_1, level=2)
+        self.assertEqual(client.zrange(check_result_key, 0, -1), ["1120|2", "1180|3", "1240|4"])
+        self.assertTrue(client.ttl(check_result_key) > 0)
+        check_result_key = key.CHECK_RESULT_CACHE_KEY.get_key(strategy_id=1, item_id=1, dimensions_md5=md5_2, level=2)
+        self.assertEqual(client.zrange(check_result_key, 0, -1), ["1000|{}".format(ANOMALY_LABEL)])
+
+        last_checkpoint_key = key.LAST_CHECKPOINTS_CACHE_KEY.get_key(strategy_id=1, item_id=1)
+        self.assertEqual(
+            key.LAST_CHECKPOINTS_CACHE_KEY.client.hgetall(last_checkpoint_key),
+            {
+                key.LAST_CHECKPOINTS_CACHE_KEY.get_field(dimensions_md5=md5_1, level=2): "1240",
+                key.LAST_CHECKPOINTS_CACHE_KEY.get_field(dimensions_md5=md5_2, level=2): "1000",
+            },
+        )
+
+    def test_record_check_results(self):
+        self.assert_check_results_recorded()
+
+    @unittest.skipIf(lupa is None, "lua script requires lupa")
+    def test_record_check_results_by_script(self):
+        with self.settings(ENABLE_REDIS_LUA_SCRIPT=True):
+            self.assert_check_results_recorded()
+
+    def test_record_check_results_script_args(self):
+        md5_1, md5_2 = count_md5(DIMENSION), count_md5({"bk_target_ip": "127.0.0.2"})
+        points = [(md5_1, 1000, 1), (md5_2, 1000, ANOMALY_LABEL), (md5_1, 1060, 2)]
+        client = key.CHECK_RESULT_CACHE_KEY.client
+        with self.settings(ENABLE_REDIS_LUA_SCRIPT=True), patch.object(
+            client, "run_script", return_value=2
+        ) as run_script:
+            CheckResult.record_check_results(
+                strategy_id=1, item_id=1, level=2, points=points, last_checkpoints={md5_1: 1060}, max_len=4
+            )
+
+        self.assertIs(run_script.call_args[0][0], RECORD_CHECK_RESULT_SCRIPT)
+        # 脚本写入的key全部通过KEYS传入
+        keys = run_script.call_args[1]["keys"]
+        self.assertEqual(
+            keys,
+            [
+                key.LAST_CHECKPOINTS_CACHE_KEY.get_key(strategy_id=1, item_id=1),
+                CheckResult.get_md5_to_dimension_key("detect", 1, 1),
+                key.CHECK_RESULT_CACHE_KEY.get_key(strategy_id=1, item_id=1, dimensions_md5=md5_1, level=2),
+                key.CHECK_RESULT_CACHE_KEY.get_key(strategy_id=1, item_id=1, dimensions_md5=md5_2, level=2),
+            ],
+        )
+        payload = json.loads(run_script.call_args[1]["args"][0])
+        self.assertEqual(payload["points"], [[3, "1000", "1"], [4, "1000", ANOMALY_LABEL], [3, "1060", "2"]])
+        self.assertEqual(
+            payload["checkpoints"], [[key.LAST_CHECKPOINTS_CACHE_KEY.get_field(dimensions_md5=md5_1, level=2), "1060"]]
+        )
+        self.assertEqual(payload["trim_end"], check_result_trim_end(4))
+        self.assertEqual(payload["ttl"], key.CHECK_RESULT_CACHE_KEY.ttl)
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+
+from alarm_backends.core.cache.key import SimilarStr
+
+
+class FakeNode(object):
+    def __init__(self, node_id):
+        self.id = node_id
+
+
+# 按策略ID奇偶路由到两个节点
+NODES = {0: FakeNode(1), 1: FakeNode(2)}
+
+
+def make_key(name, strategy_id):
+    key = SimilarStr(name)
+    key.strategy_id = strategy_id
+    return key
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import json
+import time
+
+import fakeredis
+import mock
+import pytest
+
+from alarm_backends.core.storage.counter import (
+    COUNTER_SCRIPT,
+    SLIDING_WINDOW,
+    CounterRequest,
+    MemoryCounterClient,
+    WindowCounter,
+)
+from alarm_backends.tests.core.storage import NODES, make_key
+
+try:
+    import lupa  # noqa
+except ImportError:
+    lupa = None
+
+
+class TestWindowCounter(object):
+    def test_fixed_window(self):
+        client = MemoryCounterClient()
+        counter = WindowCounter(client=client)
+        assert counter.incr("qos", window=60, limit=2) == (1, True)
+        assert counter.incr("qos", window=60, limit=2) == (2, True)
+        assert counter.incr("qos", window=60, limit=2) == (3, False)
+        assert counter.get("qos", window=60) == 3
+        assert 0 < client.ttl("qos") <= 60
+
+        # 固定窗口到期后重新计数
+        with mock.patch("time.time", return_value=time.time() + 61):
+            assert counter.incr("qos", window=60, limit=2) == (1, True)
+
+    def test_rollback_and_release(self):
+        counter = WindowCounter(client=MemoryCounterClient())
+        assert counter.incr("lock", window=60, limit=1, rollback=True, refresh_ttl=True).allowed
+        assert not counter.incr("lock", window=60, limit=1, rollback=True, refresh_ttl=True).allowed
+        assert counter.get("lock", window=60) == 1
+
+        assert counter.release("lock", window=60) == 0
+        # 计数不会小于0
+        assert counter.release("lock", window=60) == 0
+        assert counter.incr("lock", window=60, limit=1, rollback=True).allowed
+
+    def test_sliding_window(self):
+        counter = WindowCounter(window_type=SLIDING_WINDOW, client=MemoryCounterClient())
+        now = time.time()
+        with mock.patch("time.time", return_value=now):
+            assert counter.incr("qos", window=60, limit=2) == (1, True)
+        with mock.patch("time.time", return_value=now + 30):
+            assert counter.incr("qos", window=60, amount=2, limit=2, rollback=True) == (3, False)
+            assert counter.incr("qos", window=60, limit=2) == (2, True)
+        # 第一次计数滑出窗口
+        with mock.patch("time.time", return_value=now + 61):
+            assert counter.get("qos", window=60) == 1
+
+    def test_redis_commands(self, proxy):
+        proxy, clients = proxy
+        counter = WindowCounter(client=proxy)
+        key = make_key("qos", 1)
+        assert [counter.incr(key, window=60, limit=1).allowed for _ in range(2)] == [True, False]
+        assert clients[NODES[1].id].get("qos") == "2"
+        assert 0 < clients[NODES[1].id].ttl("qos") <= 60
+
+        sliding_counter = WindowCounter(window_type=SLIDING_WINDOW, client=proxy)
+        key = make_key("sliding", 2)
+        assert sliding_counter.incr(key, window=60, amount=3) == (3, True)
+        assert sliding_counter.release(key, window=60, amount=2) == 1
+        assert clients[NODES[0].id].zcard("sliding") == 1
+
+    def test_evaluate_by_script(self, proxy, settings):
+        settings.ENABLE_REDIS_LUA_SCRIPT = True
+        proxy, clients = proxy
+        calls = []
+
+        def fake_script(client, keys, args):
+            # fakeredis 不支持lua脚本，按脚本参数使用命令方式计数
+            calls.append(keys)
+            payload = json.loads(args[0])
+            counter = WindowCounter(client=client)
+            with mock.patch.object(WindowCounter, "use_script", False):
+                results = counter.evaluate(
+                    [
+                        CounterRequest(key, *item[:3], rollback=item[3], refresh_ttl=item[4])
+                        for key, item in zip(keys, payload["items"])
+                    ]
+                )
+            return [value for result in results for value in (result.count, int(result.allowed))]
+
+        keys = [make_key("qos{}".format(i % 4), i % 4) for i in range(10)]
+        with mock.patch("alarm_backends.core.storage.counter.COUNTER_SCRIPT", side_effect=fake_script):
+            results = WindowCounter(client=proxy).evaluate([CounterRequest(key, 60, limit=2) for key in keys])
+
+        # 每个节点只调用一次脚本
+        assert len(calls) == 2
+        assert [result.count for result in results] == [1, 1, 1, 1, 2, 2, 2, 2, 3, 3]
+        assert [result.allowed for result in results] == [True] * 8 + [False] * 2
+
+    def test_alert_storm(self):
+        # 模拟每分钟1w条告警，分布在20个策略上，每个策略的QOS阈值为200
+        counter = WindowCounter(client=MemoryCounterClient())
+        requests = [CounterRequest("alert.qos.{}".format(i % 20), 60, limit=200) for i in range(10000)]
+        results = counter.evaluate(requests)
+
+        assert sum(1 for result in results if not result.allowed) == 10000 - 20 * 200
+        assert max(result.count for result in results) == 500
+
+    @pytest.mark.skipif(lupa is None, reason="lua script requires lupa")
+    def test_counter_script(self):
+        client = fakeredis.FakeRedis(decode_responses=True)
+
+        def run(keys, items, sliding=False, now=None):
+            payload = {
+                "items": [request.to_payload() for request in items],
+                "sliding": sliding,
+                "now": now or time.time(),
+                "member": "test",
+            }
+            return COUNTER_SCRIPT(client, keys, [json.dumps(payload)])
+
+        # 固定窗口: 第二次超过阈值，回退计数
+        requests = [CounterRequest("qos", 60, limit=1, rollback=True), CounterRequest("qos", 60, limit=1, rollback=True)]
+        assert run(["qos", "qos"], requests) == [1, 1, 2, 0]
+        assert client.get("qos") == "1"
+        assert 0 < client.ttl("qos") <= 60
+
+        # 释放计数不会小于0
+        assert run(["qos"], [CounterRequest("qos", 60, amount=-5)]) == [0, 1]
+
+        # 滑动窗口: 超过阈值不回退时保留计数
+        now = time.time()
+        requests = [CounterRequest("sliding", 60, amount=2, limit=2), CounterRequest("sliding", 60, limit=2)]
+        assert run(["sliding", "sliding"], requests, sliding=True, now=now) == [2, 1, 3, 0]
+        assert run(["sliding"], [CounterRequest("sliding", 60, amount=0)], sliding=True, now=now + 61) == [0, 1]
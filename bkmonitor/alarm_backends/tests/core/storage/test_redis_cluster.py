@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+
+from alarm_backends.tests.core.storage import NODES, make_key
+
+
+class TestRedisProxy(object):
+    def test_pipeline_execute(self, proxy):
+        proxy, clients = proxy
+        keys = [make_key("key{}".format(i), i) for i in range(6)]
+        pipeline = proxy.pipeline(transaction=False)
+        for index, key in enumerate(keys):
+            pipeline.set(key, index)
+            pipeline.get(key)
+        result = pipeline.execute()
+        assert result == [r for index in range(6) for r in (True, str(index))]
+        assert clients[1].get("key0") == "0"
+        assert clients[2].get("key1") == "1"
+        assert clients[1].get("key1") is None
+
+    def test_mget(self, proxy):
+        proxy, clients = proxy
+        for i in range(6):
+            clients[NODES[i % 2].id].set("key{}".format(i), i)
+        keys = [make_key("key{}".format(i), i) for i in [5, 0, 3, 2, 9]]
+        assert proxy.mget(keys) == ["5", "0", "3", "2", None]
+        assert proxy.mget([]) == []
+
+    def test_mget_single_key(self, proxy):
+        proxy, clients = proxy
+        for i in range(2):
+            clients[NODES[i % 2].id].set("key{}".format(i), i)
+        assert proxy.mget(make_key("key1", 1)) == ["1"]
+        assert proxy.mget(make_key("key1", 1), make_key("key0", 0)) == ["1", "0"]
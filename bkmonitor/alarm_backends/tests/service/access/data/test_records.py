@@ -11,10 +11,18 @@ specific language governing permissions and limitations under the License.
 
 
 import copy
+import json
+
+import pytest
 
 from alarm_backends.core.cache.strategy import StrategyCacheManager
 from alarm_backends.core.control.strategy import Strategy
-from alarm_backends.service.access.data.records import DataRecord
+from alarm_backends.service.access.data.records import (
+    DataRecord,
+    dump_records_data,
+    load_records_data,
+)
+from bkmonitor.utils.common_utils import count_dimension_md5, count_md5
 
 from .config import FORMAT_RAW_DATA, STANDARD_DATA, STRATEGY_CONFIG_V3
 
@@ -32,3 +40,28 @@ class TestRecords(object):
         record.data.pop("access_time", None)
         record.data.pop("dimension_fields", None)
         assert record.data == STANDARD_DATA
+
+    def test_count_dimension_md5(self):
+        dimensions = [
+            {},
+            STANDARD_DATA["dimensions"],
+            {"bk_target_ip": "127.0.0.1", "bk_target_cloud_id": 0, "device_name": None},
+            {"tags": ["a", "b"], "bk_target_ip": "127.0.0.1"},
+        ]
+        for dimension in dimensions:
+            assert count_dimension_md5(dimension) == count_md5(dimension)
+
+    def test_dump_records_data(self):
+        records_data = [dict(STANDARD_DATA, time=STANDARD_DATA["time"] + i) for i in range(5)]
+
+        payloads = dump_records_data(records_data, batch_size=1)
+        assert payloads == [json.dumps(record_data) for record_data in records_data]
+
+        payloads = dump_records_data(records_data, batch_size=2)
+        assert len(payloads) == 3
+        # 末尾只剩单条数据时，保持逐条写入的格式
+        assert payloads[-1] == json.dumps(records_data[-1])
+        assert [record_data for payload in payloads for record_data in load_records_data(payload)] == records_data
+
+        with pytest.raises(ValueError):
+            load_records_data(json.dumps([1, 2]))
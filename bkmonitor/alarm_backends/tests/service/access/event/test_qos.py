@@ -8,3 +8,91 @@ Unless required by applicable law or agreed to in writing, software distributed
 an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
 specific language governing permissions and limitations under the License.
 """
+
+
+import fakeredis
+import mock
+
+from alarm_backends.core.cache import key
+from alarm_backends.core.storage.redis_cluster import PipelineProxy
+from alarm_backends.service.access.event.qos import QoSMixin
+
+
+class FakeRecord(object):
+    def __init__(self, record_id, ip, strategy_ids, level=1):
+        self.id = record_id
+        self.bk_biz_id = 2
+        self.level = level
+        self.data = {"data": {"dimensions": {"bk_target_ip": ip}}}
+        self.items = [
+            mock.MagicMock(id=strategy_id * 10, strategy=mock.MagicMock(id=strategy_id)) for strategy_id in strategy_ids
+        ]
+        self.is_retains = {item.id: True for item in self.items}
+        self.inhibitions = {item.id: False for item in self.items}
+
+
+class QoSProcessor(QoSMixin):
+    def __init__(self, record_list):
+        self.record_list = record_list
+
+
+def sequential_check_qos(record_list, client, threshold):
+    """逐条计数的实现，作为批量计数的对照"""
+    result = []
+    for event_record in record_list:
+        for item in event_record.items:
+            if not event_record.is_retains[item.id] or event_record.inhibitions[item.id]:
+                continue
+            field = QoSMixin.hash_alarm_by_match_info(event_record, item.strategy.id, item.id)
+            if client.hincrby(key.QOS_CONTROL_KEY.get_key(), field, 1) <= threshold:
+                result.append(event_record.id)
+    return result
+
+
+class TestQoS(object):
+    def make_records(self):
+        records = []
+        for i in range(300):
+            records.append(FakeRecord(i, "127.0.0.{}".format(i % 3), [1, 2] if i % 2 else [1]))
+        records[5].inhibitions[10] = True
+        return records
+
+    def test_qos_closed(self, settings, proxy):
+        client, _ = proxy
+        processor = QoSProcessor(self.make_records())
+        assert processor.check_qos(client) is False
+        assert len(processor.record_list) == 300
+
+    def test_same_as_sequential(self, settings, proxy):
+        settings.QOS_DROP_ALARM_THREADHOLD = 40
+        client, _ = proxy
+        expected_client = fakeredis.FakeRedis(decode_responses=True, server=fakeredis.FakeServer())
+        for c in [client, expected_client]:
+            c.hset(key.QOS_CONTROL_KEY.get_key(), "__switch__", 1)
+            # 已有的计数
+            c.hset(
+                key.QOS_CONTROL_KEY.get_key(),
+                QoSMixin.hash_alarm_by_match_info(FakeRecord(0, "127.0.0.0", []), 1, 10),
+                30,
+            )
+
+        expected = sequential_check_qos(self.make_records(), expected_client, 40)
+
+        processor = QoSProcessor(self.make_records())
+        processor.QOS_BATCH_SIZE = 2
+        with mock.patch.object(PipelineProxy, "execute", autospec=True, side_effect=PipelineProxy.execute) as execute:
+            assert processor.check_qos(client) is True
+        assert [record.id for record in processor.record_list] == expected
+        assert client.hgetall(key.QOS_CONTROL_KEY.get_key()) == expected_client.hgetall(key.QOS_CONTROL_KEY.get_key())
+        # 6 个计数维度，每批 2 个
+        assert execute.call_count == 3
+
+    def test_incr_error(self, settings, proxy):
+        settings.QOS_DROP_ALARM_THREADHOLD = 0
+        client, _ = proxy
+        client.hset(key.QOS_CONTROL_KEY.get_key(), "__switch__", 1)
+        processor = QoSProcessor(self.make_records())
+        with mock.patch.object(PipelineProxy, "execute", side_effect=ConnectionError):
+            processor.check_qos(client)
+        # 计数失败时不丢弃
+        assert len(processor.record_list) == 450 - 1
@@ -11,24 +11,37 @@ specific language governing permissions and limitations under the License.
 import copy
 import json
 import time
-from unittest import TestCase
+from unittest import TestCase, skipIf
 
+import fakeredis
 import mock
 import pytest
 from django.conf import settings
+from django.test import override_settings
 
 from alarm_backends.core.alert import Alert, Event
 from alarm_backends.core.cache.key import (
     ALERT_DETECT_RESULT,
+    COMPOSITE_CHECK_RESULT,
+    COMPOSITE_CHECK_RESULT_REGISTRY,
+    COMPOSITE_DETECT_RESULT,
     COMPOSITE_DIMENSION_KEY_LOCK,
     COMPOSITE_QOS_COUNTER,
 )
 from alarm_backends.core.cache.strategy import StrategyCacheManager
-from alarm_backends.service.composite.processor import CompositeProcessor
+from alarm_backends.service.composite.processor import (
+    UPDATE_COMPOSITE_CHECK_RESULT_SCRIPT,
+    CompositeProcessor,
+)
 from bkmonitor.models import CacheNode, CacheRouter
 from constants.action import ActionSignal
 from constants.alert import EventStatus
 
+try:
+    import lupa  # noqa
+except ImportError:
+    lupa = None
+
 pytestmark = pytest.mark.django_db
 
 STRATEGY = {
@@ -493,6 +506,96 @@ class TestProcessor(TestCase):
         self.assertEqual(3, int(event["severity"]))
         self.assertEqual("CLOSED", event["status"])
 
+    def test_check_result_registry(self):
+        alert = mock.MagicMock(id="1", update_time=int(time.time()), strategy_id=1)
+        alert.top_event = {"event_id": "dimension_md5.1617504052"}
+        check_result_keys = [
+            COMPOSITE_CHECK_RESULT.get_key(
+                strategy_id=1, dimension_hash="dimension_md5", query_config_id=query_config_id
+            )
+            for query_config_id in ["a", "b", "c"]
+        ]
+        registry_key = COMPOSITE_CHECK_RESULT_REGISTRY.get_key(strategy_id=1, dimension_hash="dimension_md5")
+        check_start_time = int(time.time()) - CompositeProcessor.COMPOSITE_CHECK_WINDOW_SIZE
+
+        processor = CompositeProcessor(alert, alert_status=EventStatus.ABNORMAL)
+        counts = processor.update_check_results(registry_key, check_result_keys, 2, check_start_time)
+        self.assertEqual(counts, [1, 1, 0])
+        self.assertEqual(COMPOSITE_CHECK_RESULT_REGISTRY.client.smembers(registry_key), set(check_result_keys[:2]))
+
+        # 恢复的告警从检测结果中移除
+        processor = CompositeProcessor(alert, alert_status=EventStatus.RECOVERED)
+        counts = processor.update_check_results(registry_key, check_result_keys, 1, check_start_time)
+        self.assertEqual(counts, [0, 1, 0])
+
+        # 清理时从索引中获取检测结果缓存，不扫描key
+        detect_result_key = COMPOSITE_DETECT_RESULT.get_key(strategy_id=1, dimension_hash="dimension_md5")
+        COMPOSITE_DETECT_RESULT.client.set(detect_result_key, "{}")
+        with mock.patch.object(CompositeProcessor, "is_composite_strategy", return_value=True), mock.patch.object(
+            COMPOSITE_CHECK_RESULT.client, "keys"
+        ) as keys:
+            processor.clear_composite_detect_cache()
+            keys.assert_not_called()
+        for cache_key in [detect_result_key, registry_key] + check_result_keys:
+            self.assertFalse(COMPOSITE_CHECK_RESULT.client.exists(cache_key))
+
+    def test_check_result_registry_by_script(self):
+        alert = mock.MagicMock(id="1", update_time=int(time.time()), strategy_id=1)
+        check_result_keys = [
+            COMPOSITE_CHECK_RESULT.get_key(
+                strategy_id=1, dimension_hash="dimension_md5", query_config_id=query_config_id
+            )
+            for query_config_id in ["a", "b", "c"]
+        ]
+        registry_key = COMPOSITE_CHECK_RESULT_REGISTRY.get_key(strategy_id=1, dimension_hash="dimension_md5")
+        check_start_time = int(time.time()) - CompositeProcessor.COMPOSITE_CHECK_WINDOW_SIZE
+
+        processor = CompositeProcessor(alert, alert_status=EventStatus.ABNORMAL)
+        with override_settings(ENABLE_REDIS_LUA_SCRIPT=True), mock.patch.object(
+            COMPOSITE_CHECK_RESULT.client, "run_script", return_value=[1, 1, 0]
+        ) as run_script:
+            counts = processor.update_check_results(registry_key, check_result_keys, 2, check_start_time)
+        self.assertEqual(counts, [1, 1, 0])
+
+        # 写入及统计的key都通过 KEYS 传入
+        args, kwargs = run_script.call_args
+        self.assertIs(args[0], UPDATE_COMPOSITE_CHECK_RESULT_SCRIPT)
+        self.assertEqual(kwargs["keys"], [registry_key] + check_result_keys)
+        payload = json.loads(kwargs["args"][0])
+        self.assertEqual(payload["matched"], 2)
+        self.assertEqual(payload["alert_id"], "1")
+        self.assertTrue(payload["is_abnormal"])
+        self.assertEqual(payload["check_start_time"], check_start_time)
+        self.assertEqual(payload["expire_before"], check_start_time - COMPOSITE_CHECK_RESULT.ttl)
+        self.assertEqual(payload["registry_ttl"], COMPOSITE_CHECK_RESULT_REGISTRY.ttl)
+
+    @skipIf(lupa is None, "lua script requires lupa")
+    def test_update_check_result_script(self):
+        client = fakeredis.FakeRedis(decode_responses=True)
+        now = int(time.time())
+        keys = ["registry", "a", "b", "c"]
+        payload = {
+            "matched": 2,
+            "alert_id": "1",
+            "update_time": now,
+            "is_abnormal": True,
+            "expire_before": now - 600,
+            "check_start_time": now - 60,
+            "ttl": 600,
+            "registry_ttl": 1200,
+        }
+        # 检测窗口外的异常不计数
+        client.zadd("c", {"2": now - 120})
+
+        self.assertEqual(UPDATE_COMPOSITE_CHECK_RESULT_SCRIPT(client, keys, [json.dumps(payload)]), [1, 1, 0])
+        self.assertEqual(client.smembers("registry"), {"a", "b"})
+        self.assertTrue(0 < client.ttl("registry") <= 1200)
+
+        # 恢复的告警从匹配的检测结果中移除
+        payload.update(matched=1, is_abnormal=False)
+        self.assertEqual(UPDATE_COMPOSITE_CHECK_RESULT_SCRIPT(client, keys, [json.dumps(payload)]), [0, 1, 0])
+        self.assertEqual(client.zcard("a"), 0)
+
     def test_single_strategy(self):
         alert = Alert.from_event(
             Event(
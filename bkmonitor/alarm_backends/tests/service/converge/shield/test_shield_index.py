@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+from datetime import datetime, timedelta, timezone
+
+import mock
+import pytest
+
+from alarm_backends.service.converge.shield.shield_index import (
+    ShieldIndex,
+    ShieldIndexManager,
+)
+from alarm_backends.service.converge.shield.shield_obj import AlertShieldObj
+
+
+def make_config(shield_id, category, scope_type, dimension_config):
+    return {
+        "id": shield_id,
+        "is_enabled": True,
+        "bk_biz_id": 2,
+        "category": category,
+        "scope_type": scope_type,
+        "begin_time": datetime.now(tz=timezone.utc) - timedelta(minutes=1),
+        "end_time": datetime.now(tz=timezone.utc) + timedelta(hours=1),
+        "dimension_config": dimension_config,
+        "cycle_config": {"type": 1, "week_list": [], "day_list": [], "begin_time": "", "end_time": ""},
+    }
+
+
+CONFIGS = [
+    make_config(1, "strategy", "instance", {"strategy_id": [1], "level": [1, 2]}),
+    make_config(2, "scope", "ip", {"bk_target_ip": [{"bk_target_ip": "127.0.0.1", "bk_target_cloud_id": 0}]}),
+    make_config(3, "scope", "node", {"bk_topo_node": [{"bk_obj_id": "module", "bk_inst_id": 8}]}),
+    make_config(
+        4,
+        "dimension",
+        "dimension",
+        {"dimension_conditions": [{"key": "device", "value": ["cpu0"], "method": "eq", "condition": "and"}]},
+    ),
+    make_config(5, "strategy", "instance", {"strategy_id": [2]}),
+    make_config(6, "scope", "ip", {"bk_target_ip": ["127.0.0.2"]}),
+]
+
+DIMENSIONS = [
+    {
+        "strategy_id": 1,
+        "level": 1,
+        "bk_target_ip": "127.0.0.1",
+        "bk_target_cloud_id": "0",
+        "bk_topo_node": ["module|8", "set|1"],
+        "device": "cpu0",
+    },
+    {
+        "strategy_id": 2,
+        "level": 3,
+        "bk_target_ip": "127.0.0.2",
+        "bk_target_cloud_id": "0",
+        "bk_topo_node": ["module|9"],
+    },
+    {"strategy_id": 1, "level": 3},
+    {},
+]
+
+
+@pytest.mark.parametrize("dimension", DIMENSIONS)
+def test_match_same_as_scan(dimension):
+    index = ShieldIndex(2, CONFIGS)
+    with mock.patch.object(AlertShieldObj, "get_dimension", return_value=dimension):
+        expected = [config["id"] for config in CONFIGS if AlertShieldObj(config).is_match(None)]
+        assert [shield_obj.id for shield_obj in index.match(None)] == expected
+
+
+def test_candidates():
+    index = ShieldIndex(2, CONFIGS)
+    # 按维度条件屏蔽的配置每次都参与匹配
+    assert [index.shield_objs[position].id for position in index.scan_positions] == [4]
+
+    candidates = [index.shield_objs[position].id for position in index.get_candidates(DIMENSIONS[1])]
+    assert candidates == [4, 5, 6]
+    assert [index.shield_objs[position].id for position in index.get_candidates({})] == [4]
+
+
+def test_index_manager():
+    ShieldIndexManager.clear()
+    with mock.patch(
+        "alarm_backends.core.cache.shield.ShieldCacheManager.get_shields_by_biz_id", return_value=CONFIGS
+    ) as get_shields, mock.patch("alarm_backends.core.cache.shield.ShieldCacheManager.get_version") as get_version:
+        get_version.return_value = "v1"
+        index = ShieldIndexManager.get_index(2)
+        assert len(index) == len(CONFIGS)
+
+        # 版本检查间隔内不访问缓存
+        assert ShieldIndexManager.get_index(2) is index
+        assert get_version.call_count == 1
+
+        # 版本未变化时复用索引
+        index.checked_at = 0
+        assert ShieldIndexManager.get_index(2) is index
+        assert get_shields.call_count == 1
+
+        # 版本变化时重建
+        index.checked_at = 0
+        get_version.return_value = "v2"
+        new_index = ShieldIndexManager.get_index(2)
+        assert new_index is not index
+        assert new_index.version == "v2"
+        assert get_shields.call_count == 2
+    ShieldIndexManager.clear()
@@ -114,6 +114,57 @@ class TestAdvancedRingRatio(object):
         assert len(anomaly_result) == 1
         assert anomaly_result[0].anomaly_message == "avg(测试指标)较前3个时间点的瞬间值(101%)下降超过100.0%, 当前值-1%"
 
+    def test_query_history_points_with_cache(self):
+        from .test_threshold import mock_datapoint_with_value
+
+        CacheRouter.get_node_by_strategy_id(0)
+        CacheNode.refresh_from_settings()
+
+        algorithms_config = {"floor": 100, "ceil": 100, "ceil_interval": 3, "floor_interval": 3, "fetch_type": "last"}
+
+        _datapoint500 = mock_datapoint_with_value(500)
+        query_record = _datapoint500.item.query_record
+        query_record.reset_mock()
+        detect_engine = AdvancedRingRatio(config=algorithms_config, unit="percent")
+        detect_engine.query_history_points([_datapoint500])
+        assert query_record.call_count == 1
+
+        # 新的检测实例直接复用进程内缓存的历史数据，无需再次查询
+        detect_engine = AdvancedRingRatio(config=algorithms_config, unit="percent")
+        detect_engine.query_history_points([_datapoint500])
+        assert query_record.call_count == 1
+        assert len(detect_engine.detect_records(_datapoint500, 1)) == 1
+
+    def test_history_frames_from_redis_not_cached(self):
+        from alarm_backends.core.cache import key
+        from alarm_backends.service.detect.strategy import HISTORY_POINT_CACHE
+
+        from .test_threshold import mock_datapoint_with_value
+
+        CacheRouter.get_node_by_strategy_id(0)
+        CacheNode.refresh_from_settings()
+
+        algorithms_config = {"floor": 100, "ceil": 100, "ceil_interval": 3, "floor_interval": 3, "fetch_type": "last"}
+        _datapoint500 = mock_datapoint_with_value(500)
+        item = _datapoint500.item
+        history_timestamp = _datapoint500.timestamp - 60
+        history_key = key.HISTORY_DATA_KEY.get_key(
+            strategy_id=item.strategy.id, item_id=item.id, timestamp=history_timestamp
+        )
+        key.HISTORY_DATA_KEY.client.hset(history_key, "other_dimensions_md5", "{}")
+
+        detect_engine = AdvancedRingRatio(config=algorithms_config, unit="percent")
+        assert detect_engine._load_history_frames(item, {history_timestamp}) == []
+        # redis中的数据可能被其他进程追加维度，不写入进程内缓存
+        assert HISTORY_POINT_CACHE.get(history_key) is None
+
+    def test_merge_history_timestamps(self):
+        assert AdvancedRingRatio._merge_history_timestamps([180, 60, 120, 600, 86400], 60) == [
+            (60, 240),
+            (600, 660),
+            (86400, 86460),
+        ]
+
     def test_detect_with_invalid_datapoint(self):
         algorithms_config = {"floor": 101, "ceil": 100, "ceil_interval": 3, "floor_interval": 3}
         with pytest.raises(InvalidDataPoint):
@@ -90,6 +90,20 @@ class TestOsRestart(object):
             assert len(anomaly_result) == 1
             assert anomaly_result[0].anomaly_message == "当前服务器在99秒前发生系统重启事件"
 
+    def test_detect_records(self):
+        with mock.patch(
+            "alarm_backends.service.detect.strategy." "os_restart.OsRestart.history_point_fetcher",
+            return_value=[datapoint200, datapoint800, datapoint30, datapoint700],
+        ):
+            from .test_threshold import mock_datapoint_with_value
+
+            detect_engine = OsRestart(config={})
+            # 不使用环比上下限的批量预筛选
+            assert detect_engine.batch_prefilter([]) is None
+            data_points = [mock_datapoint_with_value(value) for value in [99, 700, 300]]
+            anomaly_result = detect_engine.detect_records(data_points, 1)
+            assert [anomaly.data_point.value for anomaly in anomaly_result] == [99, 300]
+
     def test_detect_with_invalid_datapoint(self):
         with pytest.raises(InvalidDataPoint):
             detect_engine = OsRestart(config={})
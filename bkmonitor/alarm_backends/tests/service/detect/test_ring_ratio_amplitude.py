@@ -59,6 +59,20 @@ class TestRingRatioAmplitude(object):
             anomaly_record = detect_result[0]
             assert anomaly_record.anomaly_message == "avg(测试指标) - 前一时刻值1%的绝对值 >= 前一时刻值1% * 1.0 + 50.0%, 当前值99%"
 
+    def test_detect_records(self):
+        with mock.patch(
+            "alarm_backends.service.detect.strategy." "ring_ratio_amplitude.RingRatioAmplitude.history_point_fetcher",
+            return_value=datapoint1,
+        ):
+            from .test_threshold import mock_datapoint_with_value
+
+            detect_engine = RingRatioAmplitude(config={"threshold": 0, "ratio": 1, "shock": 50})
+            # 不使用环比上下限的批量预筛选
+            assert detect_engine.batch_prefilter([]) is None
+            data_points = [mock_datapoint_with_value(value) for value in [99, 10, 60]]
+            detect_result = detect_engine.detect_records(data_points, 1)
+            assert [anomaly.data_point.value for anomaly in detect_result] == [99, 60]
+
     def test_detect_with_invalid_datapoint(self):
         algorithms_config = {"threshold": 0, "ratio": 1, "shock": 50}
         with pytest.raises(InvalidDataPoint):
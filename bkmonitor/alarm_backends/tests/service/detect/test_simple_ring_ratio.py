@@ -102,6 +102,20 @@ class TestSimpleRingRatio(object):
             assert len(anomaly_result) == 1
             assert anomaly_result[0].anomaly_message == "avg(测试指标)较前一时刻(99%)下降超过50.0%, 当前值0%"
 
+    def test_detect_batch_consistency(self):
+        with mock.patch(
+            "alarm_backends.service.detect.strategy." "simple_ring_ratio.SimpleRingRatio.history_point_fetcher",
+            return_value=datapoint99,
+        ):
+            from .test_threshold import mock_datapoint_with_value
+
+            data_points = [mock_datapoint_with_value(value) for value in range(-10, 300)]
+            algorithms_config = {"floor": 50, "ceil": 100}
+            detect_engine = SimpleRingRatio(config=algorithms_config)
+            expected = [data_point.value for data_point in data_points if detect_engine.detect(data_point)]
+            candidates = detect_engine.batch_prefilter(data_points)
+            assert [data_point.value for data_point in candidates] == expected
+
     def test_detect_with_invalid_datapoint(self):
         algorithms_config = {"floor": 99, "ceil": 99}
         with pytest.raises(InvalidDataPoint):
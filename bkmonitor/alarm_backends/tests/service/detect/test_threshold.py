@@ -209,6 +209,34 @@ class TestThreshold(object):
         assert len(anomaly_result) == 1
         assert anomaly_result[0].anomaly_message == "avg(测试指标) = 6.0%, 当前值6%"
 
+    def test_detect_batch_consistency(self):
+        algorithms_config = [
+            [{"threshold": 6, "method": "gt"}, {"threshold": 99, "method": "lte"}, {"threshold": 50, "method": "neq"}],
+            [{"threshold": 6, "method": "eq"}],
+            [{"threshold": 1000, "method": "gte"}],
+        ]
+        detect_engine = Threshold(config=algorithms_config)
+        data_points = [mock_datapoint_with_value(value) for value in list(range(-10, 1100)) + [50.5, 6.0]]
+
+        candidates = detect_engine.batch_prefilter(data_points)
+        expected = [data_point.value for data_point in data_points if detect_engine.detect(data_point)]
+        assert [data_point.value for data_point in candidates] == expected
+
+        # 无法比较的数据点保留给逐点检测，最终被忽略
+        data_points.append(mock_datapoint_with_value(None))
+        anomaly_result = detect_engine.detect_records(data_points, 1)
+        assert [ap.data_point.value for ap in anomaly_result] == expected
+
+    def test_detect_with_debug_flag(self):
+        # strategy_check 通过在数据中写入 __debug__ 开启检测调试
+        data_point = mock_datapoint_with_value(99)
+        assert not hasattr(data_point, "__debug__")
+        data_point.as_dict()["__debug__"] = True
+        assert hasattr(data_point, "__debug__")
+
+        detect_engine = Threshold(config=[[{"threshold": 50.0, "method": "gte"}]])
+        assert len(detect_engine.detect(data_point)) == 1
+
     def test_detect_unknown_method(self):
         algorithms_config = [[{"threshold": 50.0, "method": "unknown"}]]
         with pytest.raises(
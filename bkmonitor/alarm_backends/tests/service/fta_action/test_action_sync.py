@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+from datetime import datetime, timezone
+
+import mock
+import pytest
+
+from alarm_backends.core.cache.key import (
+    ACTION_SYNC_CHANGES_KEY,
+    ACTION_SYNC_PROCESSING_KEY,
+)
+from alarm_backends.service.fta_action.action_sync import ActionChangeLog
+from alarm_backends.service.fta_action.tasks import action_tasks
+from bkmonitor.models import ActionInstance
+from constants.action import ActionSignal, ActionStatus
+
+pytestmark = pytest.mark.django_db
+
+
+def create_action(status=ActionStatus.SUCCESS, signal=ActionSignal.ABNORMAL):
+    return ActionInstance.objects.create(
+        signal=signal,
+        strategy_id=1,
+        alerts=["1"],
+        status=status,
+        bk_biz_id="2",
+        action_config={"id": 1, "name": "notice"},
+    )
+
+
+@pytest.fixture
+def synced_documents():
+    documents = []
+
+    def bulk_create(docs, action=None):
+        documents.extend(docs)
+
+    with mock.patch.object(
+        action_tasks.sync_actions_sharding_task,
+        "apply_async",
+        side_effect=lambda args: action_tasks.sync_actions_sharding_task(*args),
+    ), mock.patch.object(action_tasks.AlertDocument, "mget", return_value=[]) as mget, mock.patch.object(
+        action_tasks, "to_document", side_effect=lambda instance, *args, **kwargs: instance.id
+    ), mock.patch.object(
+        action_tasks.ActionInstanceDocument, "bulk_create", side_effect=bulk_create
+    ):
+        yield documents, mget
+
+    ActionInstance.objects.all().delete()
+
+
+class TestActionChangeLog:
+    def test_fetch_and_ack(self):
+        ActionChangeLog.record([1, 2, 2])
+        assert ActionChangeLog.fetch() == {1, 2}
+
+        # 未确认前新的变更不会混入处理中的变更
+        ActionChangeLog.record([3])
+        assert ActionChangeLog.fetch() == {1, 2}
+
+        ActionChangeLog.ack()
+        assert ActionChangeLog.fetch() == {3}
+        ActionChangeLog.ack()
+        assert ActionChangeLog.fetch() == set()
+
+        client = ACTION_SYNC_CHANGES_KEY.client
+        assert not client.exists(ACTION_SYNC_CHANGES_KEY.get_key())
+        assert not client.exists(ACTION_SYNC_PROCESSING_KEY.get_key())
+
+
+class TestSyncActionInstances:
+    def test_sync_by_change_log(self, synced_documents):
+        documents, mget = synced_documents
+        actions = [create_action() for _ in range(3)]
+        received_action = create_action(status=ActionStatus.RECEIVED)
+        ActionChangeLog.record([action.id for action in actions + [received_action]])
+
+        action_tasks.sync_action_instances_every_10_secs(reconcile=False)
+        # 刚接收到的处理记录不做同步
+        assert sorted(documents) == sorted(action.id for action in actions)
+        # 只查询一次第一个告警
+        assert mget.call_count == 1
+        assert ActionChangeLog.fetch() == set()
+
+    def test_reconcile_skip_synced(self, synced_documents):
+        documents, _ = synced_documents
+        actions = [create_action() for _ in range(3)]
+        ActionChangeLog.record([action.id for action in actions])
+        action_tasks.sync_action_instances_every_10_secs(reconcile=False)
+        assert len(documents) == 3
+
+        # 对账时已同步且未变化的处理记录不重复同步
+        documents.clear()
+        action_tasks.sync_action_instances_every_10_secs(reconcile=True)
+        assert documents == []
+
+        # 批量更新后记录的变更会被同步
+        now = datetime.now(tz=timezone.utc)
+        ActionInstance.objects.filter(id=actions[0].id).update(status=ActionStatus.FAILURE, update_time=now)
+        ActionChangeLog.record([actions[0].id])
+        action_tasks.sync_action_instances_every_10_secs(reconcile=False)
+        assert documents == [actions[0].id]
+
+    def test_sync_update_fields_without_update_time(self, synced_documents, django_capture_on_commit_callbacks):
+        documents, _ = synced_documents
+        action = create_action(status=ActionStatus.RUNNING)
+        ActionChangeLog.record([action.id])
+        action_tasks.sync_action_instances_every_10_secs(reconcile=False)
+        assert documents == [action.id]
+
+        # 仅保存状态时更新时间不变，变更仍然需要同步
+        documents.clear()
+        update_time = ActionInstance.objects.get(id=action.id).update_time
+        action.status = ActionStatus.SUCCESS
+        with django_capture_on_commit_callbacks(execute=True):
+            action.save(update_fields=["status"])
+        assert ActionInstance.objects.get(id=action.id).update_time == update_time
+
+        action_tasks.sync_action_instances_every_10_secs(reconcile=False)
+        assert documents == [action.id]
@@ -14,7 +14,7 @@ import arrow
 from django.test import TestCase
 
 from alarm_backends.core.cache.key import CHECK_RESULT_CACHE_KEY
-from alarm_backends.service.trigger.checker import AnomalyChecker
+from alarm_backends.service.trigger.checker import AnomalyChecker, prefetch_check_results
 from bkmonitor.utils import time_tools
 from core.errors.alarm_backends import StrategyItemNotFound
 
@@ -330,6 +330,20 @@ class TestChecker(TestCase):
         self.assertFalse(is_triggered)
         self.assertListEqual(anomaly_timestamps, [])
 
+    def test_check_anomaly_with_prefetch(self):
+        self.insert_check_result(3)
+        checker = AnomalyChecker(POINT, STRATEGY, 1)
+        expected = {level: checker._check_anomaly_by_level(level) for level in ["1", "2", "3"]}
+
+        prefetch_checker = AnomalyChecker(POINT, STRATEGY, 1)
+        check_results = prefetch_check_results([prefetch_checker])
+        self.assertEqual(len(check_results), 3)
+
+        # 预取后不再访问redis
+        self.clear_check_result()
+        for level in ["1", "2", "3"]:
+            self.assertEqual(prefetch_checker._check_anomaly_by_level(level), expected[level])
+
     def test_check_anomaly_by_level_anomaly_count_0(self):
         self.insert_check_result(0)
         checker = AnomalyChecker(POINT, STRATEGY, 1)
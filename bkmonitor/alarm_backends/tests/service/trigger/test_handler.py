@@ -16,6 +16,8 @@ from mock import MagicMock
 from alarm_backends.core.cache.key import ANOMALY_SIGNAL_KEY, SERVICE_LOCK_TRIGGER
 from alarm_backends.core.lock.service_lock import service_lock
 from alarm_backends.service.trigger.handler import TriggerHandler
+from core.errors.alarm_backends import LockError
+from core.prometheus import metrics
 
 pytestmark = pytest.mark.django_db
 
@@ -86,3 +88,37 @@ class TestHandler(object):
             handler.handle()
             assert processor.process.call_count == 0
             assert ANOMALY_SIGNAL_KEY.client.llen(ANOMALY_SIGNAL_KEY.get_key()) == 1
+
+    def test_batch_release_lock_per_item(self, mocker):
+        def is_locked(strategy_id, item_id):
+            try:
+                with service_lock(SERVICE_LOCK_TRIGGER, strategy_id=strategy_id, item_id=item_id):
+                    return False
+            except LockError:
+                return True
+
+        def process_batch(processors, finish_callback):
+            first, second = processors
+            finish_callback(first, Exception("test exc"))
+            # 先结束的监控项立即释放锁，其他监控项仍持有锁
+            assert not is_locked(1, 2)
+            assert is_locked(1, 3)
+            finish_callback(second, None)
+            assert not is_locked(1, 3)
+
+        trigger_processor = mocker.patch("alarm_backends.service.trigger.handler.TriggerProcessor")
+        trigger_processor.side_effect = lambda strategy_id, item_id: MagicMock(
+            strategy_id=int(strategy_id), item_id=int(item_id)
+        )
+        trigger_processor.process_batch.side_effect = process_batch
+        process_count = mocker.patch("alarm_backends.service.trigger.handler.metrics.TRIGGER_PROCESS_COUNT")
+
+        ANOMALY_SIGNAL_KEY.client.lpush(ANOMALY_SIGNAL_KEY.get_key(), "1.2", "1.3")
+        handler = TriggerHandler()
+        handler.handle()
+
+        assert trigger_processor.process_batch.call_count == 1
+        assert ANOMALY_SIGNAL_KEY.client.llen(ANOMALY_SIGNAL_KEY.get_key()) == 0
+        # 按监控项分别记录处理结果
+        statuses = [c[1]["status"] for c in process_count.labels.call_args_list]
+        assert statuses == [metrics.StatusEnum.FAILED, metrics.StatusEnum.SUCCESS]
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+TencentBlueKing is pleased to support the open source community by making
+蓝鲸智云 - Resource SDK (BlueKing - Resource SDK) available.
+Copyright (C) 2022 THL A29 Limited,
+a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+We undertake not to change the open source license (MIT license) applicable
+to the current version of the project delivered to anyone in the future.
+"""
+from array import array
+
+from constants.apm import OtlpKey
+
+
+class TraceGraph:
+    """
+    Trace 调用关系的紧凑表示
+
+    span 按 span_id 去重后编号(span_id 重复时使用最后一个 span)，不在 trace 中的父 span 作为虚拟节点编号在末尾，
+    调用关系使用父节点下标、子节点下标两个数组表示，层级数及入度在一次线性遍历中计算，替代 networkx 建图
+    """
+
+    __slots__ = ("spans", "node_count", "edge_parents", "edge_children", "root_indexes")
+
+    def __init__(self, spans):
+        """
+        :param spans: trace 下的 span 列表
+        """
+        index_mapping = {}
+        self.spans = []
+        for span in spans:
+            span_id = span[OtlpKey.SPAN_ID]
+            index = index_mapping.get(span_id)
+            if index is None:
+                index_mapping[span_id] = len(self.spans)
+                self.spans.append(span)
+            else:
+                self.spans[index] = span
+
+        edges = set()
+        # 根 span 指向虚拟的结束节点，计算层级数时需要多算一层
+        self.root_indexes = set()
+        for span in spans:
+            parent_span_id = span[OtlpKey.PARENT_SPAN_ID]
+            if not parent_span_id:
+                self.root_indexes.add(index_mapping[span[OtlpKey.SPAN_ID]])
+                continue
+            parent_index = index_mapping.get(parent_span_id)
+            if parent_index is None:
+                parent_index = index_mapping[parent_span_id] = len(index_mapping)
+            edges.add((parent_index, index_mapping[span[OtlpKey.SPAN_ID]]))
+
+        self.node_count = len(index_mapping)
+        self.edge_parents = array("l", (edge[0] for edge in edges))
+        self.edge_children = array("l", (edge[1] for edge in edges))
+
+    def in_degrees(self):
+        """各节点的入度"""
+        in_degrees = [0] * self.node_count
+        for child in self.edge_children:
+            in_degrees[child] += 1
+        return in_degrees
+
+    def calculate(self):
+        """
+        计算层级数及各 span 的入度
+        层级数与原有实现保持一致：等于图中最长路径的边数，根 span 指向虚拟的结束节点，路径需要多算一层
+        :return: (层级数, 入度列表[与 self.spans 一一对应])
+        """
+        node_count = self.node_count
+        in_degrees = self.in_degrees()
+
+        # 按父节点分组子节点，使用前缀和偏移量保存为连续数组
+        offsets = [0] * (node_count + 1)
+        for parent in self.edge_parents:
+            offsets[parent + 1] += 1
+        for index in range(node_count):
+            offsets[index + 1] += offsets[index]
+        children = array("l", bytes(array("l").itemsize * len(self.edge_children)))
+        positions = offsets[:-1]
+        for parent, child in zip(self.edge_parents, self.edge_children):
+            children[positions[parent]] = child
+            positions[parent] += 1
+
+        # 拓扑序遍历计算深度
+        remaining = in_degrees[:]
+        depths = [0] * node_count
+        stack = [index for index in range(node_count) if not remaining[index]]
+        visited = 0
+        while stack:
+            node = stack.pop()
+            visited += 1
+            depth = depths[node] + 1
+            for child in children[offsets[node] : offsets[node + 1]]:
+                if depths[child] < depth:
+                    depths[child] = depth
+                remaining[child] -= 1
+                if not remaining[child]:
+                    stack.append(child)
+
+        if visited < node_count:
+            raise ValueError("trace contains a cycle")
+
+        hierarchy_count = max(depths, default=0)
+        for index in self.root_indexes:
+            hierarchy_count = max(hierarchy_count, depths[index] + 1)
+        return hierarchy_count, in_degrees[: len(self.spans)]
@@ -17,20 +17,24 @@ to the current version of the project delivered to anyone in the future.
 """
 import datetime
 import logging
+import multiprocessing
 import operator
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
-import networkx
 from apm_web.handlers.span_infer import InferenceHandler
 from apm_web.utils import group_by
-from networkx import dag_longest_path_length
+from django.conf import settings
 from opentelemetry.semconv.resource import ResourceAttributes
 from opentelemetry.semconv.trace import SpanAttributes
 from opentelemetry.trace import StatusCode
 
 from apm.constants import KindCategory
+from apm.core.discover.precalculation.graph import TraceGraph
 from apm.models import ApmApplication
 from bkm_space.api import SpaceApi
-from bkmonitor.utils.thread_backend import ThreadPool
+from bkmonitor.utils.cache import LRUCache
 from constants.apm import (
     OtlpKey,
     PreCalculateSpecificField,
@@ -40,6 +44,72 @@ from constants.apm import (
 
 logger = logging.getLogger("apm")
 
+# 空间名称缓存，避免每次构造预计算处理器都拉取全量空间列表
+_space_name_cache = LRUCache(maxsize=1, ttl=5 * 60)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_biz_name(bk_biz_id):
+    """获取业务名称，获取不到时返回业务ID"""
+    space_names = _space_name_cache.get("space_names")
+    if space_names is None:
+        space_names = {i.bk_biz_id: i.space_name for i in SpaceApi.list_spaces()}
+        _space_name_cache.set("space_names", space_names)
+    return space_names.get(bk_biz_id, bk_biz_id)
+
+
+def is_gevent_patched():
+    """当前进程是否被 gevent patch，此时 fork 子进程会复制 hub 状态"""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched("os")
+
+
+def get_executor():
+    """
+    获取进程池，需要显式配置 APM_APP_PRE_CALCULATE_PROCESS_NUM 大于 1 才启用
+    仅适用于在普通进程中运行预计算的场景(如 celery worker 以 solo/threads 池启动)，
+    celery prefork 子进程为守护进程不允许创建子进程，gevent 下不能安全 fork，这两种情况返回 None，在当前进程中计算
+    """
+    global _executor
+
+    process_num = min(settings.APM_APP_PRE_CALCULATE_PROCESS_NUM, multiprocessing.cpu_count())
+    if process_num <= 1:
+        return None
+
+    if multiprocessing.current_process().daemon or is_gevent_patched():
+        logger.warning("[PrecalculateProcessor] process pool is not available in current process, ignore it")
+        return None
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=process_num)
+        return _executor
+
+
+def reset_executor():
+    global _executor
+
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+
+
+def calculate_trace_chunk(processor, traces):
+    """计算一批 trace 的预计算数据，在子进程中执行，单个 trace 出错时跳过"""
+    results = []
+    for trace_id, spans in traces:
+        try:
+            results.append(processor.get_trace_info(trace_id, spans))
+        except Exception as e:  # noqa
+            logger.warning(f"[PrecalculateProcessor] calculate trace: {trace_id} failed, error: {e}")
+    return results
+
 
 class PrecalculateProcessor:
     """
@@ -51,33 +121,47 @@ class PrecalculateProcessor:
         self.app_name = app_name
         self.storage = storage
         self.application = ApmApplication.get_application(bk_biz_id=bk_biz_id, app_name=app_name)
-        space_info = {i.bk_biz_id: i for i in SpaceApi.list_spaces()}
-        if bk_biz_id in space_info:
-            bk_biz_name = space_info[bk_biz_id].space_name
-        else:
-            bk_biz_name = bk_biz_id
-        self.bk_biz_name = bk_biz_name
+        self.app_id = self.application.id
+        self.bk_biz_name = get_biz_name(bk_biz_id)
+
+    def __getstate__(self):
+        # 发送到子进程时只保留计算需要的属性
+        state = self.__dict__.copy()
+        state["storage"] = None
+        state["application"] = None
+        return state
 
     def handle(self, all_span):
 
         trace_mapping = group_by(all_span, operator.itemgetter(OtlpKey.TRACE_ID))
 
         logger.info(f"[PrecalculateProcessor] group by total {len(trace_mapping)} trace")
-        data = []
-        pool = ThreadPool()
-        params = [(k, v) for k, v in trace_mapping.items()]
-
-        results = pool.map_ignore_exception(self.get_trace_info, params)
-
-        for result in results:
-            if not result:
-                continue
-
-            data.append(result)
+        data = self.calculate(list(trace_mapping.items()))
 
         # 存储数据
         self.storage.save(data)
 
+    def calculate(self, traces):
+        """
+        计算 trace 预计算数据，trace 按批次分发到进程池中计算
+        :param traces: [(trace_id, spans)]
+        """
+        chunk_size = getattr(settings, "APM_APP_PRE_CALCULATE_CHUNK_SIZE", 200)
+        chunks = [traces[i : i + chunk_size] for i in range(0, len(traces), chunk_size)]
+
+        executor = get_executor() if len(chunks) > 1 else None
+        if executor is None:
+            return [info for chunk in chunks for info in calculate_trace_chunk(self, chunk)]
+
+        try:
+            results = executor.map(calculate_trace_chunk, [self] * len(chunks), chunks)
+            return [info for result in results for info in result]
+        except BrokenProcessPool:
+            # 子进程异常退出时重建进程池，本次在当前进程中计算
+            logger.exception("[PrecalculateProcessor] process pool broken, calculate in current process")
+            reset_executor()
+            return [info for chunk in chunks for info in calculate_trace_chunk(self, chunk)]
+
     def get_status_code(self, span):
 
         for i in [SpanAttributes.HTTP_STATUS_CODE, SpanAttributes.RPC_GRPC_STATUS_CODE]:
@@ -90,8 +174,6 @@ class PrecalculateProcessor:
         from apm_web.constants import CategoryEnum
 
         sorted_spans = sorted(spans, key=lambda s: s[OtlpKey.START_TIME])
-        nodes = set()
-        edges = set()
         services = set()
         start_times = []
         end_times = []
@@ -113,19 +195,7 @@ class PrecalculateProcessor:
         }
         collections = self.init_collections()
 
-        span_id_mapping = {}
-
         for i in sorted_spans:
-            span_id_mapping[i[OtlpKey.SPAN_ID]] = i
-
-            if i[OtlpKey.PARENT_SPAN_ID]:
-                nodes.add(i[OtlpKey.PARENT_SPAN_ID])
-                nodes.add(i[OtlpKey.SPAN_ID])
-                edges.add((i[OtlpKey.PARENT_SPAN_ID], i[OtlpKey.SPAN_ID]))
-            else:
-                nodes.add(i[OtlpKey.SPAN_ID])
-                edges.add((i[OtlpKey.SPAN_ID], "--"))
-
             service_name = i[OtlpKey.RESOURCE].get(ResourceAttributes.SERVICE_NAME)
             if service_name:
                 services.add(service_name)
@@ -142,11 +212,9 @@ class PrecalculateProcessor:
             self.collect(collections, i)
 
         # 层级数
-        graph = networkx.DiGraph()
-        graph.add_nodes_from(nodes)
-        graph.add_edges_from(edges)
-        hierarchy_count = dag_longest_path_length(graph)
-        degree_mapping = self.list_span_degree(graph, span_id_mapping)
+        graph = TraceGraph(sorted_spans)
+        hierarchy_count, in_degrees = graph.calculate()
+        degree_mapping = self.list_span_degree(graph.spans, in_degrees)
 
         # 入口服务&入口接口&入口状态码&入口调用类型
         root_service_span = next(
@@ -188,10 +256,10 @@ class PrecalculateProcessor:
         span_count = len(spans)
 
         # 最早开始时间
-        min_start_time = sorted(start_times)[0]
+        min_start_time = min(start_times)
 
         # 最晚结束时间
-        max_end_time = sorted(end_times, reverse=True)[0]
+        max_end_time = max(end_times)
 
         # Trace耗时
         trace_duration = max_end_time - min_start_time
@@ -208,7 +276,7 @@ class PrecalculateProcessor:
         return {
             PreCalculateSpecificField.BIZ_ID.value: self.bk_biz_id,
             PreCalculateSpecificField.BIZ_NAME.value: self.bk_biz_name,
-            PreCalculateSpecificField.APP_ID.value: self.application.id,
+            PreCalculateSpecificField.APP_ID.value: self.app_id,
             PreCalculateSpecificField.APP_NAME.value: self.app_name,
             PreCalculateSpecificField.TRACE_ID.value: trace_id,
             PreCalculateSpecificField.HIERARCHY_COUNT.value: hierarchy_count,
@@ -262,12 +330,11 @@ class PrecalculateProcessor:
                     collections[f.source].append(span[f.key])
 
     @classmethod
-    def list_span_degree(cls, graph, node_data):
+    def list_span_degree(cls, spans, in_degrees):
         """获取span层级等信息"""
 
         res = {}
-        for node in node_data.values():
-            degree = graph.in_degree(node[OtlpKey.SPAN_ID])
+        for node, degree in zip(spans, in_degrees):
             res[node[OtlpKey.SPAN_ID]] = {
                 "degree": degree,
                 "node": node,
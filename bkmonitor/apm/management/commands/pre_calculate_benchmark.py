@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import multiprocessing
+import random
+import time
+
+from django.core.management import BaseCommand
+from django.test import override_settings
+
+from apm.core.discover.precalculation.processor import (
+    PrecalculateProcessor,
+    reset_executor,
+)
+from constants.apm import OtlpKey
+
+"""
+# 用法:
+评估 trace 预计算在当前进程及进程池中的吞吐，仅用于本地评估，不依赖数据库及存储
+命令行进程为非守护进程，--processes 大于 1 时会启用进程池，可用于确定 APM_APP_PRE_CALCULATE_PROCESS_NUM 的取值
+
+./bin/manage.sh pre_calculate_benchmark --traces=10000 --spans=10 --big-spans=1000 --processes=4
+"""
+
+
+class BenchmarkProcessor(PrecalculateProcessor):
+    """
+    不查询应用及业务信息的预计算处理类
+    """
+
+    def __init__(self):
+        self.bk_biz_id = 2
+        self.app_name = "benchmark"
+        self.storage = None
+        self.application = None
+        self.app_id = 1
+        self.bk_biz_name = "benchmark"
+
+
+def make_span(trace_id, span_id, parent_span_id, start_time, kind=2, service="service"):
+    return {
+        OtlpKey.TRACE_ID: trace_id,
+        OtlpKey.SPAN_ID: span_id,
+        OtlpKey.PARENT_SPAN_ID: parent_span_id,
+        OtlpKey.SPAN_NAME: f"span-{span_id}",
+        OtlpKey.KIND: kind,
+        OtlpKey.START_TIME: start_time,
+        OtlpKey.END_TIME: start_time + random.randint(1, 1000),
+        OtlpKey.STATUS: {"code": 0, "message": ""},
+        OtlpKey.ATTRIBUTES: {"http.method": "GET"},
+        OtlpKey.RESOURCE: {"service.name": service},
+    }
+
+
+def make_trace(trace_id, span_count):
+    """生成随机树状 trace，父 span 从最近生成的 span 中随机选取"""
+    spans = [make_span(trace_id, "0", "", 1000000)]
+    for index in range(1, span_count):
+        parent = spans[random.randint(max(0, index - 5), index - 1)]
+        spans.append(
+            make_span(
+                trace_id,
+                str(index),
+                parent[OtlpKey.SPAN_ID],
+                parent[OtlpKey.START_TIME] + random.randint(0, 100),
+                kind=random.randint(0, 5),
+                service=f"service-{index % 7}",
+            )
+        )
+    return spans
+
+
+class Command(BaseCommand):
+    help = "benchmark apm pre_calculate"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--traces", type=int, default=10000, help="小 trace 数量")
+        parser.add_argument("--spans", type=int, default=10, help="小 trace 的 span 数量")
+        parser.add_argument("--big-spans", type=int, default=1000, help="大 trace 的 span 数量")
+        parser.add_argument("--processes", type=int, default=multiprocessing.cpu_count(), help="进程池进程数")
+        parser.add_argument("--repeat", type=int, default=3, help="重复次数，取最小耗时")
+
+    def timeit(self, func, repeat):
+        cost = None
+        result = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            current = time.perf_counter() - start
+            cost = current if cost is None else min(cost, current)
+        return cost, result
+
+    def handle(self, *args, **options):
+        processor = BenchmarkProcessor()
+        repeat = max(options["repeat"], 1)
+        big_trace = [("big", make_trace("big", options["big_spans"]))]
+        traces = [(str(index), make_trace(str(index), options["spans"])) for index in range(options["traces"])]
+
+        with override_settings(APM_APP_PRE_CALCULATE_PROCESS_NUM=0):
+            big_cost, _ = self.timeit(lambda: processor.calculate(big_trace), repeat)
+            single_cost, single_results = self.timeit(lambda: processor.calculate(traces), repeat)
+        self.stdout.write(f"big trace: {options['big_spans']} spans, cost: {big_cost * 1000:.1f}ms")
+        self.stdout.write(
+            f"current process: {len(single_results)} traces, cost: {single_cost:.3f}s, "
+            f"throughput: {len(traces) / single_cost:.0f} traces/s"
+        )
+
+        process_num = min(options["processes"], multiprocessing.cpu_count())
+        if process_num <= 1:
+            return
+
+        with override_settings(APM_APP_PRE_CALCULATE_PROCESS_NUM=process_num):
+            try:
+                # 预热进程池，避免创建子进程的耗时计入结果
+                processor.calculate(traces)
+                pool_cost, pool_results = self.timeit(lambda: processor.calculate(traces), repeat)
+            finally:
+                reset_executor()
+
+        if len(pool_results) != len(single_results):
+            self.stderr.write(f"results mismatch: {len(single_results)} != {len(pool_results)}")
+        self.stdout.write(
+            f"process pool({process_num}): {len(pool_results)} traces, cost: {pool_cost:.3f}s, "
+            f"throughput: {len(traces) / pool_cost:.0f} traces/s, "
+            f"per core: {len(traces) / pool_cost / process_num:.0f} traces/s, "
+            f"speedup: {single_cost / pool_cost:.1f}x"
+        )
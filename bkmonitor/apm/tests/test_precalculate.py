@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import random
+
+import mock
+import networkx
+import pytest
+
+from apm.core.discover.precalculation.graph import TraceGraph
+from apm.core.discover.precalculation.processor import (
+    PrecalculateProcessor,
+    calculate_trace_chunk,
+    get_executor,
+)
+from constants.apm import OtlpKey
+
+
+def make_span(trace_id, span_id, parent_span_id, start_time, kind=2, service="service"):
+    return {
+        OtlpKey.TRACE_ID: trace_id,
+        OtlpKey.SPAN_ID: span_id,
+        OtlpKey.PARENT_SPAN_ID: parent_span_id,
+        OtlpKey.SPAN_NAME: f"span-{span_id}",
+        OtlpKey.KIND: kind,
+        OtlpKey.START_TIME: start_time,
+        OtlpKey.END_TIME: start_time + random.randint(1, 1000),
+        OtlpKey.STATUS: {"code": 0, "message": ""},
+        OtlpKey.ATTRIBUTES: {"http.method": "GET"},
+        OtlpKey.RESOURCE: {"service.name": service},
+    }
+
+
+def make_trace(trace_id, span_count):
+    """生成随机树状 trace，父 span 从已生成的 span 中随机选取"""
+    spans = [make_span(trace_id, "0", "", 1000000)]
+    for index in range(1, span_count):
+        parent = spans[random.randint(max(0, index - 5), index - 1)]
+        spans.append(
+            make_span(
+                trace_id,
+                str(index),
+                parent[OtlpKey.SPAN_ID],
+                parent[OtlpKey.START_TIME] + random.randint(0, 100),
+                kind=random.randint(0, 5),
+                service=f"service-{index % 7}",
+            )
+        )
+    return spans
+
+
+def networkx_graph_info(spans):
+    """原有基于 networkx 的层级数及入度计算"""
+    graph = networkx.DiGraph()
+    for span in spans:
+        if span[OtlpKey.PARENT_SPAN_ID]:
+            graph.add_edge(span[OtlpKey.PARENT_SPAN_ID], span[OtlpKey.SPAN_ID])
+        else:
+            graph.add_edge(span[OtlpKey.SPAN_ID], "--")
+    return networkx.dag_longest_path_length(graph), {
+        span[OtlpKey.SPAN_ID]: graph.in_degree(span[OtlpKey.SPAN_ID]) for span in spans
+    }
+
+
+@pytest.fixture
+def processor():
+    with mock.patch("apm.core.discover.precalculation.processor.ApmApplication.get_application") as get_application:
+        get_application.return_value.id = 1
+        with mock.patch("apm.core.discover.precalculation.processor.get_biz_name", return_value="test"):
+            yield PrecalculateProcessor(None, 2, "test_app")
+
+
+class TestTraceGraph:
+    @pytest.mark.parametrize(
+        "spans",
+        [
+            # 单个根 span
+            [("a", "")],
+            # 链路
+            [("a", ""), ("b", "a"), ("c", "b")],
+            # 父 span 缺失
+            [("b", "a"), ("c", "b"), ("d", "x")],
+            # span_id 重复
+            [("a", ""), ("b", "a"), ("b", "c"), ("c", "a")],
+        ],
+    )
+    def test_same_as_networkx(self, spans):
+        spans = [
+            make_span("trace", span_id, parent_span_id, index) for index, (span_id, parent_span_id) in enumerate(spans)
+        ]
+        hierarchy_count, degrees = networkx_graph_info(spans)
+
+        graph = TraceGraph(spans)
+        assert graph.calculate() == (
+            hierarchy_count,
+            [degrees[span[OtlpKey.SPAN_ID]] for span in graph.spans],
+        )
+
+    def test_random_traces(self):
+        for trace_index in range(50):
+            spans = make_trace(str(trace_index), random.randint(1, 200))
+            random.shuffle(spans)
+            hierarchy_count, degrees = networkx_graph_info(spans)
+            graph = TraceGraph(spans)
+            assert graph.calculate() == (
+                hierarchy_count,
+                [degrees[span[OtlpKey.SPAN_ID]] for span in graph.spans],
+            )
+
+    def test_cycle(self):
+        spans = [make_span("trace", "a", "b", 0), make_span("trace", "b", "a", 1)]
+        with pytest.raises(ValueError):
+            TraceGraph(spans).calculate()
+
+
+class TestPrecalculateProcessor:
+    def test_get_trace_info(self, processor):
+        spans = make_trace("trace", 100)
+        info = processor.get_trace_info("trace", spans)
+        assert info["app_id"] == 1
+        assert info["biz_name"] == "test"
+        assert info["span_count"] == 100
+        assert info["hierarchy_count"] == networkx_graph_info(spans)[0]
+        assert info["root_span_id"] == "0"
+
+    def test_calculate_skip_error(self, processor):
+        traces = [("trace1", make_trace("trace1", 10)), ("trace2", [])]
+        assert [info["trace_id"] for info in calculate_trace_chunk(processor, traces)] == ["trace1"]
+
+    def test_calculate_by_process_pool(self, processor, settings):
+        settings.APM_APP_PRE_CALCULATE_CHUNK_SIZE = 10
+        settings.APM_APP_PRE_CALCULATE_PROCESS_NUM = 2
+        traces = [(str(index), make_trace(str(index), 20)) for index in range(50)]
+        expected = [processor.get_trace_info(trace_id, spans)["hierarchy_count"] for trace_id, spans in traces]
+
+        results = processor.calculate(traces)
+        assert [info["trace_id"] for info in results] == [trace_id for trace_id, _ in traces]
+        assert [info["hierarchy_count"] for info in results] == expected
+
+    def test_executor_disabled(self, settings):
+        settings.APM_APP_PRE_CALCULATE_PROCESS_NUM = 0
+        assert get_executor() is None
+
+        # 守护进程(celery prefork 子进程)及 gevent 下不创建进程池
+        settings.APM_APP_PRE_CALCULATE_PROCESS_NUM = 2
+        with mock.patch("multiprocessing.current_process", return_value=mock.Mock(daemon=True)):
+            assert get_executor() is None
+        with mock.patch("apm.core.discover.precalculation.processor.is_gevent_patched", return_value=True):
+            assert get_executor() is None
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+
+import re
+
+import arrow
+
+from bkmonitor.data_source.unify_query.query import UnifyQuery
+
+
+def process_unify_query_data_by_row(params, data, end_time=None):
+    """
+    逐点解析的原实现，用于校验按列解析的结果
+    """
+    re_dimension = re.compile(r"_table\d+$")
+    records = []
+    for row in data["series"] or []:
+        dimensions = {}
+        for index, group_key in enumerate(row["group_keys"] or []):
+            end_string = re_dimension.findall(group_key)
+            if end_string:
+                group_key = group_key[: -len(end_string[0])]
+            dimensions[group_key] = row["group_values"][index]
+
+        for value in row["values"]:
+            record = {**dimensions}
+            for column, column_type, v in zip(row["columns"], row["types"], value):
+                if column_type == "time":
+                    v = arrow.get(v).timestamp * 1000
+                if column == "_time":
+                    column = "_time_"
+                elif column in ["_result", "_value"]:
+                    column = "_result_"
+                record[column] = v
+            if "_result_" not in record:
+                record["_result_"] = record[params["query_list"][0]["reference_name"]]
+            if end_time and record.get("_time_") == end_time:
+                continue
+            records.append(record)
+    return records
+
+
+def gen_unify_query_data(series_count, point_count, value_column="_value"):
+    series = []
+    for series_index in range(series_count):
+        series.append(
+            {
+                "name": "_result{}".format(series_index),
+                "columns": ["_time", value_column],
+                "types": ["time", "float"],
+                "group_keys": ["bk_target_ip_table1", "bk_target_cloud_id"],
+                "group_values": ["127.0.0.{}".format(series_index), "0"],
+                "values": [
+                    ["2022-01-01T00:{:02d}:00Z".format(point_index), series_index + point_index]
+                    for point_index in range(point_count)
+                ],
+            }
+        )
+    return {"series": series}
+
+
+class TestUnifyQuery:
+    def test_process_unify_query_data(self):
+        data = gen_unify_query_data(100, 60)
+        end_time = arrow.get("2022-01-01T00:59:00Z").timestamp * 1000
+        records = UnifyQuery.process_unify_query_data({}, data, end_time=end_time)
+        assert len(records) == 100 * 59
+        assert records == process_unify_query_data_by_row({}, data, end_time=end_time)
+        assert records[0] == {
+            "bk_target_ip": "127.0.0.0",
+            "bk_target_cloud_id": "0",
+            "_time_": 1640995200000,
+            "_result_": 0,
+        }
+
+    def test_process_unify_query_data_reference_name(self):
+        data = gen_unify_query_data(2, 3, value_column="a")
+        data["series"].append({"columns": [], "types": [], "group_keys": None, "group_values": [], "values": []})
+        params = {"query_list": [{"reference_name": "a"}]}
+        records = UnifyQuery.process_unify_query_data(params, data)
+        assert records == process_unify_query_data_by_row(params, data)
+        assert records[0]["_result_"] == records[0]["a"] == 0
+
+    def test_process_unify_query_data_empty(self):
+        assert UnifyQuery.process_unify_query_data({}, {"series": None}) == []
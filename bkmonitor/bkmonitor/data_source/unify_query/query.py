@@ -96,46 +96,77 @@ class UnifyQuery:
         """
         处理统一查询模块返回值
         """
+        return list(cls.iter_unify_query_data(params, data, end_time=end_time))
+
+    @classmethod
+    def iter_unify_query_data(cls, params: Dict, data: Dict, end_time: int = None):
+        """
+        按列解析统一查询模块返回值，逐条生成记录
+        1. 维度字段名、列名映射按序列只计算一次
+        2. 时间列按取值缓存解析结果，不同序列的时间点基本一致，只需解析一次
+        """
         re_dimension = re.compile(r"_table\d+$")
+        dimension_field_cache = {}
+        time_cache = {}
+
+        def normalize_dimension_field(group_key: str) -> str:
+            field = dimension_field_cache.get(group_key)
+            if field is None:
+                field = dimension_field_cache[group_key] = re_dimension.sub("", group_key, count=1)
+            return field
 
-        records = []
+        def parse_time(value) -> int:
+            try:
+                return time_cache[value]
+            except KeyError:
+                timestamp = time_cache[value] = arrow.get(value).timestamp * 1000
+                return timestamp
+            except TypeError:
+                # 不可哈希的取值不做缓存
+                return arrow.get(value).timestamp * 1000
 
         rows = data["series"] or []
         for row in rows:
-            dimensions = {}
             if not row["group_keys"]:
                 row["group_keys"] = []
-            for index, group_key in enumerate(row["group_keys"]):
-                end_string = re_dimension.findall(group_key)
-                if end_string:
-                    end_string = end_string[0]
-                    group_key = group_key[: -len(end_string)]
-
-                dimensions[group_key] = row["group_values"][index]
+            dimensions = {
+                normalize_dimension_field(group_key): group_value
+                for group_key, group_value in zip(row["group_keys"], row["group_values"])
+            }
+
+            # 列名及时间列位置按序列计算一次
+            columns = []
+            time_indexes = []
+            for index, (column, column_type) in enumerate(zip(row["columns"], row["types"])):
+                if column_type == "time":
+                    time_indexes.append(index)
+
+                if column == "_time":
+                    column = "_time_"
+                elif column in ["_result", "_value"]:
+                    column = "_result_"
+                columns.append(column)
+            has_result = "_result_" in columns
 
             for value in row["values"]:
-                record = {**dimensions}
-                for column, column_type, v in zip(row["columns"], row["types"], value):
-                    if column_type == "time":
-                        v = arrow.get(v).timestamp * 1000
+                if time_indexes:
+                    value = list(value)
+                    for index in time_indexes:
+                        if index < len(value):
+                            value[index] = parse_time(value[index])
 
-                    if column == "_time":
-                        column = "_time_"
-                    elif column in ["_result", "_value"]:
-                        column = "_result_"
-
-                    record[column] = v
+                record = {**dimensions}
+                record.update(zip(columns, value))
 
                 # 单指标情况下避免缺少_result_字段
-                if "_result_" not in record:
+                if not has_result:
                     record["_result_"] = record[params["query_list"][0]["reference_name"]]
 
                 # 如果是最后一条数据，且时间戳等于结束时间，不返回
                 if end_time and record.get("_time_") == end_time:
                     continue
 
-                records.append(record)
-        return records
+                yield record
 
     def use_unify_query(self) -> bool:
         """
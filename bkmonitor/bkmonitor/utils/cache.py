@@ -10,11 +10,14 @@ specific language governing permissions and limitations under the License.
 """
 
 
+import copy
 import functools
 import json
 import logging
+import threading
 import time
 import zlib
+from collections import OrderedDict
 
 from django.conf import settings
 from django.core.cache import cache, caches
@@ -24,6 +27,7 @@ from django.utils.encoding import force_bytes
 from bkmonitor.utils.common_utils import count_md5
 from bkmonitor.utils.local import local
 from bkmonitor.utils.request import get_request
+from bkmonitor.utils.thread_backend import InheritParentThread
 
 logger = logging.getLogger(__name__)
 
@@ -34,10 +38,33 @@ except Exception:
     mem_cache = cache
 
 
+class _Flight(object):
+    """
+    进程内同一缓存key正在执行的调用
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
 class UsingCache(object):
     min_length = 15
     preset = 6
     key_prefix = "web_cache"
+    # 带过期信息的缓存数据标识
+    envelope_key = "__using_cache_expire__"
+    # 等待其他进程刷新缓存时的轮询间隔(s)
+    lease_poll_interval = 0.05
+
+    # 进程内正在执行的调用，相同缓存key的并发调用只执行一次
+    _flights = {}
+    _flights_lock = threading.Lock()
+
+    # 所有缓存装饰器的累计统计
+    total_stats = {"hit": 0, "miss": 0, "stale": 0, "coalesced": 0}
+    _stats_lock = threading.Lock()
 
     def __init__(
         self,
@@ -47,6 +74,10 @@ class UsingCache(object):
         compress=True,
         is_cache_func=lambda res: True,
         func_key_generator=lambda func: "{}.{}".format(func.__module__, func.__name__),
+        single_flight=True,
+        lease_timeout=0,
+        stale_timeout=0,
+        negative_timeout=0,
     ):
         """
         :param cache_type: 缓存类型
@@ -54,12 +85,21 @@ class UsingCache(object):
         :param compress: 是否进行压缩
         :param is_cache_func: 缓存函数，当函数返回true时，则进行缓存
         :param func_key_generator: 函数标识key的生成逻辑
+        :param single_flight: 缓存未命中时，进程内相同缓存key的并发调用是否只执行一次
+        :param lease_timeout: 分布式租约超时，单位：s，大于0时跨进程只有获取到租约的调用执行函数，其余调用等待缓存写入
+        :param stale_timeout: 缓存过期后仍可使用的时间，单位：s，期间返回旧数据并在后台刷新
+        :param negative_timeout: 不满足 is_cache_func 的结果的缓存时间，单位：s，为0时不缓存
         """
         self.cache_type = cache_type
         self.backend_cache_type = backend_cache_type
         self.compress = compress
         self.is_cache_func = is_cache_func
         self.func_key_generator = func_key_generator
+        self.single_flight = single_flight
+        self.lease_timeout = lease_timeout
+        self.stale_timeout = stale_timeout
+        self.negative_timeout = negative_timeout
+        self.stats = {"hit": 0, "miss": 0, "stale": 0, "coalesced": 0}
         # 先看用户是否提供了user_related参数
         # 若无，则查看cache_type是否提供了user_related参数
         # 若都没有定义，则user_related默认为True
@@ -148,7 +188,7 @@ class UsingCache(object):
 
         try:
             if mem_cache is not cache:
-                mem_cache.set(key, value, 60)
+                mem_cache.set(key, value, min(timeout, 60))
             cache.set(key, value, timeout)
         except Exception as e:
             try:
@@ -158,40 +198,179 @@ class UsingCache(object):
             # 缓存出错不影响主流程
             logger.exception("存缓存[key:{}]时报错：{}\n value: {!r}\nurl: {}".format(key, e, value, request_path))
 
+    def _incr(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+            self.total_stats[name] += 1
+
+    def _pack(self, value, timeout):
+        """
+        需要判断是否过期时，将过期时间与数据一起缓存
+        """
+        if not (self.stale_timeout or self.negative_timeout):
+            return value
+        return {self.envelope_key: time.time() + timeout, "value": value}
+
+    def _unpack(self, value):
+        """
+        :return: (数据, 过期时间)，未记录过期时间时过期时间为 None
+        """
+        if isinstance(value, dict) and self.envelope_key in value:
+            return value.get("value"), value[self.envelope_key]
+        return value, None
+
+    def _join_flight(self, cache_key):
+        """
+        :return: (调用, 是否由当前调用执行)
+        """
+        with self._flights_lock:
+            flight = self._flights.get(cache_key)
+            if flight is not None:
+                return flight, False
+            flight = self._flights[cache_key] = _Flight()
+            return flight, True
+
+    def _leave_flight(self, cache_key, flight):
+        with self._flights_lock:
+            if self._flights.get(cache_key) is flight:
+                del self._flights[cache_key]
+        flight.event.set()
+
+    def _acquire_lease(self, cache_key):
+        if not self.lease_timeout:
+            return True
+        try:
+            return cache.add("{}:lease".format(cache_key), 1, self.lease_timeout)
+        except Exception as e:
+            # 租约不可用时退化为直接执行
+            logger.warning("[Cache]获取缓存租约[key:%s]失败：%s", cache_key, e)
+            return True
+
+    def _release_lease(self, cache_key):
+        if not self.lease_timeout:
+            return
+        try:
+            cache.delete("{}:lease".format(cache_key))
+        except Exception:
+            pass
+
     def _cached(self, task_definition, args, kwargs):
         """
         【默认缓存模式】
         先检查是否缓存是否存在
-        若存在，则直接返回缓存内容
+        若存在，则直接返回缓存内容，缓存已过期但仍在可用时间内时，返回旧数据并在后台刷新
         若不存在，则执行函数，并将结果回写到缓存中
         """
         if settings.ENVIRONMENT == "development":
             cache_key = None
         else:
             cache_key = self._cache_key(task_definition, args, kwargs)
-        if cache_key:
-            return_value = self.get_value(cache_key, default=None)
-
-            if return_value is None:
-                return_value = self._refresh(task_definition, args, kwargs)
+        if not cache_key:
+            return self._cacheless(task_definition, args, kwargs)
+
+        return_value = self.get_value(cache_key, default=None)
+        if return_value is None:
+            self._incr("miss")
+            return self._load(cache_key, task_definition, args, kwargs)
+
+        return_value, expire_time = self._unpack(return_value)
+        if expire_time and time.time() > expire_time:
+            self._incr("stale")
+            self._revalidate(cache_key, task_definition, args, kwargs)
         else:
-            return_value = self._cacheless(task_definition, args, kwargs)
+            self._incr("hit")
         return return_value
 
-    def _refresh(self, task_definition, args, kwargs):
+    def _load(self, cache_key, task_definition, args, kwargs):
+        """
+        缓存未命中时执行函数并回写缓存，相同缓存key的并发调用只有一个会执行函数，其余调用等待其结果
+        """
+        if not self.single_flight:
+            return self._refresh_with_lease(cache_key, task_definition, args, kwargs)
+
+        flight, is_leader = self._join_flight(cache_key)
+        if not is_leader:
+            self._incr("coalesced")
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            # 调用方可能修改返回值，等待的调用使用副本
+            return copy.deepcopy(flight.result)
+
+        try:
+            flight.result = self._refresh_with_lease(cache_key, task_definition, args, kwargs)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            self._leave_flight(cache_key, flight)
+
+    def _refresh_with_lease(self, cache_key, task_definition, args, kwargs):
+        """
+        获取到租约时执行函数，否则等待持有租约的进程写入缓存，超时后再自行执行
+        """
+        if self._acquire_lease(cache_key):
+            try:
+                return self._refresh(task_definition, args, kwargs, cache_key=cache_key)
+            finally:
+                self._release_lease(cache_key)
+
+        deadline = time.time() + self.lease_timeout
+        while time.time() < deadline:
+            time.sleep(self.lease_poll_interval)
+            return_value = self.get_value(cache_key, default=None)
+            if return_value is not None:
+                self._incr("coalesced")
+                return self._unpack(return_value)[0]
+        return self._refresh(task_definition, args, kwargs, cache_key=cache_key)
+
+    def _revalidate(self, cache_key, task_definition, args, kwargs):
+        """
+        后台刷新已过期的缓存，已有调用在刷新时跳过
+        """
+        flight, is_leader = self._join_flight(cache_key)
+        if not is_leader:
+            return
+        if not self._acquire_lease(cache_key):
+            self._leave_flight(cache_key, flight)
+            return
+
+        def revalidate():
+            try:
+                flight.result = self._refresh(task_definition, args, kwargs, cache_key=cache_key)
+            except Exception as e:
+                flight.error = e
+                logger.exception("[Cache]后台刷新缓存[key:%s]失败：%s", cache_key, e)
+            finally:
+                self._release_lease(cache_key)
+                self._leave_flight(cache_key, flight)
+
+        try:
+            InheritParentThread(target=revalidate).start()
+        except Exception as e:
+            self._release_lease(cache_key)
+            self._leave_flight(cache_key, flight)
+            logger.warning("[Cache]启动后台刷新缓存[key:%s]失败：%s", cache_key, e)
+
+    def _refresh(self, task_definition, args, kwargs, cache_key=None):
         """
         【强制刷新模式】
         不使用缓存的数据，将函数执行返回结果回写缓存
         """
-        cache_key = self._cache_key(task_definition, args, kwargs)
+        cache_key = cache_key or self._cache_key(task_definition, args, kwargs)
 
         return_value = self._cacheless(task_definition, args, kwargs)
 
         # 设置了缓存空数据
         # 或者不缓存空数据且数据为空时
         # 需要进行缓存
+        timeout = self.using_cache_type.timeout
         if self.is_cache_func(return_value):
-            self.set_value(cache_key, return_value, self.using_cache_type.timeout)
+            self.set_value(cache_key, self._pack(return_value, timeout), timeout + self.stale_timeout)
+        elif self.negative_timeout:
+            # 不满足缓存条件的结果短暂缓存，避免频繁穿透
+            self.set_value(cache_key, self._pack(return_value, self.negative_timeout), self.negative_timeout)
 
         return return_value
 
@@ -224,6 +403,8 @@ class UsingCache(object):
         default_wrapper.cached = cached_wrapper
         default_wrapper.refresh = refresh_wrapper
         default_wrapper.cacheless = cacheless_wrapper
+        # 命中统计
+        default_wrapper.cache_stats = self.stats
 
         return default_wrapper
 
@@ -338,3 +519,58 @@ class InstanceCache(object):
             del self.__cache[key]
         except KeyError:
             pass
+
+
+class LRUCache(object):
+    """
+    进程内有界LRU缓存，支持可选的过期时间，并记录命中统计
+    """
+
+    def __init__(self, maxsize=1024, ttl=0):
+        """
+        :param maxsize: 最大缓存条目数，超出时淘汰最久未使用的条目
+        :param ttl: 过期时间，单位：s，为0时不过期
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value, expire_time = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+
+            if expire_time and time.time() > expire_time:
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl if ttl else 0)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
@@ -453,6 +453,20 @@ def count_md5(content, dict_sort=True, list_sort=True):
     return _count_md5(str(content))
 
 
+def count_dimension_md5(dimensions: dict):
+    """
+    计算维度字典的MD5，结果与 count_md5 一致
+    维度值均为简单类型时，省去 count_md5 的递归调用
+    """
+    items = []
+    for k in sorted(dimensions.keys()):
+        v = dimensions[k]
+        if isinstance(v, (dict, list, tuple)) or callable(v):
+            return count_md5(dimensions)
+        items.append(str(sorted([_count_md5(str(k)), _count_md5(_count_md5(str(v)))])))
+    return _count_md5(str(sorted([_count_md5(item) for item in items])))
+
+
 def make_callable_hash(content):
     """
     计算callable的hash
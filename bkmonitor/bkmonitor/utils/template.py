@@ -8,6 +8,7 @@ Unless required by applicable law or agreed to in writing, software distributed
 an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
 specific language governing permissions and limitations under the License.
 """
+import functools
 import json
 import logging
 import re
@@ -21,11 +22,16 @@ from django.utils import translation
 from django.utils.translation import ugettext as _
 from jinja2 import Environment, Undefined
 
+from bkmonitor.utils.cache import LRUCache
 from bkmonitor.utils.text import cut_str_by_max_bytes, get_content_length
 from constants.action import NoticeWay
+from core.prometheus import metrics
 
 logger = logging.getLogger(__name__)
 
+# 进程内缓存的编译后模板数量上限
+TEMPLATE_CACHE_SIZE = 2048
+
 
 class NoticeRowRenderer(object):
     """
@@ -155,14 +161,53 @@ class CustomOperateTemplateRenderer(object):
 class Jinja2Renderer(object):
     """
     Jinja2渲染器
+    编译后的模板按模板内容缓存在进程内，相同的模板只编译一次
     """
 
-    @staticmethod
-    def render(content, context):
+    template_cache = LRUCache(maxsize=TEMPLATE_CACHE_SIZE)
+
+    @classmethod
+    def get_template(cls, content):
+        """
+        获取编译后的模板
+        """
+        template = cls.template_cache.get(content)
+        if template is not None:
+            metrics.JINJA2_TEMPLATE_CACHE_COUNT.labels(status="hit").inc()
+            return template
+
+        metrics.JINJA2_TEMPLATE_CACHE_COUNT.labels(status="miss").inc()
+        template = get_jinja2_environment().from_string(content)
+        cls.template_cache.set(content, template)
+        return template
+
+    @classmethod
+    def precompile(cls, templates):
+        """
+        预编译模板
+        """
+        for content in templates:
+            if not content:
+                continue
+            try:
+                cls.get_template(content)
+            except Exception as e:
+                logger.warning("precompile template failed: %s, template: %s", e, content)
+
+    @classmethod
+    def cache_stats(cls):
+        return {
+            "hit": cls.template_cache.hits,
+            "miss": cls.template_cache.misses,
+            "size": len(cls.template_cache),
+        }
+
+    @classmethod
+    def render(cls, content, context):
         """
         支持json和re函数
         """
-        return jinja2_environment().from_string(content).render({"json": json, "re": re, **context})
+        return cls.get_template(content).render({"json": json, "re": re, **context})
 
 
 class AlarmNoticeTemplate(object):
@@ -320,6 +365,15 @@ def jinja2_environment(**options):
     return env
 
 
+@functools.lru_cache(maxsize=1)
+def get_jinja2_environment():
+    """
+    共享的渲染环境
+    gettext 在渲染时按当前激活的语言翻译，因此编译结果与语言无关，所有语言共用一个环境
+    """
+    return jinja2_environment()
+
+
 def jinja_render(template_value, context):
     """
     支持object的jinja2渲染
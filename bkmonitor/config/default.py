@@ -601,6 +601,12 @@ APM_APP_BKDATA_VIRTUAL_METRIC_STORAGE = ""
 APM_APP_PRE_CALCULATE_STORAGE_SLICE_SIZE = 500
 APM_APP_PRE_CALCULATE_STORAGE_RETENTION = 30
 APM_APP_PRE_CALCULATE_STORAGE_SHARDS = 3
+# 预计算进程池进程数(不超过CPU核数，小于等于1时在当前进程中计算)及每批分发的trace数
+# 进程池默认关闭，仅在预计算运行于非守护、非 gevent 的进程(如 celery worker 使用 solo/threads 池)时生效
+# 部署建议: 默认 prefork 的 celery_cron worker 保持 0；celery_cron 以 threads 池启动时(lite 部署)设置为 worker 机器空闲的 CPU 核数(如 4)
+# 取值可通过 ./bin/manage.sh pre_calculate_benchmark 评估
+APM_APP_PRE_CALCULATE_PROCESS_NUM = 0
+APM_APP_PRE_CALCULATE_CHUNK_SIZE = 200
 APM_TRACE_DIAGRAM_CONFIG = {}
 APM_EBPF_ENABLED = False
 
@@ -676,6 +682,9 @@ TRANSFER_BUILTIN_CLUSTER_ID = ""
 # 是否开启数据平台指标缓存
 ENABLE_BKDATA_METRIC_CACHE = True
 
+# 是否开启指标选择器的进程内搜索索引
+ENABLE_METRIC_SEARCH_INDEX = True
+
 # influxdb proxy使用的默认集群名
 INFLUXDB_DEFAULT_PROXY_CLUSTER_NAME = "default"
 INFLUXDB_DEFAULT_PROXY_CLUSTER_NAME_FOR_K8S = "default"
@@ -690,6 +699,11 @@ DISABLE_BIZ_ID = []
 METRIC_AGG_GATEWAY_URL = ""
 # TODO: remove me after checking
 HTTP_METRIC_AGG_GATEWAY_URL = os.getenv("HTTP_METRIC_AGG_GATEWAY_URL", "")
+# 是否在后台线程中批量上报指标，及上报间隔(s)、触发立即上报的通知次数、待发送队列长度
+ENABLE_METRICS_BACKGROUND_FLUSH = True
+METRICS_FLUSH_INTERVAL = 5
+METRICS_FLUSH_THRESHOLD = 100
+METRICS_FLUSH_QUEUE_SIZE = 10
 
 # 网关API域名
 APIGW_BASE_URL = os.getenv("BKAPP_APIGW_BASE_URL", "")
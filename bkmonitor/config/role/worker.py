@@ -64,10 +64,16 @@ BACKEND_NAME = "BK Monitor Backend"
 MIN_DATA_ACCESS_CHECKPOINT = 30 * 60
 # access 每次往前多拉取1个周期的数据
 NUM_OF_COUNT_FREQ_ACCESS = 1
+# access 推送待检测数据时，单个队列元素合并的数据条数，小于等于1时逐条推送
+# 旧版本的 detect/nodata 无法解析批量格式，需在全部 worker 升级后再开启(建议 500)
+ACCESS_DATA_BATCH_PUSH_SIZE = 1
 
 # 流控配置
 QOS_DROP_ALARM_THREADHOLD = 3
 
+# 是否使用redis lua脚本合并批量写入
+ENABLE_REDIS_LUA_SCRIPT = True
+
 TEMPLATES = [
     {
         "NAME": "jinja2",
@@ -254,6 +260,8 @@ if os.getenv("DISABLE_METADATA_TASK") != "True":
         ("metadata.task.sync_space.sync_bkcc_space_data_source", "*/10 * * * *", "global"),
         ("metadata.task.sync_space.refresh_not_biz_space_data_source", "*/10 * * * *", "global"),
         ("metadata.task.sync_space.push_and_publish_space_router_task", "*/30 * * * *", "global"),
+        # 根据变更记录增量刷新空间路由
+        ("metadata.task.sync_space.push_space_router_incrementally", "* * * * *", "global"),
         # metadata 同步自定义事件维度及事件，每三分钟将会从ES同步一次
         ("metadata.task.custom_report.check_event_update", "*/3 * * * *", "global"),
         # metadata 同步 bkci 空间名称任务，因为不要求实时性，每天3点执行一次
@@ -39,6 +39,26 @@ class BkCollectorRegistry(CollectorRegistry):
                     collector._metrics = {}
             collector._metric_init()
 
+    def swap(self) -> "BkCollectorRegistry":
+        """
+        双缓冲：将当前指标数据整体交换出来，原 registry 中的指标重置为空数据
+        :return: 只包含交换出来的数据的 registry，可在后台线程中序列化上报
+        """
+        snapshot = BkCollectorRegistry(auto_describe=False)
+        with self._lock:
+            collectors = copy.copy(self._collector_to_names)
+        for collector in collectors:
+            # 浅拷贝保留原有的数据引用，原指标替换为新的数据容器
+            frozen = copy.copy(collector)
+            if hasattr(collector, "_lock"):
+                with collector._lock:
+                    collector._metrics = {}
+                    collector._metric_init()
+            else:
+                collector._metric_init()
+            snapshot.register(frozen)
+        return snapshot
+
 
 # SLI Registry
 REGISTRY = BkCollectorRegistry()
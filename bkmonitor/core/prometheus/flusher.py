@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, Tuple
+
+from django.conf import settings
+
+from core.prometheus.base import BkCollectorRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsFlusher:
+    """
+    进程内指标后台上报
+
+    - 业务逻辑中调用 notify 只做计数，不会阻塞
+    - 交换线程按间隔或通知次数阈值，将 registry 中的数据交换出来(双缓冲)，放入有界队列
+    - 发送线程从队列中取出数据推送到聚合网关，网关缓慢导致队列满时丢弃最旧的数据并计数
+    """
+
+    def __init__(
+        self,
+        job: str,
+        registry: BkCollectorRegistry,
+        push_func: Callable[[str, BkCollectorRegistry], bool],
+        interval: float = 5,
+        threshold: int = 100,
+        queue_size: int = 10,
+    ):
+        """
+        :param job: 上报的 job 名称
+        :param registry: 指标 registry
+        :param push_func: 推送函数，参数为 job 和交换出来的 registry，返回是否推送成功
+        :param interval: 上报间隔(s)
+        :param threshold: 通知次数达到阈值时立即上报
+        :param queue_size: 待发送队列长度
+        """
+        self.job = job
+        self.registry = registry
+        self.push_func = push_func
+        self.interval = interval
+        self.threshold = threshold
+
+        self.pid = os.getpid()
+        self.stats = {"notified": 0, "flushed": 0, "pushed": 0, "failed": 0, "dropped": 0, "push_seconds": 0.0}
+
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._threads = [
+            threading.Thread(target=self._swap_loop, name=f"metrics-flusher-swap-{job}", daemon=True),
+            threading.Thread(target=self._send_loop, name=f"metrics-flusher-send-{job}", daemon=True),
+        ]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def notify(self):
+        """业务逻辑产生指标后调用，数据会在后台上报"""
+        with self._pending_lock:
+            self._pending += 1
+            self.stats["notified"] += 1
+            pending = self._pending
+        if pending >= self.threshold:
+            self._wakeup.set()
+
+    def flush(self):
+        """交换出当前数据并放入发送队列"""
+        from core.prometheus import metrics
+
+        with self._pending_lock:
+            if not self._pending:
+                return
+            self._pending = 0
+
+        snapshot = self.registry.swap()
+        self.stats["flushed"] += 1
+        try:
+            self._queue.put_nowait(snapshot)
+        except queue.Full:
+            # 丢弃最旧的数据，保证最新的数据能够上报
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                self._queue.put_nowait(snapshot)
+            except queue.Full:
+                pass
+            self.stats["dropped"] += 1
+            metrics.METRICS_FLUSH_DROPPED_COUNT.labels(job=self.job).inc()
+            logger.warning("[MetricsFlusher] job(%s) queue is full, drop oldest metrics", self.job)
+
+    def push(self, snapshot: BkCollectorRegistry):
+        from core.prometheus import metrics
+
+        start = time.time()
+        try:
+            success = self.push_func(self.job, snapshot)
+        except Exception as e:  # noqa
+            logger.exception("[MetricsFlusher] job(%s) push metrics error: %s", self.job, e)
+            success = False
+        cost = time.time() - start
+        self.stats["push_seconds"] += cost
+        self.stats["pushed" if success else "failed"] += 1
+        metrics.METRICS_FLUSH_PUSH_TIME.labels(job=self.job, status=metrics.StatusEnum.from_exc(not success)).observe(
+            cost
+        )
+
+    def _swap_loop(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:  # noqa
+                logger.exception("[MetricsFlusher] job(%s) flush metrics error: %s", self.job, e)
+
+    def _send_loop(self):
+        while True:
+            snapshot = self._queue.get()
+            if snapshot is None:
+                return
+            self.push(snapshot)
+
+    def stop(self, timeout: float = 5):
+        """停止后台线程，并上报剩余的数据"""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._wakeup.set()
+        self.flush()
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        for thread in self._threads:
+            if thread.is_alive():
+                thread.join(timeout)
+
+
+_flushers: Dict[Tuple[str, int], MetricsFlusher] = {}
+_flushers_lock = threading.Lock()
+
+
+def get_flusher(
+    job: str, registry: BkCollectorRegistry, push_func: Callable[[str, BkCollectorRegistry], bool]
+) -> MetricsFlusher:
+    """
+    获取当前进程的后台上报器，fork 后的子进程中会重新创建
+    """
+    key = (job, id(registry))
+    flusher = _flushers.get(key)
+    if flusher is not None and flusher.pid == os.getpid():
+        return flusher
+
+    with _flushers_lock:
+        flusher = _flushers.get(key)
+        if flusher is None or flusher.pid != os.getpid():
+            flusher = MetricsFlusher(
+                job,
+                registry,
+                push_func,
+                interval=getattr(settings, "METRICS_FLUSH_INTERVAL", 5),
+                threshold=getattr(settings, "METRICS_FLUSH_THRESHOLD", 100),
+                queue_size=getattr(settings, "METRICS_FLUSH_QUEUE_SIZE", 10),
+            )
+            flusher.start()
+            _flushers[key] = flusher
+    return flusher
+
+
+@atexit.register
+def stop_flushers():
+    for flusher in list(_flushers.values()):
+        if flusher.pid == os.getpid():
+            flusher.stop()
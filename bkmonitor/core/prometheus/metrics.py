@@ -17,23 +17,23 @@ from prometheus_client.exposition import push_to_gateway
 from prometheus_client.utils import INF
 
 from core.prometheus.base import REGISTRY, BkCollectorRegistry, Counter, Histogram
+from core.prometheus.flusher import get_flusher
 from core.prometheus.tools import get_metric_agg_gateway_url, udp_handler
 
 logger = logging.getLogger(__name__)
 
 
-def report_all(job: str = settings.DEFAULT_METRIC_PUSH_JOB, registry: BkCollectorRegistry = REGISTRY):
+def push_registry(job: str, registry: BkCollectorRegistry) -> bool:
     """
-    批量上报指标
+    推送 registry 中的指标到聚合网关，不清空数据
+    :return: 是否推送成功
     """
-    if not get_metric_agg_gateway_url():
-        return
     try:
         # 发送消息
         push_to_gateway(gateway="", job=job, registry=registry, handler=udp_handler)
     except Exception:
         # 失败不处理，handler已经打了日志了，这里只是为了防止上报过程出现任何异常导致正常逻辑无法走下去
-        return
+        return False
 
     try:
         # 发送到旁路网关
@@ -43,7 +43,23 @@ def report_all(job: str = settings.DEFAULT_METRIC_PUSH_JOB, registry: BkCollecto
         logger.exception("Failed to send metrics to PushGateway via HTTP")
         # 当 TCP 发送失败时继续，不影响正常流程
 
-    registry.clear_data()
+    return True
+
+
+def report_all(job: str = settings.DEFAULT_METRIC_PUSH_JOB, registry: BkCollectorRegistry = REGISTRY):
+    """
+    批量上报指标
+    开启后台上报时，只通知当前进程的后台上报器，由后台线程交换数据并推送
+    """
+    if not get_metric_agg_gateway_url():
+        return
+
+    if getattr(settings, "ENABLE_METRICS_BACKGROUND_FLUSH", False):
+        get_flusher(job, registry, push_registry).notify()
+        return
+
+    if push_registry(job, registry):
+        registry.clear_data()
 
 
 def safe_push_to_gateway(job: str = settings.DEFAULT_METRIC_PUSH_JOB, registry: BkCollectorRegistry = REGISTRY):
@@ -447,6 +463,38 @@ ALARM_CACHE_TASK_TIME = Histogram(
     buckets=(10, 30, 60, INF),
 )
 
+STRATEGY_SNAPSHOT_CACHE_COUNT = Counter(
+    name="bkmonitor_strategy_snapshot_cache_count",
+    documentation="策略快照进程内缓存访问次数",
+    labelnames=("status",),
+)
+
+JINJA2_TEMPLATE_CACHE_COUNT = Counter(
+    name="bkmonitor_jinja2_template_cache_count",
+    documentation="Jinja2编译模板进程内缓存访问次数",
+    labelnames=("status",),
+)
+
+STRATEGY_SNAPSHOT_WRITE_COUNT = Counter(
+    name="bkmonitor_strategy_snapshot_write_count",
+    documentation="策略快照写入次数",
+    labelnames=("status",),
+)
+
+REDIS_PIPELINE_COMMAND_COUNT = Histogram(
+    name="bkmonitor_redis_pipeline_command_count",
+    documentation="redis pipeline 单节点单次执行的命令数",
+    labelnames=("node_id",),
+    buckets=(1, 10, 50, 100, 500, 1000, 5000, 10000, 50000, INF),
+)
+
+REDIS_PIPELINE_EXECUTE_TIME = Histogram(
+    name="bkmonitor_redis_pipeline_execute_time",
+    documentation="redis pipeline 执行耗时(所有节点)",
+    labelnames=("node_count",),
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, INF),
+)
+
 # mail report
 MAIL_REPORT_SEND_LATENCY = Histogram(
     name="bkmonitor_mail_report_send_latency",
@@ -461,4 +509,18 @@ MAIL_REPORT_SEND_COUNT = Counter(
     labelnames=("item_id", "status", "exception"),
 )
 
+# metrics flusher
+METRICS_FLUSH_PUSH_TIME = Histogram(
+    name="bkmonitor_metrics_flush_push_time",
+    documentation="后台指标上报推送耗时",
+    labelnames=("job", "status"),
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, INF),
+)
+
+METRICS_FLUSH_DROPPED_COUNT = Counter(
+    name="bkmonitor_metrics_flush_dropped_count",
+    documentation="后台指标上报队列已满时丢弃的数据次数",
+    labelnames=("job",),
+)
+
 TOTAL_TAG = "__total__"
@@ -96,6 +96,9 @@ RESULT_TABLE_DETAIL_KEY = os.environ.get("RESULT_TABLE_DETAIL_KEY", f"{SPACE_RED
 RESULT_TABLE_DETAIL_CHANNEL = os.environ.get(
     "RESULT_TABLE_DETAIL_CHANNEL", f"{SPACE_REDIS_PREFIX_KEY}:result_table_detail:channel"
 )
+# 空间路由变更记录，用于增量刷新路由
+SPACE_ROUTER_CHANGED_TABLE_KEY = f"{SPACE_REDIS_PREFIX_KEY}:space_router:changed_table_ids"
+SPACE_ROUTER_CHANGED_SPACE_KEY = f"{SPACE_REDIS_PREFIX_KEY}:space_router:changed_spaces"
 
 
 class EtlConfigs(Enum):
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+
+import logging
+from typing import Iterable, Set, Tuple
+
+from django.db import transaction
+
+from metadata import models
+from metadata.models.space.constants import (
+    SPACE_ROUTER_CHANGED_SPACE_KEY,
+    SPACE_ROUTER_CHANGED_TABLE_KEY,
+    SPACE_UID_HYPHEN,
+)
+from metadata.models.space.ds_rt import get_platform_data_ids
+from metadata.utils.redis_tools import RedisTools
+
+logger = logging.getLogger("metadata")
+
+
+def _record_on_commit(key: str, members: Iterable[str]):
+    """事务提交后记录变更，避免增量任务读取到未提交的数据"""
+    members = [member for member in set(members) if member]
+    if not members:
+        return
+
+    def record():
+        try:
+            RedisTools.sadd(key, members)
+        except Exception as e:
+            # 记录失败时由全量刷新兜底
+            logger.error("record space router change error, key: %s, members: %s, error: %s", key, members, e)
+
+    transaction.on_commit(record)
+
+
+def record_table_id_changes(table_ids: Iterable[str]):
+    """记录路由有变化的结果表"""
+    _record_on_commit(SPACE_ROUTER_CHANGED_TABLE_KEY, table_ids)
+
+
+def record_space_changes(space_uids: Iterable[str]):
+    """记录路由有变化的空间"""
+    _record_on_commit(SPACE_ROUTER_CHANGED_SPACE_KEY, space_uids)
+
+
+def pop_space_router_changes() -> Tuple[Set[str], Set[str]]:
+    """获取并清空变更记录
+
+    :return: 结果表列表, 空间唯一标识列表
+    """
+    return RedisTools.spop_all(SPACE_ROUTER_CHANGED_TABLE_KEY), RedisTools.spop_all(SPACE_ROUTER_CHANGED_SPACE_KEY)
+
+
+def restore_space_router_changes(table_ids: Set[str], space_uids: Set[str]):
+    """处理失败时，放回变更记录，等待下次处理"""
+    RedisTools.sadd(SPACE_ROUTER_CHANGED_TABLE_KEY, list(table_ids))
+    RedisTools.sadd(SPACE_ROUTER_CHANGED_SPACE_KEY, list(space_uids))
+
+
+def get_affected_spaces(table_ids: Set[str]) -> Tuple[Set[str], Set[str]]:
+    """获取结果表变更影响的空间
+
+    :return: 受影响的空间唯一标识, 需要全部刷新的空间类型(结果表属于平台级数据源时)
+    """
+    if not table_ids:
+        return set(), set()
+
+    data_ids = set(
+        models.DataSourceResultTable.objects.filter(table_id__in=table_ids).values_list("bk_data_id", flat=True)
+    )
+    platform_data_ids = get_platform_data_ids()
+    space_types = {platform_data_ids[data_id] for data_id in data_ids if data_id in platform_data_ids}
+
+    space_uids = {
+        f"{space_type_id}{SPACE_UID_HYPHEN}{space_id}"
+        for space_type_id, space_id in models.SpaceDataSource.objects.filter(bk_data_id__in=data_ids).values_list(
+            "space_type_id", "space_id"
+        )
+    }
+    return space_uids, space_types
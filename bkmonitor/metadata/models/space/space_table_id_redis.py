@@ -77,14 +77,17 @@ class SpaceTableIDRedis:
         2. 跟进 result field tag: metric 进行过滤
         """
         logger.info("start to push field table_id data")
-        table_ids = self._refine_table_ids(table_id_list)
+        refined_table_ids = self._refine_table_ids(table_id_list)
         table_id_fields_qs = models.ResultTableField.objects.filter(
-            tag=models.ResultTableField.FIELD_TAG_METRIC, table_id__in=table_ids
+            tag=models.ResultTableField.FIELD_TAG_METRIC, table_id__in=refined_table_ids
         ).values("table_id", "field_name")
         # 如果指标存在，则以指标进行过滤
         if field_list:
             table_id_fields_qs = table_id_fields_qs.filter(field_name__in=field_list)
         table_ids = {data["table_id"] for data in table_id_fields_qs}
+        # 时序指标以 TimeSeriesMetric 为准，不一定存在于结果表字段中，需要补充指标所在的时序结果表
+        if field_list:
+            table_ids |= self._filter_ts_table_ids_by_fields(refined_table_ids, field_list)
         # 根据 option 过滤是否有开启黑名单，如果开启黑名单，则指标会有过期时间
         white_tables = set(
             models.ResultTableOption.objects.filter(
@@ -117,17 +120,22 @@ class SpaceTableIDRedis:
                     logger.warning("table_id: %s not found field or expired", table_id)
                     continue
                 for field in fields:
+                    # 指定指标时，仅处理指定的指标，避免写入不完整的数据
+                    if field_list and field not in field_list:
+                        continue
                     field_table_ids.setdefault(field, []).append(table_id)
 
         # 推送数据到 redis，需要 json 序列化处理
         if field_table_ids:
-            redis_values = {field: json.dumps(table_ids) for field, table_ids in field_table_ids.items()}
-            RedisTools.hmset_to_redis(FIELD_TO_RESULT_TABLE_KEY, redis_values)
+            redis_values = {field: json.dumps(sorted(table_ids)) for field, table_ids in field_table_ids.items()}
+            # 仅写入和通知内容有变化的数据
+            changed_fields = RedisTools.hmset_changed(FIELD_TO_RESULT_TABLE_KEY, redis_values)
 
-            if is_publish:
-                RedisTools.publish(FIELD_TO_RESULT_TABLE_CHANNEL, list(field_table_ids.keys()))
+            if is_publish and changed_fields:
+                RedisTools.publish(FIELD_TO_RESULT_TABLE_CHANNEL, changed_fields)
 
         logger.info("push redis field_to_result_table, data: %s", json.dumps(field_table_ids))
+        return field_table_ids
 
     def push_data_label_table_ids(
         self,
@@ -152,12 +160,13 @@ class SpaceTableIDRedis:
             rt_dl_map.setdefault(data["data_label"], []).append(data["table_id"])
 
         if rt_dl_map:
-            redis_values = {data_label: json.dumps(table_ids) for data_label, table_ids in rt_dl_map.items()}
-            RedisTools.hmset_to_redis(DATA_LABEL_TO_RESULT_TABLE_KEY, redis_values)
+            redis_values = {data_label: json.dumps(sorted(table_ids)) for data_label, table_ids in rt_dl_map.items()}
+            changed_data_labels = RedisTools.hmset_changed(DATA_LABEL_TO_RESULT_TABLE_KEY, redis_values)
 
-            if is_publish:
-                RedisTools.publish(DATA_LABEL_TO_RESULT_TABLE_CHANNEL, list(rt_dl_map.keys()))
+            if is_publish and changed_data_labels:
+                RedisTools.publish(DATA_LABEL_TO_RESULT_TABLE_CHANNEL, changed_data_labels)
         logger.info("push redis data_label_to_result_table, data: %s", json.dumps(rt_dl_map))
+        return rt_dl_map
 
     def push_table_id_detail(self, table_id_list: Optional[List] = None, is_publish: Optional[bool] = False):
         """推送结果表的详细信息"""
@@ -165,7 +174,7 @@ class SpaceTableIDRedis:
         table_id_detail = get_table_info_for_influxdb_and_vm(table_id_list)
         if not table_id_detail:
             logger.info("not found table")
-            return
+            return {}
 
         table_ids = set(table_id_detail.keys())
         # 获取结果表类型
@@ -191,10 +200,11 @@ class SpaceTableIDRedis:
 
         # 推送数据
         if _table_id_detail:
-            RedisTools.hmset_to_redis(RESULT_TABLE_DETAIL_KEY, _table_id_detail)
-            if is_publish:
-                RedisTools.publish(RESULT_TABLE_DETAIL_CHANNEL, list(_table_id_detail.keys()))
+            changed_table_ids = RedisTools.hmset_changed(RESULT_TABLE_DETAIL_KEY, _table_id_detail)
+            if is_publish and changed_table_ids:
+                RedisTools.publish(RESULT_TABLE_DETAIL_CHANNEL, changed_table_ids)
         logger.info("push redis result_table_detail, data: %s", json.dumps(_table_id_detail))
+        return _table_id_detail
 
     def _push_bkcc_space_table_ids(
         self,
@@ -208,7 +218,7 @@ class SpaceTableIDRedis:
         # 推送数据
         if _values:
             redis_values = {f"{space_type}__{space_id}": json.dumps(_values)}
-            RedisTools.hmset_to_redis(SPACE_TO_RESULT_TABLE_KEY, redis_values)
+            RedisTools.hmset_changed(SPACE_TO_RESULT_TABLE_KEY, redis_values)
         logger.info(
             "push redis space_to_result_table, space_type: %s, space_id:%s data: %s",
             space_type,
@@ -231,7 +241,7 @@ class SpaceTableIDRedis:
         # 推送数据
         if _values:
             redis_values = {f"{space_type}__{space_id}": json.dumps(_values)}
-            RedisTools.hmset_to_redis(SPACE_TO_RESULT_TABLE_KEY, redis_values)
+            RedisTools.hmset_changed(SPACE_TO_RESULT_TABLE_KEY, redis_values)
         logger.info(
             "push redis space_to_result_table, space_type: %s, space_id:%s data: %s",
             space_type,
@@ -252,7 +262,7 @@ class SpaceTableIDRedis:
         _values.update(self._compose_bksaas_other_table_ids(space_type, space_id, table_id_list))
         if _values:
             redis_values = {f"{space_type}__{space_id}": json.dumps(_values)}
-            RedisTools.hmset_to_redis(SPACE_TO_RESULT_TABLE_KEY, redis_values)
+            RedisTools.hmset_changed(SPACE_TO_RESULT_TABLE_KEY, redis_values)
         logger.info(
             "push redis space_to_result_table, space_type: %s, space_id:%s data: %s",
             space_type,
@@ -583,6 +593,21 @@ class SpaceTableIDRedis:
 
         return table_ids
 
+    def _filter_ts_table_ids_by_fields(self, table_ids: Set, field_list: List) -> Set:
+        """获取包含指定指标的时序结果表"""
+        group_ids = models.TimeSeriesMetric.objects.filter(field_name__in=field_list).values_list(
+            "group_id", flat=True
+        )
+        ts_table_ids = models.TimeSeriesGroup.objects.filter(
+            time_series_group_id__in=group_ids, table_id__in=table_ids
+        ).values_list("table_id", flat=True)
+        # 与全量推送保持一致，仅处理存在指标字段的结果表
+        return set(
+            models.ResultTableField.objects.filter(
+                tag=models.ResultTableField.FIELD_TAG_METRIC, table_id__in=ts_table_ids
+            ).values_list("table_id", flat=True)
+        )
+
     def _filter_ts_info(self, table_ids: Set) -> Dict:
         """根据结果表获取对应的时序数据"""
         if not table_ids:
@@ -940,8 +940,15 @@ class InfluxDBStorage(models.Model, StorageResultTable, InfluxDBTool):
         except AccessVMRecord.DoesNotExist:
             logger.warning("table_id: %s not access vm", self.table_id)
 
+        val = self.get_redis_router_config(vm_table_id)
+        self.push_to_redis(constants.INFLUXDB_PROXY_STORAGE_ROUTER_KEY, self.table_id, json.dumps(val), is_publish)
+
+    def get_redis_router_config(self, vm_table_id: str = "") -> Dict:
+        """
+        获取推送到 redis 的路由配置
+        """
         influxdb_proxy_storage = self.influxdb_proxy_storage
-        val = {
+        return {
             "storageID": str(influxdb_proxy_storage.proxy_cluster_id),
             "clusterName": influxdb_proxy_storage.instance_cluster_name,
             "tagsKey": self.partition_tag != "" and self.partition_tag.split(",") or [],
@@ -955,7 +962,6 @@ class InfluxDBStorage(models.Model, StorageResultTable, InfluxDBTool):
                 },
             },
         }
-        self.push_to_redis(constants.INFLUXDB_PROXY_STORAGE_ROUTER_KEY, self.table_id, json.dumps(val), is_publish)
 
     @property
     def consul_cluster_path(self):
@@ -1260,6 +1266,67 @@ class InfluxDBStorage(models.Model, StorageResultTable, InfluxDBTool):
         if is_version_refresh:
             consul_tools.refresh_router_version()
 
+    @classmethod
+    def batch_refresh_consul_cluster_config(cls, storages=None, publisher=None):
+        """
+        批量刷新结果表在consul及redis上的路由信息
+        1. 预先批量查询 proxy 存储及 vm 接入记录，避免逐个结果表查询
+        2. consul 路由通过一次递归查询比对后，只按批提交有变化的内容
+        3. redis 路由分批写入，全部写入后统一发布一次
+        :param storages: InfluxDBStorage 列表，默认全部
+        :param publisher: consul_tools.ConsulRoutePublisher
+        :return: consul 发布结果
+        """
+        from metadata.models.vm.record import AccessVMRecord
+
+        if storages is None:
+            storages = list(cls.objects.all())
+
+        proxy_storage_map = {
+            obj.id: obj
+            for obj in InfluxDBProxyStorage.objects.filter(
+                id__in={storage.influxdb_proxy_storage_id for storage in storages}
+            )
+        }
+        vm_table_id_map = dict(
+            AccessVMRecord.objects.filter(result_table_id__in=[storage.table_id for storage in storages]).values_list(
+                "result_table_id", "vm_result_table_id"
+            )
+        )
+
+        consul_configs = {}
+        redis_configs = {}
+        for storage in storages:
+            proxy_storage = proxy_storage_map.get(storage.influxdb_proxy_storage_id)
+            if proxy_storage is None:
+                logger.error(
+                    "result_table->[%s] influxdb proxy storage->[%s] does not exist",
+                    storage.table_id,
+                    storage.influxdb_proxy_storage_id,
+                )
+                continue
+            # 复用预先查询的 proxy 存储，避免属性访问时逐个查询
+            storage._influxdb_proxy_storage = proxy_storage
+            consul_configs[storage.consul_cluster_path] = storage.consul_cluster_config
+            redis_configs[storage.table_id] = json.dumps(
+                storage.get_redis_router_config(vm_table_id_map.get(storage.table_id, ""))
+            )
+
+        if publisher is None:
+            publisher = consul_tools.ConsulRoutePublisher(cls.CONSUL_CONFIG_CLUSTER_PATH + "/")
+        result = publisher.publish(consul_configs)
+
+        # TODO: 待推送 redis 数据稳定后，删除推送 consul 功能
+        redis_key = f"{constants.INFLUXDB_KEY_PREFIX}:{constants.INFLUXDB_PROXY_STORAGE_ROUTER_KEY}"
+        redis_items = list(redis_configs.items())
+        for index in range(0, len(redis_items), 1000):
+            RedisTools.hmset_to_redis(redis_key, dict(redis_items[index : index + 1000]))
+        if redis_items:
+            RedisTools.publish(constants.INFLUXDB_KEY_PREFIX, [constants.INFLUXDB_PROXY_STORAGE_ROUTER_KEY])
+
+        logger.info("batch refresh influxdb router finished, result_table count->[%s]", len(redis_configs))
+        return result
+
     def get_metric_map(self):
         """
         获取metric及tag信息
@@ -12,11 +12,26 @@ specific language governing permissions and limitations under the License.
 
 import logging
 
-from django.db.models.signals import post_save, pre_delete
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
 
 from bkmonitor.utils import consul
-from metadata.models import DataSource, InfluxDBHostInfo, InfluxDBStorage
+from metadata.models import (
+    DataSource,
+    DataSourceResultTable,
+    InfluxDBHostInfo,
+    InfluxDBStorage,
+    ResultTable,
+    ResultTableField,
+    ResultTableOption,
+    SpaceDataSource,
+    SpaceResource,
+)
+from metadata.models.space.constants import SPACE_UID_HYPHEN
+from metadata.models.space.space_router_change import (
+    record_space_changes,
+    record_table_id_changes,
+)
 
 logger = logging.getLogger("metadata")
 
@@ -73,3 +88,32 @@ def refresh_influxdb_host(sender, instance, using, **kwargs):
         return
 
     logger.info("influxdb host -> [%s] refresh consul and redis end", instance.host_name)
+
+
+@receiver(post_save, sender=ResultTable)
+@receiver(post_delete, sender=ResultTable)
+@receiver(post_save, sender=ResultTableField)
+@receiver(post_delete, sender=ResultTableField)
+@receiver(post_save, sender=ResultTableOption)
+@receiver(post_delete, sender=ResultTableOption)
+@receiver(post_save, sender=DataSourceResultTable)
+@receiver(post_delete, sender=DataSourceResultTable)
+def record_table_id_router_change(sender, instance, **kwargs):
+    """记录结果表的变动，由增量任务刷新空间路由"""
+    try:
+        record_table_id_changes([instance.table_id])
+    except Exception:
+        logger.exception("record table_id->[%s] router change error", instance.table_id)
+
+
+@receiver(post_save, sender=SpaceDataSource)
+@receiver(post_delete, sender=SpaceDataSource)
+@receiver(post_save, sender=SpaceResource)
+@receiver(post_delete, sender=SpaceResource)
+def record_space_router_change(sender, instance, **kwargs):
+    """记录空间关联资源的变动，由增量任务刷新空间路由"""
+    space_uid = f"{instance.space_type_id}{SPACE_UID_HYPHEN}{instance.space_id}"
+    try:
+        record_space_changes([space_uid])
+    except Exception:
+        logger.exception("record space->[%s] router change error", space_uid)
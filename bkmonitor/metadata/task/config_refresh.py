@@ -79,11 +79,9 @@ def refresh_influxdb_route():
         models.InfluxDBClusterInfo.refresh_consul_cluster_config()
         logger.debug("influxdb cluster refresh consul config success.")
 
-        index = models.InfluxDBStorage.objects.count()
-        for result_table in models.InfluxDBStorage.objects.all():
-            index -= 1
-            result_table.refresh_consul_cluster_config(is_publish=(index == 0))
-            logger.debug("result_table->[%s] refresh consul config success." % result_table.table_id)
+        # 结果表路由批量比对后提交，避免逐个结果表请求 consul 及 redis
+        models.InfluxDBStorage.batch_refresh_consul_cluster_config()
+        logger.debug("result_table refresh consul config success.")
 
         # 更新 vm router
         models.AccessVMRecord.refresh_vm_router()
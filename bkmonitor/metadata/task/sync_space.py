@@ -11,7 +11,7 @@ specific language governing permissions and limitations under the License.
 import json
 import logging
 import threading
-from typing import Optional
+from typing import Dict, List, Optional, Set
 
 from django.db.models import Q
 
@@ -601,20 +601,12 @@ def refresh_not_biz_space_data_source():
     logger.info("refresh not biz space data source successfully")
 
 
-def push_and_publish_space_router(space_type: Optional[str] = None, space_id: Optional[str] = None, is_publish: Optional[bool] = True):
-    """推送数据和通知"""
-    from metadata.models.space.constants import SPACE_TO_RESULT_TABLE_CHANNEL
-    from metadata.models.space.ds_rt import get_space_table_id_data_id
+def _push_space_table_ids_concurrently(space_list: List[Dict]):
+    """使用多线程推送空间路由"""
     from metadata.task.tasks import multi_push_space_table_ids
 
-    # 过滤数据
-    spaces = models.Space.objects.values("space_type_id", "space_id")
-    if space_type:
-        spaces = spaces.filter(space_type_id=space_type)
-    if space_id:
-        spaces = spaces.filter(space_id=space_id)
-    # 拼装数据
-    space_list = [{"space_type": space["space_type_id"], "space_id": space["space_id"]} for space in spaces]
+    if not space_list:
+        return
 
     # 设置线程数为 30，使用线程处理，暂不允许变动
     MAX_TASK_THREAD_NUM = 30
@@ -635,6 +627,25 @@ def push_and_publish_space_router(space_type: Optional[str] = None, space_id: Op
     for t in threads:
         t.join()
 
+
+def push_and_publish_space_router(
+    space_type: Optional[str] = None, space_id: Optional[str] = None, is_publish: Optional[bool] = True
+):
+    """推送数据和通知"""
+    from metadata.models.space.constants import SPACE_TO_RESULT_TABLE_CHANNEL
+    from metadata.models.space.ds_rt import get_space_table_id_data_id
+
+    # 过滤数据
+    spaces = models.Space.objects.values("space_type_id", "space_id")
+    if space_type:
+        spaces = spaces.filter(space_type_id=space_type)
+    if space_id:
+        spaces = spaces.filter(space_id=space_id)
+    # 拼装数据
+    space_list = [{"space_type": space["space_type_id"], "space_id": space["space_id"]} for space in spaces]
+
+    _push_space_table_ids_concurrently(space_list)
+
     # 通知到使用方
     if is_publish:
         space_uid_list = [f"{space['space_type_id']}__{space['space_id']}" for space in spaces]
@@ -656,6 +667,138 @@ def push_and_publish_space_router(space_type: Optional[str] = None, space_id: Op
     space_client.push_table_id_detail(table_id_list=table_id_list, is_publish=is_publish)
 
 
+def push_space_router_by_changes(table_ids: Set[str], space_uids: Set[str], is_publish: Optional[bool] = True):
+    """根据变更的结果表和空间，仅重新计算受影响的路由
+
+    1. 空间路由: 变更的空间及结果表所属数据源关联的空间，平台级数据源则刷新对应类型的全部空间
+    2. 指标路由及 data_label 路由: 结果表变更前后关联的指标及 data_label
+    3. 结果表详情: 变更的结果表
+    """
+    from metadata.models.space.constants import (
+        DATA_LABEL_TO_RESULT_TABLE_CHANNEL,
+        DATA_LABEL_TO_RESULT_TABLE_KEY,
+        FIELD_TO_RESULT_TABLE_CHANNEL,
+        FIELD_TO_RESULT_TABLE_KEY,
+        RESULT_TABLE_DETAIL_KEY,
+        SPACE_TO_RESULT_TABLE_CHANNEL,
+        SPACE_UID_HYPHEN,
+    )
+    from metadata.models.space.space_router_change import get_affected_spaces
+    from metadata.models.space.space_table_id_redis import SpaceTableIDRedis
+
+    # 1. 空间路由
+    affected_space_uids, full_space_types = get_affected_spaces(table_ids)
+    space_uids = set(space_uids) | affected_space_uids
+    space_list = []
+    if full_space_types:
+        spaces = models.Space.objects.values("space_type_id", "space_id")
+        if SpaceTypes.ALL.value not in full_space_types:
+            spaces = spaces.filter(space_type_id__in=full_space_types)
+        space_list = [{"space_type": space["space_type_id"], "space_id": space["space_id"]} for space in spaces]
+    pushed_space_uids = {f"{space['space_type']}{SPACE_UID_HYPHEN}{space['space_id']}" for space in space_list}
+    for space_uid in space_uids - pushed_space_uids:
+        space_type, _, space_id = space_uid.partition(SPACE_UID_HYPHEN)
+        space_list.append({"space_type": space_type, "space_id": space_id})
+        pushed_space_uids.add(space_uid)
+
+    _push_space_table_ids_concurrently(space_list)
+    if is_publish and pushed_space_uids:
+        RedisTools.publish(SPACE_TO_RESULT_TABLE_CHANNEL, list(pushed_space_uids))
+
+    if not table_ids:
+        logger.info("push space router by changes, spaces: %s", len(pushed_space_uids))
+        return
+
+    # 2. 指标及 data_label 路由，变更前的数据从已推送的结果表详情中获取，用于清理不再关联的数据
+    table_id_list = list(table_ids)
+    fields, data_labels = set(), set()
+    for detail in RedisTools.hmget(RESULT_TABLE_DETAIL_KEY, table_id_list):
+        if not detail:
+            continue
+        detail = json.loads(detail)
+        fields.update(detail.get("fields") or [])
+        if detail.get("data_label"):
+            data_labels.add(detail["data_label"])
+    fields.update(
+        models.ResultTableField.objects.filter(
+            table_id__in=table_id_list, tag=models.ResultTableField.FIELD_TAG_METRIC
+        ).values_list("field_name", flat=True)
+    )
+    group_ids = models.TimeSeriesGroup.objects.filter(table_id__in=table_id_list).values_list(
+        "time_series_group_id", flat=True
+    )
+    fields.update(models.TimeSeriesMetric.objects.filter(group_id__in=group_ids).values_list("field_name", flat=True))
+    data_labels.update(
+        models.ResultTable.objects.filter(table_id__in=table_id_list)
+        .exclude(Q(data_label="") | Q(data_label=None))
+        .values_list("data_label", flat=True)
+    )
+
+    space_client = SpaceTableIDRedis()
+    if fields:
+        field_table_ids = space_client.push_field_table_ids(field_list=fields, is_publish=is_publish)
+        _delete_router_fields(
+            FIELD_TO_RESULT_TABLE_KEY, FIELD_TO_RESULT_TABLE_CHANNEL, fields - set(field_table_ids), is_publish
+        )
+    if data_labels:
+        data_label_table_ids = space_client.push_data_label_table_ids(
+            data_label_list=list(data_labels), is_publish=is_publish
+        )
+        _delete_router_fields(
+            DATA_LABEL_TO_RESULT_TABLE_KEY,
+            DATA_LABEL_TO_RESULT_TABLE_CHANNEL,
+            data_labels - set(data_label_table_ids),
+            is_publish,
+        )
+
+    # 3. 结果表详情，已删除的结果表需要清理
+    space_client.push_table_id_detail(table_id_list=table_id_list, is_publish=is_publish)
+    deleted_table_ids = table_ids - set(
+        models.ResultTable.objects.filter(table_id__in=table_id_list).values_list("table_id", flat=True)
+    )
+    RedisTools.hdel(RESULT_TABLE_DETAIL_KEY, list(deleted_table_ids))
+
+    logger.info(
+        "push space router by changes, spaces: %s, table_ids: %s, fields: %s, data_labels: %s",
+        len(pushed_space_uids),
+        len(table_ids),
+        len(fields),
+        len(data_labels),
+    )
+
+
+def _delete_router_fields(key: str, channel: str, fields: Set[str], is_publish: Optional[bool] = True):
+    """删除不再关联结果表的路由"""
+    if not fields:
+        return
+    RedisTools.hdel(key, list(fields))
+    if is_publish:
+        RedisTools.publish(channel, list(fields))
+
+
+@share_lock(identify="metadata_push_space_router_incrementally")
+def push_space_router_incrementally():
+    """根据变更记录增量刷新空间路由，全量刷新任务作为兜底"""
+    from metadata.models.space.space_router_change import (
+        pop_space_router_changes,
+        restore_space_router_changes,
+    )
+
+    table_ids, space_uids = pop_space_router_changes()
+    if not (table_ids or space_uids):
+        return
+
+    logger.info("start to push space router incrementally, table_ids: %s, spaces: %s", table_ids, space_uids)
+    try:
+        push_space_router_by_changes(table_ids, space_uids)
+    except Exception:
+        logger.exception("push space router incrementally error")
+        restore_space_router_changes(table_ids, space_uids)
+        return
+
+    logger.info("push space router incrementally successfully")
+
+
 @share_lock(identify="metadata_push_and_publish_space_router")
 def push_and_publish_space_router_task():
     logger.info("start to push and publish space router")
@@ -8,6 +8,7 @@ Unless required by applicable law or agreed to in writing, software distributed
 an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
 specific language governing permissions and limitations under the License.
 """
+import base64
 import random
 
 from mockredis import mock_redis_client
@@ -62,3 +63,55 @@ class MockCache:
 
     def delete(self, *args, **kwargs):
         return self.mocker_redis.delete(*args, **kwargs)
+
+
+class MemoryConsul:
+    """
+    内存版 consul，支持 kv 的 get/put/delete 及 txn 操作，并记录请求次数
+    """
+
+    def __init__(self, data=None):
+        self.data = dict(data or {})
+        self.requests = []
+        self.kv = MemoryConsulKV(self)
+        self.txn = MemoryConsulTxn(self)
+
+
+class MemoryConsulKV:
+    def __init__(self, consul):
+        self.consul = consul
+
+    def get(self, key, recurse=False, **kwargs):
+        self.consul.requests.append(("get", key))
+        if recurse:
+            items = [{"Key": k, "Value": v} for k, v in sorted(self.consul.data.items()) if k.startswith(key)]
+            return "1", items or None
+        value = self.consul.data.get(key)
+        return "1", {"Key": key, "Value": value} if value is not None else None
+
+    def put(self, key, value, **kwargs):
+        self.consul.requests.append(("put", key))
+        self.consul.data[key] = value.encode() if isinstance(value, str) else value
+        return True
+
+    def delete(self, key, recurse=None, **kwargs):
+        self.consul.requests.append(("delete", key))
+        for k in list(self.consul.data):
+            if k == key or (recurse and k.startswith(key)):
+                self.consul.data.pop(k)
+        return True
+
+
+class MemoryConsulTxn:
+    def __init__(self, consul):
+        self.consul = consul
+
+    def put(self, payload):
+        self.consul.requests.append(("txn", len(payload)))
+        for operation in payload:
+            kv = operation["KV"]
+            if kv["Verb"] == "set":
+                self.consul.data[kv["Key"]] = base64.b64decode(kv["Value"])
+            elif kv["Verb"] == "delete":
+                self.consul.data.pop(kv["Key"], None)
+        return {"Results": [], "Errors": None}
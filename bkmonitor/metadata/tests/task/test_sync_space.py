@@ -5,14 +5,18 @@ import pytest
 from mockredis import mock_redis_client
 
 from api.cmdb.define import Business
+from metadata import models
 from metadata.models import BCSClusterInfo
 from metadata.models.space import Space, SpaceDataSource, SpaceResource
 from metadata.models.space.constants import (
+    FIELD_TO_RESULT_TABLE_KEY,
+    RESULT_TABLE_DETAIL_KEY,
     SPACE_DETAIL_REDIS_KEY_PREFIX,
     SYSTEM_USERNAME,
     SpaceTypes,
 )
 from metadata.task.sync_space import (
+    push_space_router_by_changes,
     refresh_bkci_space_name,
     refresh_cluster_resource,
     sync_bcs_space,
@@ -312,3 +316,78 @@ def test_refresh_bkci_space_name(create_and_delete_record, create_and_delete_spa
     assert Space.objects.get(space_type_id="bkci", space_id=fake_project_id).space_name == fake_project_name
     # 没有变更
     assert Space.objects.get(space_type_id="bkci", space_id="testbkci1").space_name == fake_project_name_two
+
+
+DEFAULT_ROUTER_DATA_ID = 1100099
+
+
+@pytest.fixture
+def create_and_delete_ts_table():
+    table_id = "test_router.ts"
+    group = models.TimeSeriesGroup.objects.create(
+        bk_data_id=DEFAULT_ROUTER_DATA_ID,
+        bk_biz_id=1,
+        table_id=table_id,
+        creator=SYSTEM_USERNAME,
+        last_modify_user=SYSTEM_USERNAME,
+        time_series_group_name="test_router",
+    )
+    models.ResultTable.objects.create(
+        table_id=table_id,
+        table_name_zh=table_id,
+        is_custom_table=True,
+        schema_type="free",
+        default_storage="influxdb",
+        creator=SYSTEM_USERNAME,
+        bk_biz_id=1,
+    )
+    models.AccessVMRecord.objects.create(
+        result_table_id=table_id, bk_base_data_id=1, vm_result_table_id="1_test_router_ts"
+    )
+    # cpu 指标仅存在于 TimeSeriesMetric 中，不在结果表字段中
+    models.ResultTableField.objects.create(
+        table_id=table_id,
+        field_name="value",
+        field_type="float",
+        description="",
+        is_config_by_user=True,
+        creator=SYSTEM_USERNAME,
+        tag=models.ResultTableField.FIELD_TAG_METRIC,
+    )
+    models.TimeSeriesMetric.objects.create(group_id=group.time_series_group_id, table_id=table_id, field_name="cpu")
+    yield table_id
+    models.TimeSeriesMetric.objects.filter(group_id=group.time_series_group_id).delete()
+    models.ResultTableField.objects.filter(table_id=table_id).delete()
+    models.AccessVMRecord.objects.filter(result_table_id=table_id).delete()
+    models.ResultTable.objects.filter(table_id=table_id).delete()
+    group.delete()
+
+
+def test_push_space_router_by_changes(create_and_delete_ts_table, mocker):
+    ts_table_id = create_and_delete_ts_table
+    deleted_table_id = "test_router.deleted"
+    client = mock_redis_client()
+    mocker.patch("metadata.utils.redis_tools.RedisTools.metadata_redis_client", client)
+    mocker.patch("metadata.task.sync_space._push_space_table_ids_concurrently")
+    mocker.patch(
+        "metadata.models.space.space_table_id_redis.SpaceTableIDRedis.push_table_id_detail", return_value={}
+    )
+    # 已删除结果表的指标，cpu 仍然通过时序指标关联到其它结果表
+    client.hmset(RESULT_TABLE_DETAIL_KEY, {deleted_table_id: json.dumps({"fields": ["cpu", "disk"]})})
+    client.hmset(
+        FIELD_TO_RESULT_TABLE_KEY,
+        {
+            "cpu": json.dumps(sorted([deleted_table_id, ts_table_id])),
+            "disk": json.dumps([deleted_table_id]),
+            "other": json.dumps(["test_router.other"]),
+        },
+    )
+
+    push_space_router_by_changes({deleted_table_id}, set(), is_publish=False)
+
+    # 仅重新计算变更结果表关联的指标，cpu 保留时序结果表，disk 被清理，其它指标不受影响
+    assert client.hgetall(FIELD_TO_RESULT_TABLE_KEY) == {
+        b"cpu": json.dumps([ts_table_id]).encode("utf-8"),
+        b"other": json.dumps(["test_router.other"]).encode("utf-8"),
+    }
+    assert not client.hexists(RESULT_TABLE_DETAIL_KEY, deleted_table_id)
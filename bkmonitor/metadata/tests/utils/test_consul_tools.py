@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import json
+
+from metadata.tests.common_utils import MemoryConsul
+from metadata.utils.consul_tools import ConsulRoutePublisher
+
+PREFIX = "bkmonitorv3/influxdb_info/router/"
+
+
+def make_items(count, cluster="default"):
+    return {f"{PREFIX}db_{i}/table": {"cluster": cluster, "partition_tag": ["bk_biz_id"]} for i in range(count)}
+
+
+def test_publish_by_txn():
+    client = MemoryConsul()
+    publisher = ConsulRoutePublisher(PREFIX, client=client)
+
+    result = publisher.publish(make_items(200))
+    assert result == {"total": 200, "updated": 200, "deleted": 0}
+    assert json.loads(client.data[f"{PREFIX}db_0/table"]) == {"cluster": "default", "partition_tag": ["bk_biz_id"]}
+    # 一次递归查询，按64个操作分批提交事务
+    assert client.requests == [("get", PREFIX), ("txn", 64), ("txn", 64), ("txn", 64), ("txn", 8)]
+
+
+def test_publish_only_changed():
+    items = make_items(100)
+    client = MemoryConsul()
+    ConsulRoutePublisher(PREFIX, client=client).publish(items)
+
+    client.requests = []
+    result = ConsulRoutePublisher(PREFIX, client=client).publish(items)
+    assert result == {"total": 100, "updated": 0, "deleted": 0}
+    assert client.requests == [("get", PREFIX)]
+
+    items[f"{PREFIX}db_1/table"] = {"cluster": "new"}
+    client.requests = []
+    result = ConsulRoutePublisher(PREFIX, client=client).publish(items)
+    assert result["updated"] == 1
+    assert client.requests == [("get", PREFIX), ("txn", 1)]
+    assert json.loads(client.data[f"{PREFIX}db_1/table"]) == {"cluster": "new"}
+
+
+def test_publish_delete_missing():
+    client = MemoryConsul({f"{PREFIX}expired/table": b"{}", "bkmonitorv3/other": b"{}"})
+    result = ConsulRoutePublisher(PREFIX, client=client).publish(make_items(2), delete_missing=True)
+    assert result == {"total": 2, "updated": 2, "deleted": 1}
+    assert f"{PREFIX}expired/table" not in client.data
+    assert "bkmonitorv3/other" in client.data
+
+
+def test_publish_txn_failed(mocker):
+    client = MemoryConsul()
+    mocker.patch.object(client.txn, "put", return_value={"Errors": [{"OpIndex": 0, "What": "failed"}]})
+    result = ConsulRoutePublisher(PREFIX, client=client).publish(make_items(3))
+    # 事务失败时逐个key写入
+    assert result["updated"] == 3
+    assert len([request for request in client.requests if request[0] == "put"]) == 3
+    assert json.loads(client.data[f"{PREFIX}db_2/table"])["cluster"] == "default"
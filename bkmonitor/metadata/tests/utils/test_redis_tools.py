@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+
+import pytest
+from mockredis import mock_redis_client
+
+from metadata.utils.redis_tools import RedisTools
+
+KEY = "bkmonitorv3:test:hmset_changed"
+
+
+@pytest.fixture
+def client(mocker):
+    client = mock_redis_client()
+    mocker.patch.object(RedisTools, "metadata_redis_client", client)
+    mocker.patch("metadata.utils.redis_tools.RedisTools.hmset_to_redis", side_effect=client.hmset)
+    yield client
+    client.delete(KEY)
+
+
+def test_hmset_changed(client):
+    client.hmset(KEY, {"a": "1", "b": "2", "c": "3"})
+
+    changed = RedisTools.hmset_changed(KEY, {"a": "1", "b": "20", "d": "4"})
+
+    # 内容未变化的 a 不会写入
+    assert sorted(changed) == ["b", "d"]
+    RedisTools.hmset_to_redis.assert_called_once_with(KEY, {"b": "20", "d": "4"})
+    assert client.hgetall(KEY) == {b"a": b"1", b"b": b"20", b"c": b"3", b"d": b"4"}
+
+    # 无变化时不写入
+    assert RedisTools.hmset_changed(KEY, {"a": "1", "b": "20"}) == []
+    assert RedisTools.hmset_to_redis.call_count == 1
+
+
+def test_spop_all(client):
+    client.sadd(KEY, "table_id_1", "table_id_2")
+
+    assert RedisTools.spop_all(KEY) == {"table_id_1", "table_id_2"}
+    assert RedisTools.spop_all(KEY) == set()
@@ -10,6 +10,7 @@ specific language governing permissions and limitations under the License.
 """
 
 
+import base64
 import json
 import logging
 import time
@@ -117,3 +118,104 @@ class HashConsul(object):
             )
         )
         return consul_client.kv.put(key=key, value=json.dumps(value), *args, **kwargs)
+
+
+class ConsulRoutePublisher(object):
+    """
+    consul路由批量发布工具
+    1. 调用方一次性给出前缀下全部期望的 key/value
+    2. 通过一次递归查询获取前缀下现有的配置，按内容哈希比对出需要更新的 key
+    3. 使用consul事务分批提交变更，全程复用同一个consul客户端
+    """
+
+    # consul 单个事务最多支持64个操作
+    TXN_MAX_OPERATIONS = 64
+
+    def __init__(self, prefix, client=None, chunk_size=TXN_MAX_OPERATIONS):
+        """
+        :param prefix: 路由key的前缀
+        :param client: consul客户端，默认使用 BKConsul
+        :param chunk_size: 单个事务的操作数
+        """
+        self.prefix = prefix
+        self.client = client or consul.BKConsul()
+        self.chunk_size = min(chunk_size, self.TXN_MAX_OPERATIONS)
+
+    def get_current_hashes(self):
+        """
+        获取前缀下现有配置的哈希值
+        :return: {key: md5}
+        """
+        hashes = {}
+        for item in self.client.kv.get(self.prefix, recurse=True)[1] or []:
+            try:
+                hashes[item["Key"]] = hash_util.object_md5(json.loads(item["Value"]))
+            except (TypeError, ValueError):
+                # 无法解析的内容直接覆盖
+                hashes[item["Key"]] = None
+        return hashes
+
+    def diff(self, items, delete_missing=False):
+        """
+        比对期望的配置与consul上的配置
+        :param items: {key: value}
+        :param delete_missing: 是否删除前缀下不在 items 中的 key
+        :return: 需要写入的 {key: value}, 需要删除的 [key]
+        """
+        current_hashes = self.get_current_hashes()
+        changed = {
+            key: value
+            for key, value in items.items()
+            if key not in current_hashes or current_hashes[key] != hash_util.object_md5(value)
+        }
+        deleted = sorted(set(current_hashes) - set(items)) if delete_missing else []
+        return changed, deleted
+
+    def publish(self, items, delete_missing=False):
+        """
+        发布配置，只提交有变化的内容
+        :param items: {key: value}，value为可json序列化的对象
+        :param delete_missing: 是否删除前缀下不在 items 中的 key
+        :return: {"total": 总数, "updated": 更新数, "deleted": 删除数}
+        """
+        changed, deleted = self.diff(items, delete_missing)
+
+        operations = [
+            {"KV": {"Verb": "set", "Key": key, "Value": base64.b64encode(json.dumps(value).encode()).decode()}}
+            for key, value in changed.items()
+        ]
+        operations.extend({"KV": {"Verb": "delete", "Key": key}} for key in deleted)
+
+        for index in range(0, len(operations), self.chunk_size):
+            self._commit(operations[index : index + self.chunk_size])
+
+        logger.info(
+            "consul prefix->[%s] publish finished, total->[%s], updated->[%s], deleted->[%s]",
+            self.prefix,
+            len(items),
+            len(changed),
+            len(deleted),
+        )
+        return {"total": len(items), "updated": len(changed), "deleted": len(deleted)}
+
+    def _commit(self, operations):
+        """
+        提交一个事务，事务失败时逐个key重试，避免单个key的问题影响整批数据
+        """
+        try:
+            result = self.client.txn.put(operations)
+            if result and result.get("Errors"):
+                raise ValueError(result["Errors"])
+            return
+        except Exception as e:  # noqa
+            logger.warning("consul txn failed, will retry key by key, error->[%s]", e)
+
+        for operation in operations:
+            kv = operation["KV"]
+            try:
+                if kv["Verb"] == "delete":
+                    self.client.kv.delete(kv["Key"])
+                else:
+                    self.client.kv.put(kv["Key"], base64.b64decode(kv["Value"]).decode())
+            except Exception:  # noqa
+                logger.exception("failed to publish consul key->[%s]", kv["Key"])
@@ -82,6 +82,42 @@ class RedisTools(object):
             return
         return cls().client.hdel(key, *fields)
 
+    @classmethod
+    def hmset_changed(cls, key: str, field_value: Dict[str, str]) -> List[str]:
+        """只写入内容有变化的 field
+
+        :return: 有变化的 field 列表
+        """
+        fields = list(field_value.keys())
+        changed = field_value
+        try:
+            current_values = []
+            for index in range(0, len(fields), 5000):
+                current_values.extend(cls.hmget(key, fields[index : index + 5000]))
+        except Exception as e:
+            # 获取现有数据失败时，全量写入
+            logger.warning("get current value of key: %s error, %s", key, e)
+        else:
+            changed = {}
+            for field, current_value in zip(fields, current_values):
+                if isinstance(current_value, bytes):
+                    current_value = current_value.decode("utf-8")
+                if current_value != field_value[field]:
+                    changed[field] = field_value[field]
+
+        if changed:
+            cls.hmset_to_redis(key, changed)
+        return list(changed.keys())
+
+    @classmethod
+    def spop_all(cls, key: str) -> Set:
+        """原子获取并清空集合"""
+        pipeline = cls().client.pipeline()
+        pipeline.smembers(key)
+        pipeline.delete(key)
+        members, _ = pipeline.execute()
+        return {member.decode("utf-8") if isinstance(member, bytes) else member for member in members}
+
     @classmethod
     def hget(cls, key: str, field: str) -> str:
         return cls().client.hget(key, field)
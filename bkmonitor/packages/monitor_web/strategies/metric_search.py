@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+from django.conf import settings
+
+from bkmonitor.models.metric_list_cache import MetricListCache
+from bkmonitor.utils.cache import LRUCache
+from bkmonitor.utils.thread_backend import InheritParentThread
+
+logger = logging.getLogger("monitor_web")
+
+# 支持模糊搜索的字段
+SEARCH_FIELDS = ("result_table_id", "metric_field", "metric_field_name", "data_label")
+FIELD_INDEXES = {field: index for index, field in enumerate(SEARCH_FIELDS)}
+
+NGRAM_SIZE = 3
+# 字段拼接分隔符，查询内容中不会出现，跨字段的 ngram 不会被匹配到
+FIELD_SEPARATOR = "\x00"
+
+
+def ngrams(text: str) -> Set[str]:
+    return {text[i : i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+class MetricSearchIndex:
+    """
+    单个业务的指标搜索索引(进程内)
+
+    以 MetricListCache 的 id 为文档，按 SEARCH_FIELDS 拼接后的小写文本建立 3-gram 倒排索引，
+    搜索时用查询内容的 ngram 求交得到候选集，再按字段校验包含/前缀关系。
+    索引通过 last_update 水位增量同步指标缓存刷新产生的变更，已删除的指标只会残留在索引中，
+    最终由数据库按 id 过滤掉，并在定期全量重建时清理。
+    """
+
+    # 增量同步时 last_update 水位回退的时间，避免刷新事务提交晚于水位导致遗漏
+    SYNC_SKEW = timedelta(seconds=60)
+
+    def __init__(self, bk_biz_id: int):
+        self.bk_biz_id = bk_biz_id
+        self.docs: Dict[int, tuple] = {}
+        self.postings: Dict[str, Set[int]] = defaultdict(set)
+        self.watermark = None
+        self.built_at = 0
+        self.synced_at = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, metric_id: int, values: Iterable[str]):
+        values = tuple((value or "").lower() for value in values)
+        with self._lock:
+            old_values = self.docs.get(metric_id)
+            if old_values == values:
+                return
+            if old_values is not None:
+                self.remove(metric_id)
+            self.docs[metric_id] = values
+            for gram in ngrams(FIELD_SEPARATOR.join(values)):
+                self.postings[gram].add(metric_id)
+
+    def remove(self, metric_id: int):
+        with self._lock:
+            values = self.docs.pop(metric_id, None)
+            if values is None:
+                return
+            for gram in ngrams(FIELD_SEPARATOR.join(values)):
+                ids = self.postings.get(gram)
+                if ids is None:
+                    continue
+                ids.discard(metric_id)
+                if not ids:
+                    del self.postings[gram]
+
+    def load(self, queryset):
+        """将查询到的指标加入索引，并推进 last_update 水位"""
+        count = 0
+        for row in queryset.values_list("id", "last_update", *SEARCH_FIELDS).iterator():
+            self.add(row[0], row[2:])
+            if row[1] and (self.watermark is None or row[1] > self.watermark):
+                self.watermark = row[1]
+            count += 1
+        return count
+
+    def build(self):
+        """全量构建"""
+        start_time = time.time()
+        self.load(MetricListCache.objects.filter(bk_biz_id=self.bk_biz_id))
+        self.built_at = self.synced_at = time.time()
+        logger.info(
+            "[MetricSearchIndex] build index of biz(%s), metrics: %s, cost: %.3fs",
+            self.bk_biz_id,
+            len(self.docs),
+            self.built_at - start_time,
+        )
+
+    def sync(self):
+        """增量同步刷新任务更新的指标"""
+        # 先更新同步时间，避免并发请求重复同步
+        self.synced_at = time.time()
+        queryset = MetricListCache.objects.filter(bk_biz_id=self.bk_biz_id)
+        if self.watermark is not None:
+            queryset = queryset.filter(last_update__gte=self.watermark - self.SYNC_SKEW)
+        self.load(queryset)
+
+    def search(self, field_values: Dict[str, str], prefix: bool = False) -> Set[int]:
+        """
+        按字段搜索指标，多个字段需同时满足
+        :param field_values: {字段: 搜索内容}，字段需在 SEARCH_FIELDS 中
+        :param prefix: 是否为前缀匹配，否则为包含匹配
+        """
+        conditions = [(FIELD_INDEXES[field], str(value).lower()) for field, value in field_values.items()]
+
+        with self._lock:
+            # 按倒排列表从短到长求交，查询内容不足一个 ngram 时使用全部文档作为候选
+            posting_lists = []
+            for _, value in conditions:
+                for gram in ngrams(value):
+                    posting_lists.append(self.postings.get(gram, set()))
+            if posting_lists:
+                posting_lists.sort(key=len)
+                candidates = set(posting_lists[0])
+                for ids in posting_lists[1:]:
+                    if not candidates:
+                        break
+                    candidates &= ids
+            else:
+                candidates = self.docs.keys()
+
+            result = set()
+            for metric_id in candidates:
+                values = self.docs[metric_id]
+                if all(
+                    values[index].startswith(value) if prefix else value in values[index] for index, value in conditions
+                ):
+                    result.add(metric_id)
+            return result
+
+
+class MetricSearchService:
+    """
+    指标搜索服务，按业务维护进程内的搜索索引
+    - 索引不存在时在后台线程构建，构建完成前返回 None，由调用方回退到数据库查询
+    - 每次搜索前按间隔增量同步，超过重建间隔后在后台全量重建
+    """
+
+    def __init__(self):
+        self._indexes = LRUCache(maxsize=getattr(settings, "METRIC_SEARCH_INDEX_BIZ_COUNT", 64))
+        self._building = set()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return getattr(settings, "ENABLE_METRIC_SEARCH_INDEX", True)
+
+    def _build(self, bk_biz_id: int):
+        try:
+            index = MetricSearchIndex(bk_biz_id)
+            index.build()
+            self._indexes.set(bk_biz_id, index)
+        except Exception as e:  # noqa
+            logger.exception("[MetricSearchIndex] build index of biz(%s) failed: %s", bk_biz_id, e)
+        finally:
+            with self._lock:
+                self._building.discard(bk_biz_id)
+
+    def build_in_background(self, bk_biz_id: int):
+        with self._lock:
+            if bk_biz_id in self._building:
+                return
+            self._building.add(bk_biz_id)
+        InheritParentThread(target=self._build, args=(bk_biz_id,)).start()
+
+    def get_index(self, bk_biz_id: int) -> Optional[MetricSearchIndex]:
+        index = self._indexes.get(bk_biz_id)
+        now = time.time()
+        if index is None or now - index.built_at > getattr(settings, "METRIC_SEARCH_INDEX_REBUILD_INTERVAL", 60 * 60):
+            self.build_in_background(bk_biz_id)
+        if index is None:
+            return None
+
+        if now - index.synced_at > getattr(settings, "METRIC_SEARCH_INDEX_SYNC_INTERVAL", 30):
+            index.sync()
+        return index
+
+    def search(
+        self, bk_biz_ids: List[int], conditions: List[Dict[str, str]], prefix: bool = False
+    ) -> Optional[Set[int]]:
+        """
+        搜索指标ID
+        :param bk_biz_ids: 业务ID列表
+        :param conditions: 搜索条件列表，条件之间为或关系，单个条件内的字段为且关系
+        :param prefix: 是否为前缀匹配
+        :return: 指标ID集合，索引不可用或结果过多(此时 id 过滤不如直接查询)时返回 None
+        """
+        if not self.enabled or not conditions:
+            return None
+
+        indexes = [self.get_index(bk_biz_id) for bk_biz_id in set(bk_biz_ids)]
+        if None in indexes:
+            return None
+
+        max_result = getattr(settings, "METRIC_SEARCH_INDEX_MAX_RESULT", 5000)
+        metric_ids = set()
+        for index in indexes:
+            for condition in conditions:
+                metric_ids |= index.search(condition, prefix=prefix)
+                if len(metric_ids) > max_result:
+                    return None
+        return metric_ids
+
+
+metric_search_service = MetricSearchService()
@@ -28,6 +28,7 @@ from monitor_web.strategies.constant import (
     DEFAULT_TRIGGER_CONFIG_MAP,
     GLOBAL_TRIGGER_CONFIG,
 )
+from monitor_web.strategies.metric_search import metric_search_service
 from monitor_web.strategies.serializers import handle_target
 from monitor_web.tasks import update_metric_list_by_biz
 from rest_framework import serializers
@@ -1239,8 +1240,8 @@ class GetMetricListV2Resource(Resource):
 
         # 过滤告警名称
         if filter_dict["alert_name"]:
-            metrics = metrics.filter(
-                reduce(lambda x, y: x | y, [Q(metric_field__icontains=name) for name in filter_dict["alert_name"]])
+            metrics = cls.search_filter(
+                metrics, params["bk_biz_id"], [{"metric_field": name} for name in filter_dict["alert_name"]]
             )
 
         # 过滤索引集ID
@@ -1251,10 +1252,8 @@ class GetMetricListV2Resource(Resource):
             metrics = metrics.filter(metric_field__in=filter_dict["strategy_id"])
 
         if filter_dict["strategy_name"]:
-            metrics = metrics.filter(
-                reduce(
-                    lambda x, y: x | y, [Q(metric_field_name__icontains=name) for name in filter_dict["strategy_name"]]
-                )
+            metrics = cls.search_filter(
+                metrics, params["bk_biz_id"], [{"metric_field_name": name} for name in filter_dict["strategy_name"]]
             )
 
         # 支持metric_id查询
@@ -1292,21 +1291,34 @@ class GetMetricListV2Resource(Resource):
                         {"result_table_id": ".".join(fields[:2]), "metric_field": ".".join(fields[2:])}
                     )
 
-                for query_params in query_params_list:
-                    filter_params = {
-                        f"{query_key}__icontains": query_value for query_key, query_value in query_params.items()
-                    }
-                    exact_query.append(Q(**filter_params))
+                exact_query.extend(query_params_list)
 
             queries = []
             for query, field in product(filter_dict["query"], ["result_table_id", "metric_field", "metric_field_name"]):
-                queries.append(Q(**{f"{field}__icontains": query}))
+                queries.append({field: query})
 
             queries.extend(exact_query)
-            metrics = metrics.filter(reduce(lambda x, y: x | y, queries))
+            metrics = cls.search_filter(metrics, params["bk_biz_id"], queries)
 
         return metrics
 
+    @classmethod
+    def search_filter(cls, metrics: QuerySet, bk_biz_id: int, conditions: List[Dict[str, str]]) -> QuerySet:
+        """
+        模糊搜索过滤，条件之间为或关系，单个条件内的字段为且关系
+        优先使用进程内的指标搜索索引得到指标ID，索引未就绪或命中过多时使用 icontains 查询
+        """
+        metric_ids = metric_search_service.search([0, bk_biz_id], conditions)
+        if metric_ids is not None:
+            return metrics.filter(id__in=metric_ids)
+
+        return metrics.filter(
+            reduce(
+                lambda x, y: x | y,
+                [Q(**{f"{field}__icontains": value for field, value in condition.items()}) for condition in conditions],
+            )
+        )
+
     @classmethod
     def page_filter(cls, metrics: QuerySet, params) -> Tuple[QuerySet, int]:
         """
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import time
+
+import mock
+from monitor_web.strategies.metric_search import MetricSearchIndex, MetricSearchService
+
+METRICS = [
+    (1, ("system.cpu_summary", "usage", "CPU使用率", "")),
+    (2, ("system.mem", "pct_used", "内存使用率", "")),
+    (3, ("2_bkmonitor_time_series_1.__default__", "Requests_Total", "requests_total", "custom_app")),
+    (4, ("system.cpu_detail", "idle", "CPU单核空闲率", "")),
+]
+
+
+def make_index():
+    index = MetricSearchIndex(2)
+    for metric_id, values in METRICS:
+        index.add(metric_id, values)
+    return index
+
+
+class TestMetricSearchIndex:
+    def test_substring(self):
+        index = make_index()
+        assert index.search({"result_table_id": "cpu"}) == {1, 4}
+        assert index.search({"metric_field": "REQUESTS"}) == {3}
+        assert index.search({"metric_field_name": "使用率"}) == {1, 2}
+        # 不足一个 ngram 时遍历全部文档
+        assert index.search({"metric_field": "id"}) == {4}
+        # 跨字段的内容不会匹配
+        assert index.search({"result_table_id": "summaryusage"}) == set()
+
+    def test_multi_fields_and_prefix(self):
+        index = make_index()
+        assert index.search({"data_label": "custom", "metric_field": "total"}) == {3}
+        assert index.search({"result_table_id": "system", "metric_field": "total"}) == set()
+        assert index.search({"result_table_id": "system.cpu"}, prefix=True) == {1, 4}
+        assert index.search({"result_table_id": "cpu"}, prefix=True) == set()
+
+    def test_update_and_remove(self):
+        index = make_index()
+        index.add(1, ("system.load", "load1", "1分钟平均负载", ""))
+        assert index.search({"result_table_id": "cpu"}) == {4}
+        assert index.search({"metric_field": "load"}) == {1}
+
+        index.remove(4)
+        assert index.search({"result_table_id": "cpu"}) == set()
+        assert len(index) == 3
+        assert not [gram for gram, ids in index.postings.items() if not ids]
+
+
+class TestMetricSearchService:
+    def test_fallback_when_building(self, settings):
+        settings.ENABLE_METRIC_SEARCH_INDEX = True
+        service = MetricSearchService()
+        with mock.patch.object(service, "build_in_background") as build_in_background:
+            assert service.search([0, 2], [{"metric_field": "usage"}]) is None
+            assert build_in_background.call_count == 2
+
+    def test_search(self, settings):
+        settings.ENABLE_METRIC_SEARCH_INDEX = True
+        settings.METRIC_SEARCH_INDEX_MAX_RESULT = 2
+        service = MetricSearchService()
+        for index in [make_index(), MetricSearchIndex(0)]:
+            index.built_at = index.synced_at = time.time()
+            service._indexes.set(index.bk_biz_id, index)
+
+        assert service.search([0, 2], [{"metric_field": "usage"}, {"metric_field": "idle"}]) == {1, 4}
+        # 命中过多时回退到数据库查询
+        assert service.search([0, 2], [{"result_table_id": "system"}]) is None
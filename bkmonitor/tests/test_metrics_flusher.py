@@ -0,0 +1,126 @@
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import socket
+import threading
+import time
+
+import pytest
+from prometheus_client.exposition import generate_latest
+
+from core.prometheus.base import BkCollectorRegistry, Counter
+from core.prometheus.flusher import MetricsFlusher
+from core.prometheus.metrics import push_registry
+
+
+@pytest.fixture
+def registry():
+    registry = BkCollectorRegistry()
+    counter = Counter(name="test_flusher_count", documentation="test", labelnames=("status",), registry=registry)
+    return registry, counter
+
+
+def wait_for(condition, timeout=5):
+    start = time.time()
+    while not condition():
+        if time.time() - start > timeout:
+            raise TimeoutError
+        time.sleep(0.01)
+
+
+class TestMetricsFlusher:
+    def test_swap(self, registry):
+        registry, counter = registry
+        counter.labels(status="success").inc(3)
+
+        snapshot = registry.swap()
+        assert b'test_flusher_count_total{status="success"} 3.0' in generate_latest(snapshot)
+        assert b"test_flusher_count_total" not in generate_latest(registry)
+
+        # 交换后的新数据不影响已交换出的数据
+        counter.labels(status="failed").inc()
+        assert b'status="failed"' not in generate_latest(snapshot)
+        assert b'test_flusher_count_total{status="failed"} 1.0' in generate_latest(registry)
+
+    def test_flush_by_threshold(self, registry):
+        registry, counter = registry
+        payloads = []
+
+        def push(job, snapshot):
+            payloads.append((job, generate_latest(snapshot)))
+            return True
+
+        flusher = MetricsFlusher("test", registry, push, interval=60, threshold=2)
+        flusher.start()
+        try:
+            counter.labels(status="success").inc()
+            flusher.notify()
+            counter.labels(status="success").inc()
+            flusher.notify()
+            wait_for(lambda: flusher.stats["pushed"] == 1)
+        finally:
+            flusher.stop()
+
+        assert payloads[0][0] == "test"
+        assert b'test_flusher_count_total{status="success"} 2.0' in payloads[0][1]
+        assert flusher.stats["flushed"] == 1
+
+    def test_drop_when_gateway_slow(self, registry):
+        registry, counter = registry
+        blocked = threading.Event()
+        released = threading.Event()
+
+        def slow_push(job, snapshot):
+            blocked.set()
+            released.wait(5)
+            return True
+
+        flusher = MetricsFlusher("test", registry, slow_push, interval=60, threshold=1000, queue_size=1)
+        flusher.start()
+        try:
+            counter.labels(status="success").inc()
+            flusher.notify()
+            flusher.flush()
+            blocked.wait(5)
+
+            # 发送线程阻塞时，交换数据不会阻塞，超出队列长度的数据被丢弃
+            start = time.time()
+            for _ in range(3):
+                counter.labels(status="success").inc()
+                flusher.notify()
+                flusher.flush()
+            assert time.time() - start < 1
+            assert flusher.stats["dropped"] == 2
+        finally:
+            released.set()
+            flusher.stop()
+
+        assert flusher.stats["pushed"] == 2
+
+    def test_push_to_udp_sink(self, registry, settings):
+        registry, counter = registry
+        sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sink.bind(("127.0.0.1", 0))
+        sink.settimeout(5)
+        settings.IS_CONTAINER_MODE = False
+        settings.METRIC_AGG_GATEWAY_URL = "127.0.0.1:{}".format(sink.getsockname()[1])
+        settings.HTTP_METRIC_AGG_GATEWAY_URL = ""
+
+        counter.labels(status="success").inc()
+        flusher = MetricsFlusher("test", registry, push_registry, interval=60)
+        flusher.start()
+        flusher.notify()
+        flusher.stop()
+
+        try:
+            data, _ = sink.recvfrom(65535)
+        finally:
+            sink.close()
+        assert b'test_flusher_count_total{status="success"} 1.0' in data
+        assert flusher.stats["pushed"] == 1
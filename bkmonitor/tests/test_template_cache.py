@@ -0,0 +1,59 @@
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import mock
+import pytest
+from jinja2 import TemplateSyntaxError
+
+from bkmonitor.utils.template import (
+    Jinja2Renderer,
+    get_jinja2_environment,
+    jinja_render,
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_template_cache():
+    Jinja2Renderer.template_cache.clear()
+    yield
+    Jinja2Renderer.template_cache.clear()
+
+
+class TestJinja2TemplateCache:
+    def test_compile_once(self):
+        env = get_jinja2_environment()
+        with mock.patch.object(env, "from_string", wraps=env.from_string) as from_string:
+            assert Jinja2Renderer.render("{{ a }}-{{ b }}", {"a": 1, "b": 2}) == "1-2"
+            assert Jinja2Renderer.render("{{ a }}-{{ b }}", {"a": 3, "b": 4}) == "3-4"
+            assert from_string.call_count == 1
+        assert Jinja2Renderer.cache_stats() == {"hit": 1, "miss": 1, "size": 1}
+
+    def test_jinja_render_object(self):
+        template = {"url": "http://{{ host }}/", "headers": [{"key": "id", "value": "{{ host }}"}], "retry": 3}
+        env = get_jinja2_environment()
+        with mock.patch.object(env, "from_string", wraps=env.from_string) as from_string:
+            for host in ["a", "b"]:
+                assert jinja_render(template, {"host": host}) == {
+                    "url": "http://{}/".format(host),
+                    "headers": [{"key": "id", "value": host}],
+                    "retry": 3,
+                }
+            assert from_string.call_count == 3
+
+    def test_syntax_error_not_cached(self):
+        for _ in range(2):
+            with pytest.raises(TemplateSyntaxError):
+                Jinja2Renderer.render("{{ a ", {})
+        assert Jinja2Renderer.cache_stats()["size"] == 0
+
+    def test_precompile(self):
+        Jinja2Renderer.precompile(["{{ a }}", "", "{% if %}"])
+        assert Jinja2Renderer.cache_stats()["size"] == 1
+        Jinja2Renderer.render("{{ a }}", {"a": 1})
+        assert Jinja2Renderer.cache_stats()["hit"] == 1
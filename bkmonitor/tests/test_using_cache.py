@@ -0,0 +1,157 @@
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import threading
+import time
+
+import mock
+import pytest
+from django.core.cache.backends.locmem import LocMemCache
+
+from bkmonitor.utils.cache import CacheTypeItem, UsingCache
+
+CACHE_TYPE = CacheTypeItem(key="test", timeout=60, user_related=False)
+
+
+@pytest.fixture(autouse=True)
+def locmem(settings):
+    settings.ENVIRONMENT = "testing"
+    settings.ROLE = "worker"
+    backend = LocMemCache("using_cache_test", {})
+    with mock.patch("bkmonitor.utils.cache.cache", backend), mock.patch("bkmonitor.utils.cache.mem_cache", backend):
+        yield backend
+    backend.clear()
+
+
+def wait_for(condition, timeout=5):
+    start = time.time()
+    while not condition():
+        if time.time() - start > timeout:
+            raise TimeoutError
+        time.sleep(0.01)
+
+
+class TestUsingCache:
+    def test_single_flight(self):
+        calls = []
+        release = threading.Event()
+
+        @UsingCache(CACHE_TYPE)
+        def get_hosts(bk_biz_id):
+            calls.append(bk_biz_id)
+            release.wait(5)
+            return [{"bk_host_id": 1}]
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(get_hosts(2))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        wait_for(lambda: get_hosts.cache_stats["coalesced"] == 4)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert calls == [2]
+        assert results == [[{"bk_host_id": 1}]] * 5
+        # 等待的调用拿到的是副本
+        assert len({id(result) for result in results}) == 5
+
+        assert get_hosts(2) == [{"bk_host_id": 1}]
+        assert calls == [2]
+        assert get_hosts.cache_stats == {"hit": 1, "miss": 5, "stale": 0, "coalesced": 4}
+
+    def test_single_flight_error(self):
+        release = threading.Event()
+
+        @UsingCache(CACHE_TYPE)
+        def get_hosts():
+            release.wait(5)
+            raise ValueError("backend error")
+
+        errors = []
+
+        def call():
+            try:
+                get_hosts()
+            except ValueError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        wait_for(lambda: get_hosts.cache_stats["coalesced"] == 2)
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert len(errors) == 3
+        assert not UsingCache._flights
+
+    def test_lease(self, locmem):
+        calls = []
+        cache = UsingCache(CACHE_TYPE, lease_timeout=5)
+        cache.lease_poll_interval = 0.01
+
+        @cache
+        def get_hosts():
+            calls.append(1)
+            return [1]
+
+        # 模拟其他进程持有租约并写入缓存
+        cache_key = cache._cache_key(get_hosts.__wrapped__, (), {})
+        locmem.add("{}:lease".format(cache_key), 1, 5)
+        threading.Timer(0.1, lambda: cache.set_value(cache_key, [2], 60)).start()
+
+        assert get_hosts() == [2]
+        assert calls == []
+        assert get_hosts.cache_stats["coalesced"] == 1
+
+    def test_stale_while_revalidate(self):
+        values = iter([1, 2])
+        cache = UsingCache(CACHE_TYPE(1), stale_timeout=60)
+
+        @cache
+        def get_value():
+            return next(values)
+
+        assert get_value() == 1
+        with mock.patch("bkmonitor.utils.cache.time.time", return_value=time.time() + 2):
+            # 过期后返回旧数据，并在后台刷新
+            assert get_value() == 1
+            assert get_value.cache_stats["stale"] == 1
+            wait_for(lambda: not UsingCache._flights)
+        assert get_value() == 2
+        assert get_value.cache_stats == {"hit": 1, "miss": 1, "stale": 1, "coalesced": 0}
+
+    def test_negative_cache(self):
+        calls = []
+
+        @UsingCache(CACHE_TYPE, is_cache_func=lambda res: bool(res), negative_timeout=1)
+        def get_host(ip):
+            calls.append(ip)
+            return None
+
+        assert get_host("127.0.0.1") is None
+        assert get_host("127.0.0.1") is None
+        assert calls == ["127.0.0.1"]
+
+        time.sleep(1.1)
+        assert get_host("127.0.0.1") is None
+        assert calls == ["127.0.0.1"] * 2
+
+    def test_no_negative_cache(self):
+        calls = []
+
+        @UsingCache(CACHE_TYPE, is_cache_func=lambda res: bool(res))
+        def get_host(ip):
+            calls.append(ip)
+            return []
+
+        get_host("127.0.0.1")
+        get_host("127.0.0.1")
+        assert len(calls) == 2